@@ -0,0 +1,395 @@
+"""
+YUI — modo ASGI (async) para os endpoints de streaming.
+
+No gunicorn sync/gthread cada stream SSE aberto (e cada terminal) segura uma
+thread do worker inteira, mesmo parado esperando tokens do LLM: com
+--threads 2 o terceiro usuário fica na fila. Aqui:
+- POST /api/chat/stream: SSE nativo; cada stream é uma corrotina
+  (services.ai_service.handle_chat_stream_async)
+- /ws/terminal: WebSocket nativo ligado ao core/terminal_mux (sem thread por conexão)
+- Demais rotas: o app Flask de web_server, via ponte WSGI num pool de threads
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+    gunicorn -k uvicorn.workers.UvicornWorker --workers ${WEB_CONCURRENCY:-1} asgi:app
+O modo WSGI (gunicorn web_server:app) continua funcionando igual.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from werkzeug.http import dump_cookie
+
+from core import startup
+from core.terminal_mux import get_terminal_mux, session_marker
+from web_server import app as flask_app
+from web.routes.routes_chat import parse_chat_stream_payload, sse_event
+from web.routes import routes_terminal
+from services.chat_service import chat_pertence_usuario
+from services import ai_service
+
+WSGI_THREADS = int(os.environ.get("YUI_ASGI_WSGI_THREADS", "8"))
+BODY_SPOOL_BYTES = 1024 * 1024  # corpos maiores vão para arquivo temporário
+CHAT_STREAM_PATH = "/api/chat/stream"
+TERMINAL_PATH = "/ws/terminal"
+
+# Mesmos cabeçalhos do after_request add_cors_headers de web_server (o SSE nativo não passa pelo Flask)
+_CORS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", b"Content-Type"),
+]
+_END = object()
+QUEUE_CHUNKS = 16  # chunks em trânsito entre a thread do Flask e o loop (backpressure)
+
+
+# ---------- utilitários HTTP ----------
+
+async def _read_body(receive) -> Any:
+    """Lê o corpo inteiro para um arquivo (RAM até BODY_SPOOL_BYTES)."""
+    body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_BYTES)
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body.write(message.get("body", b""))
+        more = message.get("more_body", False)
+    body.seek(0)
+    return body
+
+
+def _header(scope, name: bytes) -> str:
+    for k, v in scope.get("headers") or ():
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return ""
+
+
+async def _send_json(send, status: int, payload: Dict[str, Any], extra: Optional[List] = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        + _CORS + (extra or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _session_cookie(scope, user_id: str) -> Optional[Tuple[bytes, bytes]]:
+    """Set-Cookie equivalente a session["user_id"] = user_id no Flask (mesma assinatura)."""
+    si = flask_app.session_interface
+    serializer = si.get_signing_serializer(flask_app)
+    if serializer is None:
+        return None
+    name = si.get_cookie_name(flask_app)
+    data: Dict[str, Any] = {}
+    raw = SimpleCookie()
+    try:
+        raw.load(_header(scope, b"cookie"))
+        if name in raw:
+            data = dict(serializer.loads(raw[name].value,
+                                         max_age=int(flask_app.permanent_session_lifetime.total_seconds())))
+    except Exception:
+        data = {}
+    data["user_id"] = user_id
+    value = dump_cookie(
+        name,
+        serializer.dumps(data),
+        domain=si.get_cookie_domain(flask_app),
+        path=si.get_cookie_path(flask_app),
+        secure=si.get_cookie_secure(flask_app),
+        httponly=si.get_cookie_httponly(flask_app),
+        samesite=si.get_cookie_samesite(flask_app),
+    )
+    return b"set-cookie", value.encode("latin-1")
+
+
+# ---------- /api/chat/stream (SSE nativo) ----------
+
+async def chat_stream(scope, receive, send) -> None:
+    if scope["method"] == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": list(_CORS)})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if scope["method"] != "POST":
+        await _send_json(send, 405, {"error": "Método não permitido"})
+        return
+    try:
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body.read() or b"{}")
+        except ValueError:
+            data = {}
+        params, erro = parse_chat_stream_payload(data if isinstance(data, dict) else {})
+        if erro:
+            await _send_json(send, erro[1], {"error": erro[0]})
+            return
+        user_id, chat_id = params["user_id"], params["chat_id"]
+        if not await asyncio.to_thread(chat_pertence_usuario, chat_id, user_id):
+            await _send_json(send, 403, {"error": "Chat não encontrado ou não pertence ao usuário"})
+            return
+        headers = [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + _CORS
+        cookie = _session_cookie(scope, user_id)
+        if cookie:
+            headers.append(cookie)
+    except Exception as e:  # noqa: BLE001
+        await _send_json(send, 500, {"error": str(e)})
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def _chunks():
+        yield sse_event("__STATUS__:thinking")
+        async for chunk in ai_service.handle_chat_stream_async(
+            user_id, chat_id, params["message"],
+            model=params["model"],
+            confirm_high_cost=params["confirm_high_cost"],
+            active_files=params["active_files"],
+            console_errors=params["console_errors"],
+            workspace_open=params["workspace_open"],
+        ):
+            yield sse_event(chunk)
+        yield sse_event("__STATUS__:done")
+
+    async def _pump():
+        gen = _chunks()
+        try:
+            async for event in gen:
+                await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        finally:
+            await gen.aclose()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    # Cliente fechou a aba: cancela a geração em vez de continuar gastando tokens
+    pump = asyncio.ensure_future(_pump())
+    watch = asyncio.ensure_future(_wait_disconnect())
+    try:
+        await asyncio.wait({pump, watch}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (pump, watch):
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(pump, watch, return_exceptions=True)
+    if pump.done() and not pump.cancelled() and pump.exception():
+        logging.warning("Stream ASGI interrompido: %s", pump.exception())
+
+
+# ---------- /ws/terminal (WebSocket nativo) ----------
+
+async def terminal_ws(scope, receive, send) -> None:
+    if (await receive())["type"] != "websocket.connect":
+        return
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    mux = get_terminal_mux()
+    att = await asyncio.to_thread(
+        mux.attach, (query.get("session") or [None])[0], routes_terminal._spawn_shell,
+        lambda: loop.call_soon_threadsafe(ready.set),
+    )
+    await send({"type": "websocket.accept"})
+    await send({"type": "websocket.send", "text": session_marker(att.session.id)})
+
+    async def _forward_output():
+        while True:
+            await ready.wait()
+            ready.clear()
+            frames = att.drain()
+            if frames is None:
+                break
+            for frame in frames:
+                await send({"type": "websocket.send", "text": frame})
+        await send({"type": "websocket.close", "code": 1000})
+
+    sender = asyncio.ensure_future(_forward_output())
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+            att.write(text)
+    except Exception:  # noqa: BLE001
+        pass
+    finally:
+        mux.detach(att)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+# ---------- ponte WSGI (demais rotas Flask) ----------
+
+class WSGIBridge:
+    """
+    Roda um app WSGI sob ASGI. Cada request usa uma thread do pool enquanto o
+    Flask trabalha; respostas em streaming são consumidas chunk a chunk.
+
+    Chamada, iteração e close() da resposta rodam na mesma thread: generators com
+    stream_with_context empilham o contexto do request numa thread e precisam
+    desempilhar nela. Os chunks chegam ao loop por uma fila limitada (QUEUE_CHUNKS).
+    """
+
+    def __init__(self, wsgi_app, max_workers: int = WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yui-wsgi")
+
+    @staticmethod
+    def environ(scope, body) -> Dict[str, Any]:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        path = scope.get("path", "/")
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": (scope.get("query_string") or b"").decode("latin-1"),
+            "SERVER_NAME": str(server[0]),
+            "SERVER_PORT": str(server[1] if server[1] is not None else 80),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.input_terminated": True,  # corpo já lido inteiro (inclusive chunked)
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for raw_name, raw_value in scope.get("headers") or ():
+            name = raw_name.decode("latin-1").upper().replace("-", "_")
+            value = raw_value.decode("latin-1")
+            if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+                environ[name] = value
+                continue
+            key = "HTTP_" + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        if "CONTENT_LENGTH" not in environ:
+            pos = body.tell()
+            environ["CONTENT_LENGTH"] = str(body.seek(0, 2) - pos)
+            body.seek(pos)
+        return environ
+
+    async def __call__(self, scope, receive, send) -> None:
+        body = await _read_body(receive)
+        environ = self.environ(scope, body)
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Tuple[Any, Any]]" = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+        aborted = threading.Event()
+        started: Dict[str, Any] = {}
+
+        def _put(kind, value=None) -> bool:
+            fut = asyncio.run_coroutine_threadsafe(queue.put((kind, value)), loop)
+            while True:
+                try:
+                    fut.result(timeout=0.5)
+                    return True
+                except FutureTimeout:
+                    if aborted.is_set():  # o lado ASGI desistiu (cliente caiu, erro no send)
+                        fut.cancel()
+                        return False
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+            return lambda chunk: _put("chunk", chunk)
+
+        def _run() -> None:
+            try:
+                result = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if chunk and not _put("chunk", chunk):
+                            break
+                finally:
+                    close = getattr(result, "close", None)
+                    if close is not None:
+                        close()
+            except BaseException as e:  # noqa: BLE001
+                _put("error", e)
+            finally:
+                body.close()
+                _put(_END)
+
+        worker = loop.run_in_executor(self.executor, _run)
+        sent_start = False
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind is _END:
+                    break
+                if kind == "error":
+                    if not sent_start:
+                        raise value
+                    logging.warning("Resposta WSGI interrompida: %s", value)
+                    continue
+                if not sent_start:
+                    await send({"type": "http.response.start", "status": started.get("status", 500),
+                                "headers": started.get("headers", [])})
+                    sent_start = True
+                await send({"type": "http.response.body", "body": value, "more_body": True})
+            if not sent_start:
+                await send({"type": "http.response.start", "status": started.get("status", 500),
+                            "headers": started.get("headers", [])})
+            await send({"type": "http.response.body", "body": b""})
+            await worker
+        finally:
+            aborted.set()
+
+
+_wsgi = WSGIBridge(flask_app)
+
+
+# ---------- app ----------
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            startup.warm_up()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _wsgi.executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    """Aplicação ASGI: rotas de streaming nativas, resto via Flask."""
+    kind = scope["type"]
+    path = scope.get("path", "")
+    if kind == "http":
+        if path == CHAT_STREAM_PATH:
+            await chat_stream(scope, receive, send)
+        else:
+            await _wsgi(scope, receive, send)
+    elif kind == "websocket":
+        if path == TERMINAL_PATH:
+            await terminal_ws(scope, receive, send)
+        else:
+            await send({"type": "websocket.close", "code": 4404})
+    elif kind == "lifespan":
+        await _lifespan(receive, send)
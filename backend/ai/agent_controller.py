@@ -19,6 +19,7 @@ from core.event_bus import emit
 from core.memory_manager import add_event
 from core.self_state import set_last_action, set_last_error, set_confidence
 from core.tool_runner import run_tool
+from core.tool_executor import STOP, run_tools
 from core.task_engine import get_task_engine
 from core.action_planner import get_action_planner
 from core.user_profile import get_user_profile
@@ -32,7 +33,9 @@ from backend.ai.skill_manager import executar_skill, listar_skills
 from backend.ai.task_planner import criar_plano
 from backend.ai.tool_router import processar_resposta_ai
 from core.limits import MAX_STEPS as LIMIT_MAX_STEPS
-from core.usage_tracker import record_response_cost, estimate_cost_brl, BUDGET_ALERT_BRL
+from core.usage_tracker import record_response_cost, estimate_cost_brl_tokens, BUDGET_ALERT_BRL
+from core.token_budget import PROMPT_BUDGET, count_tokens, turn_report
+from core.prompt_assembler import PromptAssembler, note_prompt, note_provider_usage
 from core.goals.goal_manager import get_active_goals, update_progress
 from core.planner import criar_plano_estruturado, plan_to_prompt
 try:
@@ -100,6 +103,9 @@ except ImportError:
 OPENAI_API_KEY = (os.environ.get("OPENAI_API_KEY") or "").strip()
 client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 MODEL = os.environ.get("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+# Tokens reservados para system prompts pequenos montados depois do filtro
+# (perfil, missão, planner, Action Engine, autopercepção)
+RESERVA_SISTEMA_TOKENS = 1500
 MAX_HISTORY = 50
 CHUNK_SIZE = 12  # chunks menores = streaming mais fluido  # tamanho do chunk ao “streamar” a resposta final
 
@@ -708,71 +714,83 @@ def agent_controller(
                 top = get_strategy_engine().get_attention_top(strategy)
             else:
                 top = 2 if (meta_signals.get("context_overload") or meta_signals.get("simplified_mode")) else None
-            ctx = filter_context_blocks(ctx, user_message=user_message, top=top)
-        msgs: List[Dict[str, str]] = list(ctx.get("historico") or [])
+            # Orçamento de tokens do contexto = total do turno menos o que é fixo
+            # (instruções de tools/skills, persona e a própria mensagem)
+            reserva = count_tokens(_build_tool_system(user_message) + _build_skills_system()) + count_tokens(user_message)
+            if effective_model == "heathcliff":
+                reserva += count_tokens(HEATHCLIFF_SYSTEM_PROMPT)
+            ctx = filter_context_blocks(
+                ctx, user_message=user_message, top=top,
+                token_budget=max(0, PROMPT_BUDGET - reserva - RESERVA_SISTEMA_TOKENS),
+            )
+        # Prompt em camadas (core/prompt_assembler): instruções fixas → sessão →
+        # histórico → dados do turno. O prefixo repete byte a byte entre turnos
+        # e aproveita o cache de prompt do provedor.
+        asm = PromptAssembler()
 
-        # Context Builder: data/hora e regras base (antes de tudo)
-        try:
-            from yui_ai.core.context_builder import contexto_base_sistema
-            ctx_base = contexto_base_sistema()
-            if ctx_base:
-                msgs.insert(0, {"role": "system", "content": ctx_base})
-        except Exception:
-            pass
+        skills_system = _build_skills_system()
+        if effective_model == "heathcliff":
+            asm.static(HEATHCLIFF_SYSTEM_PROMPT, "heathcliff")
+            if is_hybrid and get_hybrid_modifier:
+                asm.static(get_hybrid_modifier(), "hybrid")
+        asm.static(_build_tool_system(user_message) + skills_system, "tools")
+        if effective_model == "heathcliff":
+            asm.session(_get_dependencies_context(), "deps")
+            asm.session(_get_lessons_context(), "lessons")
+
+        profile = ctx.get("user_profile") or get_user_profile(user_id)
+        if profile:
+            nivel = profile.get("nivel_tecnico") or "desconhecido"
+            langs = profile.get("linguagens_pref") or ""
+            modo = profile.get("modo_resposta") or "dev"
+            asm.session(
+                f"Usuário: nível {nivel}, linguagens {langs or 'não especificado'}, modo {modo}. "
+                "Ajuste o tom da resposta.",
+                "perfil",
+            )
+
+        # ---------- Project Brain: missão ativa (antes do planner) ----------
+        asm.session(_get_mission_context(user_id, chat_id), "missao")
 
-        if ctx.get("context_kernel"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": (
-                    "Contexto em tempo real (arquivos ativos, erros do console, workspace):\n\n"
-                    + ctx["context_kernel"]
-                )
-            })
         if ctx.get("contexto_projeto"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": (
-                    "Você é a YUI, uma IA desenvolvedora. Use o contexto do projeto abaixo para responder "
-                    "de forma compatível com o código existente.\n\n" + ctx["contexto_projeto"]
-                )
-            })
+            asm.turn(
+                "Você é a YUI, uma IA desenvolvedora. Use o contexto do projeto abaixo para responder "
+                "de forma compatível com o código existente.\n\n" + ctx["contexto_projeto"],
+                "contexto_projeto",
+            )
         if ctx.get("memoria_vetorial"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": (
-                    "Você é a YUI, uma IA desenvolvedora especialista. Use o contexto recuperado da memória do projeto:\n"
-                    + ctx["memoria_vetorial"]
-                )
-            })
-        if ctx.get("session_context"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": ctx["session_context"],
-            })
-        if ctx.get("operational_context"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": ctx["operational_context"],
-            })
-        if ctx.get("contexto_chat_anterior"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": f"Contexto anterior relevante gerado pela própria Yui:\n\n{ctx['contexto_chat_anterior']}",
-            })
-        if ctx.get("memoria_eventos"):
-            msgs.insert(0, {"role": "system", "content": ctx["memoria_eventos"]})
+            asm.turn(
+                "Você é a YUI, uma IA desenvolvedora especialista. Use o contexto recuperado da memória do projeto:\n"
+                + ctx["memoria_vetorial"],
+                "memoria_vetorial",
+            )
         if ctx.get("memoria_ia"):
-            msgs.insert(0, {
-                "role": "system",
-                "content": "Use as decisões abaixo (memória de longo prazo) para manter consistência:\n\n" + ctx["memoria_ia"],
-            })
+            asm.turn(
+                "Use as decisões abaixo (memória de longo prazo) para manter consistência:\n\n" + ctx["memoria_ia"],
+                "memoria_ia",
+            )
+        if ctx.get("contexto_chat_anterior"):
+            asm.turn(
+                f"Contexto anterior relevante gerado pela própria Yui:\n\n{ctx['contexto_chat_anterior']}",
+                "contexto_chat_anterior",
+            )
+        asm.turn(ctx.get("memoria_eventos"), "memoria_eventos")
+        asm.turn(ctx.get("session_context"), "session_context")
+        asm.turn(ctx.get("operational_context"), "operational_context")
+        if ctx.get("context_kernel"):
+            asm.turn(
+                "Contexto em tempo real (arquivos ativos, erros do console, workspace):\n\n" + ctx["context_kernel"],
+                "context_kernel",
+            )
         if ctx.get("system_state"):
-            msgs.insert(0, {"role": "system", "content": f"Estado da Yui: {ctx['system_state']}"})
+            asm.turn(f"Estado da Yui: {ctx['system_state']}", "system_state")
 
-        # ---------- Project Brain: missão ativa (antes do planner) ----------
-        mission_context = _get_mission_context(user_id, chat_id)
-        if mission_context:
-            msgs.insert(0, {"role": "system", "content": mission_context})
+        # Context Builder: data/hora e regras base (volátil: fica no fim)
+        try:
+            from yui_ai.core.context_builder import contexto_base_sistema
+            asm.turn(contexto_base_sistema(), "contexto_base")
+        except Exception:
+            pass
 
         # ---------- Action Engine: sugestão de tool (roteamento de intenção) ----------
         intent = None
@@ -787,10 +805,10 @@ def agent_controller(
                 has_console_errors=bool(console_errors),
             )
             if intent.tool_hint and intent.confidence > 0.3:
-                msgs.insert(0, {
-                    "role": "system",
-                    "content": f"[Action Engine] Sugestão: considere usar a ferramenta '{intent.tool_hint}' para esta tarefa (confiança {intent.confidence:.0%}).",
-                })
+                asm.turn(
+                    f"[Action Engine] Sugestão: considere usar a ferramenta '{intent.tool_hint}' para esta tarefa (confiança {intent.confidence:.0%}).",
+                    "action_engine",
+                )
         except Exception:
             pass
 
@@ -811,39 +829,10 @@ def agent_controller(
         except Exception:
             pass
 
-        profile = ctx.get("user_profile") or get_user_profile(user_id)
-        if profile:
-            nivel = profile.get("nivel_tecnico") or "desconhecido"
-            langs = profile.get("linguagens_pref") or ""
-            modo = profile.get("modo_resposta") or "dev"
-            perfil_txt = (
-                f"Usuário: nível {nivel}, linguagens {langs or 'não especificado'}, modo {modo}. "
-                "Ajuste o tom da resposta."
-            )
-            msgs.insert(0, {"role": "system", "content": perfil_txt})
-
-        skills_system = _build_skills_system()
-        msgs.insert(0, {"role": "system", "content": _build_tool_system(user_message) + skills_system})
-        if effective_model == "heathcliff":
-            msgs.insert(0, {"role": "system", "content": HEATHCLIFF_SYSTEM_PROMPT})
-            if is_hybrid and get_hybrid_modifier:
-                msgs.insert(0, {"role": "system", "content": get_hybrid_modifier()})
-            deps = _get_dependencies_context()
-            if deps:
-                msgs.insert(0, {"role": "system", "content": deps})
-            lessons = _get_lessons_context()
-            if lessons:
-                msgs.insert(0, {"role": "system", "content": lessons})
-            if get_system_state_for_prompt:
-                telemetry = get_system_state_for_prompt(always_include=True)
-                if telemetry:
-                    msgs.insert(-1, {"role": "system", "content": telemetry})
-        # Autopercepção: avisa a Yui sobre carga do servidor (modo economia)
-        elif get_system_state_for_prompt:
-            autopercepcao = get_system_state_for_prompt()
-            if autopercepcao:
-                msgs.insert(-1, {"role": "system", "content": autopercepcao})
-        msgs.append({"role": "user", "content": user_message})
+        if get_system_state_for_prompt:
+            # Heathcliff sempre vê a telemetria; os outros só sob carga (modo economia)
+            asm.turn(get_system_state_for_prompt(always_include=True) if effective_model == "heathcliff"
+                     else get_system_state_for_prompt(), "autopercepcao")
 
         # ---------- Planner Core (v2): planeja antes de responder ----------
         transition(AgentState.PLANNING)
@@ -866,15 +855,12 @@ def agent_controller(
             if planner_ok:
                 try:
                     plano_execucao = criar_plano(user_message)
-                    if plano_execucao and plano_execucao.strip():
-                        msgs.insert(0, {"role": "system", "content": plano_execucao.strip()})
+                    asm.turn((plano_execucao or "").strip(), "plano_execucao")
                     # intention já obtido pelo Capability Router
                     if intention is None:
                         intention = infer_intention(user_message)
                     task_graph = build_task_graph(intention, user_message)
-                    plan_steps = get_planned_steps_for_prompt(task_graph)
-                    if plan_steps:
-                        msgs.insert(0, {"role": "system", "content": plan_steps})
+                    asm.turn(get_planned_steps_for_prompt(task_graph), "plan_steps")
                     # Planner estruturado (memory aware, tool reasoning, goals aware, meta-aware, strategy-aware, budget-aware)
                     max_steps = LIMIT_MAX_STEPS
                     if budget:
@@ -893,18 +879,27 @@ def agent_controller(
                             hint = get_world_model().get_focus_hint()
                             if hint:
                                 plan_txt = f"[World Model] {hint}\n\n{plan_txt}"
-                        msgs.insert(0, {"role": "system", "content": plan_txt})
+                        asm.turn(plan_txt, "plano_estruturado")
                 except Exception:
                     pass
 
+        msgs: List[Dict[str, str]] = asm.build(ctx.get("historico") or [], user_message)
+        note_prompt(chat_id, asm, msgs)
+
         if not client:
             for c in _yield_in_chunks("⚠️ Configure OPENAI_API_KEY no servidor para respostas da Yui."):
                 yield c
             return
 
         # ---------- 1.5) Alerta de orçamento: estimar custo antes de chamar ----------
-        prompt_chars = sum(len(str(m.get("content", ""))) for m in msgs)
-        estimated_cost = estimate_cost_brl(prompt_chars)
+        token_report = turn_report(msgs, ctx.get("token_pack"), user_message)
+        try:
+            from core.observability import record_activity
+            fontes = ", ".join(f"{k}={v}" for k, v in sorted(token_report["fontes"].items(), key=lambda x: -x[1]))
+            record_activity("tokens", f"Prompt: {token_report['total']} tokens", fontes)
+        except Exception:
+            pass
+        estimated_cost = estimate_cost_brl_tokens(token_report["total"])
         if estimated_cost > BUDGET_ALERT_BRL and not confirm_high_cost:
             msg = f"⚠️ Esta tarefa pode custar aproximadamente R$ {estimated_cost:.2f}. Deseja continuar? (Responda 'sim' para prosseguir)"
             yield f"__BUDGET_CONFIRM__:{estimated_cost:.2f}:{msg}"
@@ -941,6 +936,7 @@ def agent_controller(
                 completion_tokens = getattr(usage, "completion_tokens") or 0
                 if prompt_tokens or completion_tokens:
                     record_response_cost(prompt_tokens, completion_tokens)
+                note_provider_usage(usage)
         except Exception:
             pass
         data = _parse_json(raw_content)
@@ -987,25 +983,13 @@ def agent_controller(
 
             partes: List[str] = []
             last_step_ok = True  # para goal update
+            # Tools em paralelo por ondas (core/tool_executor); loop, energia e redundância são
+            # checados no início de cada onda, já vendo as ações registradas pelas anteriores
+            planned: List[Dict] = []
             for i, step in enumerate(steps):
                 if i >= LIMIT_MAX_STEPS:
                     break
-                if get_metacognition and get_metacognition().analyze(steps_executed=i).get("loop_detected"):
-                    loop_detected_this_turn = True
-                    partes.append("Detectei repetição. Interrompendo execução.")
-                    break
-                if get_energy_manager and not get_energy_manager().can_execute():
-                    partes.append("Energia esgotada. Interrompendo execução.")
-                    break
-                if get_energy_manager:
-                    get_energy_manager().consume(COST_TOOL)
                 tool_name = step["tool"]
-                args = step.get("args") or {}
-                if get_metacognition and tool_name == "criar_projeto_arquivos":
-                    redundant, motivo = get_metacognition().check_redundant_action(tool_name, args)
-                    if redundant:
-                        partes.append(f"⚠️ {motivo} Pulando criação duplicada.")
-                        continue
                 label = planner.get_label_for_tool(tool_name)
                 yield f"__STATUS__:executing_tools:{label}"
                 try:
@@ -1013,7 +997,43 @@ def agent_controller(
                     get_context(user_id, chat_id).set("task_ativa", tool_name)
                 except Exception:
                     pass
-                result = get_task_engine().executar_tool(tool_name, args)
+                planned.append({"tool": tool_name, "args": step.get("args") or {}})
+
+            stop_msg = ""
+
+            def _admitir(i: int, call: Dict, admitidas: List[str]):
+                nonlocal stop_msg, loop_detected_this_turn
+                if get_metacognition and get_metacognition().analyze(
+                    steps_executed=i, pending_actions=admitidas
+                ).get("loop_detected"):
+                    loop_detected_this_turn = True
+                    stop_msg = "Detectei repetição. Interrompendo execução."
+                    return STOP
+                if get_energy_manager and not get_energy_manager().can_execute():
+                    stop_msg = "Energia esgotada. Interrompendo execução."
+                    return STOP
+                if get_energy_manager:
+                    get_energy_manager().consume(COST_TOOL)
+                if get_metacognition and call["tool"] == "criar_projeto_arquivos":
+                    redundant, motivo = get_metacognition().check_redundant_action(call["tool"], call["args"])
+                    if redundant:
+                        planned[i]["skip"] = f"⚠️ {motivo} Pulando criação duplicada."
+                        return {"ok": False, "result": None, "error": motivo}
+                return None
+
+            outputs = run_tools(planned, runner=get_task_engine().executar_tool, admit=_admitir)
+            for p, result in zip(planned, outputs):
+                p["result"] = result
+
+            for step in planned:
+                if step.get("skip"):
+                    partes.append(step["skip"])
+                    continue
+                if step["result"] is None:
+                    continue  # não executada (interrompida por loop ou energia)
+                tool_name = step["tool"]
+                args = step["args"]
+                result = step["result"] or {}
                 emit("tool_executed", tool_name=tool_name, args=args, result=result)
                 tools_executed_this_turn.append(tool_name)
                 if not result.get("ok"):
@@ -1093,6 +1113,8 @@ def agent_controller(
                                 partes.append(f"Projeto compactado. [DOWNLOAD]:/download/{zip_basename}")
                         else:
                             partes.append("Projeto criado, mas não consegui compactar automaticamente agora.")
+            if stop_msg:
+                partes.append(stop_msg)
 
             final_answer = str(data.get("final_answer") or "").strip()
             if final_answer:
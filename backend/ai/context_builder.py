@@ -6,6 +6,8 @@
 import os
 from typing import List
 
+from core.fs_snapshot import get_snapshot
+
 EXTENSOES_VALIDAS = (
     ".py", ".js", ".ts", ".html", ".css", ".json",
     ".md", ".yaml", ".yml", ".tsx", ".jsx",
@@ -39,14 +41,12 @@ def listar_arquivos(raiz: str) -> List[str]:
     if not os.path.isdir(raiz):
         return arquivos
 
-    for root, dirs, files in os.walk(raiz):
-        dirs[:] = [d for d in dirs if d not in IGNORAR_PASTAS]
-        for f in files:
-            if any(f.endswith(ext) for ext in EXTENSOES_VALIDAS):
-                caminho = os.path.join(root, f)
-                arquivos.append(caminho)
-                if len(arquivos) >= MAX_ARQUIVOS:
-                    return arquivos
+    snap = get_snapshot(raiz)
+    for rel in snap.iter_files(skip=lambda parte: parte in IGNORAR_PASTAS):
+        if rel.endswith(EXTENSOES_VALIDAS):
+            arquivos.append(os.path.join(raiz, rel))
+            if len(arquivos) >= MAX_ARQUIVOS:
+                return arquivos
     return arquivos
 
 
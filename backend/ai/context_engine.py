@@ -124,6 +124,7 @@ def montar_contexto_ia(
             chat_id=chat_id,
             limit_short=LIMITE_CURTA,
             limit_long=LIMITE_LONGA,
+            query=user_message,
         ) or ""
     except Exception:
         out["memoria_eventos"] = ""
@@ -2,50 +2,190 @@
 # YUI CONTEXT MEMORY AGENT
 # Guarda respostas recentes e permite reutilizar contexto
 # (memória em RAM por chat — não substitui o histórico do Supabase)
+#
+# Antes: deque de 12 itens por chat e busca por substring de
+# qualquer palavra (perdia contexto antigo e varria tudo).
+# Agora: índice invertido por chat (token → itens, BM25) com
+# profundidade e tetos configuráveis; embeddings opcionais
+# (configurar_embeddings). A busca toca só as listas dos tokens
+# da mensagem e devolve no máximo MAX_RECALL_CHARS.
 # ==========================================================
 
+import math
+import os
+import threading
 import time
-from collections import deque
-from typing import Dict
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional
 
-# Memória em RAM por sessão (simples e rápida)
-# session_id = chat_id (um deque por conversa)
-MEMORIA_SESSAO: Dict[str, deque] = {}
+from yui_ai.architecture.memory_index import EmbedFn, tokenizar
 
-MAX_ITENS = 12  # quantidade máxima por chat (evita RAM infinito)
+MAX_ITENS = int(os.environ.get("YUI_CHAT_MEMORY_DEPTH", "200"))        # itens por chat
+MAX_CHATS = int(os.environ.get("YUI_CHAT_MEMORY_CHATS", "500"))        # chats em RAM (LRU)
+MAX_CHARS_TOTAL = int(os.environ.get("YUI_CHAT_MEMORY_MAX_CHARS", str(8 * 1024 * 1024)))
+MAX_ITEM_CHARS = 4000      # trecho guardado por resposta
+MAX_RESULTADOS = 3         # itens devolvidos por busca
+MAX_RECALL_CHARS = 1500    # teto do texto devolvido (não alarga o prompt)
+EMBED_PESO = 2.0           # peso da similaridade de embedding no score
+
+# BM25
+_K1 = 1.2
+_B = 0.75
+
+
+class _ChatIndex:
+    """Itens de um chat + índice invertido token → {id: tf}."""
+
+    def __init__(self):
+        self.itens: "OrderedDict[int, dict]" = OrderedDict()
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.chars = 0
+        self.total_tokens = 0
+        self.proximo_id = 0
+
+    def adicionar(self, conteudo: str, vetor: Optional[List[float]] = None) -> None:
+        freq: Dict[str, int] = defaultdict(int)
+        for t in tokenizar(conteudo):
+            freq[t] += 1
+        item_id = self.proximo_id
+        self.proximo_id += 1
+        self.itens[item_id] = {
+            "conteudo": conteudo,
+            "timestamp": time.time(),
+            "tokens": dict(freq),
+            "tamanho": sum(freq.values()),
+            "vetor": vetor,
+        }
+        for t, n in freq.items():
+            self.postings[t][item_id] = n
+        self.chars += len(conteudo)
+        self.total_tokens += sum(freq.values())
+
+    def remover_mais_antigo(self) -> int:
+        item_id, item = self.itens.popitem(last=False)
+        for t in item["tokens"]:
+            lista = self.postings.get(t)
+            if lista is not None:
+                lista.pop(item_id, None)
+                if not lista:
+                    del self.postings[t]
+        self.chars -= len(item["conteudo"])
+        self.total_tokens -= item["tamanho"]
+        return len(item["conteudo"])
+
+    def pontuar(self, tokens: List[str], vetor: Optional[List[float]] = None) -> Dict[int, float]:
+        n = len(self.itens)
+        if not n:
+            return {}
+        media = (self.total_tokens / n) or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for t in set(tokens):
+            lista = self.postings.get(t)
+            if not lista:
+                continue
+            idf = math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+            for item_id, tf in lista.items():
+                dl = self.itens[item_id]["tamanho"]
+                scores[item_id] += idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * dl / media))
+        if vetor is not None:
+            for item_id, item in self.itens.items():
+                if item["vetor"] is not None:
+                    sim = sum(a * b for a, b in zip(vetor, item["vetor"]))
+                    if sim > 0:
+                        scores[item_id] += EMBED_PESO * sim
+        return dict(scores)
+
+
+_CHATS: "OrderedDict[str, _ChatIndex]" = OrderedDict()
+_lock = threading.Lock()
+_chars_total = 0
+_embed: Optional[EmbedFn] = None
+
+
+def configurar_embeddings(embed_fn: Optional[EmbedFn]) -> None:
+    """
+    Liga (ou desliga, com None) embeddings na memória do chat. embed_fn(textos) → vetores;
+    ex.: yui_ai.architecture.memory_index.embedding_openai(). Itens já salvos ficam só no BM25.
+    """
+    global _embed
+    _embed = embed_fn
+
+
+def _vetor(texto: str) -> Optional[List[float]]:
+    if _embed is None:
+        return None
+    try:
+        v = list(_embed([texto])[0])
+    except Exception:
+        return None
+    norma = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norma for x in v]
 
 
 def salvar_memoria(session_id: str, conteudo: str) -> None:
     """Salva respostas recentes da Yui para reutilização futura."""
-    if not session_id or not (conteudo or "").strip():
+    global _chars_total
+    conteudo = (conteudo or "").strip()
+    if not session_id or not conteudo:
         return
-    if session_id not in MEMORIA_SESSAO:
-        MEMORIA_SESSAO[session_id] = deque(maxlen=MAX_ITENS)
-    MEMORIA_SESSAO[session_id].append({
-        "conteudo": (conteudo or "").strip(),
-        "timestamp": time.time(),
-    })
+    conteudo = conteudo[:MAX_ITEM_CHARS]
+    vetor = _vetor(conteudo)
+    with _lock:
+        chat = _CHATS.get(session_id)
+        if chat is None:
+            chat = _CHATS[session_id] = _ChatIndex()
+        _CHATS.move_to_end(session_id)
+        chat.adicionar(conteudo, vetor)
+        _chars_total += len(conteudo)
+        while len(chat.itens) > MAX_ITENS:
+            _chars_total -= chat.remover_mais_antigo()
+        # Tetos globais: descarta chats menos usados
+        while len(_CHATS) > 1 and (len(_CHATS) > MAX_CHATS or _chars_total > MAX_CHARS_TOTAL):
+            _, antigo = _CHATS.popitem(last=False)
+            _chars_total -= antigo.chars
 
 
 def buscar_contexto(session_id: str, texto_usuario: str) -> str:
-    """Procura no histórico recente do chat algo relacionado à mensagem do usuário."""
+    """Procura no histórico do chat as respostas mais relacionadas à mensagem do usuário."""
     if not session_id or not (texto_usuario or "").strip():
         return ""
-    if session_id not in MEMORIA_SESSAO:
+    tokens = tokenizar(texto_usuario)
+    if not tokens and _embed is None:
         return ""
-
-    texto_busca = texto_usuario.lower().strip()
-    palavras = [p for p in texto_busca.split() if len(p) > 1]
-    if not palavras:
+    vetor = _vetor(texto_usuario) if _embed is not None else None
+    with _lock:
+        chat = _CHATS.get(session_id)
+        if chat is None:
+            return ""
+        _CHATS.move_to_end(session_id)
+        scores = chat.pontuar(tokens, vetor)
+        melhores = sorted(scores, key=lambda i: (-scores[i], -i))[:MAX_RESULTADOS]
+        trechos = [chat.itens[i]["conteudo"] for i in sorted(melhores)]  # ordem cronológica
+    if not trechos:
         return ""
+    por_item = max(200, MAX_RECALL_CHARS // len(trechos))
+    return "\n\n".join(t if len(t) <= por_item else t[:por_item].rstrip() + "…" for t in trechos)
 
-    resultados: list = []
-    for item in MEMORIA_SESSAO[session_id]:
-        conteudo = (item.get("conteudo") or "").lower()
-        if any(p in conteudo for p in palavras):
-            resultados.append(item.get("conteudo") or "")
 
-    if not resultados:
-        return ""
-    # retorna os últimos 3 relevantes
-    return "\n\n".join(resultados[-3:])
+def limpar_memoria(session_id: Optional[str] = None) -> None:
+    """Remove a memória de um chat (ou de todos)."""
+    global _chars_total
+    with _lock:
+        if session_id is None:
+            _CHATS.clear()
+            _chars_total = 0
+            return
+        chat = _CHATS.pop(session_id, None)
+        if chat is not None:
+            _chars_total -= chat.chars
+
+
+def estatisticas() -> Dict[str, int]:
+    """Chats, itens e caracteres em RAM."""
+    with _lock:
+        return {
+            "chats": len(_CHATS),
+            "itens": sum(len(c.itens) for c in _CHATS.values()),
+            "chars": _chars_total,
+            "tokens_indexados": sum(len(c.postings) for c in _CHATS.values()),
+        }
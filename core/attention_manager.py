@@ -2,10 +2,14 @@
 # YUI ATTENTION MANAGER
 # Filtro cognitivo: decide o que importa antes de ir pro planner.
 # Prioridade + recência + tipo de tarefa — não tamanho.
+# Com token_budget, os blocos escolhidos são empacotados por
+# tokens reais (core/token_budget).
 # ==========================================================
 
 from typing import Any, Dict, List, Optional
 
+from core.token_budget import Block, pack
+
 try:
     from core.energy_manager import get_energy_manager
 except ImportError:
@@ -52,11 +56,15 @@ def filter_context_blocks(
     ctx: Dict[str, Any],
     user_message: str = "",
     top: Optional[int] = None,
+    token_budget: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Converte contexto bruto em itens, pontua, filtra e devolve contexto enxuto.
     Blocos: historico, contexto_projeto, memoria_vetorial, contexto_chat_anterior, memoria_eventos.
     system_state e user_profile: sempre incluídos (pequenos e essenciais).
+    token_budget: empacota histórico + blocos escolhidos nesse número de tokens
+    (histórico perde as mensagens mais antigas; blocos de menor score são cortados
+    ou saem). O resultado (PackResult) fica em out["token_pack"].
     """
     t = (user_message or "").lower()
     items: List[Dict[str, Any]] = []
@@ -117,6 +125,26 @@ def filter_context_blocks(
             val = it.get("content", ctx.get(key, [] if key == "historico" else ""))
             out[key] = val
 
+    if token_budget is not None:
+        blocks = []
+        if out["system_state"]:
+            blocks.append(Block("system_state", text=str(out["system_state"]), required=True))
+        if out["historico"]:
+            # Histórico recente vale mais que qualquer bloco recuperado
+            blocks.append(Block("historico", messages=list(out["historico"]), priority=100))
+        for it in selected:
+            if it.get("key") and it.get("content"):
+                blocks.append(Block(it["key"], text=str(it["content"]), priority=score(it)))
+        packed = pack(blocks, token_budget)
+        for b in blocks:
+            if b.source == "historico":
+                kept = packed.get("historico")
+                out["historico"] = kept.messages if kept else []
+            elif b.source != "system_state":
+                kept = packed.get(b.source)
+                out[b.source] = kept.text if kept else ""
+        out["token_pack"] = packed
+
     return out
 
 
@@ -0,0 +1,305 @@
+# ==========================================================
+# YUI BACKUP STORE
+# Backups do workspace endereçados por conteúdo.
+#
+# Antes: yui_tools.escrever_arquivo_workspace copiava o arquivo
+# inteiro para .yui-backups/<nome>.<timestamp>.bak a cada escrita —
+# o disco crescia linearmente com as edições (conteúdos iguais
+# repetidos) e cada escrita lia e gravava o arquivo duas vezes.
+# Agora:
+# - Blob por sha256 do conteúdo em .yui-backups/objects/ab/<sha>
+#   (zlib); conteúdo já guardado não é regravado (dedup, inclusive
+#   entre arquivos diferentes)
+# - Delta opcional: versão nova de um texto vira diff por linhas da
+#   versão anterior quando fica < DELTA_RATIO do blob completo
+#   (cadeia limitada a MAX_DELTA_CHAIN; depois grava completo)
+# - Índice em SQLite (index.db): versões por arquivo + objetos
+# - Retenção: KEEP_VERSIONS por arquivo e MAX_AGE_DAYS; objetos sem
+#   referência (nem como base de delta) são apagados em lote: o GC
+#   varre a tabela inteira, então roda a cada GC_EVERY versões
+#   podadas ou GC_INTERVAL_S, não a cada backup
+# - restore(path, sha) devolve qualquer versão ao workspace (o
+#   conteúdo atual vira backup antes, então restaurar é reversível)
+# ==========================================================
+
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKUP_DIR = ".yui-backups"
+KEEP_VERSIONS = int(os.environ.get("YUI_BACKUP_KEEP", "20"))
+MAX_AGE_DAYS = float(os.environ.get("YUI_BACKUP_MAX_DAYS", "30"))
+USE_DELTAS = os.environ.get("YUI_BACKUP_DELTAS", "1").strip().lower() not in ("0", "false", "no")
+MAX_DELTA_CHAIN = 8
+DELTA_MAX_BYTES = 1024 * 1024   # arquivos maiores sempre completos (diff por linhas fica caro)
+DELTA_RATIO = 0.5
+GC_EVERY = int(os.environ.get("YUI_BACKUP_GC_EVERY", "50"))          # versões podadas até o próximo GC
+GC_INTERVAL_S = float(os.environ.get("YUI_BACKUP_GC_INTERVAL", "300"))
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _make_delta(base: bytes, data: bytes) -> List[Any]:
+    """Diff por linhas: ["c", i1, i2] copia linhas da base; ["i", texto] insere."""
+    a = base.splitlines(keepends=True)
+    b = data.splitlines(keepends=True)
+    ops: List[Any] = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif j2 > j1:
+            ops.append(["i", b"".join(b[j1:j2]).decode("latin-1")])
+    return ops
+
+
+def _apply_delta(base: bytes, ops: List[Any]) -> bytes:
+    a = base.splitlines(keepends=True)
+    out: List[bytes] = []
+    for op in ops:
+        if op[0] == "c":
+            out.extend(a[op[1]:op[2]])
+        else:
+            out.append(op[1].encode("latin-1"))
+    return b"".join(out)
+
+
+class BackupStore:
+    """
+    store.backup(path, data) -> sha | None; store.versions(path); store.read(sha);
+    store.restore(path, sha=None). path é relativo à raiz do workspace.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.dir = self.root / BACKUP_DIR
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"backups": 0, "dedup": 0, "deltas": 0, "bytes_written": 0, "pruned": 0, "gc_runs": 0}
+        self._gc_pending = 0   # versões podadas desde o último GC
+        self._last_gc = time.monotonic()
+
+    # ---------- persistência ----------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        self.dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.dir / "index.db"), check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, sha TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_versions_path ON versions(path, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "sha TEXT PRIMARY KEY, kind TEXT NOT NULL, base TEXT, depth INTEGER NOT NULL, "
+            "stored INTEGER NOT NULL)"
+        )
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def _object_path(self, sha: str) -> Path:
+        return self.dir / "objects" / sha[:2] / sha
+
+    def _write_object(self, sha: str, payload: bytes) -> int:
+        path = self._object_path(sha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        blob = zlib.compress(payload, 6)
+        tmp = path.with_name(f"{sha}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        self.stats["bytes_written"] += len(blob)
+        return len(blob)
+
+    # ---------- API ----------
+
+    def read(self, sha: str) -> bytes:
+        """Conteúdo de uma versão (resolve a cadeia de deltas). KeyError se não existir."""
+        with self._lock:
+            conn = self._db()
+            cadeia = []
+            atual: Optional[str] = sha
+            while atual:
+                row = conn.execute("SELECT kind, base FROM objects WHERE sha = ?", (atual,)).fetchone()
+                if row is None:
+                    raise KeyError(sha)
+                cadeia.append((atual, row[0]))
+                atual = row[1] if row[0] == "delta" else None
+            data = b""
+            for obj, kind in reversed(cadeia):
+                payload = zlib.decompress(self._object_path(obj).read_bytes())
+                data = _apply_delta(data, json.loads(payload)) if kind == "delta" else payload
+        return data
+
+    def backup(self, path: str, data: bytes) -> Optional[str]:
+        """
+        Registra data como versão de path. Conteúdo já guardado não é regravado;
+        se for igual à última versão do arquivo, nem uma versão nova é criada.
+        """
+        sha = _sha(data)
+        with self._lock:
+            conn = self._db()
+            ultima = conn.execute(
+                "SELECT sha FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (path,)
+            ).fetchone()
+            if ultima and ultima[0] == sha:
+                self.stats["dedup"] += 1
+                return sha
+            existe = conn.execute("SELECT 1 FROM objects WHERE sha = ?", (sha,)).fetchone()
+            if existe:
+                self.stats["dedup"] += 1
+            else:
+                self._store_object(conn, sha, data, ultima[0] if ultima else None)
+            conn.execute(
+                "INSERT INTO versions (path, sha, size, created_at) VALUES (?, ?, ?, ?)",
+                (path, sha, len(data), time.time()),
+            )
+            conn.commit()
+            self.stats["backups"] += 1
+            self._prune_path(conn, path)
+            self._maybe_gc(conn)
+        return sha
+
+    def _store_object(self, conn: sqlite3.Connection, sha: str, data: bytes, base: Optional[str]) -> None:
+        completo = zlib.compress(data, 6)
+        if USE_DELTAS and base and len(data) <= DELTA_MAX_BYTES and b"\0" not in data[:8192]:
+            row = conn.execute("SELECT depth FROM objects WHERE sha = ?", (base,)).fetchone()
+            if row is not None and row[0] < MAX_DELTA_CHAIN:
+                try:
+                    delta = json.dumps(_make_delta(self.read(base), data), separators=(",", ":")).encode("utf-8")
+                except (KeyError, OSError, zlib.error, ValueError):
+                    delta = b""
+                if delta and len(zlib.compress(delta, 6)) < DELTA_RATIO * len(completo):
+                    stored = self._write_object(sha, delta)
+                    conn.execute("INSERT INTO objects VALUES (?, 'delta', ?, ?, ?)", (sha, base, row[0] + 1, stored))
+                    self.stats["deltas"] += 1
+                    return
+        stored = self._write_object(sha, data)
+        conn.execute("INSERT INTO objects VALUES (?, 'full', NULL, 0, ?)", (sha, stored))
+
+    def versions(self, path: str) -> List[Dict[str, Any]]:
+        """Versões guardadas de path, da mais recente para a mais antiga."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT sha, size, created_at FROM versions WHERE path = ? ORDER BY id DESC", (path,)
+            ).fetchall()
+        return [{"sha": sha, "size": size, "created_at": ts} for sha, size, ts in rows]
+
+    def restore(self, path: str, sha: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Devolve uma versão (padrão: a mais recente; aceita prefixo do sha) para
+        root/path. O conteúdo atual é guardado antes. Retorna {"sha", "backup"}.
+        """
+        versoes = self.versions(path)
+        if not versoes:
+            raise KeyError(f"sem backups de {path}")
+        if sha:
+            escolhidas = [v for v in versoes if v["sha"].startswith(sha)]
+            if not escolhidas:
+                raise KeyError(f"versão {sha} não encontrada para {path}")
+            alvo_sha = escolhidas[0]["sha"]
+        else:
+            alvo_sha = versoes[0]["sha"]
+        data = self.read(alvo_sha)
+        alvo = self.root / path
+        backup_sha = None
+        if alvo.is_file():
+            atual = alvo.read_bytes()
+            if atual == data:
+                return {"sha": alvo_sha, "backup": None}
+            backup_sha = self.backup(path, atual)
+        alvo.parent.mkdir(parents=True, exist_ok=True)
+        tmp = alvo.with_name(f".{alvo.name}.{os.getpid()}.restore")
+        tmp.write_bytes(data)
+        os.replace(tmp, alvo)
+        return {"sha": alvo_sha, "backup": backup_sha}
+
+    # ---------- retenção ----------
+
+    def _prune_path(self, conn: sqlite3.Connection, path: str) -> None:
+        limite = time.time() - MAX_AGE_DAYS * 86400
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM versions WHERE path = ? ORDER BY id DESC LIMIT -1 OFFSET ?", (path, KEEP_VERSIONS)
+        )]
+        ids += [r[0] for r in conn.execute(
+            "SELECT id FROM versions WHERE path = ? AND created_at < ? "
+            "AND id < (SELECT MAX(id) FROM versions WHERE path = ?)", (path, limite, path)
+        )]
+        if not ids:
+            return
+        conn.executemany("DELETE FROM versions WHERE id = ?", [(i,) for i in set(ids)])
+        conn.commit()
+        self.stats["pruned"] += len(set(ids))
+        self._gc_pending += len(set(ids))
+
+    def _maybe_gc(self, conn: sqlite3.Connection) -> None:
+        """GC em lote: depois de GC_EVERY versões podadas ou GC_INTERVAL_S com poda pendente."""
+        if not self._gc_pending:
+            return
+        if self._gc_pending >= GC_EVERY or time.monotonic() - self._last_gc >= GC_INTERVAL_S:
+            self._gc(conn)
+
+    def _gc(self, conn: sqlite3.Connection) -> int:
+        """Apaga objetos que nenhuma versão referencia (direto ou como base de delta)."""
+        vivos = {r[0] for r in conn.execute("SELECT DISTINCT sha FROM versions")}
+        bases = dict(conn.execute("SELECT sha, base FROM objects WHERE kind = 'delta'").fetchall())
+        pendentes = list(vivos)
+        while pendentes:
+            base = bases.get(pendentes.pop())
+            if base and base not in vivos:
+                vivos.add(base)
+                pendentes.append(base)
+        mortos = [r[0] for r in conn.execute("SELECT sha FROM objects") if r[0] not in vivos]
+        for sha in mortos:
+            try:
+                self._object_path(sha).unlink()
+            except OSError:
+                pass
+        conn.executemany("DELETE FROM objects WHERE sha = ?", [(s,) for s in mortos])
+        conn.commit()
+        self._gc_pending = 0
+        self._last_gc = time.monotonic()
+        self.stats["gc_runs"] += 1
+        return len(mortos)
+
+    def prune(self) -> int:
+        """Aplica a retenção em todos os arquivos. Retorna quantos objetos foram apagados."""
+        with self._lock:
+            conn = self._db()
+            for (path,) in conn.execute("SELECT DISTINCT path FROM versions").fetchall():
+                self._prune_path(conn, path)
+            return self._gc(conn)
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._db()
+            objetos, armazenado = conn.execute("SELECT COUNT(*), COALESCE(SUM(stored), 0) FROM objects").fetchone()
+            versoes, logico = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM versions").fetchone()
+        return dict(self.stats, objects=objetos, stored_bytes=armazenado, versions=versoes, logical_bytes=logico)
+
+
+_stores: Dict[str, BackupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_backup_store(root: str) -> BackupStore:
+    """Store da raiz do workspace (um por raiz)."""
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = BackupStore(root)
+        return store
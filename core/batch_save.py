@@ -0,0 +1,255 @@
+# ==========================================================
+# YUI BATCH SAVE
+# Lote de escrita em streaming (NDJSON) com retomada.
+#
+# Antes: /save (até 50 arquivos) e /multi-save (até 100 ações) recebiam
+# um JSON único, lido e parseado inteiro na memória antes de gravar o
+# primeiro arquivo; lote grande fazia pico de RAM ou estourava o
+# timeout, e o cliente não sabia o que já tinha sido aplicado.
+# Agora:
+# - iter_ndjson lê o corpo linha a linha (uma ação por linha, teto
+#   MAX_LINE_BYTES): a memória fica em uma ação, sem limite de ações
+# - BatchJournal: journal append-only por batch_id (~/Yui/batches) com
+#   o resultado de cada ação; reenviar o lote com o mesmo batch_id pula
+#   os seq já aplicados com sucesso (retomada após queda/timeout) e
+#   reaplica os que falharam
+# - Um batch_id só pode estar aberto por uma requisição de cada vez,
+#   inclusive entre workers (WEB_CONCURRENCY>1): lock exclusivo não
+#   bloqueante no arquivo do journal; journals mais velhos que
+#   BATCH_TTL_S são apagados ao abrir outro
+# ==========================================================
+
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from typing import Any, Dict, IO, Iterator, Optional, Set, Tuple
+
+try:
+    import fcntl  # POSIX
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+MAX_LINE_BYTES = int(os.environ.get("YUI_BATCH_MAX_LINE", str(16 * 1024 * 1024)))
+BATCH_TTL_S = float(os.environ.get("YUI_BATCH_TTL_S", str(7 * 24 * 3600)))
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_BATCH_DIR: Optional[str] = None
+_active: Set[str] = set()
+_active_lock = threading.Lock()
+
+
+def _get_batch_dir() -> str:
+    global _BATCH_DIR
+    if _BATCH_DIR is not None:
+        return _BATCH_DIR
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    _BATCH_DIR = os.path.join(base, "Yui", "batches")
+    return _BATCH_DIR
+
+
+def new_batch_id() -> str:
+    return secrets.token_hex(8)
+
+
+def valid_batch_id(batch_id: str) -> bool:
+    return bool(batch_id) and bool(_ID_RE.match(batch_id))
+
+
+def _journal_path(batch_id: str) -> str:
+    return os.path.join(_get_batch_dir(), batch_id + ".log")
+
+
+def _try_lock(f: IO[str]) -> bool:
+    """Lock exclusivo sem esperar no journal aberto; False se outro processo/requisição o tem."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _is_locked(batch_id: str) -> bool:
+    try:
+        f = open(_journal_path(batch_id), "a", encoding="utf-8")
+    except OSError:
+        return False
+    with f:
+        return not _try_lock(f)  # o lock some com o close
+
+
+def _purge_old(now: float) -> None:
+    try:
+        with os.scandir(_get_batch_dir()) as it:
+            for entry in it:
+                if not entry.name.endswith(".log") or entry.name[:-4] in _active:
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > BATCH_TTL_S:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+def _read_journal(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Estado do lote a partir do journal; None se não existe.
+    Só ações que deram certo ficam confirmadas (acked: seq → registro); falhas
+    ficam em failed até um reenvio do mesmo seq dar certo.
+    """
+    try:
+        f = open(_journal_path(batch_id), "r", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    acked: Dict[int, Dict[str, Any]] = {}
+    failed: Set[int] = set()
+    done = False
+    with f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # última linha cortada por queda no meio da escrita
+            if rec.get("done"):
+                done = True
+                continue
+            seq = rec.get("seq")
+            if not isinstance(seq, int) or seq in acked:
+                continue
+            if rec.get("ok"):
+                acked[seq] = rec
+                failed.discard(seq)
+            else:
+                failed.add(seq)
+    kinds = [r.get("kind") for r in acked.values()]
+    return {"acked": acked, "failed": failed, "last_seq": max(acked, default=-1), "done": done,
+            "saved": kinds.count("saved"), "deleted": kinds.count("deleted"), "errors": len(failed)}
+
+
+def batch_status(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Resumo público do lote (para o cliente decidir de onde retomar)."""
+    if not valid_batch_id(batch_id):
+        return None
+    state = _read_journal(batch_id)
+    if state is None:
+        return None
+    with _active_lock:
+        active = batch_id in _active
+    active = active or _is_locked(batch_id)
+    return {"batch_id": batch_id, "last_seq": state["last_seq"], "acked": len(state["acked"]),
+            "saved": state["saved"], "deleted": state["deleted"], "errors": state["errors"],
+            "done": state["done"], "active": active}
+
+
+class BatchJournal:
+    """Journal append-only de um lote: open()/close() ou context manager."""
+
+    def __init__(self, batch_id: Optional[str] = None):
+        self.batch_id = batch_id or new_batch_id()
+        if not valid_batch_id(self.batch_id):
+            raise ValueError("batch_id inválido")
+        self._f: Optional[IO[str]] = None
+        self.acked: Dict[int, Dict[str, Any]] = {}
+        self.last_seq = -1
+
+    def open(self) -> "BatchJournal":
+        """Abre o lote. RuntimeError se o mesmo batch_id já está aberto (neste ou em outro worker)."""
+        with _active_lock:
+            if self.batch_id in _active:
+                raise RuntimeError("lote já está em andamento")
+            _active.add(self.batch_id)
+        f = None
+        try:
+            os.makedirs(_get_batch_dir(), exist_ok=True)
+            _purge_old(time.time())
+            f = open(_journal_path(self.batch_id), "a", encoding="utf-8")
+            if not _try_lock(f):
+                raise RuntimeError("lote já está em andamento")
+            # Estado lido só com o lock: outro worker pode ter acabado de gravar
+            state = _read_journal(self.batch_id)
+            if state is not None:
+                self.acked, self.last_seq = state["acked"], state["last_seq"]
+            self._f = f
+        except Exception:
+            if f is not None:
+                f.close()
+            with _active_lock:
+                _active.discard(self.batch_id)
+            raise
+        return self
+
+    def close(self) -> None:
+        """Fecha o lote (idempotente); o journal fica para status e retomada."""
+        if self._f is None:
+            return
+        try:
+            self._f.close()
+        finally:
+            self._f = None
+            with _active_lock:
+                _active.discard(self.batch_id)
+
+    def __enter__(self) -> "BatchJournal":
+        return self.open()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def acked_record(self, seq: int) -> Optional[Dict[str, Any]]:
+        """Registro da ação já confirmada (kind, path) ou None se ainda precisa ser aplicada."""
+        return self.acked.get(seq)
+
+    def record(self, seq: int, ok: bool, kind: Optional[str] = None, path: str = "") -> None:
+        """
+        Grava o resultado da ação (flush antes de responder ao cliente). Só ok=True
+        confirma o seq; uma falha fica no journal (status) mas o reenvio é aplicado.
+        """
+        rec = {"seq": seq, "ok": ok, "kind": kind, "path": path}
+        self._f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._f.flush()
+        if ok:
+            self.acked[seq] = rec
+            self.last_seq = max(self.last_seq, seq)
+
+    def finish(self) -> None:
+        self._f.write('{"done":true}\n')
+        self._f.flush()
+
+
+def iter_ndjson(stream: IO[bytes], max_line: int = MAX_LINE_BYTES) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Lê NDJSON do stream sem carregar o corpo todo: (linha, objeto, erro).
+    Linhas em branco são ignoradas; linha maior que max_line é descartada
+    até o próximo \\n e volta como erro.
+    """
+    numero = 0
+    while True:
+        raw = stream.readline(max_line + 1)
+        if not raw:
+            return
+        numero += 1
+        if len(raw) > max_line and not raw.endswith(b"\n"):
+            while True:
+                resto = stream.readline(64 * 1024)
+                if not resto or resto.endswith(b"\n"):
+                    break
+            yield numero, None, f"linha maior que {max_line} bytes"
+            continue
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            yield numero, json.loads(raw), None
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
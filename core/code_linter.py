@@ -1,12 +1,27 @@
 """
 Linter de sintaxe: valida Python e JS/TS antes de exibir no Workspace.
 Retorna erros para correção automática pela IA.
+
+Resultados ficam em cache pelo hash do conteúdo: o mesmo código reenviado
+(retry de /multi-save, arquivo inalterado no lote) não é reanalisado. A análise
+é in-process e presa ao GIL — o paralelismo fica com os linters externos
+(yui_ai/validation/linter_runner.executar_linters_em_lote).
 """
 
 import ast
+import hashlib
 import re
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 
+LINT_CACHE_MAX = 1024
+
+_cache: "OrderedDict[Tuple[str, str], List[Dict[str, str]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"lints": 0, "cache_hits": 0, "last_batch_ms": 0.0}
+
 
 def _lint_python(code: str, path: str = "") -> List[Dict[str, str]]:
     """Valida sintaxe Python via AST."""
@@ -95,10 +110,25 @@ def lint_code(content: str, path: str = "", lang: Optional[str] = None) -> List[
         ext_map = {"py": "python", "js": "javascript", "jsx": "javascript", "ts": "javascript", "tsx": "javascript"}
         lang = ext_map.get(ext, "")
     if lang in ("python", "py"):
-        return _lint_python(content, path)
-    if lang in ("javascript", "js", "typescript", "ts", "jsx", "tsx"):
-        return _lint_javascript(content, path)
-    return []
+        lint = _lint_python
+    elif lang in ("javascript", "js", "typescript", "ts", "jsx", "tsx"):
+        lint = _lint_javascript
+    else:
+        return []
+    chave = (lint.__name__, hashlib.sha1(content.encode("utf-8", "surrogatepass")).hexdigest())
+    with _cache_lock:
+        _stats["lints"] += 1
+        hit = _cache.get(chave)
+        if hit is not None:
+            _cache.move_to_end(chave)
+            _stats["cache_hits"] += 1
+    if hit is None:
+        hit = lint(content, "")
+        with _cache_lock:
+            _cache[chave] = hit
+            while len(_cache) > LINT_CACHE_MAX:
+                _cache.popitem(last=False)
+    return [dict(e, path=path) for e in hit]
 
 
 def lint_multi_write_actions(actions: List[Dict]) -> Tuple[List[Dict], List[str]]:
@@ -106,6 +136,7 @@ def lint_multi_write_actions(actions: List[Dict]) -> Tuple[List[Dict], List[str]
     Aplica lint em cada ação create/update que tem content.
     Retorna (actions_corrigidas, erros_formatados).
     """
+    inicio = time.perf_counter()
     all_errors: List[str] = []
     fixed_actions: List[Dict] = []
     for a in actions:
@@ -120,4 +151,10 @@ def lint_multi_write_actions(actions: List[Dict]) -> Tuple[List[Dict], List[str]
                 for e in errs:
                     all_errors.append(f"{path}:{e.get('line', 0)} - {e.get('message', '')}")
         fixed_actions.append(a)
+    _stats["last_batch_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
     return fixed_actions, all_errors
+
+
+def lint_stats() -> Dict[str, float]:
+    with _cache_lock:
+        return dict(_stats, cache=len(_cache))
@@ -36,10 +36,14 @@ class CognitiveBudget:
     start_time: float = field(default_factory=time.monotonic)
 
     def estimate_tokens(self, text: str) -> int:
-        """Estima tokens a partir do texto."""
+        """Tokens do texto (tokenizer local via core/token_budget; fallback chars/4)."""
         if not text:
             return 0
-        return max(1, len(text) // CHARS_PER_TOKEN)
+        try:
+            from core.token_budget import count_tokens
+            return count_tokens(text)
+        except Exception:
+            return max(1, len(text) // CHARS_PER_TOKEN)
 
     def consume_tokens(self, count: int) -> None:
         """Registra consumo de tokens."""
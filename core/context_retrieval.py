@@ -0,0 +1,191 @@
+# ==========================================================
+# YUI CONTEXT RETRIEVAL
+# Uma ida ao banco por turno para montar a memória do prompt.
+#
+# Antes: build_context_text fazia 2 queries (longa + curta) e
+# buscar_memoria trazia limite*3 linhas para pontuar em Python.
+# Agora: RPC yui_turn_context (supabase_migration_context_rpc.sql)
+# devolve eventos longos, curtos e memoria_ia já ranqueada por
+# full-text (tsvector) numa única chamada.
+#
+# Sem Supabase: memoria_ia local usa SQLite FTS5 (core/memoria_ia).
+# Resultado fica em cache curto para que context_engine, planner
+# e memoria_ia compartilhem a mesma consulta no mesmo turno.
+# Com N workers, invalidate() incrementa uma geração por usuário
+# em core/shared_state: os caches dos outros workers deixam de valer.
+# ==========================================================
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    from core.supabase_client import supabase
+except ImportError:
+    supabase = None
+
+RPC_NAME = "yui_turn_context"
+FETCH_SHORT = 20     # teto de eventos curtos por turno (callers fatiam)
+FETCH_LONG = 20      # teto de eventos longos por turno
+FETCH_MEMORIA = 12   # teto de resumos memoria_ia por turno
+CACHE_TTL = 10.0     # segundos: cobre um turno inteiro
+CACHE_MAX = 64
+RPC_RETRY_SECONDS = 300  # RPC ausente (migration não aplicada): tenta de novo depois
+RPC_MAX_FAILURES = 3     # falhas de transporte seguidas antes de pausar a RPC
+# RPC inexistente: PostgREST (função fora do schema cache) e Postgres (undefined_function)
+_MISSING_CODES = ("PGRST202", "42883")
+
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_lock = threading.Lock()
+_rpc_disabled_until = 0.0
+_rpc_failures = 0
+_stats = {"rpc": 0, "fallback": 0, "cache_hits": 0}
+
+
+def query_terms(query: str, max_terms: int = 12) -> List[str]:
+    """Palavras-chave da mensagem (minúsculas, sem duplicatas, 3+ chars)."""
+    seen: List[str] = []
+    for w in re.findall(r"\w+", (query or "").lower()):
+        if len(w) >= 3 and w not in seen:
+            seen.append(w)
+        if len(seen) >= max_terms:
+            break
+    return seen
+
+
+def to_tsquery_text(query: str) -> str:
+    """Termos em OR para to_tsquery (só caracteres de palavra: sem erro de sintaxe)."""
+    return " | ".join(query_terms(query))
+
+
+def _empty() -> Dict[str, List[dict]]:
+    return {"longa": [], "curta": [], "memoria": []}
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    """Código do erro devolvido pelo banco (APIError do postgrest); None se nem houve resposta."""
+    code = getattr(exc, "code", None)
+    if code is None and exc.args and isinstance(exc.args[0], dict):
+        code = exc.args[0].get("code")
+    return str(code) if code else None
+
+
+def _rpc_failed(exc: Exception) -> None:
+    """
+    Decide se a falha pausa a RPC para todos. Só pausa com a função ausente (na hora)
+    ou com RPC_MAX_FAILURES falhas de transporte seguidas; erro do banco sobre a
+    entrada deste pedido (ex.: user_id que não é UUID) só cai no fallback.
+    """
+    global _rpc_disabled_until, _rpc_failures
+    code = _error_code(exc)
+    if code in _MISSING_CODES or (code is None and "does not exist" in str(exc)):
+        _rpc_disabled_until = time.time() + RPC_RETRY_SECONDS
+        return
+    if code is not None:
+        return
+    with _lock:
+        _rpc_failures += 1
+        pausar = _rpc_failures >= RPC_MAX_FAILURES
+        if pausar:
+            _rpc_failures = 0
+    if pausar:
+        _rpc_disabled_until = time.time() + RPC_RETRY_SECONDS
+
+
+def _fetch_rpc(user_id: str, chat_id: Optional[str], query: str) -> Optional[Dict[str, List[dict]]]:
+    global _rpc_failures
+    if time.time() < _rpc_disabled_until:
+        return None
+    try:
+        r = supabase.rpc(RPC_NAME, {
+            "p_user_id": user_id,
+            "p_chat_id": chat_id or None,
+            "p_tsquery": to_tsquery_text(query),
+            "p_limit_short": FETCH_SHORT,
+            "p_limit_long": FETCH_LONG,
+            "p_limit_memoria": FETCH_MEMORIA,
+        }).execute()
+    except Exception as e:  # noqa: BLE001
+        _rpc_failed(e)
+        return None
+    _rpc_failures = 0
+    data = r.data
+    if isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict):
+        data = data[0].get(RPC_NAME, data[0])
+    if not isinstance(data, dict):
+        return None
+    return {k: list(data.get(k) or []) for k in ("longa", "curta", "memoria")}
+
+
+def _fetch_fallback(user_id: str, chat_id: Optional[str], query: str) -> Dict[str, List[dict]]:
+    """Sem a RPC: queries separadas (comportamento anterior)."""
+    out = _empty()
+    if supabase:
+        from core.memory_events import buscar_eventos
+        out["longa"] = buscar_eventos(user_id=user_id, chat_id=None, tipo="longa", limit=FETCH_LONG)
+        if chat_id:
+            out["curta"] = buscar_eventos(user_id=user_id, chat_id=chat_id, tipo="curta", limit=FETCH_SHORT)
+    from core.memoria_ia import buscar_rows_direto
+    out["memoria"] = buscar_rows_direto(user_id, query=query, chat_id=chat_id, limite=FETCH_MEMORIA)
+    return out
+
+
+def _generations():
+    """Gerações por usuário compartilhadas entre workers (None com 1 processo)."""
+    try:
+        from core.shared_state import get_backend, shared_dict
+        return shared_dict("ctx_generation") if get_backend().shared else None
+    except Exception:
+        return None
+
+
+def get_turn_context(user_id: str, chat_id: Optional[str] = None, query: str = "") -> Dict[str, List[dict]]:
+    """
+    Retorna {"longa": [...], "curta": [...], "memoria": [...]} (mais recentes/relevantes primeiro).
+    Uma chamada ao Supabase por (user_id, chat_id, query) a cada CACHE_TTL segundos.
+    """
+    if not user_id:
+        return _empty()
+    key = (user_id, chat_id or "", " ".join(query_terms(query)))
+    gens = _generations()
+    gen = gens.get(user_id, 0) if gens is not None else 0
+    now = time.time()
+    with _lock:
+        hit = _cache.get(key)
+        if hit and now - hit[0] < CACHE_TTL and hit[2] == gen:
+            _cache.move_to_end(key)
+            _stats["cache_hits"] += 1
+            return hit[1]
+    result = _fetch_rpc(user_id, chat_id, query) if supabase else None
+    if result is None:
+        result = _fetch_fallback(user_id, chat_id, query)
+        _stats["fallback"] += 1
+    else:
+        _stats["rpc"] += 1
+    with _lock:
+        _cache[key] = (time.time(), result, gen)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate(user_id: Optional[str] = None) -> None:
+    """Descarta cache (após gravar memória nova), de um usuário ou de todos."""
+    gens = _generations()
+    if gens is not None and user_id is not None:
+        gens.incr(user_id)
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+            return
+        for k in [k for k in _cache if k[0] == user_id]:
+            del _cache[k]
+
+
+def get_stats() -> Dict[str, Any]:
+    """Contadores de RPC/fallback/cache (observabilidade)."""
+    with _lock:
+        return dict(_stats, cached_turns=len(_cache))
@@ -4,7 +4,6 @@
 # Cada ação tem custo; energia recupera após resposta.
 # ==========================================================
 
-import json
 from pathlib import Path
 from typing import Optional
 
@@ -35,34 +34,79 @@ except Exception:
 # Custos por tipo de ação (configuráveis via settings/.env)
 
 
+_store = None
+
+
+def _reduce_state(state: dict, op: dict) -> dict:
+    """
+    {"op": "incr", "delta": d}: soma d ao saldo (limitado a [0, ENERGY_MAX]) — processos
+    que persistem ao mesmo tempo somam, não sobrescrevem um ao outro.
+    {"op": "set", "energy": v} (ou linha antiga sem "op"): define o saldo.
+    """
+    if op.get("op") == "incr":
+        atual = float(state.get("energy", ENERGY_MAX))
+        state["energy"] = max(0.0, min(ENERGY_MAX, atual + float(op.get("delta", 0))))
+    else:
+        state.update({k: v for k, v in op.items() if k not in ("op", "ts")})
+    if op.get("ts"):
+        state["last_updated"] = op["ts"]
+    return state
+
+
+def _get_store():
+    """LogStore do estado de energia (energy_state.json + .log)."""
+    global _store
+    if _store is None:
+        from core.log_store import get_store
+        _store = get_store(
+            ENERGY_STATE_PATH,
+            _reduce_state,
+            default=lambda: {"energy": ENERGY_MAX, "last_updated": ""},
+        )
+    return _store
+
+
 def _load_state() -> dict:
-    """Carrega estado de energia do disco."""
-    ENERGY_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not ENERGY_STATE_PATH.exists():
-        return {"energy": ENERGY_MAX, "last_updated": ""}
+    """Carrega estado de energia (snapshot + log)."""
     try:
-        with open(ENERGY_STATE_PATH, encoding="utf-8") as f:
-            return json.load(f)
+        return _get_store().read()
     except Exception:
         return {"energy": ENERGY_MAX, "last_updated": ""}
 
 
-def _save_state(data: dict) -> None:
-    """Salva estado de energia."""
+def _save_state(op: dict) -> dict:
+    """Anexa a operação ao log (snapshot só na compactação). Retorna o estado agregado."""
     import datetime
-    ENERGY_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    data["last_updated"] = datetime.datetime.utcnow().isoformat()
-    with open(ENERGY_STATE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    op["ts"] = datetime.datetime.utcnow().isoformat()
+    return _get_store().apply(op)
+
+
+def _shared_energy():
+    """Contador compartilhado entre workers (None com backend em RAM de 1 processo)."""
+    try:
+        from core.shared_state import get_backend, shared_dict
+        return shared_dict("energy") if get_backend().shared else None
+    except Exception:
+        return None
 
 
 class EnergyManager:
     """
     Gerenciador de energia mental da Yui.
     Global (por servidor): protege RAM e evita runaway.
+    Com N workers (core/shared_state compartilhado) o saldo é um contador
+    único: consume/recover são incrementos atômicos vistos por todos.
     """
 
     def __init__(self):
+        self._shared = _shared_energy()
+        self._energy = ENERGY_MAX
+        self._unsaved = 0.0  # variação ainda não persistida (backend em RAM)
+        current = self._shared.get("energy") if self._shared is not None else None
+        if current is not None:
+            self._energy = float(current)
+            self._state_path = ENERGY_STATE_PATH
+            return
         state = _load_state()
         loaded = float(state.get("energy", ENERGY_MAX))
         # Evita ficar preso para sempre em 0 energia entre sessões.
@@ -70,11 +114,44 @@ class EnergyManager:
         self.energy = max(ENERGY_MIN_BOOT, min(ENERGY_MAX, loaded))
         self._state_path = ENERGY_STATE_PATH
         if self.energy != loaded:
-            _save_state({"energy": self.energy})
+            _save_state({"op": "set", "energy": self.energy})
+
+    @property
+    def energy(self) -> float:
+        if self._shared is not None:
+            return float(self._shared.get("energy", self._energy))
+        return self._energy
+
+    @energy.setter
+    def energy(self, value: float) -> None:
+        self._energy = float(value)
+        if self._shared is not None:
+            self._shared["energy"] = self._energy
+
+    def _add(self, amount: float) -> None:
+        if self._shared is not None:
+            self._energy = self._shared.incr("energy", amount, lo=0, hi=ENERGY_MAX, default=self._energy)
+        else:
+            novo = max(0, min(ENERGY_MAX, self._energy + amount))
+            self._unsaved += novo - self._energy
+            self._energy = novo
+
+    def _persist(self) -> None:
+        """
+        Compartilhado: o contador já é a verdade, grava o valor. Em RAM: grava só a
+        variação desde a última persistência e adota o saldo agregado (que inclui as
+        variações de outros processos).
+        """
+        if self._shared is not None:
+            _save_state({"op": "set", "energy": self.energy})
+            return
+        delta, self._unsaved = self._unsaved, 0.0
+        state = _save_state({"op": "incr", "delta": delta})
+        self._energy = float(state.get("energy", self._energy))
 
     def consume(self, amount: float) -> None:
         """Consome energia. Não persiste a cada consume para performance."""
-        self.energy = max(0, self.energy - amount)
+        self._add(-amount)
 
     def can_execute(self) -> bool:
         """Verifica se ainda há energia para executar."""
@@ -91,17 +168,18 @@ class EnergyManager:
     def recover(self, amount: Optional[float] = None) -> None:
         """Recupera energia após resposta. Persiste no disco."""
         amt = amount if amount is not None else COST_RECOVERY
-        self.energy = min(ENERGY_MAX, self.energy + amt)
-        _save_state({"energy": self.energy})
+        self._add(amt)
+        self._persist()
 
     def persist(self) -> None:
         """Persiste estado atual (útil ao final do turno)."""
-        _save_state({"energy": self.energy})
+        self._persist()
 
     def reset(self) -> None:
         """Reseta para o máximo configurado (útil em testes)."""
         self.energy = ENERGY_MAX
-        _save_state({"energy": ENERGY_MAX})
+        self._unsaved = 0.0
+        _save_state({"op": "set", "energy": ENERGY_MAX})
 
 
 # Singleton global (uma instância por processo)
@@ -9,6 +9,7 @@ from openai import OpenAI
 from core.chat_summarizer import summarize_chat
 from yui_ai.services.memory_service import load_history as get_messages, save_message
 from core.memory_manager import add_event, build_context_text
+from core.prompt_assembler import PromptAssembler, note_prompt
 from core.tool_runner import run_tool
 from core.user_profile import get_user_profile
 from pathlib import Path
@@ -71,10 +72,9 @@ def process_message(user_id, chat_id, message):
         "NUNCA misture explicações fora do JSON. O JSON deve ser o único conteúdo da resposta."
     )
 
-    # Memória contextual: combina memória curta e longa
-    contexto = build_context_text(user_id=user_id, chat_id=chat_id, limit_short=8, limit_long=8)
-    if contexto:
-        msgs.insert(0, {"role": "system", "content": contexto})
+    # Prompt em camadas: protocolo (fixo) → perfil → histórico → memória do turno
+    asm = PromptAssembler()
+    asm.static(tool_system, "tools")
 
     # Mensagem de sistema com o perfil do usuário
     if profile:
@@ -89,10 +89,14 @@ def process_message(user_id, chat_id, message):
             "(dev = direto ao ponto e focado em código; explicativo = mais didático; resumido = respostas menores).\n"
             "Ajuste o nível de detalhe e exemplos com base nesses dados.\n"
         )
-        msgs.insert(0, {"role": "system", "content": perfil_txt})
+        asm.session(perfil_txt, "perfil")
 
-    # Mensagem de sistema com o protocolo de tools
-    msgs.insert(0, {"role": "system", "content": tool_system})
+    # Memória contextual: combina memória curta e longa (muda a cada turno)
+    asm.turn(build_context_text(user_id=user_id, chat_id=chat_id, limit_short=8, limit_long=8), "memoria")
+
+    atual = msgs.pop()["content"] if msgs and msgs[-1]["role"] == "user" else message
+    msgs = asm.build(msgs, atual)
+    note_prompt(chat_id, asm, msgs)
 
     if not client:
         return "⚠️ Configure OPENAI_API_KEY no servidor para respostas da Yui."
@@ -4,6 +4,8 @@
 # Cada parte independente — sem fios cruzados.
 # ==========================================================
 
+from pathlib import Path
+
 from core.event_bus import on
 
 
@@ -21,6 +23,17 @@ def wire_events() -> None:
 
     on("workspace_toggled", _on_workspace_toggled)
 
+    # file_changed (path relativo ao sandbox) → snapshot do filesystem refaz o diff
+    def _on_file_changed(path: str = "", **kwargs):
+        try:
+            from config import settings
+            from core.fs_snapshot import notify_changed
+            notify_changed(str(Path(settings.SANDBOX_DIR) / path))
+        except Exception:
+            pass
+
+    on("file_changed", _on_file_changed)
+
     # memory_update_requested → scheduler (indexar em background)
     def _on_memory_update_requested(root: str = "", **kwargs):
         try:
@@ -4,17 +4,41 @@
 #
 # Conecta Planner → Observer → Self-Critic em um fluxo visível.
 # Permite: pausar, reexecutar nó, progresso visual, custo por etapa.
+#
+# Antes: nós rodavam estritamente em sequência, sem arestas de
+# dependência; uma falha obrigava a rodar tudo de novo.
+# Agora (DAG):
+# - Node(inputs=[...]) declara de quais nós depende; inputs=None
+#   mantém o comportamento antigo (depende do nó anterior)
+# - Ramos independentes rodam juntos num pool (YUI_GRAPH_WORKERS)
+# - memoize=True: saída guardada pelo hash das entradas (saídas
+#   dos nós de entrada + ctx_keys); mesma entrada não reexecuta.
+#   O cache é do grafo; só nós com cache_key explícito dividem o
+#   cache global entre grafos (closures têm o mesmo __qualname__)
+# - resume(): depois de uma falha, roda só o que não terminou
+# - Cada nó roda numa cópia dos contextvars de quem chamou run()
+#   (core/agent_context), como quando rodava na thread do chamador
 # ==========================================================
 
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 try:
     from core.event_bus import emit
 except ImportError:
     emit = lambda e, *a, **k: None
 
+MAX_WORKERS = int(os.environ.get("YUI_GRAPH_WORKERS", "4"))
+MEMO_MAX = 512   # saídas memoizadas (LRU, por grafo e no cache compartilhado)
+
 
 class NodeStatus(str, Enum):
     PENDING = "pending"
@@ -25,16 +49,29 @@ class NodeStatus(str, Enum):
 
 @dataclass
 class Node:
-    """Nó do grafo: nome, ação e estado."""
+    """
+    Nó do grafo: nome, ação e estado.
+    inputs: nós dos quais depende (None = o nó anterior; [] = nenhum). A saída de
+    cada entrada chega em ctx["_result_<nome>"].
+    memoize: reaproveita a saída quando as entradas (e ctx_keys) têm o mesmo hash.
+    cache_key: identifica a ação entre grafos; com ele a saída vai para o cache
+    compartilhado (o mesmo cache_key precisa significar a mesma computação).
+    """
     name: str
     action: Callable[[Dict[str, Any]], Any]
     status: NodeStatus = field(default=NodeStatus.PENDING)
     result: Any = None
     error: Optional[str] = None
+    inputs: Optional[List[str]] = None
+    memoize: bool = False
+    ctx_keys: Tuple[str, ...] = ()
+    cache_key: Optional[str] = None
+    cached: bool = False
 
     def run(self, ctx: Dict[str, Any]) -> Any:
         """Executa a ação e atualiza status."""
         self.status = NodeStatus.RUNNING
+        self.cached = False
         emit("execution_node_start", node_name=self.name, ctx=ctx)
         try:
             from core.observability import trace
@@ -51,33 +88,174 @@ class Node:
             raise
 
 
+# ---------- memoização por hash das entradas ----------
+
+_MISS = object()
+
+
+class _Memo:
+    """LRU de saídas memoizadas, com contadores de acerto."""
+
+    def __init__(self, max_items: int = MEMO_MAX):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._items[key]
+            self._stats["misses"] += 1
+            return _MISS
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._items))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+# Só para nós com cache_key: a identidade da ação vem do chamador, não do __qualname__
+_shared_memo = _Memo()
+
+
+def _fingerprint(value: Any) -> bytes:
+    try:
+        raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=repr)
+    except (TypeError, ValueError):
+        raw = repr(value)
+    return raw.encode("utf-8", "surrogatepass")
+
+
+def input_hash(node: Node, ctx: Dict[str, Any], inputs: Sequence[str] = ()) -> str:
+    """Hash do nó (cache_key, ou nome dentro do grafo) com as saídas das entradas e os ctx_keys."""
+    h = hashlib.sha256()
+    h.update(b"key:" + node.cache_key.encode() if node.cache_key else b"node:" + node.name.encode())
+    for dep in inputs:
+        h.update(b"\0" + dep.encode() + b"=" + _fingerprint(ctx.get(f"_result_{dep}")))
+    for key in node.ctx_keys:
+        h.update(b"\0ctx:" + key.encode() + b"=" + _fingerprint(ctx.get(key)))
+    return h.hexdigest()
+
+
+def memo_stats() -> Dict[str, int]:
+    """Estatísticas do cache compartilhado (nós com cache_key)."""
+    return _shared_memo.stats()
+
+
+def clear_memo() -> None:
+    _shared_memo.clear()
+
+
 class ExecutionGraph:
     """
-    Grafo de execução: sequência de nós observáveis.
+    Grafo de execução: DAG de nós observáveis.
 
     Fluxo: Input → Planner cria mini-fluxo → nodes executam → Observer acompanha → Critic valida.
+    Sem inputs declarados os nós formam uma cadeia (execução sequencial, como antes).
     """
 
-    def __init__(self, intention: str = ""):
+    def __init__(self, intention: str = "", max_workers: int = MAX_WORKERS):
         self.intention = intention
+        self.max_workers = max(1, int(max_workers))
         self.nodes: List[Node] = []
         self._ctx: Dict[str, Any] = {}
+        self._memo = _Memo()
 
     def add(self, node: Node) -> "ExecutionGraph":
         """Adiciona um nó ao grafo."""
         self.nodes.append(node)
         return self
 
-    def add_step(self, name: str, action: Callable[[Dict[str, Any]], Any]) -> "ExecutionGraph":
-        """Atalho para add(Node(name, action))."""
-        return self.add(Node(name=name, action=action))
+    def add_step(
+        self,
+        name: str,
+        action: Callable[[Dict[str, Any]], Any],
+        inputs: Optional[List[str]] = None,
+        memoize: bool = False,
+        ctx_keys: Sequence[str] = (),
+        cache_key: Optional[str] = None,
+    ) -> "ExecutionGraph":
+        """Atalho para add(Node(name, action, ...))."""
+        return self.add(Node(name=name, action=action, inputs=inputs, memoize=memoize,
+                             ctx_keys=tuple(ctx_keys), cache_key=cache_key))
+
+    def _memo_for(self, node: Node) -> _Memo:
+        return _shared_memo if node.cache_key else self._memo
+
+    def memo_stats(self) -> Dict[str, int]:
+        """Estatísticas do cache deste grafo."""
+        return self._memo.stats()
+
+    def _dependencies(self) -> List[List[int]]:
+        """Índices das dependências de cada nó. Valida nomes e ciclos (ValueError)."""
+        by_name = {n.name: i for i, n in enumerate(self.nodes)}
+        deps: List[List[int]] = []
+        for i, node in enumerate(self.nodes):
+            if node.inputs is None:
+                deps.append([i - 1] if i > 0 else [])
+                continue
+            idx = []
+            for dep in node.inputs:
+                if dep not in by_name:
+                    raise ValueError(f"Nó '{node.name}' depende de '{dep}', que não existe no grafo.")
+                idx.append(by_name[dep])
+            deps.append(idx)
+        # Ciclo: ordenação topológica (Kahn) precisa visitar todos os nós
+        indegree = [len(d) for d in deps]
+        dependents: Dict[int, List[int]] = {}
+        for i, d in enumerate(deps):
+            for j in d:
+                dependents.setdefault(j, []).append(i)
+        fila = [i for i, n in enumerate(indegree) if n == 0]
+        vistos = 0
+        while fila:
+            i = fila.pop()
+            vistos += 1
+            for k in dependents.get(i, ()):
+                indegree[k] -= 1
+                if indegree[k] == 0:
+                    fila.append(k)
+        if vistos != len(self.nodes):
+            raise ValueError("O grafo de execução tem um ciclo.")
+        return deps
 
     def run(self, ctx: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Executa todos os nós em sequência.
+        Executa todos os nós respeitando as dependências; ramos independentes em paralelo.
         ctx: contexto compartilhado entre nós (pode ser mutado).
         Consulta Resource Governor antes de executar.
         """
+        for node in self.nodes:
+            node.status, node.result, node.error, node.cached = NodeStatus.PENDING, None, None, False
+        self._ctx = dict(ctx or {})
+        return self._execute()
+
+    def resume(self, ctx: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Retoma um grafo que falhou: nós já concluídos mantêm a saída; o resto roda de novo.
+        ctx: chaves extras/atualizadas para o contexto guardado.
+        """
+        for node in self.nodes:
+            if node.status != NodeStatus.DONE:
+                node.status, node.error = NodeStatus.PENDING, None
+        self._ctx.update(ctx or {})
+        return self._execute()
+
+    def _execute(self) -> Dict[str, Any]:
+        deps = self._dependencies()
         try:
             from core.resource_governor import allow_execution_graph
             dec = allow_execution_graph()
@@ -90,23 +268,74 @@ class ExecutionGraph:
             set_executing_graph(True)
         except Exception:
             pass
-        self._ctx = dict(ctx or {})
-        results = []
+
+        nodes = self.nodes
+        # "finished" é mantido só por esta thread: o status DONE do nó muda na thread
+        # do worker antes de a saída estar em ctx
+        finished = {i for i, n in enumerate(nodes) if n.status == NodeStatus.DONE}
+        pending = set(range(len(nodes))) - finished
+        running: Dict[Any, Tuple[int, Optional[str]]] = {}
+        failure: Optional[Tuple[Node, BaseException]] = None
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="yui-graph")
+
+        def _schedule() -> None:
+            progressed = True
+            while progressed:
+                progressed = False
+                for i in sorted(pending):
+                    if any(d not in finished for d in deps[i]):
+                        continue
+                    pending.discard(i)
+                    node = nodes[i]
+                    key = None
+                    if node.memoize:
+                        key = input_hash(node, self._ctx, [nodes[d].name for d in deps[i]])
+                        hit = self._memo_for(node).get(key)
+                        if hit is not _MISS:
+                            node.status, node.result, node.error, node.cached = NodeStatus.DONE, hit, None, True
+                            self._ctx[f"_result_{node.name}"] = hit
+                            finished.add(i)
+                            emit("execution_node_done", node_name=node.name, result=hit, ctx=self._ctx)
+                            progressed = True
+                            continue
+                    node.cached = False
+                    # Threads do pool não herdam contextvars (user_id/chat_id do agente)
+                    running[pool.submit(contextvars.copy_context().run, node.run, self._ctx)] = (i, key)
 
         try:
-            for node in self.nodes:
-                try:
-                    out = node.run(self._ctx)
-                    results.append({"node": node.name, "status": node.status.value, "result": out})
+            _schedule()
+            while running:
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i, key = running.pop(fut)
+                    node = nodes[i]
+                    try:
+                        out = fut.result()
+                    except Exception as e:  # noqa: BLE001
+                        if failure is None:
+                            failure = (node, e)
+                        continue
                     self._ctx[f"_result_{node.name}"] = out
-                except Exception:
-                    results.append({"node": node.name, "status": node.status.value, "error": node.error})
-                    emit("execution_graph_failed", graph=self, node=node)
-                    raise
+                    finished.add(i)
+                    if key is not None:
+                        self._memo_for(node).put(key, out)
+                if failure is None:
+                    _schedule()
 
+            results = []
+            for node in nodes:
+                if node.status == NodeStatus.DONE:
+                    results.append({"node": node.name, "status": node.status.value, "result": node.result,
+                                    "cached": node.cached})
+                elif node.status == NodeStatus.FAILED:
+                    results.append({"node": node.name, "status": node.status.value, "error": node.error})
+            if failure is not None:
+                emit("execution_graph_failed", graph=self, node=failure[0])
+                raise failure[1]
             emit("execution_graph_done", graph=self, results=results)
             return {"results": results, "ctx": self._ctx}
         finally:
+            pool.shutdown(wait=False, cancel_futures=True)
             try:
                 from core.system_state import set_executing_graph
                 set_executing_graph(False)
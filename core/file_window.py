@@ -0,0 +1,221 @@
+# ==========================================================
+# YUI FILE WINDOW
+# Leituras em janela e listagens paginadas para as tools de workspace.
+#
+# Antes: yui_tools.ler_arquivo_workspace e GET /api/sandbox/read
+# carregavam o arquivo inteiro na memória (e a tool truncava depois);
+# listar_arquivos_workspace ordenava todos os arquivos antes de pegar 200.
+# Agora:
+# - read_bytes(offset, length): seek + leitura só da janela
+# - read_lines(inicio, quantidade): para de ler ao fim da janela
+# - tail(n): lê blocos a partir do fim até achar n linhas
+# - grep_file: varre linha a linha com limite de ocorrências
+# - Listagens paginadas com cursor opaco (último caminho entregue):
+#   list_files_page percorre o snapshot em ordem de árvore e só ordena
+#   as pastas visitadas; list_dir_page pagina uma pasta só
+# ==========================================================
+
+import base64
+import heapq
+import os
+import re
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_WINDOW_BYTES = 256 * 1024   # teto de uma janela em bytes
+MAX_WINDOW_LINES = 2000         # teto de uma janela em linhas
+MAX_LINE_CHARS = 2000           # linhas maiores são cortadas no resultado
+MAX_GREP_MATCHES = 200
+MAX_GREP_PATTERN = 500           # teto do padrão de busca (caracteres)
+TAIL_BLOCK = 8192
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _cut(line: str) -> str:
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "…"
+
+
+def read_bytes(path: str, offset: int = 0, length: int = 8000) -> Dict[str, Any]:
+    """Janela de bytes [offset, offset+length). next_offset continua a leitura."""
+    size = os.path.getsize(path)
+    offset = max(0, min(int(offset), size))
+    length = max(0, min(int(length), MAX_WINDOW_BYTES))
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    fim = offset + len(data)
+    return {"content": _decode(data), "offset": offset, "next_offset": fim if fim < size else None,
+            "size": size, "eof": fim >= size}
+
+
+def read_chars(path: str, max_chars: int = 8000) -> Dict[str, Any]:
+    """Primeiros max_chars caracteres (lê só isso do disco)."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read(max_chars)
+        truncated = bool(f.read(1))
+    return {"content": content, "truncated": truncated}
+
+
+def read_lines(path: str, start: int = 1, count: int = 200) -> Dict[str, Any]:
+    """Linhas [start, start+count) (1-based). Para de ler ao fim da janela."""
+    start = max(1, int(start))
+    count = max(0, min(int(count), MAX_WINDOW_LINES))
+    lines: List[str] = []
+    eof = True
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for numero, line in enumerate(f, 1):
+            if numero < start:
+                continue
+            if len(lines) >= count:
+                eof = False
+                break
+            lines.append(_cut(line.rstrip("\r\n")))
+    return {"lines": lines, "start": start, "next_line": None if eof else start + len(lines), "eof": eof}
+
+
+def head(path: str, n: int = 50) -> Dict[str, Any]:
+    return read_lines(path, 1, n)
+
+
+def tail(path: str, n: int = 50) -> Dict[str, Any]:
+    """Últimas n linhas, lendo blocos de trás para frente."""
+    n = max(0, min(int(n), MAX_WINDOW_LINES))
+    size = os.path.getsize(path)
+    blocos: deque = deque()
+    quebras = 0
+    pos = size
+    with open(path, "rb") as f:
+        while pos > 0 and quebras <= n:
+            passo = min(TAIL_BLOCK, pos)
+            pos -= passo
+            f.seek(pos)
+            bloco = f.read(passo)
+            quebras += bloco.count(b"\n")
+            blocos.appendleft(bloco)
+    texto = _decode(b"".join(blocos))
+    lines = texto.splitlines()
+    if pos > 0 and lines:
+        lines = lines[1:]  # primeira linha do bloco pode estar cortada
+    lines = lines[-n:] if n else []
+    return {"lines": [_cut(l) for l in lines], "size": size}
+
+
+def grep_file(
+    path: str,
+    pattern: str,
+    regex: bool = False,
+    ignore_case: bool = True,
+    max_matches: int = 50,
+    context: int = 0,
+) -> Dict[str, Any]:
+    """
+    Ocorrências de pattern no arquivo (linha a linha): [{"line", "text", "before", "after"}].
+    Para ao atingir max_matches; truncated indica que o arquivo não foi lido até o fim.
+    """
+    flags = re.IGNORECASE if ignore_case else 0
+    rx = re.compile(pattern if regex else re.escape(pattern), flags)
+    max_matches = max(1, min(int(max_matches), MAX_GREP_MATCHES))
+    context = max(0, min(int(context), 10))
+    matches: List[Dict[str, Any]] = []
+    antes: deque = deque(maxlen=context)
+    pendentes: List[Dict[str, Any]] = []  # ocorrências ainda coletando linhas "after"
+    truncated = False
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for numero, line in enumerate(f, 1):
+            line = _cut(line.rstrip("\r\n"))
+            for m in pendentes:
+                m["after"].append(line)
+            pendentes = [m for m in pendentes if len(m["after"]) < context]
+            if rx.search(line):
+                if len(matches) >= max_matches:
+                    truncated = True
+                    break
+                m = {"line": numero, "text": line, "before": list(antes), "after": []}
+                matches.append(m)
+                if context:
+                    pendentes.append(m)
+            antes.append(line)
+            if len(matches) >= max_matches and not pendentes:
+                truncated = bool(f.readline())
+                break
+    return {"matches": matches, "truncated": truncated}
+
+
+# ---------- paginação ----------
+
+def encode_cursor(rel: str) -> str:
+    return base64.urlsafe_b64encode(rel.encode("utf-8", "surrogatepass")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Cursor → último caminho entregue. ValueError se inválido."""
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        rel = base64.b64decode(cursor + pad, altchars=b"-_", validate=True).decode("utf-8", "surrogatepass")
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not rel or rel.startswith("/") or ".." in rel.split("/"):
+        raise ValueError("cursor inválido")
+    return rel
+
+
+def list_files_page(
+    root: str,
+    prefix: str = "",
+    cursor: Optional[str] = None,
+    limit: int = 200,
+    skip: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, Any]:
+    """Arquivos (recursivo) sob prefix, em ordem de árvore, a partir do cursor."""
+    from core.fs_snapshot import get_snapshot
+
+    after = decode_cursor(cursor)
+    snap = get_snapshot(root)
+    files: List[str] = []
+    more = False
+    for rel in snap.iter_files_after(prefix=prefix, after=after, skip=skip):
+        if len(files) >= limit:
+            more = True
+            break
+        files.append(rel)
+    return {"files": files, "cursor": encode_cursor(files[-1]) if more and files else None}
+
+
+def list_dir_page(
+    directory: str,
+    cursor: Optional[str] = None,
+    limit: int = 500,
+    skip: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, Any]:
+    """Entradas diretas de uma pasta (pastas primeiro, nome sem caixa), a partir do cursor."""
+    after = decode_cursor(cursor)
+    chave_after = None
+    if after is not None:
+        tipo, _, nome = after.partition(":")
+        chave_after = (tipo == "f", nome.lower(), nome)
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if skip is not None and skip(entry.name):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            chave = (not is_dir, entry.name.lower(), entry.name)
+            if chave_after is not None and chave <= chave_after:
+                continue
+            entries.append((chave, entry.name, is_dir))
+    page = heapq.nsmallest(limit + 1, entries)  # sem ordenar a pasta inteira
+    more = len(page) > limit
+    page = page[:limit]
+    next_cursor = None
+    if more and page:
+        _, nome, is_dir = page[-1]
+        next_cursor = encode_cursor(("d:" if is_dir else "f:") + nome)
+    return {"entries": [{"name": nome, "is_dir": is_dir} for _, nome, is_dir in page], "cursor": next_cursor}
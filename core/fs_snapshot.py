@@ -0,0 +1,394 @@
+# ==========================================================
+# YUI FS SNAPSHOT
+# Um único walk por raiz, compartilhado por todos os scanners.
+#
+# Antes: workspace_indexer.scan, project_scanner.escanear_estrutura,
+# analyzer.scan_structure/list_py_files, project_mapper,
+# yui_tools.listar_arquivos_workspace (rglob),
+# backend/ai/context_builder e code_quality_metrics percorriam a
+# mesma árvore cada um por conta própria, várias vezes por turno.
+# Agora:
+# - get_snapshot(raiz): árvore em memória (arquivo → tamanho,
+#   mtime; pasta → mtime) com as regras de ignore comuns
+# - Atualização por diff: pastas com mtime alterado são relistadas,
+#   arquivos conhecidos recebem stat; o resto vem da memória
+# - Com watchdog instalado, eventos de inotify marcam o que mudou e
+#   a atualização não faz stat nenhum quando não houve evento
+# - Dentro de REFRESH_INTERVAL o snapshot é servido sem syscalls;
+#   notify_changed(path) (escritas da própria Yui) força o diff
+# - Cada consumidor aplica seus filtros extras em memória; nenhum deles
+#   faz walk próprio (workspace_indexer, project_scanner, analyzer,
+#   project_mapper, context_builder, code_quality_metrics, yui_tools)
+# - Tools que escrevem (core/tools_runtime, yui/yui_tools) chamam
+#   notify_changed depois de gravar
+# ==========================================================
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+REFRESH_INTERVAL = float(os.environ.get("YUI_FS_SNAPSHOT_INTERVAL", "1.0"))  # segundos
+MAX_ROOTS = 16
+USE_WATCHER = os.environ.get("YUI_FS_WATCH", "1").strip().lower() not in ("0", "false", "no")
+
+# Pastas que nenhum consumidor quer ver (nunca entram no snapshot)
+IGNORE_DIRS = {
+    "__pycache__", ".git", ".hg", ".svn", ".venv", "venv", "node_modules",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".next", ".nuxt", ".cache",
+}
+IGNORE_NAMES = {".DS_Store", "Thumbs.db"}
+HIDDEN_OK = (".env", ".env.example")
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+def is_hidden(name: str) -> bool:
+    """Nome oculto (".algo"), exceto .env/.env.example."""
+    return name.startswith(".") and name not in HIDDEN_OK
+
+
+@dataclass
+class Changes:
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+
+class _Watcher(FileSystemEventHandler):
+    """Marca pastas sujas a partir dos eventos do watchdog (inotify/FSEvents/ReadDirectoryChanges)."""
+
+    def __init__(self, snapshot: "FsSnapshot"):
+        self.snapshot = snapshot
+
+    def on_any_event(self, event):  # noqa: D401 - API do watchdog
+        for attr in ("src_path", "dest_path"):
+            path = getattr(event, attr, None)
+            if path:
+                self.snapshot._mark_dirty(os.fsdecode(path))
+
+
+class FsSnapshot:
+    """
+    Árvore de uma raiz em memória. Caminhos relativos com "/".
+    files: rel → (tamanho, mtime_ns); dirs: rel → mtime_ns ("" é a raiz).
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.files: Dict[str, Tuple[int, int]] = {}
+        self.dirs: Dict[str, int] = {}
+        self._listing: Dict[str, Tuple[Set[str], Set[str]]] = {}  # pasta → (arquivos, subpastas)
+        self.generation = 0
+        self.refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._dirty: Set[str] = set()
+        self._dirty_all = True
+        self._observer = None
+        self._scanned = False
+
+    # ---------- varredura ----------
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _scan_dir(self, rel: str, changes: Changes, recursive: bool) -> None:
+        """Lista uma pasta: registra arquivos/subpastas novos e remove os que sumiram."""
+        try:
+            st = os.stat(self._abs(rel))
+            entries = list(os.scandir(self._abs(rel)))
+        except OSError:
+            self._drop_dir(rel, changes)
+            return
+        self.dirs[rel] = st.st_mtime_ns
+        prefix = rel + "/" if rel else ""
+        vistos_arq: Set[str] = set()
+        vistos_dir: Set[str] = set()
+        for entry in entries:
+            name = entry.name
+            child = prefix + name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name in IGNORE_DIRS:
+                        continue
+                    vistos_dir.add(child)
+                    if child not in self.dirs or recursive:
+                        self._scan_dir(child, changes, recursive=True)
+                    continue
+                if not entry.is_file() or name in IGNORE_NAMES:
+                    continue
+                est = entry.stat()
+            except OSError:
+                continue
+            vistos_arq.add(child)
+            novo = (est.st_size, est.st_mtime_ns)
+            antigo = self.files.get(child)
+            if antigo is None:
+                changes.added.append(child)
+            elif antigo != novo:
+                changes.modified.append(child)
+            self.files[child] = novo
+        antes_arq, antes_dir = self._listing.get(rel, (set(), set()))
+        for child in antes_arq - vistos_arq:
+            if self.files.pop(child, None) is not None:
+                changes.removed.append(child)
+        for child in antes_dir - vistos_dir:
+            self._drop_dir(child, changes)
+        self._listing[rel] = (vistos_arq, vistos_dir)
+
+    def _drop_dir(self, rel: str, changes: Changes) -> None:
+        arquivos, subpastas = self._listing.pop(rel, (set(), set()))
+        self.dirs.pop(rel, None)
+        for child in arquivos:
+            if self.files.pop(child, None) is not None:
+                changes.removed.append(child)
+        for child in subpastas:
+            self._drop_dir(child, changes)
+
+    def _diff(self, changes: Changes) -> None:
+        """Pastas com mtime novo são relistadas; arquivos conhecidos recebem stat."""
+        for rel, mtime in list(self.dirs.items()):
+            if rel not in self.dirs:
+                continue  # removida durante o diff
+            try:
+                atual = os.stat(self._abs(rel)).st_mtime_ns
+            except OSError:
+                self._drop_dir(rel, changes)
+                continue
+            if atual != mtime:
+                self._scan_dir(rel, changes, recursive=False)
+        ja = set(changes.added)
+        for rel, antigo in list(self.files.items()):
+            if rel in ja:
+                continue
+            try:
+                st = os.stat(self._abs(rel))
+            except OSError:
+                del self.files[rel]
+                changes.removed.append(rel)
+                continue
+            novo = (st.st_size, st.st_mtime_ns)
+            if novo != antigo:
+                self.files[rel] = novo
+                changes.modified.append(rel)
+
+    # ---------- watcher ----------
+
+    def _start_watcher(self) -> None:
+        if Observer is None or not USE_WATCHER or self._observer is not None:
+            return
+        try:
+            obs = Observer()
+            obs.schedule(_Watcher(self), self.root, recursive=True)
+            obs.daemon = True
+            obs.start()
+            self._observer = obs
+        except Exception:
+            self._observer = None
+
+    def _mark_dirty(self, path: str) -> None:
+        try:
+            rel = os.path.relpath(path, self.root).replace("\\", "/")
+        except ValueError:
+            return
+        if rel.startswith(".."):
+            return
+        parts = rel.split("/")
+        if any(p in IGNORE_DIRS for p in parts):
+            return
+        with self._lock:
+            self._dirty.add("" if rel == "." else rel)
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    # ---------- API ----------
+
+    def refresh(self, max_age: Optional[float] = None) -> Changes:
+        """
+        Atualiza o snapshot se ele tiver mais de max_age segundos (padrão REFRESH_INTERVAL)
+        ou se algo foi marcado como alterado. Retorna o que mudou.
+        """
+        max_age = REFRESH_INTERVAL if max_age is None else max_age
+        changes = Changes()
+        with self._lock:
+            if not os.path.isdir(self.root):
+                if self.files or self.dirs:
+                    changes.removed.extend(self.files)
+                    self.files.clear()
+                    self.dirs.clear()
+                    self._listing.clear()
+                    self.generation += 1
+                self._scanned = False
+                return changes
+            if not self._scanned:
+                self._scan_dir("", changes, recursive=True)
+                self._scanned = True
+                self._dirty.clear()
+                self._dirty_all = False
+                self._start_watcher()
+            elif self._observer is not None and not self._dirty_all:
+                # Watcher ativo: só o que os eventos apontaram
+                dirty, self._dirty = self._dirty, set()
+                for rel in sorted(dirty, key=len):
+                    self._refresh_path(rel, changes)
+            elif self._dirty_all or self._dirty or time.monotonic() - self.refreshed_at >= max_age:
+                self._dirty.clear()
+                self._dirty_all = False
+                self._diff(changes)
+            else:
+                return changes
+            self.refreshed_at = time.monotonic()
+            if changes:
+                self.generation += 1
+            return changes
+
+    def _refresh_path(self, rel: str, changes: Changes) -> None:
+        """Relista a pasta do caminho (ou o ancestral mais próximo já conhecido)."""
+        alvo = rel if rel in self.dirs else (rel.rsplit("/", 1)[0] if "/" in rel else "")
+        while alvo and alvo not in self.dirs:
+            alvo = alvo.rsplit("/", 1)[0] if "/" in alvo else ""
+        self._scan_dir(alvo, changes, recursive=False)
+
+    def invalidate(self, rel: Optional[str] = None) -> None:
+        """Próximo refresh faz o diff completo (ou só o caminho, com watcher)."""
+        with self._lock:
+            if rel is None or self._observer is None:
+                self._dirty_all = True
+            else:
+                self._dirty.add(rel)
+
+    def iter_files(
+        self,
+        prefix: str = "",
+        skip: Optional[Callable[[str], bool]] = None,
+    ) -> Iterator[str]:
+        """Caminhos relativos (ordenados) sob prefix; skip(parte) descarta pastas/arquivos pelo nome."""
+        prefix = prefix.strip("/")
+        base = prefix + "/" if prefix else ""
+        with self._lock:
+            nomes = sorted(self.files)
+        for rel in nomes:
+            if base and not rel.startswith(base):
+                continue
+            if skip is not None and any(skip(p) for p in rel.split("/")):
+                continue
+            yield rel
+
+    def iter_files_after(
+        self,
+        prefix: str = "",
+        after: Optional[str] = None,
+        skip: Optional[Callable[[str], bool]] = None,
+    ) -> Iterator[str]:
+        """
+        Arquivos sob prefix em ordem de árvore (nomes ordenados pasta a pasta), retomando
+        depois de `after`. Só as pastas visitadas são ordenadas: custo proporcional à página.
+        """
+        prefix = prefix.strip("/")
+        resto = after.split("/") if after else []
+        if prefix and resto:
+            base = prefix.split("/")
+            if resto[: len(base)] != base:
+                return
+            resto = resto[len(base):]
+        # pilha de (pasta, filhos ordenados, próximo índice, resto do cursor nesta pasta)
+        pilha = [self._frame(prefix, resto)]
+        while pilha:
+            pasta, filhos, i, resto = pilha[-1]
+            if i >= len(filhos):
+                pilha.pop()
+                continue
+            nome, is_dir = filhos[i]
+            child = f"{pasta}/{nome}" if pasta else nome
+            if resto and nome <= resto[0]:
+                pilha[-1] = (pasta, filhos, i + 1, resto)
+                if nome == resto[0] and is_dir and len(resto) > 1:
+                    pilha.append(self._frame(child, resto[1:]))
+                continue
+            pilha[-1] = (pasta, filhos, i + 1, None)  # cursor já passou nesta pasta
+            if skip is not None and skip(nome):
+                continue
+            if is_dir:
+                pilha.append(self._frame(child, None))
+            else:
+                yield child
+
+    def _frame(self, pasta: str, resto: Optional[List[str]]) -> tuple:
+        with self._lock:
+            arquivos, subpastas = self._listing.get(pasta, (set(), set()))
+            filhos = sorted([(a.rsplit("/", 1)[-1], False) for a in arquivos]
+                            + [(d.rsplit("/", 1)[-1], True) for d in subpastas])
+        return (pasta, filhos, 0, resto or None)
+
+    def stat(self, rel: str) -> Optional[Tuple[int, int]]:
+        return self.files.get(rel)
+
+    def has_dir(self, rel: str) -> bool:
+        return rel.strip("/") in self.dirs
+
+    def subdirs(self, rel: str = "") -> List[str]:
+        """Subpastas imediatas (nomes) de uma pasta do snapshot."""
+        with self._lock:
+            _, subpastas = self._listing.get(rel.strip("/"), (set(), set()))
+            return sorted(d.rsplit("/", 1)[-1] for d in subpastas)
+
+
+_snapshots: "OrderedDict[str, FsSnapshot]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def get_snapshot(root: str, max_age: Optional[float] = None) -> FsSnapshot:
+    """Snapshot atualizado da raiz (um por raiz, LRU de MAX_ROOTS)."""
+    root = os.path.abspath(root)
+    with _registry_lock:
+        snap = _snapshots.get(root)
+        if snap is None:
+            snap = _snapshots[root] = FsSnapshot(root)
+        _snapshots.move_to_end(root)
+        while len(_snapshots) > MAX_ROOTS:
+            _, antigo = _snapshots.popitem(last=False)
+            antigo.stop()
+    snap.refresh(max_age)
+    return snap
+
+
+def notify_changed(path: "str | os.PathLike[str]") -> None:
+    """
+    Avisa que a Yui escreveu/apagou path: snapshots que o contêm refazem o diff no próximo
+    acesso. Chamado pelas tools de escrita depois de gravar; nunca levanta (a escrita já
+    aconteceu, e no pior caso o snapshot se corrige no próximo REFRESH_INTERVAL).
+    """
+    try:
+        path = os.path.abspath(os.fspath(path))
+        with _registry_lock:
+            snaps = list(_snapshots.values())
+        for snap in snaps:
+            if path == snap.root or path.startswith(snap.root + os.sep):
+                snap.invalidate(os.path.relpath(path, snap.root).replace("\\", "/"))
+    except Exception:
+        pass
+
+
+def snapshot_stats() -> Dict[str, Dict[str, int]]:
+    with _registry_lock:
+        return {
+            root: {"files": len(s.files), "dirs": len(s.dirs), "generation": s.generation,
+                   "watcher": int(s._observer is not None)}
+            for root, s in _snapshots.items()
+        }
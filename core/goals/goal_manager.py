@@ -5,7 +5,6 @@
 # ==========================================================
 
 import datetime
-import json
 from dataclasses import asdict, dataclass, field
 from enum import Enum
 from pathlib import Path
@@ -59,25 +58,64 @@ class Goal:
         )
 
 
+_store = None
+
+
+def _reduce_memory(data: Dict[str, Any], op: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Operações do log de goals:
+    {"op": "add", "goal": {...}} | {"op": "update", "index": i, "fields": {...}}
+    | {"op": "incr", "index": i, "field": f, "delta": d, "lo": a, "hi": b}
+    incr soma sobre o valor corrente (limitado a [lo, hi]): atualizações concorrentes
+    de progresso/prioridade se somam em vez de uma sobrescrever a outra.
+    Goals nunca são removidos, então o índice é estável.
+    """
+    goals = data.setdefault("goals", [])
+    kind = op.get("op")
+    idx = op.get("index")
+    alvo = goals[idx] if isinstance(idx, int) and 0 <= idx < len(goals) else None
+    if kind == "add" and isinstance(op.get("goal"), dict):
+        goals.append(op["goal"])
+    elif kind == "update" and alvo is not None:
+        alvo.update(op.get("fields") or {})
+    elif kind == "incr" and alvo is not None and op.get("field") in ("progress", "priority"):
+        campo = op["field"]
+        valor = float(alvo.get(campo, 0.0)) + float(op.get("delta", 0))
+        if op.get("lo") is not None:
+            valor = max(float(op["lo"]), valor)
+        if op.get("hi") is not None:
+            valor = min(float(op["hi"]), valor)
+        alvo[campo] = valor
+    if op.get("ts"):
+        data["last_updated"] = op["ts"]
+    return data
+
+
+def _get_store():
+    """LogStore de goals (goal_memory.json + .log)."""
+    global _store
+    if _store is None:
+        from core.log_store import get_store
+        _store = get_store(GOAL_MEMORY_PATH, _reduce_memory, default=lambda: {"goals": [], "last_updated": ""})
+    return _store
+
+
 def _load_memory() -> Dict[str, Any]:
-    """Carrega goal_memory.json."""
-    GOAL_MEMORY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not GOAL_MEMORY_PATH.exists():
-        return {"goals": [], "last_updated": ""}
+    """Carrega goals (snapshot + log)."""
     try:
-        with open(GOAL_MEMORY_PATH, encoding="utf-8") as f:
-            return json.load(f)
+        return _get_store().read()
     except Exception:
         return {"goals": [], "last_updated": ""}
 
 
-def _save_memory(data: Dict[str, Any]) -> None:
-    """Salva goal_memory.json."""
-    GOAL_MEMORY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    import datetime
-    data["last_updated"] = datetime.datetime.utcnow().isoformat()
-    with open(GOAL_MEMORY_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _append_ops(ops: List[Dict[str, Any]]) -> None:
+    """Anexa operações ao log de goals (sem reescrever goal_memory.json)."""
+    if not ops:
+        return
+    now = datetime.datetime.utcnow().isoformat()
+    for op in ops:
+        op["ts"] = now
+    _get_store().apply_many(ops)
 
 
 def _decay_stale_goals(goals: List[Goal]) -> None:
@@ -105,11 +143,16 @@ def get_active_goals(user_id: str = "", chat_id: str = "", energy: Optional[floa
     """
     data = _load_memory()
     all_goals = [Goal.from_dict(g) for g in data.get("goals", [])]
-    active_goals = [g for g in all_goals if g.status == "active"]
+    active = [(i, g) for i, g in enumerate(all_goals) if g.status == "active"]
+    before = [g.priority for _, g in active]
+    active_goals = [g for _, g in active]
     _decay_stale_goals(active_goals)
-    if active_goals:
-        data["goals"] = [g.to_dict() for g in all_goals]
-        _save_memory(data)
+    # Só registra no log os goals cuja prioridade realmente mudou (como variação)
+    _append_ops([
+        {"op": "incr", "index": i, "field": "priority", "delta": g.priority - old, "lo": 0.1}
+        for (i, g), old in zip(active, before)
+        if g.priority != old
+    ])
     goals = active_goals
     if energy is not None and energy < 20:
         goals = [g for g in goals if g.priority >= 0.5]
@@ -126,7 +169,6 @@ def add_goal(
     chat_id: str = "",
 ) -> Goal:
     """Adiciona um objetivo ativo."""
-    import datetime
     goal = Goal(
         name=name,
         priority=priority,
@@ -136,14 +178,20 @@ def add_goal(
         last_execution="",
         created_at=datetime.datetime.utcnow().isoformat(),
     )
-    data = _load_memory()
-    goals = [Goal.from_dict(g) for g in data.get("goals", [])]
-    goals.append(goal)
-    data["goals"] = [g.to_dict() for g in goals]
-    _save_memory(data)
+    _append_ops([{"op": "add", "goal": goal.to_dict()}])
     return goal
 
 
+def _find_goal(goal_name: str, active_only: bool) -> Optional[tuple]:
+    """Retorna (índice, Goal) do primeiro goal com esse nome, ou None."""
+    data = _load_memory()
+    for i, d in enumerate(data.get("goals", [])):
+        g = Goal.from_dict(d)
+        if g.name == goal_name and (g.status == "active" or not active_only):
+            return i, g
+    return None
+
+
 def update_progress(
     goal_name: str,
     success: bool,
@@ -154,32 +202,26 @@ def update_progress(
     success=True → aumenta progresso
     success=False → diminui prioridade (evita repetir estratégia que falhou)
     """
-    data = _load_memory()
-    import datetime
-    now = datetime.datetime.utcnow().isoformat()
-    goals = [Goal.from_dict(g) for g in data.get("goals", [])]
-    for g in goals:
-        if g.name == goal_name and g.status == "active":
-            g.last_execution = now
-            if success:
-                g.progress = min(1.0, g.progress + delta)
-            else:
-                g.priority = max(0.1, g.priority - delta * 2)
-            break
-    data["goals"] = [g.to_dict() for g in goals]
-    _save_memory(data)
+    found = _find_goal(goal_name, active_only=True)
+    if not found:
+        return
+    i = found[0]
+    ops: List[Dict[str, Any]] = [
+        {"op": "update", "index": i, "fields": {"last_execution": datetime.datetime.utcnow().isoformat()}}
+    ]
+    if success:
+        ops.append({"op": "incr", "index": i, "field": "progress", "delta": delta, "hi": 1.0})
+    else:
+        ops.append({"op": "incr", "index": i, "field": "priority", "delta": -delta * 2, "lo": 0.1})
+    _append_ops(ops)
 
 
 def complete_goal(goal_name: str) -> None:
     """Marca objetivo como concluído."""
-    data = _load_memory()
-    goals = [Goal.from_dict(g) for g in data.get("goals", [])]
-    for g in goals:
-        if g.name == goal_name:
-            g.status = "completed"
-            break
-    data["goals"] = [g.to_dict() for g in goals]
-    _save_memory(data)
+    found = _find_goal(goal_name, active_only=False)
+    if not found:
+        return
+    _append_ops([{"op": "update", "index": found[0], "fields": {"status": "completed"}}])
 
 
 def goals_to_context(goals: List[Goal]) -> str:
@@ -2,6 +2,12 @@
 YUI JOB QUEUE
 API leve → fila → Worker processa em background.
 Gerencia picos de carga e evita timeouts no Zeabur.
+
+Estados e métricas ficam em core/shared_state: com N workers, o poll
+pode cair em qualquer worker e ainda enxerga o job.
+
+A limpeza de jobs expirados percorre o dict compartilhado inteiro; enqueue
+e poll a disparam no máximo uma vez a cada CLEANUP_INTERVAL segundos.
 """
 
 import uuid
@@ -10,23 +16,22 @@ import threading
 from threading import Lock
 from typing import Any, Dict, Optional
 
+from core.shared_state import shared_dict
+
 try:
     from core.task_scheduler import get_scheduler
 except ImportError:
     get_scheduler = None
 
-# Armazenamento em memória dos estados dos Jobs
-_results: Dict[str, Dict[str, Any]] = {}
+# Estados dos Jobs (compartilhados entre workers)
+_results = shared_dict("jobs")
 _lock = Lock()
 TTL = 600  # 10 min (Tempo de vida dos resultados no cache para economizar RAM)
+CLEANUP_INTERVAL = 30  # segundos entre limpezas disparadas por enqueue/poll
+_last_cleanup = float("-inf")  # time.monotonic() da última limpeza (por processo)
 
-# Métricas globais para monitoramento administrativo
-_metrics: Dict[str, int] = {
-    "enqueued": 0,
-    "done": 0,
-    "failed": 0,
-    "cleaned": 0,
-}
+# Métricas globais para monitoramento administrativo (contadores atômicos)
+_metrics = shared_dict("job_metrics")
 
 
 def _run_job(payload: Dict[str, Any]) -> None:
@@ -58,19 +63,19 @@ def _run_job(payload: Dict[str, Any]) -> None:
             _results[job_id] = {
                 "status": "done",
                 "result": result,
-                "created_at": _results.get(job_id, {}).get("created_at", time.time()),
+                "created_at": (_results.get(job_id) or {}).get("created_at", time.time()),
                 "updated_at": time.time(),
             }
-            _metrics["done"] += 1
+        _metrics.incr("done")
     except Exception as e:
         with _lock:
             _results[job_id] = {
                 "status": "failed",
                 "error": str(e),
-                "created_at": _results.get(job_id, {}).get("created_at", time.time()),
+                "created_at": (_results.get(job_id) or {}).get("created_at", time.time()),
                 "updated_at": time.time(),
             }
-            _metrics["failed"] += 1
+        _metrics.incr("failed")
 
 
 def enqueue_chat(
@@ -80,7 +85,7 @@ def enqueue_chat(
     model: str = "yui",
 ) -> str:
     """Enfileira processamento de chat. Retorna job_id para o Poll do cliente."""
-    cleanup_old_jobs()
+    _maybe_cleanup()
     job_id = str(uuid.uuid4())[:12]
     payload = {
         "job_id": job_id,
@@ -90,7 +95,7 @@ def enqueue_chat(
 
     with _lock:
         _results[job_id] = {"status": "queued", "created_at": time.time(), "updated_at": time.time()}
-        _metrics["enqueued"] += 1
+    _metrics.incr("enqueued")
 
     if get_scheduler and get_scheduler():
         get_scheduler().add(_run_job, payload, task_id=job_id)
@@ -103,11 +108,22 @@ def enqueue_chat(
 
 def get_job_result(job_id: str) -> Optional[Dict[str, Any]]:
     """Retorna status do job: {status: queued|done|failed, result?, error?}."""
-    cleanup_old_jobs()
+    _maybe_cleanup()
     with _lock:
         return _results.get(job_id)
 
 
+def _maybe_cleanup() -> None:
+    """Roda cleanup_old_jobs se a última limpeza deste processo tem mais de CLEANUP_INTERVAL."""
+    global _last_cleanup
+    now = time.monotonic()
+    with _lock:
+        if now - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = now
+    cleanup_old_jobs()
+
+
 def cleanup_old_jobs(ttl_seconds: Optional[int] = None) -> int:
     """Remove jobs expirados para economizar memória RAM (crucial para o Zeabur)."""
     ttl = int(ttl_seconds or TTL)
@@ -125,22 +141,26 @@ def cleanup_old_jobs(ttl_seconds: Optional[int] = None) -> int:
         for j_id in to_remove:
             _results.pop(j_id, None)
         removed = len(to_remove)
-        _metrics["cleaned"] += removed
+    if removed:
+        _metrics.incr("cleaned", removed)
     return removed
 
 
 def get_job_metrics() -> Dict[str, Any]:
     """Retorna estatísticas de uso da fila para observabilidade."""
     with _lock:
-        queued = sum(1 for j in _results.values() if j.get("status") == "queued")
-        running = sum(1 for j in _results.values() if j.get("status") == "running")
-        return {
-            "queued": queued,
-            "running": running,
-            "stored_results": len(_results),
-            "enqueued_total": _metrics.get("enqueued", 0),
-            "done_total": _metrics.get("done", 0),
-            "failed_total": _metrics.get("failed", 0),
-            "cleaned_total": _metrics.get("cleaned", 0),
-            "ttl_seconds": TTL,
-        }
+        jobs = list(_results.values())
+        counters = dict(_metrics.items())
+    queued = sum(1 for j in jobs if j.get("status") == "queued")
+    running = sum(1 for j in jobs if j.get("status") == "running")
+    return {
+        "queued": queued,
+        "running": running,
+        "stored_results": len(jobs),
+        "enqueued_total": counters.get("enqueued", 0),
+        "done_total": counters.get("done", 0),
+        "failed_total": counters.get("failed", 0),
+        "cleaned_total": counters.get("cleaned", 0),
+        "ttl_seconds": TTL,
+        "shared_backend": _results.backend.name,
+    }
@@ -12,5 +12,5 @@ MAX_STEPS = int(os.environ.get("YUI_MAX_STEPS", "12"))
 # Máximo de tokens na resposta (placeholder; modelo tem seu próprio limite)
 MAX_TOKENS = int(os.environ.get("YUI_MAX_TOKENS", "4096"))
 
-# Timeout em segundos por execução de tool (placeholder para futuro)
+# Timeout em segundos por execução de tool (core/tool_executor)
 TIMEOUT_SECONDS = int(os.environ.get("YUI_TIMEOUT", "30"))
@@ -0,0 +1,266 @@
+# ==========================================================
+# YUI LOG STORE
+# Estado persistente = snapshot JSON + log append-only (JSONL).
+#
+# Antes: cada contador (uso, energia, goals) relia e reescrevia
+# o JSON inteiro a cada alteração.
+# Agora: estado agregado em RAM, cada alteração vira 1 linha no
+# .log e o snapshot só é regravado na compactação (a cada N
+# operações ou T segundos).
+#
+# Locks: threading.Lock (threads) + lock de arquivo (processos).
+# O snapshot continua no mesmo caminho/formato do JSON antigo.
+# ==========================================================
+
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl  # POSIX
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+COMPACT_EVERY = 200      # operações no log antes de regravar o snapshot
+SNAPSHOT_INTERVAL = 60.0  # segundos máximos entre snapshots (se houve alteração)
+
+Reducer = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Lock exclusivo entre processos usando um arquivo .lock ao lado do dado.
+    Sem fcntl/msvcrt disponível, vira no-op (o lock de thread ainda protege).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        except OSError:
+            pass
+        try:
+            yield
+        finally:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+
+
+def atomic_write_json(path: Path, data: Any, indent: Optional[int] = 2) -> None:
+    """Grava JSON em arquivo temporário e troca com os.replace (nunca deixa arquivo pela metade)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp, path)
+
+
+class LogStore:
+    """
+    Store de estado com log append-only e compactação.
+
+    reducer(state, op) -> state aplica uma operação; deve ser determinístico,
+    pois o log é re-aplicado ao carregar (e por outros processos).
+
+    Uso:
+        store = LogStore(path, reducer, default=dict)
+        store.apply({"op": "incr", "key": "x"})
+        store.read()  # cópia do estado agregado
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        reducer: Reducer,
+        default: Callable[[], Dict[str, Any]] = dict,
+        compact_every: int = COMPACT_EVERY,
+        snapshot_interval: float = SNAPSHOT_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + ".log")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._reducer = reducer
+        self._default = default
+        self._compact_every = max(1, int(compact_every))
+        self._snapshot_interval = float(snapshot_interval)
+        self._lock = threading.RLock()
+        self._state: Dict[str, Any] = default()
+        self._log_offset = 0
+        self._snapshot_sig: Optional[tuple] = None
+        self._pending = 0
+        self._last_snapshot = time.time()
+        self._loaded = False
+
+    # ---------- leitura ----------
+
+    def _snapshot_signature(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+            return (st.st_mtime_ns, st.st_size, getattr(st, "st_ino", 0))
+        except OSError:
+            return None
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not self.path.exists():
+            return self._default()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else self._default()
+        except Exception:
+            return self._default()
+
+    def _replay_from(self, offset: int) -> int:
+        """Aplica linhas do log a partir de offset. Retorna novo offset (só linhas completas)."""
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+        except OSError:
+            return offset
+        if not chunk:
+            return offset
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return offset
+        for raw in chunk[: end + 1].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                op = json.loads(raw.decode("utf-8"))
+            except Exception:
+                continue
+            try:
+                self._state = self._reducer(self._state, op)
+            except Exception:
+                pass
+        return offset + end + 1
+
+    def _reload_locked(self) -> None:
+        self._state = self._read_snapshot()
+        self._snapshot_sig = self._snapshot_signature()
+        self._log_offset = self._replay_from(0)
+        self._pending = 0
+        self._loaded = True
+
+    def _catch_up_locked(self) -> None:
+        """Sincroniza com escritas de outros processos (snapshot trocado ou log crescido)."""
+        if not self._loaded or self._snapshot_signature() != self._snapshot_sig:
+            self._reload_locked()
+            return
+        try:
+            size = self.log_path.stat().st_size
+        except OSError:
+            size = 0
+        if size < self._log_offset:
+            self._reload_locked()
+        elif size > self._log_offset:
+            self._log_offset = self._replay_from(self._log_offset)
+
+    def read(self) -> Dict[str, Any]:
+        """Retorna cópia do estado agregado (sem reescrever nada)."""
+        with self._lock:
+            with file_lock(self.lock_path):
+                self._catch_up_locked()
+            return copy.deepcopy(self._state)
+
+    # ---------- escrita ----------
+
+    def apply(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica operação em RAM e anexa 1 linha ao log. Compacta periodicamente."""
+        return self.apply_many([op])
+
+    def apply_many(self, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aplica várias operações com um único lock/append."""
+        if not ops:
+            return self.read()
+        lines = "".join(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n" for op in ops)
+        with self._lock:
+            with file_lock(self.lock_path):
+                self._catch_up_locked()
+                for op in ops:
+                    self._state = self._reducer(self._state, op)
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "ab") as f:
+                    f.write(lines.encode("utf-8"))
+                self._log_offset += len(lines.encode("utf-8"))
+                self._pending += len(ops)
+                if (
+                    self._pending >= self._compact_every
+                    or (time.time() - self._last_snapshot) >= self._snapshot_interval
+                ):
+                    self._compact_locked()
+            return copy.deepcopy(self._state)
+
+    def _compact_locked(self) -> None:
+        atomic_write_json(self.path, self._state)
+        with open(self.log_path, "wb"):
+            pass
+        self._log_offset = 0
+        self._pending = 0
+        self._snapshot_sig = self._snapshot_signature()
+        self._last_snapshot = time.time()
+
+    def compact(self) -> None:
+        """Grava snapshot e zera o log (chamado também no encerramento do processo)."""
+        with self._lock:
+            with file_lock(self.lock_path):
+                self._catch_up_locked()
+                if self._pending or self._log_offset:
+                    self._compact_locked()
+
+    def pending(self) -> int:
+        """Operações no log ainda não incorporadas ao snapshot."""
+        with self._lock:
+            return self._pending
+
+
+_stores: List[LogStore] = []
+_stores_lock = threading.Lock()
+
+
+def get_store(
+    path: Path,
+    reducer: Reducer,
+    default: Callable[[], Dict[str, Any]] = dict,
+    **kwargs: Any,
+) -> LogStore:
+    """Cria um LogStore e registra compactação no encerramento do processo."""
+    store = LogStore(path, reducer, default=default, **kwargs)
+    with _stores_lock:
+        _stores.append(store)
+    return store
+
+
+def compact_all() -> None:
+    """Compacta todos os stores registrados."""
+    with _stores_lock:
+        stores = list(_stores)
+    for s in stores:
+        try:
+            s.compact()
+        except Exception:
+            pass
+
+
+atexit.register(compact_all)
@@ -5,6 +5,8 @@ Usada pelo Heathcliff para lembrar decisões anteriores.
 
 import json
 import re
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -19,11 +21,17 @@ try:
     MEMORIA_IA_PATH = Path(settings.DATA_DIR) / "memoria_ia.json"
 except Exception:
     MEMORIA_IA_PATH = Path(__file__).resolve().parents[1] / "data" / "memoria_ia.json"
+MEMORIA_IA_DB = MEMORIA_IA_PATH.with_suffix(".db")
+
+
+LOCAL_MAX_ITEMS = 500
+_local_conn = None
+_local_fts = False
+_local_lock = threading.Lock()
 
 
 def _load_local() -> list:
-    """Carrega memória local (fallback quando Supabase não disponível)."""
-    MEMORIA_IA_PATH.parent.mkdir(parents=True, exist_ok=True)
+    """Carrega memória local legada (memoria_ia.json) — usada só na migração para SQLite."""
     if not MEMORIA_IA_PATH.exists():
         return []
     try:
@@ -34,13 +42,116 @@ def _load_local() -> list:
         return []
 
 
-def _save_local(items: list) -> None:
-    """Salva memória local."""
-    MEMORIA_IA_PATH.parent.mkdir(parents=True, exist_ok=True)
-    # Manter últimos 500 registros
-    items = items[-500:]
-    with open(MEMORIA_IA_PATH, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
+def _local_db() -> sqlite3.Connection:
+    """
+    Backend local (sem Supabase): SQLite com índice FTS5 em resumo/tags.
+    Migra memoria_ia.json na primeira abertura.
+    """
+    global _local_conn, _local_fts
+    if _local_conn is not None:
+        return _local_conn
+    MEMORIA_IA_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(MEMORIA_IA_DB), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS memoria ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, chat_id TEXT, "
+        "resumo TEXT NOT NULL, tags TEXT DEFAULT '', created_at TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_memoria_user ON memoria(user_id, created_at)")
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS memoria_fts USING fts5("
+            "resumo, tags, content='memoria', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        conn.executescript(
+            "CREATE TRIGGER IF NOT EXISTS memoria_ai AFTER INSERT ON memoria BEGIN "
+            "INSERT INTO memoria_fts(rowid, resumo, tags) VALUES (new.id, new.resumo, new.tags); END;"
+            "CREATE TRIGGER IF NOT EXISTS memoria_ad AFTER DELETE ON memoria BEGIN "
+            "INSERT INTO memoria_fts(memoria_fts, rowid, resumo, tags) VALUES ('delete', old.id, old.resumo, old.tags); END;"
+        )
+        _local_fts = True
+    except sqlite3.OperationalError:
+        _local_fts = False  # SQLite sem FTS5: ranking em Python
+    if conn.execute("SELECT COUNT(*) FROM memoria").fetchone()[0] == 0:
+        legado = _load_local()
+        if legado:
+            conn.executemany(
+                "INSERT INTO memoria (user_id, chat_id, resumo, tags, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (it.get("user_id"), it.get("chat_id"), it.get("resumo") or "", it.get("tags") or "", it.get("created_at") or "")
+                    for it in legado[-LOCAL_MAX_ITEMS:]
+                    if it.get("resumo")
+                ],
+            )
+    conn.commit()
+    _local_conn = conn
+    return conn
+
+
+def _save_local_item(user_id: str, chat_id: Optional[str], resumo: str, tags: str) -> None:
+    """Insere resumo no SQLite local e mantém os últimos LOCAL_MAX_ITEMS registros."""
+    with _local_lock:
+        conn = _local_db()
+        conn.execute(
+            "INSERT INTO memoria (user_id, chat_id, resumo, tags, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, chat_id, resumo, tags, datetime.utcnow().isoformat() + "Z"),
+        )
+        conn.execute(
+            "DELETE FROM memoria WHERE id <= (SELECT id FROM memoria ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (LOCAL_MAX_ITEMS,),
+        )
+        conn.commit()
+
+
+def _fts_match(query: str) -> str:
+    """Termos em OR com prefixo (aproxima o antigo 'palavra contida no resumo')."""
+    from core.context_retrieval import query_terms
+    return " OR ".join(f'"{t}"*' for t in query_terms(query))
+
+
+def _buscar_local(user_id: str, query: str, chat_id: Optional[str], limite: int) -> List[dict]:
+    with _local_lock:
+        conn = _local_db()
+        filtro = "m.user_id = ?"
+        params: list = [user_id]
+        if chat_id:
+            filtro += " AND (m.chat_id = ? OR m.chat_id IS NULL OR m.chat_id = '')"
+            params.append(chat_id)
+        match = _fts_match(query) if query else ""
+        if match and _local_fts:
+            rows = conn.execute(
+                "SELECT m.resumo, m.tags, m.created_at, m.chat_id FROM memoria_fts "
+                "JOIN memoria m ON m.id = memoria_fts.rowid "
+                f"WHERE memoria_fts MATCH ? AND {filtro} "
+                "ORDER BY bm25(memoria_fts), m.id DESC LIMIT ?",
+                [match] + params + [limite],
+            ).fetchall()
+            return [dict(r) for r in rows]
+        rows = conn.execute(
+            f"SELECT m.resumo, m.tags, m.created_at, m.chat_id FROM memoria m WHERE {filtro} "
+            "ORDER BY m.id DESC LIMIT ?",
+            params + [limite * 2],
+        ).fetchall()
+    items = [dict(r) for r in rows]
+    return _rank_python(items, query, limite) if query else items[:limite]
+
+
+def _rank_python(items: List[dict], query: str, limite: int) -> List[dict]:
+    """Ranking por palavra-chave em Python (fallback sem RPC/FTS)."""
+    q_lower = query.lower()
+    kw = set(re.findall(r"#?\w+", q_lower))
+    scored = []
+    for it in items:
+        resumo = (it.get("resumo") or "").lower()
+        tags_str = (it.get("tags") or "").lower()
+        score = 0
+        for w in kw:
+            if w in resumo or w in tags_str:
+                score += 1
+        scored.append((score, it))
+    scored.sort(key=lambda x: -x[0])
+    return [x[1] for x in scored if x[0] > 0][:limite]
 
 
 def salvar_resumo(
@@ -56,6 +167,11 @@ def salvar_resumo(
     if not resumo or not resumo.strip():
         return False
     tags = (tags or "").strip()
+    try:
+        from core.context_retrieval import invalidate
+        invalidate(user_id)
+    except Exception:
+        pass
     if supabase:
         try:
             row = {
@@ -69,29 +185,20 @@ def salvar_resumo(
             return True
         except Exception:
             pass
-    # Fallback JSON local
-    items = _load_local()
-    items.append({
-        "id": str(len(items)),
-        "user_id": user_id,
-        "chat_id": chat_id,
-        "resumo": resumo.strip()[:4000],
-        "tags": tags,
-        "created_at": datetime.utcnow().isoformat() + "Z",
-    })
-    _save_local(items)
+    # Fallback local (SQLite + FTS5)
+    _save_local_item(user_id, chat_id, resumo.strip()[:4000], tags)
     return True
 
 
-def buscar_memoria(
+def buscar_rows_direto(
     user_id: str,
     query: str = "",
     chat_id: Optional[str] = None,
     limite: int = 10,
-) -> str:
+) -> List[dict]:
     """
-    Busca resumos relevantes na memória do usuário.
-    Retorna texto formatado para incluir no contexto do Heathcliff.
+    Resumos relevantes sem passar pela RPC de turno.
+    Supabase sem a migration: últimas linhas + ranking em Python. Local: SQLite FTS5.
     """
     if supabase:
         try:
@@ -104,31 +211,31 @@ def buscar_memoria(
                 items = raw[:limite * 2]
         except Exception:
             items = []
-    else:
-        items = _load_local()
-        items = [x for x in items if x.get("user_id") == user_id]
-        if chat_id:
-            items = [x for x in items if x.get("chat_id") == chat_id or not x.get("chat_id")]
-        items = sorted(items, key=lambda x: x.get("created_at", ""), reverse=True)[:limite * 2]
+        return _rank_python(items, query, limite) if query else items[:limite]
+    try:
+        return _buscar_local(user_id, query, chat_id, limite)
+    except Exception:
+        return []
+
+
+def buscar_memoria(
+    user_id: str,
+    query: str = "",
+    chat_id: Optional[str] = None,
+    limite: int = 10,
+) -> str:
+    """
+    Busca resumos relevantes na memória do usuário.
+    Retorna texto formatado para incluir no contexto do Heathcliff.
+    Ranking no servidor (tsvector via RPC de turno) ou no SQLite FTS5 local.
+    """
+    try:
+        from core.context_retrieval import get_turn_context
+        items = get_turn_context(user_id, chat_id, query).get("memoria", [])[:limite]
+    except Exception:
+        items = buscar_rows_direto(user_id, query=query, chat_id=chat_id, limite=limite)
     if not items:
         return ""
-    # Filtro por query (tags ou palavras-chave)
-    if query:
-        q_lower = query.lower()
-        kw = set(re.findall(r"#?\w+", q_lower))
-        scored = []
-        for it in items:
-            resumo = (it.get("resumo") or "").lower()
-            tags_str = (it.get("tags") or "").lower()
-            score = 0
-            for w in kw:
-                if w in resumo or w in tags_str:
-                    score += 1
-            scored.append((score, it))
-        scored.sort(key=lambda x: -x[0])
-        items = [x[1] for x in scored if x[0] > 0][:limite]
-    else:
-        items = items[:limite]
     lines = []
     for it in items:
         r = (it.get("resumo") or "").strip()
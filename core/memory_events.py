@@ -43,6 +43,8 @@ def registrar_evento(
         row["chat_id"] = chat_id
     try:
         supabase.table("memory_events").insert(row).execute()
+        from core.context_retrieval import invalidate
+        invalidate(user_id)
     except Exception:
         # Falha de memória não deve quebrar fluxo principal
         return
@@ -28,24 +28,39 @@ def add_summary(user_id: str, chat_id: str, conteudo: str) -> None:
     registrar_evento(user_id=user_id, chat_id=chat_id, tipo="longa", conteudo=conteudo)
 
 
-def build_context_text(user_id: str, chat_id: Optional[str], limit_short: int = 10, limit_long: int = 10) -> str:
+def build_context_text(
+    user_id: str,
+    chat_id: Optional[str],
+    limit_short: int = 10,
+    limit_long: int = 10,
+    query: str = "",
+) -> str:
     """
     Monta um texto de contexto combinando:
     - memória longa (fatos/resumos) -> tipo='longa'
     - memória curta (eventos recentes desse chat) -> tipo='curta'
+
+    Uma única consulta por turno (core.context_retrieval): passe a mesma
+    query usada em memoria_ia.buscar_memoria para reaproveitar o resultado.
     """
     partes = []
-    eventos_longos = buscar_eventos(user_id=user_id, chat_id=None, tipo="longa", limit=limit_long)
+    try:
+        from core.context_retrieval import get_turn_context
+        turno = get_turn_context(user_id, chat_id, query)
+        eventos_longos = turno.get("longa", [])[:limit_long]
+        eventos_curta = turno.get("curta", [])[:limit_short] if chat_id else []
+    except Exception:
+        eventos_longos = buscar_eventos(user_id=user_id, chat_id=None, tipo="longa", limit=limit_long)
+        eventos_curta = (
+            buscar_eventos(user_id=user_id, chat_id=chat_id, tipo="curta", limit=limit_short)
+            if chat_id else []
+        )
+
     if eventos_longos:
         partes.append("Fatos importantes e resumos anteriores sobre este usuário/projeto:")
         for ev in reversed(eventos_longos):
             partes.append(f"- {ev.get('conteudo', '')}")
 
-    if chat_id:
-        eventos_curta = buscar_eventos(user_id=user_id, chat_id=chat_id, tipo="curta", limit=limit_short)
-    else:
-        eventos_curta = []
-
     if eventos_curta:
         partes.append("")
         partes.append("Contexto recente desta conversa (últimos eventos):")
@@ -53,4 +68,3 @@ def build_context_text(user_id: str, chat_id: Optional[str], limit_short: int =
             partes.append(f"- {ev.get('conteudo', '')}")
 
     return "\n".join(p for p in partes if p)
-
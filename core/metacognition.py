@@ -76,9 +76,12 @@ def _build_state(
     )
 
 
-def _detect_loop() -> bool:
-    """Detecta se últimas ações são repetidas (ex: create_file x3)."""
-    hist = list(ACTION_HISTORY)
+def _detect_loop(pending: Optional[List[str]] = None) -> bool:
+    """
+    Detecta se últimas ações são repetidas (ex: create_file x3).
+    pending: ações já aceitas que ainda não rodaram (mesma onda de tools paralelas).
+    """
+    hist = list(ACTION_HISTORY) + list(pending or [])
     if len(hist) < LOOP_THRESHOLD:
         return False
     last = hist[-LOOP_THRESHOLD:]
@@ -91,9 +94,15 @@ class MetaCognition:
     Sinais influenciam planner, attention, identity.
     """
 
-    def analyze(self, state: Optional[MetaState] = None, **kwargs) -> Dict[str, Any]:
+    def analyze(
+        self,
+        state: Optional[MetaState] = None,
+        pending_actions: Optional[List[str]] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
         """
         Analisa estado e retorna sinais.
+        pending_actions: ações aceitas e ainda não executadas (entram no loop detector).
         kwargs: context_size, steps_planned, steps_executed, current_goal
         """
         if state is None:
@@ -107,7 +116,7 @@ class MetaCognition:
             or state.steps_executed > TOO_MANY_STEPS_THRESHOLD
         )
         signals["context_overload"] = state.context_size > CONTEXT_OVERLOAD_THRESHOLD
-        signals["loop_detected"] = _detect_loop()
+        signals["loop_detected"] = _detect_loop(pending_actions)
         signals["last_failed"] = not state.last_result_ok
 
         meta_score = 100
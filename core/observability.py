@@ -6,6 +6,10 @@
 # "Por que a CPU subiu?", "Qual módulo consumiu RAM?"
 #
 # Conecta: Event Bus, Scheduler, Governor, Execution Graph.
+#
+# Com N workers (core/shared_state compartilhado) spans concluídos
+# e atividades vão para listas compartilhadas: o painel mostra o
+# sistema todo, não só o worker que atendeu o request.
 # ==========================================================
 
 import time
@@ -22,6 +26,16 @@ _lock = Lock()
 _TTL = 300  # 5 min
 
 
+def _shared_backend():
+    """Backend compartilhado entre workers, ou None (deques locais)."""
+    try:
+        from core.shared_state import get_backend
+        backend = get_backend()
+        return backend if backend.shared else None
+    except Exception:
+        return None
+
+
 @dataclass
 class Span:
     """Um span de execução: nome, duração, status."""
@@ -75,6 +89,7 @@ class Trace:
         if self._span:
             self._span.end_ts = time.time()
             self._span.status = status
+            _publish_span(self._span)
 
     def __enter__(self) -> "Trace":
         self.start()
@@ -94,24 +109,57 @@ def trace(name: str, meta: Optional[Dict[str, Any]] = None) -> Trace:
     return Trace(name=name, meta=meta)
 
 
+def _publish_span(span: Span) -> None:
+    """Span concluído → lista compartilhada (se houver backend compartilhado)."""
+    backend = _shared_backend()
+    if backend is None:
+        return
+    try:
+        backend.push("obs_spans", dict(span.to_dict(), start_ts=span.start_ts), _spans.maxlen)
+    except Exception:
+        pass
+
+
 def record_span(name: str, duration_ms: float, status: str = "done", meta: Optional[Dict] = None) -> None:
     """Registra um span já concluído."""
     now = time.time()
     s = Span(name=name, start_ts=now - duration_ms / 1000, end_ts=now, status=status, meta=meta or {})
     with _lock:
         _spans.append(s)
+    _publish_span(s)
 
 
 def record_activity(kind: str, label: str, detail: str = "") -> None:
     """Registra atividade para o painel System Activity."""
+    a = Activity(kind=kind, label=label, detail=detail)
+    backend = _shared_backend()
+    if backend is not None:
+        try:
+            backend.push("obs_activity", {"kind": a.kind, "label": a.label, "detail": a.detail, "ts": a.ts},
+                         _activity.maxlen)
+            return
+        except Exception:
+            pass
     with _lock:
-        _activity.append(Activity(kind=kind, label=label, detail=detail))
+        _activity.append(a)
 
 
 def get_timeline(limit: int = 20) -> List[Dict[str, Any]]:
     """Retorna os spans recentes (Execution Timeline)."""
     now = time.time()
     cutoff = now - _TTL
+    backend = _shared_backend()
+    if backend is not None:
+        # Concluídos de todos os workers + em andamento deste worker
+        with _lock:
+            running = [s for s in _spans if s.end_ts is None and s.start_ts > cutoff]
+        try:
+            done = [d for d in backend.recent("obs_spans", limit) if d.get("start_ts", 0) > cutoff]
+        except Exception:
+            done = []
+        merged = [(s.start_ts, s.to_dict()) for s in running] + [(d.pop("start_ts"), d) for d in done]
+        merged.sort(key=lambda x: x[0], reverse=True)
+        return [d for _, d in merged[:limit]]
     with _lock:
         items = [s for s in _spans if s.start_ts > cutoff]
     # Últimos primeiro
@@ -123,6 +171,12 @@ def get_system_activity(limit: int = 10) -> List[Dict[str, Any]]:
     """Retorna atividade recente para UI (System Activity)."""
     now = time.time()
     cutoff = now - _TTL
+    backend = _shared_backend()
+    if backend is not None:
+        try:
+            return [a for a in backend.recent("obs_activity", limit) if a.get("ts", 0) > cutoff]
+        except Exception:
+            pass
     with _lock:
         items = [a for a in _activity if a.ts > cutoff]
     items = list(reversed(items))[:limit]
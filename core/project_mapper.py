@@ -1,6 +1,11 @@
 """
 Project Mapper — gera .yui_map.json com estrutura e dependências do projeto.
 Leitura sob demanda (streaming) para evitar estouro de RAM (2GB).
+
+Antes: cada chamada extraía os imports de todos os arquivos e regravava o mapa
+com indentação. Agora o mapa é incremental: entradas de arquivos inalterados
+(tamanho + mtime do core/fs_snapshot) vêm do mapa anterior, só os arquivos
+alterados são relidos, e o JSON é compacto e só regravado quando algo mudou.
 """
 
 import json
@@ -10,6 +15,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Optional
 
+from core.fs_snapshot import get_snapshot, is_hidden
+
 try:
     from config import settings
     SANDBOX_DIR = Path(settings.SANDBOX_DIR).resolve()
@@ -19,27 +26,19 @@ except Exception:
 IGNORE_DIRS = {"__pycache__", ".git", ".venv", "venv", "env", "node_modules", ".mypy_cache", ".pytest_cache", "build", "dist"}
 IGNORE_NAMES = IGNORE_DIRS | {".DS_Store", "Thumbs.db", ".yui_map.json"}
 MAX_FILE_SIZE = 512 * 1024  # 512KB max por arquivo para análise de deps
+MAP_VERSION = "1.1"  # 1.1: entradas com size/mtime_ns (mapa incremental)
 
-
-def _should_skip(path: Path) -> bool:
-    name = path.name
-    if name in IGNORE_NAMES:
-        return True
-    if any(part in IGNORE_DIRS for part in path.parts):
-        return True
-    return False
+_last_maps: Dict[str, tuple] = {}  # caminho do mapa → ((size, mtime_ns), dados)
 
 
 def _iter_files_streaming(root: Path) -> Generator[Path, None, None]:
-    """Itera arquivos um a um — sem carregar tudo na memória."""
-    for dirpath, _, filenames in os.walk(root):
-        for f in filenames:
-            p = Path(dirpath) / f
-            if _should_skip(p):
-                continue
-            if p.name.startswith(".") and p.name not in (".env", ".env.example"):
-                continue
-            yield p
+    """Itera arquivos um a um (sem montar a lista inteira)."""
+    snap = get_snapshot(str(root))
+    for rel in snap.iter_files(skip=lambda part: part in IGNORE_DIRS):
+        name = rel.rsplit("/", 1)[-1]
+        if name in IGNORE_NAMES or is_hidden(name):
+            continue
+        yield root / rel
 
 
 def _extract_js_imports(content: str) -> List[str]:
@@ -94,10 +93,33 @@ def _get_file_deps(path: Path, root: Path) -> Dict[str, Any]:
     return deps
 
 
-def generate_yui_map(root: Optional[Path] = None) -> Dict[str, Any]:
+def _load_previous_map(map_path: Path) -> Optional[Dict[str, Any]]:
+    """Mapa anterior (cache em memória enquanto o arquivo não mudar)."""
+    try:
+        st = map_path.stat()
+    except OSError:
+        return None
+    key = str(map_path)
+    cached = _last_maps.get(key)
+    if cached and cached[0] == (st.st_size, st.st_mtime_ns):
+        return cached[1]
+    try:
+        with open(map_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    _last_maps[key] = ((st.st_size, st.st_mtime_ns), data)
+    return data
+
+
+def generate_yui_map(root: Optional[Path] = None, incremental: bool = True) -> Dict[str, Any]:
     """
     Gera um mapa do projeto com estrutura e dependências.
     Usa leitura sob demanda para cada arquivo — evita >2GB RAM.
+
+    incremental=True: entradas do mapa anterior são reaproveitadas quando o arquivo
+    não mudou (mesmo tamanho e mtime); só arquivos novos/alterados têm imports
+    reextraídos. Sem nenhuma mudança o mapa não é regravado.
     """
     root = root or SANDBOX_DIR
     root = Path(root).resolve()
@@ -105,36 +127,64 @@ def generate_yui_map(root: Optional[Path] = None) -> Dict[str, Any]:
     if not root.is_dir():
         return {"ok": False, "error": "raiz não é diretório"}
 
-    structure: List[str] = []
+    map_path = root / ".yui_map.json"
+    snap = get_snapshot(str(root), max_age=0)
+    anterior = _load_previous_map(map_path) if incremental else None
+    prev_files: Dict[str, Dict] = {}
+    if anterior and anterior.get("version") == MAP_VERSION and anterior.get("root") == str(root):
+        prev_files = anterior.get("files") or {}
+
     files_deps: Dict[str, Dict] = {}
-    total = 0
+    added: List[str] = []
+    modified: List[str] = []
     for p in _iter_files_streaming(root):
         rel = str(p.relative_to(root)).replace("\\", "/")
-        structure.append(rel)
-        total += 1
+        st = snap.stat(rel)
+        prev = prev_files.get(rel)
+        if prev is not None and st is not None and (prev.get("size"), prev.get("mtime_ns")) == st:
+            files_deps[rel] = prev
+            continue
         deps_data = _get_file_deps(p, root)
+        if st is not None:
+            deps_data["size"], deps_data["mtime_ns"] = st
         files_deps[rel] = deps_data
+        (modified if prev is not None else added).append(rel)
+    removed = [rel for rel in prev_files if rel not in files_deps]
+    changes = {"added": len(added), "modified": len(modified), "removed": len(removed),
+               "reused": len(files_deps) - len(added) - len(modified)}
+
+    stats = {
+        "total_files": len(files_deps),
+        "total_with_deps": sum(1 for f in files_deps.values() if f.get("imports")),
+    }
+    if anterior is not None and prev_files and not (added or modified or removed):
+        return {"ok": True, "path": str(map_path), "stats": stats, "changes": changes, "unchanged": True}
 
     out = {
-        "version": "1.0",
+        "version": MAP_VERSION,
         "generated_at": datetime.utcnow().isoformat() + "Z",
         "root": str(root),
-        "structure": sorted(structure),
+        "structure": sorted(files_deps),
         "files": files_deps,
-        "stats": {
-            "total_files": total,
-            "total_with_deps": sum(1 for f in files_deps.values() if f.get("imports")),
-        },
+        "stats": stats,
     }
 
-    map_path = root / ".yui_map.json"
+    tmp = map_path.with_name(f"{map_path.name}.{os.getpid()}.tmp")
     try:
-        with open(map_path, "w", encoding="utf-8") as f:
-            json.dump(out, f, ensure_ascii=False, indent=2)
+        # Formato compacto (sem indentação): o mapa é lido por máquina; troca atômica
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, map_path)
+        st = map_path.stat()
+        _last_maps[str(map_path)] = ((st.st_size, st.st_mtime_ns), out)
     except Exception as e:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
         return {"ok": False, "error": str(e), "data": out}
 
-    return {"ok": True, "path": str(map_path), "stats": out["stats"]}
+    return {"ok": True, "path": str(map_path), "stats": stats, "changes": changes}
 
 
 def get_yui_map(root: Optional[Path] = None) -> Optional[Dict]:
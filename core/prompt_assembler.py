@@ -0,0 +1,167 @@
+# ==========================================================
+# YUI PROMPT ASSEMBLER
+# Monta o prompt do mais estável para o mais volátil.
+#
+# Antes: agent_controller e core/engine inseriam system
+# messages com msgs.insert(0, ...) na ordem em que cada dado
+# ficava pronto — data/hora, energia, estado e plano do turno
+# acabavam ANTES das instruções fixas, e o prefixo do prompt
+# mudava a cada chamada (o cache de prefixo do provedor nunca
+# acertava).
+# Agora, em camadas:
+#   STATIC   instruções fixas (tools, skills, persona)
+#   SESSION  muda raramente (perfil, missão, decisões, lições)
+#   histórico do chat (só cresce no fim)
+#   TURN     recuperado/calculado neste turno (RAG, plano, hora,
+#            energia, estado)
+#   mensagem do usuário
+# Turnos seguidos do mesmo chat compartilham um prefixo
+# byte-idêntico. prefix_stats(): hash do prefixo estático e
+# taxa de reaproveitamento (inclui cached_tokens do provedor).
+# ==========================================================
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+STATIC, SESSION, TURN = 0, 1, 2
+_TIER_NAMES = {STATIC: "static", SESSION: "session", TURN: "turn"}
+MAX_STREAMS = 1024   # chats lembrados para medir reaproveitamento
+
+
+@dataclass
+class Segment:
+    content: str
+    tier: int
+    source: str = ""
+    role: str = "system"
+
+
+class PromptAssembler:
+    """Coleta segmentos em qualquer ordem e monta a lista de mensagens em ordem estável."""
+
+    def __init__(self):
+        self._segments: List[Segment] = []
+
+    def add(self, content: Optional[str], tier: int, source: str = "", role: str = "system") -> None:
+        """Adiciona um segmento (vazio é ignorado). Dentro da camada vale a ordem de chegada."""
+        if content is None or not str(content).strip():
+            return
+        if tier not in _TIER_NAMES:
+            raise ValueError(f"Camada inválida: {tier}")
+        self._segments.append(Segment(str(content), tier, source, role))
+
+    def static(self, content: Optional[str], source: str = "") -> None:
+        self.add(content, STATIC, source)
+
+    def session(self, content: Optional[str], source: str = "") -> None:
+        self.add(content, SESSION, source)
+
+    def turn(self, content: Optional[str], source: str = "") -> None:
+        self.add(content, TURN, source)
+
+    def segments(self, tier: Optional[int] = None) -> List[Segment]:
+        return [s for s in self._segments if tier is None or s.tier == tier]
+
+    def static_prefix_hash(self) -> str:
+        """Hash das camadas STATIC + SESSION (o que deveria repetir entre turnos)."""
+        h = hashlib.sha256()
+        for seg in self._segments:
+            if seg.tier in (STATIC, SESSION):
+                h.update(seg.role.encode())
+                h.update(b"\0")
+                h.update(seg.content.encode("utf-8", "surrogatepass"))
+                h.update(b"\0")
+        return h.hexdigest()[:16]
+
+    def build(self, history: Sequence[Dict[str, Any]] = (), user_message: Optional[str] = None) -> List[Dict[str, str]]:
+        """STATIC → SESSION → histórico → TURN → usuário."""
+        def _msgs(tier: int) -> List[Dict[str, str]]:
+            return [{"role": s.role, "content": s.content} for s in self._segments if s.tier == tier]
+
+        msgs = _msgs(STATIC) + _msgs(SESSION)
+        msgs += [{"role": m.get("role") or "user", "content": m.get("content") or ""} for m in history or ()]
+        msgs += _msgs(TURN)
+        if user_message is not None:
+            msgs.append({"role": "user", "content": user_message})
+        return msgs
+
+
+# ---------- medição de reaproveitamento ----------
+
+def _msg_hash(m: Dict[str, Any]) -> str:
+    raw = json.dumps([m.get("role"), m.get("content")], ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+_lock = threading.Lock()
+_streams: "OrderedDict[str, tuple]" = OrderedDict()   # chave → (hash estático, [(hash msg, bytes)])
+_stats = {
+    "turns": 0,
+    "static_prefix_reused": 0,
+    "prefix_bytes_total": 0,
+    "prefix_bytes_shared": 0,
+    "provider_prompt_tokens": 0,
+    "provider_cached_tokens": 0,
+}
+
+
+def note_prompt(stream_key: str, assembler: PromptAssembler, messages: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Registra o prompt de um turno. Compara com o turno anterior do mesmo stream
+    (ex.: chat_id): mesmo hash estático? quantos bytes iniciais são idênticos?
+    """
+    static_hash = assembler.static_prefix_hash()
+    atual = [(_msg_hash(m), len(str(m.get("content") or "").encode("utf-8", "surrogatepass"))) for m in messages]
+    total = sum(b for _, b in atual)
+    with _lock:
+        anterior = _streams.pop(stream_key, None)
+        _streams[stream_key] = (static_hash, atual)
+        while len(_streams) > MAX_STREAMS:
+            _streams.popitem(last=False)
+        shared = 0
+        if anterior is not None:
+            for (h1, b), (h2, _) in zip(atual, anterior[1]):
+                if h1 != h2:
+                    break
+                shared += b
+        reused = anterior is not None and anterior[0] == static_hash
+        _stats["turns"] += 1
+        _stats["static_prefix_reused"] += int(reused)
+        _stats["prefix_bytes_total"] += total
+        _stats["prefix_bytes_shared"] += shared
+    return {"static_hash": static_hash, "static_reused": reused, "shared_bytes": shared, "total_bytes": total}
+
+
+def note_provider_usage(usage: Any) -> None:
+    """Guarda prompt_tokens e cached_tokens (prompt_tokens_details) da resposta do provedor."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    with _lock:
+        _stats["provider_prompt_tokens"] += int(prompt)
+        _stats["provider_cached_tokens"] += int(cached)
+
+
+def prefix_stats() -> Dict[str, Any]:
+    """Taxas de reaproveitamento do prefixo (local e, se houver, a do provedor)."""
+    with _lock:
+        s = dict(_stats)
+    turns = s["turns"] or 1
+    s["static_prefix_reuse_rate"] = round(s["static_prefix_reused"] / turns, 3)
+    s["shared_prefix_ratio"] = round(s["prefix_bytes_shared"] / (s["prefix_bytes_total"] or 1), 3)
+    s["provider_cache_hit_ratio"] = round(s["provider_cached_tokens"] / (s["provider_prompt_tokens"] or 1), 3)
+    return s
+
+
+def reset_stats() -> None:
+    """Zera medições (testes)."""
+    with _lock:
+        _streams.clear()
+        for k in _stats:
+            _stats[k] = 0
@@ -0,0 +1,255 @@
+# ==========================================================
+# YUI SEARCH CACHE
+# Cache persistente de buscas web + single-flight.
+#
+# Antes: services/ai_service guardava 50 respostas por 5 min em
+# RAM e core/tools_runtime.buscar_web chamava o DDGS direto —
+# buscas iguais simultâneas iam todas à rede e o restart zerava.
+# Agora:
+# - Chave normalizada (minúsculas, sem acento/pontuação, espaços)
+# - SQLite em data/search_cache.db (sobrevive a restart) + LRU em RAM
+# - TTL por tipo de resultado: "recente" (notícias, cotações, clima)
+#   expira rápido; "geral" dura mais; "vazio" é cache negativo curto
+# - Single-flight: buscas iguais em paralelo esperam a mesma ida à rede
+# Erros do backend não são cacheados.
+# ==========================================================
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from config import settings
+    SEARCH_CACHE_DB = Path(settings.DATA_DIR) / "search_cache.db"
+except Exception:
+    SEARCH_CACHE_DB = Path(__file__).resolve().parents[1] / "data" / "search_cache.db"
+
+TTL_BY_KIND = {
+    "recente": float(os.environ.get("YUI_SEARCH_TTL_RECENTE", "600")),     # 10 min
+    "geral": float(os.environ.get("YUI_SEARCH_TTL_GERAL", "86400")),       # 24 h
+    "vazio": float(os.environ.get("YUI_SEARCH_TTL_VAZIO", "120")),         # 2 min
+}
+MEMORY_MAX = 256          # entradas quentes em RAM
+DB_MAX_ENTRIES = 5000     # teto de linhas no SQLite (limpeza por expiração e idade)
+
+# Consultas cujo resultado muda rápido
+_RECENT_HINTS = re.compile(
+    r"\b(hoje|agora|ontem|amanha|atual|atualmente|ultim[ao]s?|noticias?|news|cotacao|"
+    r"preco|dolar|euro|bitcoin|clima|tempo em|previsao|placar|jogo|resultado|eleicao|"
+    r"today|now|latest|price|weather|score)\b"
+)
+
+SearchFn = Callable[[str, int], List[Dict[str, Any]]]
+
+
+def normalize_query(query: str) -> str:
+    """Minúsculas, sem acentos/pontuação, espaços colapsados."""
+    q = unicodedata.normalize("NFKD", str(query or "").lower())
+    q = "".join(c for c in q if not unicodedata.combining(c))
+    q = re.sub(r"[^\w\s]", " ", q)
+    return re.sub(r"\s+", " ", q).strip()
+
+
+def classify(query_norm: str, results: List[Dict[str, Any]]) -> str:
+    """Tipo do resultado (define o TTL)."""
+    if not results:
+        return "vazio"
+    return "recente" if _RECENT_HINTS.search(query_norm) else "geral"
+
+
+def ddgs_search(query: str, limite: int) -> List[Dict[str, Any]]:
+    """Backend padrão: DuckDuckGo (duckduckgo-search). Levanta ImportError se ausente."""
+    from duckduckgo_search import DDGS
+
+    with DDGS() as ddgs:
+        return list(ddgs.text(query, max_results=limite) or [])
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """
+    cache.search(query, limite) -> (resultados, origem), origem em "memory" | "disk" | "network".
+    backend(query, limite) devolve a lista crua de resultados (padrão: ddgs_search).
+    """
+
+    def __init__(self, path: Optional[Path] = None, backend: Optional[SearchFn] = None,
+                 ttl_by_kind: Optional[Dict[str, float]] = None):
+        self.path = Path(path) if path else SEARCH_CACHE_DB
+        self.backend = backend or ddgs_search
+        self.ttl_by_kind = dict(TTL_BY_KIND, **(ttl_by_kind or {}))
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = {"memory": 0, "disk": 0, "network": 0, "coalesced": 0}
+
+    # ---------- persistência ----------
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT, results TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_exp ON search_cache(expires_at)")
+            conn.commit()
+        except sqlite3.Error:
+            return None  # disco indisponível: segue só com RAM
+        self._conn = conn
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        with self._db_lock:
+            conn = self._db()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT results, expires_at FROM search_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        if not row:
+            return None
+        try:
+            return row[1], json.loads(row[0])
+        except ValueError:
+            return None
+
+    def _disk_set(self, key: str, kind: str, results: List[Dict[str, Any]], now: float, expires: float) -> None:
+        with self._db_lock:
+            conn = self._db()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, kind, results, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, kind, json.dumps(results, ensure_ascii=False), now, expires),
+                )
+                conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (DB_MAX_ENTRIES,),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: str, expires: float, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._memory[key] = (expires, results)
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_MAX:
+                self._memory.popitem(last=False)
+
+    # ---------- API ----------
+
+    def key(self, query: str, limite: int) -> str:
+        return f"{int(limite)}:{normalize_query(query)}"
+
+    def lookup(self, query: str, limite: int) -> Optional[tuple]:
+        """(resultados, origem) se houver entrada válida; senão None. Não vai à rede."""
+        k = self.key(query, limite)
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(k)
+            if hit and hit[0] > now:
+                self._memory.move_to_end(k)
+                self.stats["memory"] += 1
+                return hit[1], "memory"
+        disk = self._disk_get(k, now)
+        if disk:
+            self._remember(k, disk[0], disk[1])
+            with self._lock:
+                self.stats["disk"] += 1
+            return disk[1], "disk"
+        return None
+
+    def search(self, query: str, limite: int = 5) -> tuple:
+        """
+        Resultados da busca com cache. Exceções do backend são propagadas
+        (a todas as chamadas que esperavam o mesmo voo) e não ficam em cache.
+        """
+        cached = self.lookup(query, limite)
+        if cached:
+            return cached
+        k = self.key(query, limite)
+        with self._lock:
+            flight = self._flights.get(k)
+            leader = flight is None
+            if leader:
+                flight = self._flights[k] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, "coalesced"
+        try:
+            results = list(self.backend(str(query).strip(), int(limite)) or [])
+            now = time.time()
+            kind = classify(normalize_query(query), results)
+            expires = now + self.ttl_by_kind.get(kind, self.ttl_by_kind["geral"])
+            self._remember(k, expires, results)
+            self._disk_set(k, kind, results, now, expires)
+            with self._lock:
+                self.stats["network"] += 1
+            flight.value = results
+            return results, "network"
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(k, None)
+            flight.event.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            conn = self._db()
+            if conn is not None:
+                try:
+                    conn.execute("DELETE FROM search_cache")
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+
+
+_instance: Optional[SearchCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Singleton do cache de buscas."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = SearchCache()
+    return _instance
@@ -8,14 +8,257 @@
 # request → Session Manager → IA recebe contexto já pronto
 # Menos processamento, menos RAM, respostas mais rápidas.
 #
-# Por ora: sessão em RAM (dict). Depois: Redis Session Store.
+# Armazenamento: core/shared_state (RAM com 1 worker; SQLite
+# compartilhado com N workers — a próxima mensagem pode cair
+# em outro worker e ainda ver a sessão).
+#
+# Teto de memória (SessionStore): sessões saem por LRU quando
+# passam de YUI_SESSION_MAX sessões ou YUI_SESSION_MAX_BYTES, e
+# por ociosidade (YUI_SESSION_IDLE_TTL). Com YUI_SESSION_SPILL=1
+# a sessão despejada vai para data/session_spill.db e volta no
+# próximo acesso. Gauges: get_session_metrics().
 # ==========================================================
 
-from collections import defaultdict
-from threading import Lock
-from typing import Any, Dict, Optional
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Any, Callable, Dict, Optional
+
+from core.shared_state import SharedDict, shared_dict
+
+try:
+    from config import settings
+    SESSION_SPILL_DB = Path(settings.DATA_DIR) / "session_spill.db"
+except Exception:
+    SESSION_SPILL_DB = Path(__file__).resolve().parents[1] / "data" / "session_spill.db"
+
+MAX_SESSIONS = int(os.environ.get("YUI_SESSION_MAX", "5000"))
+MAX_SESSION_BYTES = int(os.environ.get("YUI_SESSION_MAX_BYTES", str(16 * 1024 * 1024)))
+IDLE_TTL = float(os.environ.get("YUI_SESSION_IDLE_TTL", str(6 * 3600)))
+SPILL_ENABLED = os.environ.get("YUI_SESSION_SPILL", "0").strip().lower() in ("1", "true", "yes")
+SPILL_TTL = 7 * 24 * 3600       # sessões em disco sem acesso há 7 dias são apagadas
+SWEEP_INTERVAL = 30.0           # varredura de ociosidade (no máximo a cada 30s, no fluxo dos acessos)
+
+
+class _SpillStore:
+    """Sessões despejadas (SQLite). Lidas de volta uma vez e removidas."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_spill (key TEXT PRIMARY KEY, value TEXT NOT NULL, spilled_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO session_spill (key, value, spilled_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            conn.commit()
+
+    def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._db()
+            row = conn.execute("SELECT value FROM session_spill WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM session_spill WHERE key = ?", (key,))
+            conn.commit()
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def delete(self, key: Optional[str] = None, prefix: Optional[str] = None) -> None:
+        with self._lock:
+            conn = self._db()
+            if key is not None:
+                conn.execute("DELETE FROM session_spill WHERE key = ?", (key,))
+            if prefix == "":
+                conn.execute("DELETE FROM session_spill")
+            elif prefix:
+                esc = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                conn.execute("DELETE FROM session_spill WHERE key LIKE ? ESCAPE '\\'", (esc + "%",))
+            conn.commit()
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            conn = self._db()
+            n = conn.execute("DELETE FROM session_spill WHERE spilled_at < ?", (older_than,)).rowcount
+            conn.commit()
+            return n
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM session_spill").fetchone()[0]
+
+
+class SessionStore:
+    """
+    Sessões com teto de memória sobre um SharedDict.
+    Índice LRU local: chave → (bytes, último acesso). Despejo por contagem, bytes
+    (JSON) e ociosidade; com spill, a sessão despejada vai para disco e volta no get.
+    Com vários workers cada um despeja pelo que ele mesmo acessou (o spill evita perda).
+    """
+
+    def __init__(self, hot: SharedDict, max_sessions: int = MAX_SESSIONS, max_bytes: int = MAX_SESSION_BYTES,
+                 idle_ttl: float = IDLE_TTL, spill_path: Optional[Path] = None):
+        self.hot = hot
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill = _SpillStore(spill_path) if spill_path else None
+        self._lock = RLock()
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self._counters = {"evicted_lru": 0, "evicted_idle": 0, "spilled": 0, "restored": 0}
+
+    # ---------- índice ----------
+
+    def _touch(self, key: str, value: Dict[str, Any]) -> None:
+        size = len(json.dumps(value, ensure_ascii=False))
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old:
+                self._bytes -= old[0]
+            self._index[key] = (size, time.time())
+            self._bytes += size
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old:
+                self._bytes -= old[0]
+
+    def _evict(self, key: str, reason: str) -> None:
+        value = self.hot.pop(key, None)
+        self._forget(key)
+        with self._lock:
+            self._counters[reason] += 1
+        if value is not None and self.spill is not None:
+            try:
+                self.spill.put(key, value)
+                with self._lock:
+                    self._counters["spilled"] += 1
+            except sqlite3.Error:
+                pass
+
+    def _enforce(self) -> None:
+        while True:
+            with self._lock:
+                if not self._index or (len(self._index) <= self.max_sessions and self._bytes <= self.max_bytes):
+                    break
+                key = next(iter(self._index))
+            self._evict(key, "evicted_lru")
+        if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL:
+            self.sweep()
+
+    # ---------- API ----------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.hot.get(key)
+        if value is None and self.spill is not None:
+            try:
+                value = self.spill.pop(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                self.hot[key] = value
+                with self._lock:
+                    self._counters["restored"] += 1
+        if value is not None:
+            self._touch(key, value)
+            self._enforce()
+        return value
 
-_sessoes: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    def update(self, key: str, fn: Callable[[Dict[str, Any]], Dict[str, Any]], default: Dict[str, Any]) -> Dict[str, Any]:
+        if key not in self._index and self.spill is not None:
+            self.get(key)  # sessão despejada volta antes do merge
+        novo = self.hot.update_key(key, fn, default=default)
+        self._touch(key, novo)
+        self._enforce()
+        return novo
+
+    def pop(self, key: str) -> None:
+        self.hot.pop(key, None)
+        self._forget(key)
+        if self.spill is not None:
+            self.spill.delete(key=key)
+
+    def clear(self, prefix: str = "") -> None:
+        self.hot.clear(prefix=prefix)
+        with self._lock:
+            for key in [k for k in self._index if k.startswith(prefix)]:
+                self._forget(key)
+        if self.spill is not None:
+            self.spill.delete(prefix=prefix)
+
+    def sweep(self) -> int:
+        """Despeja sessões sem acesso há mais de idle_ttl (do mais antigo ao mais novo)."""
+        self._last_sweep = time.monotonic()
+        limite = time.time() - self.idle_ttl
+        ociosas = []
+        with self._lock:
+            for key, (_, last) in self._index.items():
+                if last >= limite:
+                    break
+                ociosas.append(key)
+        for key in ociosas:
+            self._evict(key, "evicted_idle")
+        if self.spill is not None:
+            try:
+                self.spill.purge(time.time() - SPILL_TTL)
+            except sqlite3.Error:
+                pass
+        return len(ociosas)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            out.update({
+                "live_sessions": len(self._index),
+                "live_bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+            })
+        if self.spill is not None:
+            try:
+                out["spilled_sessions"] = self.spill.count()
+            except sqlite3.Error:
+                out["spilled_sessions"] = None
+        out["shared_backend"] = self.hot.backend.name
+        return out
+
+
+def _hot_ttl(idle_ttl: float, spill: bool) -> float:
+    """
+    TTL do backend compartilhado. Com spill ele precisa durar mais que idle_ttl:
+    se o valor expirasse junto, o sweep despejaria None e nada iria para o disco.
+    Continua havendo TTL para limpar sessões que nenhum worker indexa mais.
+    """
+    return 2 * idle_ttl if spill else idle_ttl
+
+
+_sessoes = shared_dict("sessions", ttl=_hot_ttl(IDLE_TTL, SPILL_ENABLED))
+_store = SessionStore(_sessoes, spill_path=SESSION_SPILL_DB if SPILL_ENABLED else None)
 _lock = Lock()
 
 # Limite para evitar sessões gigantes
@@ -26,15 +269,14 @@ MAX_HISTORICO_RECENTE = 5
 def get_session(user_id: str, chat_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Retorna sessão do usuário. Se chat_id, retorna sub-sessão do chat.
-    Sessão vazia = dict mutável; updates funcionam.
+    Retorna uma cópia: para alterar use update_session (atômico entre workers).
     """
-    key = str(user_id or "")
-    if chat_id:
-        key = f"{user_id}:{chat_id}"
-    with _lock:
-        if key not in _sessoes:
-            _sessoes[key] = _new_session()
-        return _sessoes[key]
+    session = _store.get(_key(user_id, chat_id))
+    return session if session is not None else _new_session()
+
+
+def _key(user_id: str, chat_id: Optional[str] = None) -> str:
+    return f"{user_id}:{chat_id}" if chat_id else str(user_id or "")
 
 
 def _new_session() -> Dict[str, Any]:
@@ -55,8 +297,7 @@ def update_session(
     chat_id: Optional[str] = None,
 ) -> None:
     """Atualiza sessão. data é mergeado no dict existente."""
-    session = get_session(user_id, chat_id)
-    with _lock:
+    def _merge(session: Dict[str, Any]) -> Dict[str, Any]:
         for k, v in data.items():
             if k == "historico_recente" and isinstance(v, list):
                 session[k] = v[-MAX_HISTORICO_RECENTE:]
@@ -64,8 +305,11 @@ def update_session(
                 session[k] = v[-MAX_CONTEXTO_LEN:]
             else:
                 session[k] = v
-        import time
         session["updated_at"] = time.time()
+        return session
+
+    with _lock:
+        _store.update(_key(user_id, chat_id), _merge, default=_new_session())
 
 
 def get_contexto(user_id: str, chat_id: Optional[str] = None) -> str:
@@ -109,29 +353,43 @@ def append_turn(
     assistant_msg: str,
     chat_id: Optional[str] = None,
 ) -> None:
-    """Adiciona uma troca ao histórico recente da sessão."""
-    session = get_session(user_id, chat_id)
-    recent = list(session.get("historico_recente") or [])
-    recent.append({"user": (user_msg or "")[:300], "assistant": (assistant_msg or "")[:500]})
-    update_session(user_id, {"historico_recente": recent}, chat_id)
+    """Adiciona uma troca ao histórico recente da sessão (read-modify-write atômico)."""
+    turno = {"user": (user_msg or "")[:300], "assistant": (assistant_msg or "")[:500]}
+
+    def _append(session: Dict[str, Any]) -> Dict[str, Any]:
+        recent = list(session.get("historico_recente") or []) + [turno]
+        session["historico_recente"] = recent[-MAX_HISTORICO_RECENTE:]
+        session["updated_at"] = time.time()
+        return session
+
+    with _lock:
+        _store.update(_key(user_id, chat_id), _append, default=_new_session())
 
 
 def clear_session(user_id: str, chat_id: Optional[str] = None) -> None:
     """Limpa sessão (ex: quando usuário limpa chat)."""
     with _lock:
         if chat_id:
-            key = f"{user_id}:{chat_id}"
-            if key in _sessoes:
-                del _sessoes[key]
+            _store.pop(_key(user_id, chat_id))
         else:
             # Remove todas as sessões do usuário
             prefix = str(user_id)
-            to_remove = [k for k in _sessoes if k == prefix or k.startswith(prefix + ":")]
-            for k in to_remove:
-                del _sessoes[k]
+            _store.pop(prefix)
+            _store.clear(prefix=prefix + ":")
 
 
 def session_count() -> int:
     """Quantidade de sessões ativas (útil para debug)."""
     with _lock:
         return len(_sessoes)
+
+
+def get_session_metrics() -> Dict[str, Any]:
+    """Gauges das sessões (vivas, bytes, despejos, spill) para /api/system/runtime_metrics."""
+    return _store.metrics()
+
+
+def sweep_sessions() -> int:
+    """Despeja sessões ociosas agora (também roda sozinho a cada SWEEP_INTERVAL)."""
+    with _lock:
+        return _store.sweep()
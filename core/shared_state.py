@@ -0,0 +1,335 @@
+# ==========================================================
+# YUI SHARED STATE
+# Estado compartilhado entre workers (gunicorn --workers N).
+#
+# Antes: job_queue._results, sessões, observability, energia
+# viviam na RAM do processo — com 2+ workers o poll de um job
+# caía em outro worker e não achava nada. Por isso o deploy
+# ficava preso em --workers 1.
+# Agora: uma API única (namespace → chave → valor JSON) com
+# backends plugáveis:
+# - memory: dict em RAM (1 worker; padrão)
+# - sqlite: arquivo local em WAL (N workers no mesmo host)
+#
+# Escolha: YUI_SHARED_STATE=memory|sqlite|auto (auto = sqlite
+# quando WEB_CONCURRENCY > 1). Arquivo: YUI_SHARED_STATE_PATH.
+# ==========================================================
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional
+
+try:
+    from config import settings
+    SHARED_STATE_DB = Path(settings.DATA_DIR) / "shared_state.db"
+except Exception:
+    SHARED_STATE_DB = Path(__file__).resolve().parents[1] / "data" / "shared_state.db"
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Backend de processo único. Valores copiados na entrada/saída (mesma semântica do SQLite)."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._kv: Dict[str, Dict[str, tuple]] = {}
+        self._lists: Dict[str, deque] = {}
+
+    def _live(self, ns: str, key: str) -> Any:
+        item = self._kv.get(ns, {}).get(key)
+        if item is None:
+            return _MISSING
+        value, expires = item
+        if expires is not None and expires <= time.time():
+            del self._kv[ns][key]
+            return _MISSING
+        return value
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._live(ns, key)
+            return default if value is _MISSING else copy.deepcopy(value)
+
+    def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._kv.setdefault(ns, {})[key] = (copy.deepcopy(value), time.time() + ttl if ttl else None)
+
+    def delete(self, ns: str, key: str) -> bool:
+        with self._lock:
+            return self._kv.get(ns, {}).pop(key, None) is not None
+
+    def update(self, ns: str, key: str, fn: Callable[[Any], Any], default: Any = None,
+               ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            value = self._live(ns, key)
+            novo = fn(copy.deepcopy(default) if value is _MISSING else copy.deepcopy(value))
+            self.set(ns, key, novo, ttl)
+            return copy.deepcopy(novo)
+
+    def items(self, ns: str) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for key in list(self._kv.get(ns, {})):
+                value = self._live(ns, key)
+                if value is not _MISSING:
+                    out[key] = copy.deepcopy(value)
+            return out
+
+    def clear(self, ns: str, prefix: str = "") -> int:
+        with self._lock:
+            bucket = self._kv.get(ns, {})
+            keys = [k for k in bucket if k.startswith(prefix)]
+            for k in keys:
+                del bucket[k]
+            return len(keys)
+
+    def push(self, ns: str, value: Any, maxlen: int) -> None:
+        with self._lock:
+            lst = self._lists.get(ns)
+            if lst is None or lst.maxlen != maxlen:
+                lst = self._lists[ns] = deque(lst or (), maxlen=maxlen)
+            lst.append(copy.deepcopy(value))
+
+    def recent(self, ns: str, limit: int) -> List[Any]:
+        """Itens mais recentes primeiro."""
+        with self._lock:
+            return [copy.deepcopy(v) for v in list(self._lists.get(ns, ()))[::-1][:limit]]
+
+
+class SQLiteBackend:
+    """
+    Backend multi-processo (mesmo host). Uma conexão por processo (reaberta após fork),
+    WAL + busy_timeout; read-modify-write com BEGIN IMMEDIATE.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else SHARED_STATE_DB
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS lists (id INTEGER PRIMARY KEY AUTOINCREMENT, ns TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lists_ns ON lists(ns, id)")
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _dump(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    def _get_locked(self, conn: sqlite3.Connection, ns: str, key: str) -> Any:
+        row = conn.execute(
+            "SELECT value FROM kv WHERE ns = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (ns, key, time.time()),
+        ).fetchone()
+        return _MISSING if row is None else json.loads(row[0])
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get_locked(self._db(), ns, key)
+        return default if value is _MISSING else value
+
+    def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (ns, key, self._dump(value), time.time() + ttl if ttl else None),
+            )
+
+    def delete(self, ns: str, key: str) -> bool:
+        with self._lock:
+            return self._db().execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, key)).rowcount > 0
+
+    def update(self, ns: str, key: str, fn: Callable[[Any], Any], default: Any = None,
+               ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = self._get_locked(conn, ns, key)
+                novo = fn(copy.deepcopy(default) if value is _MISSING else value)
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (ns, key, self._dump(novo), time.time() + ttl if ttl else None),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return novo
+
+    def items(self, ns: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key, value FROM kv WHERE ns = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (ns, time.time()),
+            ).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def clear(self, ns: str, prefix: str = "") -> int:
+        with self._lock:
+            conn = self._db()
+            if prefix:
+                esc = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                cur = conn.execute("DELETE FROM kv WHERE ns = ? AND key LIKE ? ESCAPE '\\'", (ns, esc + "%"))
+            else:
+                cur = conn.execute("DELETE FROM kv WHERE ns = ?", (ns,))
+            return cur.rowcount
+
+    def push(self, ns: str, value: Any, maxlen: int) -> None:
+        with self._lock:
+            conn = self._db()
+            cur = conn.execute("INSERT INTO lists (ns, value) VALUES (?, ?)", (ns, self._dump(value)))
+            # Poda barata: só a cada ~maxlen inserções por id
+            if cur.lastrowid % max(1, maxlen) == 0:
+                conn.execute(
+                    "DELETE FROM lists WHERE ns = ? AND id <= (SELECT id FROM lists WHERE ns = ? "
+                    "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (ns, ns, maxlen),
+                )
+
+    def recent(self, ns: str, limit: int) -> List[Any]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT value FROM lists WHERE ns = ? ORDER BY id DESC LIMIT ?", (ns, int(limit))
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db().execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+
+
+class SharedDict(MutableMapping):
+    """
+    Visão dict de um namespace (drop-in para os dicts de módulo antigos).
+    Leitura/escrita vão ao backend; use incr/update para read-modify-write atômico.
+    """
+
+    def __init__(self, ns: str, ttl: Optional[float] = None, backend: Any = None):
+        self.ns = ns
+        self.ttl = ttl
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.backend.get(self.ns, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.backend.set(self.ns, key, value, self.ttl)
+
+    def __delitem__(self, key: str) -> None:
+        if not self.backend.delete(self.ns, key):
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.backend.items(self.ns)))
+
+    def __len__(self) -> int:
+        return len(self.backend.items(self.ns))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.backend.get(self.ns, key, default)
+
+    def items(self):
+        return self.backend.items(self.ns).items()
+
+    def values(self):
+        return self.backend.items(self.ns).values()
+
+    def clear(self, prefix: str = "") -> int:
+        return self.backend.clear(self.ns, prefix)
+
+    def update_key(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        return self.backend.update(self.ns, key, fn, default, self.ttl)
+
+    def incr(self, key: str, amount: float = 1, lo: Optional[float] = None, hi: Optional[float] = None,
+             default: float = 0) -> float:
+        def _add(v):
+            v = (v if isinstance(v, (int, float)) else default) + amount
+            if lo is not None:
+                v = max(lo, v)
+            if hi is not None:
+                v = min(hi, v)
+            return v
+        return self.backend.update(self.ns, key, _add, default)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _choose_backend():
+    mode = (os.environ.get("YUI_SHARED_STATE") or "auto").strip().lower()
+    if mode == "auto":
+        try:
+            workers = int(os.environ.get("WEB_CONCURRENCY") or "1")
+        except ValueError:
+            workers = 1
+        mode = "sqlite" if workers > 1 else "memory"
+    if mode == "sqlite":
+        path = os.environ.get("YUI_SHARED_STATE_PATH")
+        return SQLiteBackend(Path(path) if path else None)
+    return MemoryBackend()
+
+
+def get_backend():
+    """Backend global do processo (escolhido por env na primeira chamada)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _choose_backend()
+    return _backend
+
+
+def set_backend(backend) -> None:
+    """Troca o backend (testes, ou configuração explícita no startup)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def is_shared() -> bool:
+    """True se o estado é visível para outros processos."""
+    return bool(getattr(get_backend(), "shared", False))
+
+
+def shared_dict(ns: str, ttl: Optional[float] = None) -> SharedDict:
+    return SharedDict(ns, ttl=ttl)
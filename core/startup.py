@@ -0,0 +1,205 @@
+# ==========================================================
+# YUI STARTUP — inicialização preguiçosa + relatório
+#
+# Antes: web_server.py fazia tudo no import (apply_mode, wiring,
+# plugins, TaskEngine com todos os cap_*.py, cliente Supabase):
+# cold start e restart de worker do gunicorn pagavam tudo.
+# Agora: subsistemas registram uma factory e são construídos:
+# - no primeiro uso (get(nome)), ou
+# - em background depois que o servidor já atende (warm_up)
+# Getters antigos (get_task_engine, get_supabase_client) passam a
+# construção por track(nome, fn): quem os chama direto também
+# aparece no relatório como first_use.
+# Subsistemas "eager" (baratos e necessários antes de tudo,
+# ex.: listeners do Event Bus) rodam no registro.
+#
+# report(): tempo de import por fase e de init por subsistema
+# (GET /api/system/startup_report).
+# ==========================================================
+
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+WARM_DELAY = float(os.environ.get("YUI_WARM_DELAY", "0.5"))  # s após o primeiro request
+
+_T0 = time.perf_counter()
+_lock = threading.Lock()
+_phases: List[Dict[str, Any]] = []
+_subsystems: Dict[str, "_Subsystem"] = {}
+_warm_thread: Optional[threading.Thread] = None
+
+
+def _top_packages(names) -> List[str]:
+    return sorted({n.split(".", 1)[0] for n in names})
+
+
+class _Subsystem:
+    def __init__(self, name: str, factory: Callable[[], Any], warm: bool):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.status = "pending"   # pending | building | ready | failed
+        self.value: Any = None
+        self.error = ""
+        self.init_ms = 0.0
+        self.modules = 0
+        self.trigger = ""
+        self.lock = threading.Lock()
+
+    def build(self, trigger: str) -> Any:
+        if self.status == "ready":
+            return self.value
+        with self.lock:
+            return self._build_locked(trigger, self.factory, reraise=False)
+
+    def _build_locked(self, trigger: str, factory: Callable[[], Any], reraise: bool) -> Any:
+        if self.status in ("ready", "failed"):
+            return self.value
+        self.status = "building"
+        self.trigger = trigger
+        before = set(sys.modules)
+        t = time.perf_counter()
+        try:
+            self.value = factory()
+            self.status = "ready"
+        except Exception as e:  # noqa: BLE001
+            self.error = str(e) or e.__class__.__name__
+            self.status = "failed"
+            logging.warning("Subsistema %s: %s", self.name, self.error)
+            if reraise:
+                raise
+        finally:
+            self.init_ms = (time.perf_counter() - t) * 1000
+            self.modules = len(set(sys.modules) - before)
+        return self.value
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "trigger": self.trigger,
+            "init_ms": round(self.init_ms, 1),
+            "modules_loaded": self.modules,
+            "warm": self.warm,
+            "error": self.error or None,
+        }
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Mede um bloco do startup (ex.: imports do web_server) e os módulos que ele carregou."""
+    before = set(sys.modules)
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        novos = set(sys.modules) - before
+        with _lock:
+            _phases.append({
+                "phase": name,
+                "ms": round((time.perf_counter() - t) * 1000, 1),
+                "modules_loaded": len(novos),
+                "packages": _top_packages(novos)[:20],
+            })
+
+
+def register(name: str, factory: Callable[[], Any], warm: bool = True, eager: bool = False) -> None:
+    """
+    Registra um subsistema. eager=True constrói agora; warm=True entra no warm_up em background;
+    caso contrário só é construído no primeiro get(name).
+    """
+    sub = _Subsystem(name, factory, warm)
+    with _lock:
+        _subsystems[name] = sub
+    if eager:
+        sub.build("eager")
+
+
+def get(name: str) -> Any:
+    """Valor do subsistema, construindo no primeiro uso. KeyError se não registrado."""
+    with _lock:
+        sub = _subsystems[name]
+    return sub.build("first_use")
+
+
+def track(name: str, fn: Callable[[], Any]) -> Any:
+    """
+    Roda fn() (a construção de dentro de um getter singleton) registrando-a como init
+    first_use de name. Sem registro, já construído ou em construção por outra thread
+    (ex.: warm-up, que chama o mesmo getter), só roda fn(). Exceções de fn() sobem.
+    """
+    with _lock:
+        sub = _subsystems.get(name)
+    # acquire sem esperar: o warm-up segura sub.lock e pode estar esperando o lock do getter
+    if sub is None or sub.status != "pending" or not sub.lock.acquire(blocking=False):
+        return fn()
+    try:
+        if sub.status != "pending":
+            return fn()
+        return sub._build_locked("first_use", fn, reraise=True)
+    finally:
+        sub.lock.release()
+
+
+def is_ready(name: str) -> bool:
+    with _lock:
+        sub = _subsystems.get(name)
+    return bool(sub and sub.status == "ready")
+
+
+def warm_up(background: bool = True, delay: float = WARM_DELAY) -> Optional[threading.Thread]:
+    """
+    Constrói os subsistemas warm=True ainda pendentes (uma única vez por processo).
+    Em background por padrão: chamado depois que o servidor já está aceitando conexões.
+    """
+    global _warm_thread
+
+    def _run():
+        if delay > 0:
+            time.sleep(delay)
+        with _lock:
+            pendentes = [s for s in _subsystems.values() if s.warm and s.status == "pending"]
+        for sub in pendentes:
+            sub.build("warm")
+
+    with _lock:
+        if _warm_thread is not None:
+            return _warm_thread
+        if not background:
+            _warm_thread = threading.current_thread()
+        else:
+            _warm_thread = threading.Thread(target=_run, name="yui-warm-up", daemon=True)
+    if background:
+        _warm_thread.start()
+        return _warm_thread
+    _run()
+    return None
+
+
+def report() -> Dict[str, Any]:
+    """Relatório do startup: fases de import, subsistemas e tempo desde o import deste módulo."""
+    with _lock:
+        phases = [dict(p) for p in _phases]
+        subs = {name: s.info() for name, s in _subsystems.items()}
+        warming = bool(_warm_thread and _warm_thread.is_alive())
+    return {
+        "uptime_s": round(time.perf_counter() - _T0, 1),
+        "import_ms": round(sum(p["ms"] for p in phases), 1),
+        "phases": phases,
+        "subsystems": subs,
+        "warming": warming,
+        "modules_total": len(sys.modules),
+    }
+
+
+def reset() -> None:
+    """Limpa registro (testes)."""
+    global _warm_thread
+    with _lock:
+        _phases.clear()
+        _subsystems.clear()
+        _warm_thread = None
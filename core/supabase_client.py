@@ -1,13 +1,19 @@
 """
 Cliente Supabase: duas keys — anon (frontend) e service (backend).
 Nunca expor SERVICE_KEY em templates ou JS.
+
+Os clientes são criados no primeiro uso (não no import): `supabase` é um
+proxy que só chama create_client quando alguém o usa ou testa (`if supabase:`).
 """
-from typing import Literal, Optional
+import threading
+from typing import Any, Literal, Optional
 
 from config import settings
 
 _anon_client = None
 _service_client = None
+_failed = set()  # modos cuja criação falhou (não tenta de novo a cada acesso)
+_create_lock = threading.Lock()
 
 
 def get_supabase_client(mode: Literal["anon", "service"] = "anon"):
@@ -23,25 +29,50 @@ def get_supabase_client(mode: Literal["anon", "service"] = "anon"):
         key = settings.SUPABASE_SERVICE_KEY
         if not key:
             return None
-        if _service_client is None:
-            try:
-                from supabase import create_client
-                _service_client = create_client(settings.SUPABASE_URL, key)
-            except Exception:
-                _service_client = None
+        if _service_client is None and mode not in _failed:
+            with _create_lock:
+                if _service_client is None and mode not in _failed:
+                    from core import startup
+                    _service_client = startup.track("supabase", lambda: _create(key, mode))
         return _service_client
     else:
         key = settings.SUPABASE_ANON_KEY
         if not key:
             return None
-        if _anon_client is None:
-            try:
-                from supabase import create_client
-                _anon_client = create_client(settings.SUPABASE_URL, key)
-            except Exception:
-                _anon_client = None
+        if _anon_client is None and mode not in _failed:
+            with _create_lock:
+                if _anon_client is None and mode not in _failed:
+                    _anon_client = _create(key, mode)
         return _anon_client
 
 
+def _create(key: str, mode: str):
+    try:
+        from supabase import create_client
+        return create_client(settings.SUPABASE_URL, key)
+    except Exception:
+        _failed.add(mode)
+        return None
+
+
+class _LazyServiceClient:
+    """Proxy do cliente service: cria no primeiro acesso; falso se não configurado."""
+
+    def _client(self):
+        return get_supabase_client("service")
+
+    def __bool__(self) -> bool:
+        return self._client() is not None
+
+    def __getattr__(self, name: str) -> Any:
+        client = self._client()
+        if client is None:
+            raise AttributeError(f"Supabase não configurado (atributo '{name}')")
+        return getattr(client, name)
+
+    def __repr__(self) -> str:
+        return f"<supabase service client ({'pronto' if _service_client is not None else 'lazy'})>"
+
+
 # Backend usa sempre service (compatibilidade com código que importa supabase)
-supabase = get_supabase_client("service")
+supabase = _LazyServiceClient()
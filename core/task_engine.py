@@ -13,6 +13,7 @@
 
 from __future__ import annotations
 
+import threading
 import time
 import uuid
 from dataclasses import dataclass, field
@@ -275,17 +276,26 @@ def _tipo_to_label(tipo: str) -> str:
 
 # --- Singleton ---
 _engine: Optional[TaskEngine] = None
+_engine_lock = threading.RLock()
 
 
 def get_task_engine() -> TaskEngine:
-    """Retorna o TaskEngine singleton."""
+    """Retorna o TaskEngine singleton (warm-up em background e requests podem chamar juntos)."""
     global _engine
     if _engine is None:
-        _engine = TaskEngine()
-        _load_capabilities(_engine)
+        with _engine_lock:
+            if _engine is None:
+                from core import startup
+                _engine = startup.track("task_engine", _build_engine)
     return _engine
 
 
+def _build_engine() -> TaskEngine:
+    engine = TaskEngine()
+    _load_capabilities(engine)
+    return engine
+
+
 def _load_capabilities(engine: TaskEngine) -> None:
     """
     Carrega capabilities dinamicamente (core/capabilities/cap_*.py).
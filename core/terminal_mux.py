@@ -0,0 +1,457 @@
+# ==========================================================
+# YUI TERMINAL MUX
+# Multiplexador dos shells do terminal web (/ws/terminal).
+#
+# Antes: uma thread por WebSocket fazia select() a cada 0.1s,
+# lia 4096 bytes e mandava uma mensagem por leitura; outra
+# thread acordava a cada 60s para o kill switch. Fechar a aba
+# (ou uma queda de rede) matava o bash.
+# Agora:
+# - Um único loop (selectors → epoll no Linux) lê todos os PTYs
+# - Saída agrupada em frames a cada FLUSH_INTERVAL (20 ms)
+# - Backpressure: se o cliente não consome e a fila passa de
+#   HIGH_WATER, o loop para de ler aquele PTY (o bash bloqueia
+#   no write) até a fila cair abaixo de LOW_WATER
+# - Reattach: a sessão sobrevive à queda do WebSocket até o
+#   kill switch; reconectar com o token reenvia o scrollback
+#   para o mesmo bash
+# - Kill switch por prazo dentro do loop (sem thread dedicada)
+# ==========================================================
+
+import codecs
+import os
+import secrets
+import selectors
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FLUSH_INTERVAL = float(os.environ.get("YUI_TERMINAL_FLUSH_MS", "20")) / 1000.0
+HIGH_WATER = 256 * 1024          # chars na fila do cliente que pausam a leitura do PTY
+LOW_WATER = 64 * 1024            # abaixo disso a leitura volta
+SCROLLBACK_BYTES = 64 * 1024     # reenviado no reattach
+READ_CHUNK = 64 * 1024
+IDLE_KILL_SECONDS = 120          # 2 minutos sem interação
+REAP_INTERVAL = 5.0
+
+# Sequência OSC que o xterm.js ignora: leva o token da sessão ao cliente
+SESSION_OSC_PREFIX = "\x1b]7777;yui-session="
+SESSION_OSC_SUFFIX = "\x07"
+
+Spawn = Callable[[], Tuple[Any, Optional[int], bool]]
+
+
+def session_marker(session_id: str) -> str:
+    """Mensagem de controle com o token para reattach (primeira enviada ao cliente)."""
+    return f"{SESSION_OSC_PREFIX}{session_id}{SESSION_OSC_SUFFIX}"
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+class Attachment:
+    """
+    Um cliente (WebSocket) ligado a uma sessão. O loop empurra frames; o consumidor tira
+    com take() (thread) ou drain() após notify() (asyncio).
+    """
+
+    def __init__(self, session: "TerminalSession", notify: Optional[Callable[[], None]] = None):
+        self.session = session
+        self.resumed = False
+        self._notify = notify
+        self._cond = threading.Condition()
+        self._frames: deque = deque()
+        self.queued = 0
+        self.closed = False
+
+    def _push(self, frame: str) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            self._frames.append(frame)
+            self.queued += len(frame)
+            self._cond.notify()
+        if self._notify:
+            self._notify()
+
+    def _close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        if self._notify:
+            self._notify()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[List[str]]:
+        """Frames pendentes (espera até haver algo). [] = timeout; None = sessão encerrada ou substituída."""
+        with self._cond:
+            if not self._frames and not self.closed:
+                self._cond.wait(timeout)
+        return self.drain()
+
+    def drain(self) -> Optional[List[str]]:
+        """Frames pendentes sem esperar. None = sessão encerrada ou substituída."""
+        with self._cond:
+            frames = list(self._frames)
+            self._frames.clear()
+            self.queued -= sum(len(f) for f in frames)
+            closed = self.closed
+        if frames:
+            self.session.mux._drained(self.session)
+        if not frames and closed:
+            return None
+        return frames
+
+    def write(self, data: Any) -> None:
+        """Entrada do cliente para o shell."""
+        self.session.write(data)
+
+
+class TerminalSession:
+    def __init__(self, mux: "TerminalMux", proc, master: Optional[int], use_pty: bool):
+        self.mux = mux
+        self.id = secrets.token_urlsafe(16)
+        self.proc = proc
+        self.master = master
+        self.use_pty = use_pty
+        if use_pty and master is not None:
+            self.fd: Optional[int] = master
+        elif proc.stdout is not None and os.name != "nt":
+            self.fd = proc.stdout.fileno()
+        else:
+            self.fd = None  # Windows: pipe não entra no selector (thread alimenta o loop)
+        self.pending = bytearray()
+        self.scrollback = bytearray()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.attachment: Optional[Attachment] = None
+        self.last_activity = time.time()
+        self.paused = False
+        self.closed = False
+
+    def write(self, data: Any) -> None:
+        payload = data if isinstance(data, bytes) else str(data).encode("utf-8", errors="replace")
+        self.last_activity = time.time()
+        if self.closed or not payload:
+            return
+        if self.use_pty and self.master is not None:
+            view = memoryview(payload)
+            while view:
+                try:
+                    n = os.write(self.master, view)
+                    view = view[n:]
+                except BlockingIOError:  # master é não bloqueante (colagem grande)
+                    time.sleep(0.005)
+        elif self.proc.stdin:
+            self.proc.stdin.write(payload)
+            self.proc.stdin.flush()
+
+
+class TerminalMux:
+    """Loop único que atende todas as sessões de terminal do processo."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, high_water: int = HIGH_WATER,
+                 low_water: int = LOW_WATER, idle_kill: float = IDLE_KILL_SECONDS,
+                 scrollback: int = SCROLLBACK_BYTES):
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+        self.low_water = low_water
+        self.idle_kill = idle_kill
+        self.scrollback = scrollback
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, TerminalSession] = {}
+        self._commands: deque = deque()
+        self._sel: Optional[selectors.BaseSelector] = None
+        self._wake_r = self._wake_w = -1
+        self._thread: Optional[threading.Thread] = None
+        self._flush_at: Optional[float] = None
+        self._dirty: set = set()
+        self._counters = {"reads": 0, "bytes": 0, "frames": 0, "pauses": 0, "reattached": 0, "reaped": 0}
+
+    # ---------- API ----------
+
+    def attach(self, session_id: Optional[str], spawn: Spawn,
+               notify: Optional[Callable[[], None]] = None) -> Attachment:
+        """
+        Liga um cliente à sessão session_id (reattach: mesmo shell + scrollback) ou,
+        se ela não existir mais, a um shell novo criado por spawn().
+        Um cliente anterior da mesma sessão é desligado.
+        """
+        self._ensure_loop()
+        with self._lock:
+            session = self._sessions.get(session_id or "")
+            if session is not None and not session.closed:
+                att = Attachment(session, notify)
+                att.resumed = True
+                old, session.attachment = session.attachment, att
+                session.pending.clear()
+                session.last_activity = time.time()
+                if session.scrollback:
+                    att._push(_decode(bytes(session.scrollback)))
+                self._counters["reattached"] += 1
+                if old is not None:
+                    old._close()
+                if session.paused:
+                    self._call_soon(lambda: self._resume(session))
+                return att
+        proc, master, use_pty = spawn()
+        session = TerminalSession(self, proc, master, use_pty)
+        att = Attachment(session, notify)
+        session.attachment = att
+        with self._lock:
+            self._sessions[session.id] = session
+        _set_alive(True)
+        if session.fd is not None:
+            os.set_blocking(session.fd, False)
+            self._call_soon(lambda: self._register(session))
+        else:
+            threading.Thread(target=self._feed_pipe, args=(session,), daemon=True).start()
+        return att
+
+    def detach(self, att: Attachment) -> None:
+        """Cliente saiu: a sessão continua viva (scrollback) até o kill switch."""
+        session = att.session
+        with self._lock:
+            if session.attachment is att:
+                session.attachment = None
+                session.pending.clear()
+                self._dirty.discard(session)
+                if session.paused:
+                    self._call_soon(lambda: self._resume(session))
+        att._close()
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        self._call_soon(lambda: self._end(session))
+        return True
+
+    def reap_idle(self) -> int:
+        """Encerra sessões sem interação há mais de idle_kill segundos."""
+        limite = time.time() - self.idle_kill
+        with self._lock:
+            ociosas = [s for s in self._sessions.values() if s.last_activity < limite]
+        for session in ociosas:
+            self._end(session)
+        with self._lock:
+            self._counters["reaped"] += len(ociosas)
+        return len(ociosas)
+
+    def get(self, session_id: str) -> Optional[TerminalSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            out = dict(self._counters)
+        out.update({
+            "sessions": len(sessions),
+            "attached": sum(1 for s in sessions if s.attachment is not None),
+            "paused": sum(1 for s in sessions if s.paused),
+        })
+        return out
+
+    # ---------- loop ----------
+
+    def _ensure_loop(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._sel = selectors.DefaultSelector()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            os.set_blocking(self._wake_w, False)
+            self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+            self._thread = threading.Thread(target=self._run, name="yui-terminal-mux", daemon=True)
+            self._thread.start()
+
+    def _call_soon(self, fn: Callable[[], None]) -> None:
+        """Executa fn na thread do loop (o selector não é thread-safe)."""
+        self._commands.append(fn)
+        try:
+            os.write(self._wake_w, b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self) -> None:
+        next_reap = time.monotonic() + REAP_INTERVAL
+        while True:
+            now = time.monotonic()
+            deadlines = [next_reap] if self._sessions else []
+            if self._flush_at is not None:
+                deadlines.append(self._flush_at)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            for key, _ in self._sel.select(timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                self._on_readable(key.data)
+            while self._commands:
+                try:
+                    self._commands.popleft()()
+                except Exception:
+                    pass
+            now = time.monotonic()
+            if self._flush_at is not None and now >= self._flush_at:
+                self._flush()
+            if now >= next_reap:
+                next_reap = now + REAP_INTERVAL
+                try:
+                    self.reap_idle()
+                except Exception:
+                    pass
+
+    def _register(self, session: TerminalSession) -> None:
+        if session.closed or session.fd is None:
+            return
+        try:
+            self._sel.register(session.fd, selectors.EVENT_READ, session)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def _unregister(self, session: TerminalSession) -> None:
+        if session.fd is None:
+            return
+        try:
+            self._sel.unregister(session.fd)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def _on_readable(self, session: TerminalSession) -> None:
+        try:
+            data = os.read(session.fd, READ_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._end(session)
+            return
+        self._ingest(session, data)
+
+    def _feed_pipe(self, session: TerminalSession) -> None:
+        """Windows / sem PTY: pipe bloqueante lido numa thread e entregue ao loop."""
+        while not session.closed:
+            try:
+                data = session.proc.stdout.read1(READ_CHUNK) if session.proc.stdout else b""
+            except Exception:
+                data = b""
+            if not data:
+                self._call_soon(lambda: self._end(session))
+                return
+            self._call_soon(lambda d=data: self._ingest(session, d))
+
+    def _ingest(self, session: TerminalSession, data: bytes) -> None:
+        with self._lock:
+            self._counters["reads"] += 1
+            self._counters["bytes"] += len(data)
+            session.scrollback += data
+            excesso = len(session.scrollback) - self.scrollback
+            if excesso > 0:
+                del session.scrollback[:excesso]
+            att = session.attachment
+            if att is None:
+                return  # desligada: só scrollback, o shell segue rodando
+            session.pending += data
+            self._dirty.add(session)
+            if self._flush_at is None:
+                self._flush_at = time.monotonic() + self.flush_interval
+            if not session.paused and len(session.pending) + att.queued >= self.high_water:
+                session.paused = True
+                self._counters["pauses"] += 1
+                self._unregister(session)
+
+    def _flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._flush_at = None
+            for session in dirty:
+                att = session.attachment
+                if att is None or not session.pending:
+                    continue
+                text = session.decoder.decode(bytes(session.pending))
+                session.pending.clear()
+                if text:
+                    att._push(text)
+                    self._counters["frames"] += 1
+
+    def _drained(self, session: TerminalSession) -> None:
+        """Consumidor tirou frames: retoma a leitura se a fila baixou."""
+        with self._lock:
+            att = session.attachment
+            if not session.paused or att is None:
+                return
+            if att.queued + len(session.pending) > self.low_water:
+                return
+        self._call_soon(lambda: self._resume(session))
+
+    def _resume(self, session: TerminalSession) -> None:
+        with self._lock:
+            if not session.paused or session.closed:
+                return
+            session.paused = False
+        self._register(session)
+
+    def _end(self, session: TerminalSession) -> None:
+        if self._thread is not None and threading.current_thread() is not self._thread:
+            self._call_soon(lambda: self._end(session))  # fd só é mexido na thread do loop
+            return
+        with self._lock:
+            if session.closed:
+                return
+            session.closed = True
+            self._sessions.pop(session.id, None)
+            self._dirty.discard(session)
+            att, session.attachment = session.attachment, None
+            alive = bool(self._sessions)
+        self._unregister(session)
+        if att is not None:
+            att._close()
+        _set_alive(alive)
+        threading.Thread(target=_terminate, args=(session.proc, session.master), daemon=True).start()
+
+
+def _terminate(proc, master: Optional[int]) -> None:
+    try:
+        if proc.poll() is None:
+            proc.terminate()
+            proc.wait(timeout=2)
+    except Exception:
+        try:
+            proc.kill()
+        except Exception:
+            pass
+    if master is not None:
+        try:
+            os.close(master)
+        except OSError:
+            pass
+
+
+def _set_alive(alive: bool) -> None:
+    try:
+        from core.system_state import set_terminal_sessions_alive
+        set_terminal_sessions_alive(alive)
+    except Exception:
+        pass
+
+
+_instance: Optional[TerminalMux] = None
+_instance_lock = threading.Lock()
+
+
+def get_terminal_mux() -> TerminalMux:
+    """Singleton do multiplexador (um loop por processo)."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = TerminalMux()
+    return _instance
@@ -0,0 +1,282 @@
+# ==========================================================
+# YUI TOKEN BUDGET
+# Contagem real de tokens + empacotamento do contexto.
+#
+# Antes: agent_controller estimava custo por chars/4 e o
+# attention_manager escolhia blocos só por score (top-N), sem
+# saber quantos tokens cada um ocupava: o prompt estourava a
+# janela ou desperdiçava espaço.
+# Agora:
+# - count_tokens: tokenizer local (tiktoken, o200k_base /
+#   cl100k_base) quando disponível; senão heurística parecida
+#   com a pré-tokenização BPE (nunca chars/4 puro)
+# - Cache de contagens por hash do bloco (LRU)
+# - pack(blocks, budget): obrigatórios primeiro, depois por
+#   prioridade; o primeiro que não cabe é truncado (texto: corta
+#   o fim; histórico: descarta as mensagens mais antigas)
+# - turn_report: tokens por fonte do turno (last_report)
+# ==========================================================
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+PROMPT_BUDGET = int(os.environ.get("YUI_PROMPT_BUDGET", "24000"))   # tokens de entrada por turno
+TOKENIZER_MODE = (os.environ.get("YUI_TOKENIZER") or "auto").strip().lower()  # auto | tiktoken | heuristic
+MESSAGE_OVERHEAD = 4      # tokens de formatação por mensagem de chat
+REPLY_PRIMING = 3         # tokens do início da resposta
+MIN_TRUNCATE_TOKENS = 64  # abaixo disso não vale truncar: descarta o bloco
+CACHE_MAX = 4096
+
+_MODEL = os.environ.get("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+
+# Heurística: aproxima a pré-tokenização do BPE (palavras, números em grupos de 3,
+# pontuação, quebras de linha). Palavras longas viram várias peças.
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d{1,3}|\n+|[^\s\w]|_+", re.UNICODE)
+
+
+def _heuristic_count(text: str) -> int:
+    n = 0
+    for piece in _PIECE_RE.findall(text):
+        c = piece[0]
+        if c.isalpha():
+            extra = sum(1 for ch in piece if ord(ch) > 127)  # acentos custam mais no BPE
+            n += max(1, math.ceil((len(piece) + extra) / 4))
+        else:
+            n += 1
+    return n
+
+
+_encoding = None
+_encoding_state = "pending"   # pending | loading | ready | unavailable
+_encoding_lock = threading.Lock()
+
+
+def _load_encoding() -> None:
+    global _encoding, _encoding_state
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(_MODEL)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        _encoding = enc
+        _encoding_state = "ready"
+    except Exception:
+        _encoding_state = "unavailable"
+
+
+def _encoder():
+    """
+    Encoding do tiktoken se carregado. A primeira carga pode baixar o vocabulário:
+    roda em background e, enquanto isso, vale a heurística.
+    """
+    global _encoding_state
+    if _encoding_state == "ready":
+        return _encoding
+    if TOKENIZER_MODE == "heuristic" or _encoding_state == "unavailable":
+        return None
+    with _encoding_lock:
+        if _encoding_state == "pending":
+            _encoding_state = "loading"
+            if TOKENIZER_MODE == "tiktoken":
+                _load_encoding()
+            else:
+                threading.Thread(target=_load_encoding, name="yui-tokenizer", daemon=True).start()
+    return _encoding if _encoding_state == "ready" else None
+
+
+def tokenizer_name() -> str:
+    enc = _encoder()
+    return f"tiktoken:{enc.name}" if enc is not None else "heuristic"
+
+
+_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _count_raw(text: str) -> int:
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return _heuristic_count(text)
+
+
+def count_tokens(text: Any) -> int:
+    """Tokens do texto (cache por hash do conteúdo + tokenizer)."""
+    text = "" if text is None else str(text)
+    if not text:
+        return 0
+    key = (tokenizer_name(), hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _cache_lock:
+        n = _cache.get(key)
+        if n is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return n
+        _cache_stats["misses"] += 1
+    n = _count_raw(text)
+    with _cache_lock:
+        _cache[key] = n
+        while len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    return n
+
+
+def count_messages(messages: Sequence[Dict[str, Any]]) -> int:
+    """Tokens de uma lista de mensagens de chat (conteúdo + formatação)."""
+    if not messages:
+        return 0
+    return sum(count_tokens(m.get("content")) + MESSAGE_OVERHEAD for m in messages) + REPLY_PRIMING
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Maior prefixo de text com até max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoder()
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+    lo, hi = 0, len(text)
+    while lo < hi:  # busca binária no comprimento em chars
+        mid = (lo + hi + 1) // 2
+        if _heuristic_count(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+@dataclass
+class Block:
+    """
+    Um bloco de contexto candidato ao prompt.
+    text ou messages (histórico). required=True entra sempre; truncatable=False
+    não é cortado (entra inteiro ou sai).
+    """
+
+    source: str
+    text: str = ""
+    priority: float = 1.0
+    required: bool = False
+    truncatable: bool = True
+    messages: Optional[List[Dict[str, Any]]] = None
+
+    def tokens(self) -> int:
+        if self.messages is not None:
+            return sum(count_tokens(m.get("content")) + MESSAGE_OVERHEAD for m in self.messages)
+        return count_tokens(self.text)
+
+
+@dataclass
+class PackResult:
+    blocks: List[Block]
+    budget: int
+    used: int = 0
+    breakdown: Dict[str, int] = field(default_factory=dict)
+    dropped: List[str] = field(default_factory=list)
+    truncated: List[str] = field(default_factory=list)
+
+    def get(self, source: str) -> Optional[Block]:
+        for b in self.blocks:
+            if b.source == source:
+                return b
+        return None
+
+
+def _shrink(block: Block, allowance: int) -> Optional[Block]:
+    if allowance < MIN_TRUNCATE_TOKENS or not block.truncatable:
+        return None
+    if block.messages is not None:
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        for m in reversed(block.messages):  # mantém as mais recentes
+            cost = count_tokens(m.get("content")) + MESSAGE_OVERHEAD
+            if used + cost > allowance:
+                break
+            kept.insert(0, m)
+            used += cost
+        return Block(block.source, priority=block.priority, messages=kept) if kept else None
+    text = truncate_to_tokens(block.text, allowance)
+    return Block(block.source, text=text, priority=block.priority) if text.strip() else None
+
+
+def pack(blocks: Sequence[Block], budget: int) -> PackResult:
+    """
+    Empacota blocos no orçamento: obrigatórios (na ordem dada), depois por prioridade
+    decrescente. Um bloco que não cabe é truncado para o espaço restante (se sobrar
+    pelo menos MIN_TRUNCATE_TOKENS); senão é descartado e o próximo é tentado.
+    """
+    result = PackResult(blocks=[], budget=budget)
+    ordem = [b for b in blocks if b.required] + sorted(
+        (b for b in blocks if not b.required), key=lambda b: -b.priority
+    )
+    for block in ordem:
+        n = block.tokens()
+        if n == 0:
+            continue
+        restante = budget - result.used
+        if block.required or n <= restante:
+            escolhido = block
+        else:
+            escolhido = _shrink(block, restante)
+            if escolhido is None:
+                result.dropped.append(block.source)
+                continue
+            result.truncated.append(block.source)
+            n = escolhido.tokens()
+        result.blocks.append(escolhido)
+        result.used += n
+        result.breakdown[escolhido.source] = result.breakdown.get(escolhido.source, 0) + n
+    return result
+
+
+# ---------- relatório por turno ----------
+
+_last_report: Dict[str, Any] = {}
+_report_lock = threading.Lock()
+
+
+def turn_report(messages: Sequence[Dict[str, Any]], packed: Optional[PackResult] = None,
+                user_message: str = "", budget: int = PROMPT_BUDGET) -> Dict[str, Any]:
+    """
+    Tokens finais do turno por fonte: blocos de contexto empacotados, mensagem do
+    usuário e o resto (instruções de sistema). Guardado em last_report().
+    """
+    total = count_messages(messages)
+    fontes: Dict[str, int] = dict(packed.breakdown) if packed else {}
+    usuario = count_tokens(user_message) + MESSAGE_OVERHEAD if user_message else 0
+    if usuario:
+        fontes["mensagem_usuario"] = usuario
+    fontes["instrucoes_sistema"] = max(0, total - sum(fontes.values()))
+    report = {
+        "total": total,
+        "budget": budget,
+        "fontes": fontes,
+        "descartados": list(packed.dropped) if packed else [],
+        "truncados": list(packed.truncated) if packed else [],
+        "tokenizer": tokenizer_name(),
+    }
+    with _report_lock:
+        _last_report.clear()
+        _last_report.update(report)
+    return report
+
+
+def last_report() -> Dict[str, Any]:
+    """Relatório do último turno (vazio se nenhum)."""
+    with _report_lock:
+        return dict(_last_report)
+
+
+def cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return dict(_cache_stats, size=len(_cache))
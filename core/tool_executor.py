@@ -0,0 +1,218 @@
+# ==========================================================
+# YUI TOOL EXECUTOR
+# Executa as tool calls de um mesmo turno em paralelo.
+#
+# Antes: agent_controller e yui_core.stream_chat_agent rodavam
+# cada tool em sequência (buscar_web + analisar_arquivo = soma
+# das latências).
+# Agora: calls independentes rodam juntas num pool de threads;
+# calls de filesystem que conflitam (escrita x leitura/escrita
+# no mesmo caminho) ficam em "ondas" sucessivas, na ordem dada.
+#
+# - Timeout por tool (core/limits.TIMEOUT_SECONDS ou TOOL_TIMEOUTS);
+#   call que conflita com uma que estourou e ainda roda falha
+# - admit: checagens (loop, energia, redundância) por onda, vendo as
+#   ações registradas pelas ondas anteriores
+# - Resultados sempre na ordem de entrada (determinístico)
+# - Cada call roda numa cópia dos contextvars de quem chamou
+#   (core/agent_context: user_id/chat_id, ExecutionGraph ativo)
+# - Tool desconhecida (plugin) roda sozinha: não sabemos o que toca
+# ==========================================================
+
+import contextvars
+import os
+import posixpath
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.limits import TIMEOUT_SECONDS
+
+MAX_WORKERS = int(os.environ.get("YUI_TOOL_WORKERS", "4"))
+
+READ, WRITE, PURE, EXCLUSIVE = "read", "write", "pure", "exclusive"
+
+# nome → (modo, argumentos que carregam caminho)
+TOOL_ACCESS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    # core/tools_registry
+    "get_current_time": (PURE, ()),
+    "buscar_web": (PURE, ()),
+    "analisar_arquivo": (PURE, ()),
+    "analisar_projeto": (READ, ("raiz",)),
+    "observar_ambiente": (READ, ("raiz",)),
+    "consultar_indice_projeto": (READ, ("raiz",)),
+    "generate_project_map": (READ, ("root",)),
+    "criar_zip_projeto": (READ, ("root_dir",)),
+    "criar_projeto_arquivos": (WRITE, ("root_dir",)),
+    "fs_create_file": (WRITE, ("path",)),
+    "fs_create_folder": (WRITE, ("path",)),
+    "fs_delete_file": (WRITE, ("path",)),
+    # yui/yui_tools
+    "analisar_codigo": (PURE, ()),
+    "sugerir_arquitetura": (PURE, ()),
+    "calcular_custo_estimado": (PURE, ()),
+    "resumir_contexto": (PURE, ()),
+    "listar_arquivos_workspace": (READ, ("pasta",)),
+    "ler_arquivo_workspace": (READ, ("caminho",)),
+    "escrever_arquivo_workspace": (WRITE, ("caminho",)),
+    "listar_backups_workspace": (READ, ("caminho",)),
+    "restaurar_backup_workspace": (WRITE, ("caminho",)),
+}
+
+# Timeouts específicos (segundos); demais usam TIMEOUT_SECONDS
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "criar_projeto_arquivos": TIMEOUT_SECONDS * 2,
+}
+
+Runner = Callable[[str, Dict[str, Any]], Any]
+
+
+def register_tool_access(name: str, mode: str, path_args: Sequence[str] = ()) -> None:
+    """Declara como uma tool (ex.: de plugin) acessa o filesystem."""
+    if mode not in (READ, WRITE, PURE, EXCLUSIVE):
+        raise ValueError(f"Modo de acesso inválido: {mode}")
+    TOOL_ACCESS[name] = (mode, tuple(path_args))
+
+
+def _normalize_path(value: Any) -> str:
+    p = str(value or "").replace("\\", "/").strip()
+    p = posixpath.normpath(p) if p else ""
+    return "" if p in (".", "/") else p.strip("/")
+
+
+def _access(name: str, args: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """(modo, caminhos). Caminho "" = raiz inteira (tool sem caminho explícito)."""
+    mode, keys = TOOL_ACCESS.get(name, (EXCLUSIVE, ()))
+    if mode in (PURE, EXCLUSIVE):
+        return mode, []
+    paths = [_normalize_path(args.get(k)) for k in keys if args.get(k)]
+    return mode, paths or [""]
+
+
+def _overlap(a: str, b: str) -> bool:
+    if not a or not b or a == b:
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+
+def conflicts(a: Tuple[str, List[str]], b: Tuple[str, List[str]]) -> bool:
+    """Duas calls conflitam se alguma é exclusiva ou se há escrita em caminhos sobrepostos."""
+    mode_a, paths_a = a
+    mode_b, paths_b = b
+    if EXCLUSIVE in (mode_a, mode_b):
+        return True
+    if PURE in (mode_a, mode_b) or (mode_a == READ and mode_b == READ):
+        return False
+    return any(_overlap(pa, pb) for pa in paths_a for pb in paths_b)
+
+
+def plan_waves(calls: Sequence[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Agrupa índices em ondas: cada call vai para a onda seguinte à da última
+    call anterior com que conflita. A ordem relativa de calls conflitantes é mantida.
+    """
+    accesses = [_access(str(c.get("tool") or ""), c.get("args") or {}) for c in calls]
+    level: List[int] = []
+    for i, acc in enumerate(accesses):
+        lv = 0
+        for j in range(i):
+            if level[j] + 1 > lv and conflicts(accesses[j], acc):
+                lv = level[j] + 1
+        level.append(lv)
+    waves: List[List[int]] = [[] for _ in range(max(level) + 1)] if level else []
+    for i, lv in enumerate(level):
+        waves[lv].append(i)
+    return waves
+
+
+def _error(msg: str) -> Dict[str, Any]:
+    return {"ok": False, "result": None, "error": msg}
+
+
+# admit(...) devolve STOP para encerrar a execução (calls ainda não iniciadas ficam None)
+STOP = object()
+
+Admit = Callable[[int, Dict[str, Any], List[str]], Any]
+
+
+def run_tools(
+    calls: Sequence[Dict[str, Any]],
+    runner: Optional[Runner] = None,
+    timeout: Optional[float] = None,
+    max_workers: int = MAX_WORKERS,
+    admit: Optional[Admit] = None,
+) -> List[Any]:
+    """
+    Executa calls [{"tool": nome, "args": {...}}, ...] e devolve os resultados na mesma ordem.
+
+    runner(nome, args) padrão: core.tool_runner.run_tool. Exceção ou timeout viram
+    {"ok": False, "result": None, "error": ...}.
+
+    admit(indice, call, admitidas_na_onda) é chamado em ordem, no início de cada onda
+    (depois que as ondas anteriores terminaram e registraram suas ações): None executa
+    a call, um dict vira o resultado dela sem executar, STOP encerra (calls não
+    iniciadas ficam None). admitidas_na_onda são os nomes já aceitos na onda atual,
+    que ainda não rodaram.
+
+    Uma tool que estoura o timeout segue rodando em segundo plano (threads não são
+    interrompíveis); enquanto não termina, calls de ondas seguintes que conflitam com
+    ela falham em vez de rodar junto (a ordem das escritas no mesmo caminho vale).
+    """
+    if runner is None:
+        from core.tool_runner import run_tool as runner
+    results: List[Any] = [None] * len(calls)
+    if not calls:
+        return results
+    workers = max(1, int(max_workers))
+    names = [str(c.get("tool") or "") for c in calls]
+    accesses = [_access(names[i], calls[i].get("args") or {}) for i in range(len(calls))]
+    stalled: List[Tuple[int, Future]] = []  # estouraram o timeout e ainda rodam
+    for wave in plan_waves(calls):
+        stalled = [(j, f) for j, f in stalled if not f.done()]
+        ready: List[int] = []
+        admitted: List[str] = []
+        stop = False
+        for i in wave:
+            blocker = next((j for j, _ in stalled if conflicts(accesses[j], accesses[i])), None)
+            if blocker is not None:
+                results[i] = _error(
+                    f"'{names[i]}' não executada: '{names[blocker]}' estourou o tempo limite "
+                    "e ainda está rodando sobre o mesmo caminho."
+                )
+                continue
+            if admit is not None:
+                verdict = admit(i, calls[i], list(admitted))
+                if verdict is STOP:
+                    stop = True
+                    break
+                if verdict is not None:
+                    results[i] = verdict
+                    continue
+            ready.append(i)
+            admitted.append(names[i])
+        for start in range(0, len(ready), workers):
+            batch = ready[start:start + workers]
+            pool = ThreadPoolExecutor(max_workers=len(batch), thread_name_prefix="yui-tool")
+            try:
+                began = time.monotonic()
+                # Threads do pool não herdam contextvars: cada call leva uma cópia do contexto atual
+                futures = {
+                    i: pool.submit(contextvars.copy_context().run, runner, names[i], dict(calls[i].get("args") or {}))
+                    for i in batch
+                }
+                for i in batch:
+                    limit = timeout if timeout is not None else TOOL_TIMEOUTS.get(names[i], TIMEOUT_SECONDS)
+                    remaining = max(0.0, began + limit - time.monotonic())
+                    try:
+                        results[i] = futures[i].result(timeout=remaining)
+                    except FutureTimeout:
+                        results[i] = _error(f"Tempo limite excedido ({limit:g}s) em '{names[i]}'.")
+                        stalled.append((i, futures[i]))
+                    except Exception as e:  # noqa: BLE001
+                        results[i] = _error(str(e) or e.__class__.__name__)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        if stop:
+            break
+    return results
@@ -16,6 +16,7 @@ try:
 except ImportError:
     ZoneInfo = None  # Python < 3.9
 
+from core.fs_snapshot import notify_changed
 from yui_ai.analyzer.report_formatter import run_file_analysis, report_to_text
 from yui_ai.project_analysis.analysis_report import executar_analise_completa
 from yui_ai.project_analysis.project_scanner import escanear_estrutura
@@ -70,12 +71,12 @@ def tool_buscar_web(query: str, limite: int = 5) -> Dict[str, Any]:
     if not query or not str(query).strip():
         return {"ok": False, "resultados": [], "error": "query obrigatória"}
     try:
-        from duckduckgo_search import DDGS
+        from core.search_cache import get_search_cache
 
-        with DDGS() as ddgs:
-            results = list(ddgs.text(str(query).strip(), max_results=min(limite, 10)))
+        results, origem = get_search_cache().search(str(query).strip(), min(limite, 10))
         return {
             "ok": True,
+            "cache": origem,
             "resultados": [
                 {
                     "titulo": r.get("title", ""),
@@ -269,6 +270,7 @@ def tool_criar_projeto_arquivos(root_dir: str, files: Any) -> Dict[str, Any]:
             with open(destino, "w", encoding="utf-8") as f:
                 f.write(safe_content)
             created.append(str(destino.relative_to(PROJECT_ROOT)))
+        notify_changed(base)
         return {"ok": True, "root": str(base), "files": created, "error": None}
     except Exception as e:  # noqa: BLE001
         return {"ok": False, "root": str(base), "files": created, "error": str(e)}
@@ -515,6 +517,7 @@ def tool_fs_create_file(path: str, content: str = "") -> Dict[str, Any]:
         target = _safe_sandbox_path(path)
         target.parent.mkdir(parents=True, exist_ok=True)
         target.write_text(content or "", encoding="utf-8", errors="replace")
+        notify_changed(target)
         try:
             from core.usage_tracker import record_disk_write
             record_disk_write()
@@ -534,6 +537,7 @@ def tool_fs_create_folder(path: str) -> Dict[str, Any]:
     try:
         target = _safe_sandbox_path(path)
         target.mkdir(parents=True, exist_ok=True)
+        notify_changed(target)
         try:
             from core.usage_tracker import record_disk_write
             record_disk_write()
@@ -573,6 +577,7 @@ def tool_fs_delete_file(path: str) -> Dict[str, Any]:
             target.unlink()
         else:
             shutil.rmtree(target)
+        notify_changed(target)
         try:
             from core.usage_tracker import record_disk_write
             record_disk_write()
@@ -4,7 +4,6 @@
 # Transparência para o usuário do SaaS.
 # ==========================================================
 
-import json
 from datetime import date
 from pathlib import Path
 from typing import Any, Dict
@@ -32,53 +31,59 @@ _last_response_tokens: dict = {}
 COST_DISK_WRITE_BRL = 0.001  # R$ por operação de escrita (ajustável)
 
 
+_EMPTY_DAY = {"energy_consumed": 0, "requests": 0, "token_cost_brl": 0, "disk_writes": 0, "disk_write_cost_brl": 0}
+MAX_DAYS = 30
+
+_store = None
+
+
+def _reduce_usage(data: Dict[str, Any], op: Dict[str, Any]) -> Dict[str, Any]:
+    """Aplica {day, incr: {campo: delta}} ao agregado diário. Mantém últimos MAX_DAYS dias."""
+    day = op.get("day")
+    if not day:
+        return data
+    day_data = dict(data.get(day) or _EMPTY_DAY)
+    for k, v in (op.get("incr") or {}).items():
+        day_data[k] = day_data.get(k, 0) + v
+    data[day] = day_data
+    if len(data) > MAX_DAYS:
+        keys = sorted(data.keys(), reverse=True)[:MAX_DAYS]
+        data = {k: data[k] for k in keys}
+    return data
+
+
+def _get_store():
+    """LogStore de uso diário: incrementos vão para usage_daily.json.log; snapshot periódico."""
+    global _store
+    if _store is None:
+        from core.log_store import get_store
+        _store = get_store(USAGE_PATH, _reduce_usage)
+    return _store
+
+
 def _load_usage() -> Dict[str, Any]:
-    USAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not USAGE_PATH.exists():
-        return {}
-    try:
-        with open(USAGE_PATH, encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    return _get_store().read()
 
 
-def _save_usage(data: Dict[str, Any]) -> None:
-    USAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(USAGE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _incr_today(**fields: float) -> None:
+    _get_store().apply({"day": date.today().isoformat(), "incr": fields})
 
 
 def record_disk_write() -> None:
     """Registra escrita em disco para auditoria de custo Zeabur."""
-    today = date.today().isoformat()
-    data = _load_usage()
-    day_data = data.get(today, {"energy_consumed": 0, "requests": 0, "token_cost_brl": 0, "disk_writes": 0, "disk_write_cost_brl": 0})
-    day_data["disk_writes"] = day_data.get("disk_writes", 0) + 1
-    day_data["disk_write_cost_brl"] = day_data.get("disk_write_cost_brl", 0) + COST_DISK_WRITE_BRL
-    data[today] = day_data
-    _save_usage(data)
+    _incr_today(disk_writes=1, disk_write_cost_brl=COST_DISK_WRITE_BRL)
 
 
 def record_consumption(energy_consumed: float) -> None:
     """Registra consumo de energia do dia."""
-    today = date.today().isoformat()
-    data = _load_usage()
-    day_data = data.get(today, {"energy_consumed": 0, "requests": 0, "token_cost_brl": 0, "disk_writes": 0, "disk_write_cost_brl": 0})
-    day_data["energy_consumed"] = day_data.get("energy_consumed", 0) + energy_consumed
-    day_data["requests"] = day_data.get("requests", 0) + 1
-    data[today] = day_data
-    # Mantém últimos 30 dias
-    keys = sorted(data.keys(), reverse=True)[:30]
-    data = {k: data[k] for k in keys}
-    _save_usage(data)
+    _incr_today(energy_consumed=energy_consumed, requests=1)
 
 
 def get_today_usage() -> Dict[str, Any]:
     """Retorna uso do dia atual."""
     today = date.today().isoformat()
     data = _load_usage()
-    day_data = data.get(today, {"energy_consumed": 0, "requests": 0, "token_cost_brl": 0, "disk_writes": 0, "disk_write_cost_brl": 0})
+    day_data = data.get(today, _EMPTY_DAY)
     token_cost = day_data.get("token_cost_brl", 0)
     disk_cost = day_data.get("disk_write_cost_brl", 0)
     energy_cost = day_data.get("energy_consumed", 0) * COST_PER_ENERGY_UNIT
@@ -104,6 +109,14 @@ def estimate_cost_brl(prompt_chars: int, estimated_output_chars: int = 4000) ->
     return round(usd * BRL_PER_USD, 4)
 
 
+def estimate_cost_brl_tokens(prompt_tokens: int, estimated_output_tokens: int = 1000) -> float:
+    """Estima custo em R$ a partir de tokens contados (core/token_budget)."""
+    usd = (max(0, prompt_tokens) * PRICE_INPUT_PER_1M / 1_000_000) + (
+        max(0, estimated_output_tokens) * PRICE_OUTPUT_PER_1M / 1_000_000
+    )
+    return round(usd * BRL_PER_USD, 4)
+
+
 def record_response_cost(prompt_tokens: int, completion_tokens: int) -> float:
     """Registra custo da última resposta e retorna valor em R$."""
     global _last_response_cost_brl, _last_response_tokens
@@ -111,12 +124,7 @@ def record_response_cost(prompt_tokens: int, completion_tokens: int) -> float:
     _last_response_cost_brl = round(usd * BRL_PER_USD, 4)
     _last_response_tokens = {"prompt": prompt_tokens, "completion": completion_tokens}
     # Acumular custo por token no dia (auditoria)
-    today = date.today().isoformat()
-    data = _load_usage()
-    day_data = data.get(today, {"energy_consumed": 0, "requests": 0, "token_cost_brl": 0})
-    day_data["token_cost_brl"] = day_data.get("token_cost_brl", 0) + _last_response_cost_brl
-    data[today] = day_data
-    _save_usage(data)
+    _incr_today(token_cost_brl=_last_response_cost_brl)
     return _last_response_cost_brl
 
 
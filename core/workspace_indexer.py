@@ -12,6 +12,8 @@ import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core.fs_snapshot import get_snapshot, is_hidden
+
 try:
     from config import settings
     SANDBOX_DIR = Path(settings.SANDBOX_DIR).resolve()
@@ -44,17 +46,6 @@ EXT_MAP = {
 }
 
 
-def _should_skip(path: Path, root: Path) -> bool:
-    """Ignora pastas e arquivos desnecessários."""
-    rel = path.relative_to(root)
-    for part in rel.parts:
-        if part in IGNORE_DIRS or part.startswith(".") and part not in (".env", ".env.example"):
-            return True
-    if path.name in IGNORE_NAMES:
-        return True
-    return False
-
-
 def scan(base_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Escaneia o workspace e retorna mapa leve.
@@ -79,25 +70,14 @@ def scan(base_path: Optional[str] = None) -> Dict[str, Any]:
     extensoes: Dict[str, int] = {}
     total = 0
 
-    for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [d for d in dirnames if d not in IGNORE_DIRS and not d.startswith(".")]
-        for f in filenames:
-            if f in IGNORE_NAMES:
-                continue
-            full = Path(dirpath) / f
-            try:
-                rel = full.relative_to(root)
-            except ValueError:
-                continue
-            if _should_skip(full, root):
-                continue
-            ext = full.suffix.lower()
-            key = EXT_MAP.get(ext)
-            if key and key in mapa:
-                rel_str = str(rel).replace("\\", "/")
-                mapa[key].append(rel_str)
-            extensoes[ext or "(sem ext)"] = extensoes.get(ext or "(sem ext)", 0) + 1
-            total += 1
+    snap = get_snapshot(str(root))
+    for rel_str in snap.iter_files(skip=lambda part: part in IGNORE_NAMES or is_hidden(part)):
+        ext = os.path.splitext(rel_str)[1].lower()
+        key = EXT_MAP.get(ext)
+        if key and key in mapa:
+            mapa[key].append(rel_str)
+        extensoes[ext or "(sem ext)"] = extensoes.get(ext or "(sem ext)", 0) + 1
+        total += 1
 
     return {
         "python": mapa["python"],
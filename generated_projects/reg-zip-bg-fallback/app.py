@@ -0,0 +1 @@
+print('ok')
\ No newline at end of file
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N streams SSE parados (esperando o LLM) + latência de um request comum.
+
+Sobe o servidor no próprio processo com o handler de chat trocado por um falso que
+manda um chunk e fica parado até o fim do teste (simula o LLM pensando), abre N
+conexões POST /api/chat/stream e mede: threads do processo, RSS e a latência de
+GET --path enquanto os N streams estão abertos.
+
+Modos:
+    asgi  uvicorn + asgi:app (uma corrotina por stream)
+    wsgi  servidor threaded do werkzeug + web_server:app (uma thread por stream,
+          como gunicorn gthread com threads ilimitadas)
+
+Uso:
+    python scripts/bench_idle_streams.py --mode asgi --streams 500
+    python scripts/bench_idle_streams.py --mode wsgi --streams 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+
+_release = threading.Event()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _patch(mode: str) -> None:
+    """Troca LLM e checagem de dono do chat por falsos que não saem do processo."""
+    from services import ai_service
+    import web.routes.routes_chat as routes_chat
+
+    async def _idle_async(user_id, chat_id, message, **kwargs):
+        yield "primeiro chunk"
+        while not _release.is_set():
+            await asyncio.sleep(0.2)
+        yield "fim"
+
+    def _idle_sync(user_id, chat_id, message, **kwargs):
+        yield "primeiro chunk"
+        _release.wait()
+        yield "fim"
+
+    routes_chat.chat_pertence_usuario = lambda chat_id, user_id: True
+    routes_chat.handle_chat_stream = _idle_sync
+    if mode == "asgi":
+        import asgi
+        asgi.chat_pertence_usuario = lambda chat_id, user_id: True
+        ai_service.handle_chat_stream_async = _idle_async
+
+
+def _serve(mode: str, port: int):
+    if mode == "asgi":
+        import uvicorn
+        import asgi
+        server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=port, log_level="error",
+                                               backlog=4096, lifespan="off"))
+        threading.Thread(target=server.run, daemon=True).start()
+        return lambda: setattr(server, "should_exit", True)
+    from werkzeug.serving import make_server
+    from web_server import app
+    srv = make_server("127.0.0.1", port, app, threaded=True)
+    srv.socket.listen(4096)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv.shutdown
+
+
+async def _open_stream(port: int, idx: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"chat_id": f"c{idx}", "user_id": "bench", "message": "oi"}).encode()
+    writer.write(
+        b"POST /api/chat/stream HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    buf = b""
+    while b"primeiro chunk" not in buf:
+        data = await reader.read(4096)
+        if not data:
+            raise ConnectionError("stream fechado antes do primeiro chunk")
+        buf += data
+    return reader, writer
+
+
+async def _get_latency(port: int, path: str, samples: int) -> list:
+    out = []
+    for _ in range(samples):
+        t = time.perf_counter()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        await reader.read()
+        out.append((time.perf_counter() - t) * 1000)
+        writer.close()
+    return out
+
+
+async def _run(args) -> dict:
+    port = _free_port()
+    _patch(args.mode)
+    stop = _serve(args.mode, port)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    base_threads = threading.active_count()
+    base_lat = await _get_latency(port, args.path, args.samples)
+
+    t = time.perf_counter()
+    results = await asyncio.gather(*[_open_stream(port, i) for i in range(args.streams)], return_exceptions=True)
+    open_s = time.perf_counter() - t
+    streams = [r for r in results if not isinstance(r, BaseException)]
+
+    threads = threading.active_count()
+    rss = _rss_mb()
+    lat = await _get_latency(port, args.path, args.samples)
+
+    _release.set()
+    for _, writer in streams:
+        writer.close()
+    await asyncio.sleep(0.5)
+    stop()
+    return {
+        "mode": args.mode,
+        "streams_open": len(streams),
+        "failed": len(results) - len(streams),
+        "open_s": open_s,
+        "threads_idle": base_threads,
+        "threads_with_streams": threads,
+        "rss_mb": rss,
+        "lat_idle_ms": statistics.median(base_lat),
+        "lat_with_streams_ms": statistics.median(lat),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=("asgi", "wsgi"), default="asgi")
+    ap.add_argument("--streams", type=int, default=500)
+    ap.add_argument("--path", default="/api/system/startup_report")
+    ap.add_argument("--samples", type=int, default=10)
+    args = ap.parse_args()
+    os.environ.setdefault("YUI_WARM_DELAY", "3600")  # não aquecer subsistemas durante a medição
+    r = asyncio.run(_run(args))
+    print(
+        f"modo={r['mode']}  streams={r['streams_open']} (falhas {r['failed']}, abertos em {r['open_s']:.1f}s)\n"
+        f"threads: {r['threads_idle']} -> {r['threads_with_streams']}   RSS: {r['rss_mb']:.0f} MB\n"
+        f"latência GET {args.path}: {r['lat_idle_ms']:.1f} ms sem streams, "
+        f"{r['lat_with_streams_ms']:.1f} ms com streams (mediana)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: throughput com 1..N workers usando o estado compartilhado (core/shared_state).
+
+Modo padrão (sem rede): cada worker é um processo com o app Flask (test_client) fazendo
+requests reais + atualizações de sessão/contadores no backend SQLite compartilhado.
+No fim confere que nenhum incremento se perdeu entre processos.
+
+Modo --gunicorn: sobe `gunicorn --workers N` para cada N e dispara requests HTTP
+concorrentes em --path (precisa de gunicorn instalado).
+
+Uso:
+    python scripts/load_test_workers.py --workers 1,2,4 --duration 5
+    python scripts/load_test_workers.py --gunicorn --workers 1,2,4 --path /api/system/runtime_metrics
+"""
+import argparse
+import multiprocessing as mp
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+
+
+def _worker(idx: int, db: str, path: str, duration: float, start_at: float, out: "mp.Queue") -> None:
+    os.environ["YUI_SHARED_STATE"] = "sqlite"
+    os.environ["YUI_SHARED_STATE_PATH"] = db
+    sys.path.insert(0, str(BASE))
+    from web_server import app
+    from core.session_manager import append_turn
+    from core.shared_state import shared_dict
+
+    client = app.test_client()
+    counters = shared_dict("load_test")
+    while time.time() < start_at:
+        time.sleep(0.005)
+    done = 0
+    end = start_at + duration
+    while time.time() < end:
+        resp = client.get(path)
+        if resp.status_code != 200:
+            continue
+        append_turn("load-user", f"msg {idx}-{done}", "ok", chat_id=f"chat-{done % 8}")
+        counters.incr("requests")
+        done += 1
+    out.put(done)
+
+
+def run_inproc(workers: int, duration: float, path: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "shared_state.db")
+        ctx = mp.get_context("spawn")
+        out = ctx.Queue()
+        start_at = time.time() + 3.0  # tempo para os processos importarem o app
+        procs = [ctx.Process(target=_worker, args=(i, db, path, duration, start_at, out)) for i in range(workers)]
+        for p in procs:
+            p.start()
+        counts = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        os.environ["YUI_SHARED_STATE_PATH"] = db
+        sys.path.insert(0, str(BASE))
+        from core.shared_state import SQLiteBackend
+        stored = SQLiteBackend(Path(db)).get("load_test", "requests", 0)
+    total = sum(counts)
+    return {"workers": workers, "requests": total, "rps": total / duration, "lost_increments": total - int(stored)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_gunicorn(workers: int, duration: float, path: str, concurrency: int) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, YUI_SHARED_STATE="sqlite", YUI_SHARED_STATE_PATH=str(Path(tmp) / "shared_state.db"),
+                   WEB_CONCURRENCY=str(workers))
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--threads", "2",
+             "--bind", f"127.0.0.1:{port}", "web_server:app"],
+            cwd=str(BASE), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        url = f"http://127.0.0.1:{port}{path}"
+        try:
+            for _ in range(200):
+                try:
+                    urllib.request.urlopen(url, timeout=1).read()
+                    break
+                except Exception:
+                    time.sleep(0.1)
+            counts = [0] * concurrency
+            end = time.time() + duration
+
+            def _client(i):
+                while time.time() < end:
+                    try:
+                        urllib.request.urlopen(url, timeout=10).read()
+                        counts[i] += 1
+                    except Exception:
+                        pass
+
+            threads = [threading.Thread(target=_client, args=(i,)) for i in range(concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    total = sum(counts)
+    return {"workers": workers, "requests": total, "rps": total / duration}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--path", default="/api/system/runtime_metrics")
+    ap.add_argument("--gunicorn", action="store_true")
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    base_rps = None
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        if args.gunicorn:
+            r = run_gunicorn(n, args.duration, args.path, args.concurrency)
+        else:
+            r = run_inproc(n, args.duration, args.path)
+        base_rps = base_rps or r["rps"] or 1.0
+        extra = f"  perdidos={r['lost_increments']}" if "lost_increments" in r else ""
+        print(f"workers={n:<3} req={r['requests']:<7} req/s={r['rps']:8.1f}  escala={r['rps'] / base_rps:4.2f}x{extra}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
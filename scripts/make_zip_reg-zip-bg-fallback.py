@@ -0,0 +1,38 @@
+import os
+import zipfile
+from pathlib import Path
+
+ROOT = Path('/root/package/generated_projects/reg-zip-bg-fallback').resolve()
+ZIP_PATH = Path('/root/package/generated_projects/reg-zip-bg-fallback.zip').resolve()
+
+IGNORE_NAMES = ['.env', '.env.example', '.venv', '__pycache__', 'node_modules', 'venv']
+IGNORE_SUFFIXES = ['.key', '.pem', '.pfx']
+
+
+def _should_skip(path: Path) -> bool:
+    name = path.name
+    if name in IGNORE_NAMES:
+        return True
+    if path.suffix in IGNORE_SUFFIXES:
+        return True
+    return False
+
+
+def make_zip() -> None:
+    if ZIP_PATH.exists():
+        ZIP_PATH.unlink()
+    with zipfile.ZipFile(ZIP_PATH, "w", zipfile.ZIP_DEFLATED) as z:
+        for p in ROOT.rglob("*"):
+            rel = p.relative_to(ROOT)
+            if any(part in IGNORE_NAMES for part in rel.parts):
+                continue
+            if _should_skip(p):
+                continue
+            if p.is_file():
+                z.write(p, rel)
+
+
+if __name__ == "__main__":
+    print(f"Criando zip em {ZIP_PATH} a partir de {ROOT}...")
+    make_zip()
+    print("OK.")
@@ -4,12 +4,14 @@ Fluxo: Route -> Service -> Core (Lazy Loading & Intent Router).
 Controle de Custo: Cache de Busca Web e Cache de Respostas (Token Shield).
 """
 
+import asyncio
 import time
 from collections import OrderedDict
 from threading import Lock
-from typing import Any, Generator, Optional, Tuple
+from typing import Any, AsyncIterator, Generator, Iterator, Optional, Tuple
 
-# Cache para buscas web (evita chamar DDGS repetidamente)
+# Última resposta formatada por pergunta: fallback quando o provedor de busca falha.
+# O cache de resultados (persistente, com single-flight) fica em core/search_cache.
 _WEB_CACHE: OrderedDict = OrderedDict()
 _WEB_CACHE_LOCK = Lock()
 _WEB_CACHE_MAX = 50
@@ -38,15 +40,14 @@ def _web_cache_set(key: str, value: str) -> None:
 
 def _responder_busca_web_local(message: str) -> Optional[str]:
     """Resposta factual rápida via tool buscar_web sem depender da LLM."""
-    cached = _web_cache_get(message)
-    if cached:
-        return "(Resultado recente em cache)\n" + cached
-
     try:
         from core.tools_runtime import tool_buscar_web
         result = tool_buscar_web(message, limite=5)
 
         if not result or not result.get("ok"):
+            cached = _web_cache_get(message)
+            if cached:
+                return "(Resultado recente em cache)\n" + cached
             error = (result or {}).get("error") if isinstance(result, dict) else None
             detalhe = f" Detalhe: {error}." if error else ""
             return f"Não consegui consultar a web agora.{detalhe}"
@@ -69,6 +70,8 @@ def _responder_busca_web_local(message: str) -> Optional[str]:
 
         resposta = "\n".join(linhas)
         _web_cache_set(message, resposta)
+        if result.get("cache") in ("memory", "disk"):
+            return "(Resultado recente em cache)\n" + resposta
         return resposta
     except Exception:
         return (
@@ -189,21 +192,13 @@ def processar_mensagem_sync(
     return full_text
 
 
-def handle_chat_stream(
-    user_id: str,
-    chat_id: str,
-    message: str,
-    model: str = "yui",
-    confirm_high_cost: bool = False,
-    active_files: Optional[list] = None,
-    console_errors: Optional[list] = None,
-    workspace_open: bool = False,
-    **kwargs
-) -> Generator[str, None, None]:
-    """Orquestra o stream: Intent Router → Local → Cache → Tools → IA."""
-    from core.ai_loader import get_session_memory, get_detect_intent, get_tool_executor
-    session_memory = get_session_memory()
-
+def _resposta_rapida(
+    user_id: str, chat_id: str, message: str, session_memory: Any
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Etapas sem LLM do stream: Intent Router → Local → Cache → Tools.
+    Retorna (resposta ou None, resumo_ctx para salvar no cache depois).
+    """
     # Intent Router
     try:
         from yui_ai.core.intent_router import decidir_rota
@@ -214,15 +209,13 @@ def handle_chat_stream(
             if resposta_web:
                 session_memory.add(user_id, "user", message)
                 session_memory.add(user_id, "assistant", resposta_web)
-                yield resposta_web
-                return
+                return resposta_web, None
         if rota in ("time", "zip_builder", "terminal", "deploy"):
             resposta_local = responder_local(message)
             if resposta_local:
                 session_memory.add(user_id, "user", message)
                 session_memory.add(user_id, "assistant", resposta_local)
-                yield resposta_local
-                return
+                return resposta_local, None
     except Exception:
         pass
 
@@ -233,8 +226,7 @@ def handle_chat_stream(
         if resposta_local:
             session_memory.add(user_id, "user", message)
             session_memory.add(user_id, "assistant", resposta_local)
-            yield resposta_local
-            return
+            return resposta_local, None
     except Exception:
         pass
 
@@ -249,12 +241,12 @@ def handle_chat_stream(
         if cached:
             session_memory.add(user_id, "user", message)
             session_memory.add(user_id, "assistant", cached)
-            yield cached
-            return
+            return cached, resumo_ctx
     except Exception:
         pass
 
     session_memory.add(user_id, "user", message)
+    from core.ai_loader import get_detect_intent, get_tool_executor
     detect_intent = get_detect_intent()
     intent = detect_intent(message)
 
@@ -265,8 +257,40 @@ def handle_chat_stream(
             msg = tool_result.get("message") or str(tool_result)
             if msg and "nenhum resultado" not in msg.lower():
                 session_memory.add(user_id, "assistant", msg)
-                yield msg
-                return
+                return msg, resumo_ctx
+    return None, resumo_ctx
+
+
+def _finalizar_resposta(user_id: str, message: str, reply: str, resumo_ctx: Optional[str], session_memory: Any) -> None:
+    """Grava a resposta do LLM na memória de sessão e no Cache Brain."""
+    session_memory.add(user_id, "assistant", reply)
+    if reply:
+        try:
+            from yui_ai.core.cache_brain import salvar_cache
+            salvar_cache(message, reply, user_id=user_id, resumo_contexto=resumo_ctx)
+        except Exception:
+            pass
+
+
+def handle_chat_stream(
+    user_id: str,
+    chat_id: str,
+    message: str,
+    model: str = "yui",
+    confirm_high_cost: bool = False,
+    active_files: Optional[list] = None,
+    console_errors: Optional[list] = None,
+    workspace_open: bool = False,
+    **kwargs
+) -> Generator[str, None, None]:
+    """Orquestra o stream: Intent Router → Local → Cache → Tools → IA."""
+    from core.ai_loader import get_session_memory
+    session_memory = get_session_memory()
+
+    resposta, resumo_ctx = _resposta_rapida(user_id, chat_id, message, session_memory)
+    if resposta is not None:
+        yield resposta
+        return
 
     full_reply = []
     for chunk in stream_resposta(
@@ -280,15 +304,72 @@ def handle_chat_stream(
         full_reply.append(chunk)
         yield chunk
 
-    reply = "".join(full_reply)
-    session_memory.add(user_id, "assistant", reply)
+    _finalizar_resposta(user_id, message, "".join(full_reply), resumo_ctx, session_memory)
 
-    if reply:
-        try:
-            from yui_ai.core.cache_brain import salvar_cache
-            salvar_cache(message, reply, user_id=user_id, resumo_contexto=resumo_ctx)
-        except Exception:
-            pass
+
+async def _aiter_thread(gen: Iterator[str]) -> AsyncIterator[str]:
+    """Consome um gerador síncrono sem bloquear o event loop (um next() por vez em thread)."""
+    fim = object()
+    while True:
+        chunk = await asyncio.to_thread(next, gen, fim)
+        if chunk is fim:
+            return
+        yield chunk
+
+
+async def handle_chat_stream_async(
+    user_id: str,
+    chat_id: str,
+    message: str,
+    model: str = "yui",
+    confirm_high_cost: bool = False,
+    active_files: Optional[list] = None,
+    console_errors: Optional[list] = None,
+    workspace_open: bool = False,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Versão async de handle_chat_stream (modo ASGI). Etapas rápidas rodam em thread
+    uma vez; a geração do LLM usa stream_chat_agent (AsyncOpenAI), então um stream
+    esperando tokens custa uma corrotina, não uma thread. Fallback: agent_controller.
+    """
+    from core.ai_loader import get_session_memory
+    session_memory = get_session_memory()
+
+    resposta, resumo_ctx = await asyncio.to_thread(_resposta_rapida, user_id, chat_id, message, session_memory)
+    if resposta is not None:
+        yield resposta
+        return
+
+    full_reply: list[str] = []
+    try:
+        from yui.yui_core import _resolve_agent, stream_chat_agent
+        agent = await asyncio.to_thread(_resolve_agent, model, message)
+        async for chunk in stream_chat_agent(
+            message, agent, chat_id, user_id,
+            active_files=active_files,
+            console_errors=console_errors,
+            workspace_open=workspace_open,
+        ):
+            full_reply.append(chunk)
+            yield chunk
+    except Exception:
+        if full_reply:
+            raise
+        from core.ai_loader import get_agent_controller
+        agent_controller = get_agent_controller()
+        async for chunk in _aiter_thread(agent_controller(
+            user_id, chat_id, message,
+            model=model,
+            confirm_high_cost=confirm_high_cost,
+            active_files=active_files,
+            console_errors=console_errors,
+            workspace_open=workspace_open,
+        )):
+            full_reply.append(chunk)
+            yield chunk
+
+    await asyncio.to_thread(_finalizar_resposta, user_id, message, "".join(full_reply), resumo_ctx, session_memory)
 
 
 def improve_message(prompt: str) -> Tuple[str, bool]:
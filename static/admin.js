@@ -99,18 +99,21 @@
       });
   }
 
-  function loadUsers() {
+  var usersPage = 1;
+
+  function loadUsers(page) {
     var div = document.getElementById("adminUsersList");
     if (!div) return;
+    usersPage = Math.max(1, page || usersPage || 1);
     div.innerHTML = "Carregando...";
-    adminFetch("/api/admin/users")
+    adminFetch("/api/admin/users?page=" + usersPage + "&per_page=50")
       .then(function (data) {
         if (!data.ok) {
           div.innerHTML = "<div class='adminError'>" + (data.error || "Erro") + "</div>";
           return;
         }
         var users = data.users || [];
-        if (users.length === 0) {
+        if (users.length === 0 && usersPage === 1) {
           div.innerHTML = "<div class='adminEmpty'>Nenhum usuário encontrado.</div>";
           return;
         }
@@ -119,7 +122,18 @@
           html += "<tr><td class='adminTdId'>" + (u.id || "—").toString().slice(0, 8) + "…</td><td>" + (u.email || "—") + "</td><td>" + (u.chats_count || 0) + "</td></tr>";
         });
         html += "</tbody></table>";
+        var pages = Math.max(1, Math.ceil((data.total || 0) / (data.per_page || 50)));
+        html += "<div class='adminPager'>" +
+          "<button type='button' class='adminBtn' data-admin-page='" + (usersPage - 1) + "'" + (usersPage <= 1 ? " disabled" : "") + ">‹</button>" +
+          "<span>Página " + usersPage + " de " + pages + " (" + (data.total || 0) + " usuários)</span>" +
+          "<button type='button' class='adminBtn' data-admin-page='" + (usersPage + 1) + "'" + (data.has_more ? "" : " disabled") + ">›</button>" +
+          "</div>";
         div.innerHTML = html;
+        div.querySelectorAll("[data-admin-page]").forEach(function (btn) {
+          btn.addEventListener("click", function () {
+            loadUsers(parseInt(btn.getAttribute("data-admin-page"), 10) || 1);
+          });
+        });
       })
       .catch(function (e) {
         div.innerHTML = "<div class='adminError'>Erro: " + (e.message || String(e)) + "</div>";
@@ -214,7 +228,7 @@
     var statsRefresh = document.getElementById("adminStatsRefresh");
     if (logsRefresh) logsRefresh.addEventListener("click", loadLogs);
     if (logsClear) logsClear.addEventListener("click", clearLogs);
-    if (usersRefresh) usersRefresh.addEventListener("click", loadUsers);
+    if (usersRefresh) usersRefresh.addEventListener("click", function () { loadUsers(); });
     if (statsRefresh) statsRefresh.addEventListener("click", loadStats);
 
     var adminTabEl = document.querySelector('.sidebarTab[data-sidebar-tab="admin"]');
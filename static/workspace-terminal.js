@@ -9,11 +9,20 @@
   var webLinksAddon = null;
   var ws = null;
   var container = null;
+  var disposing = false;
+  var reconnectAttempts = 0;
+  var MAX_RECONNECT = 5;
+  var SESSION_KEY = "yuiTerminalSession";
+  // Primeira mensagem do servidor: ESC ] 7777;yui-session=<token> BEL (token para reattach)
+  var SESSION_PREFIX = "\x1b]7777;yui-session=";
 
   function getWsUrl() {
     var loc = window.location;
     var protocol = loc.protocol === "https:" ? "wss:" : "ws:";
-    return protocol + "//" + loc.host + "/ws/terminal";
+    var url = protocol + "//" + loc.host + "/ws/terminal";
+    var sessionId = null;
+    try { sessionId = window.sessionStorage.getItem(SESSION_KEY); } catch (e) {}
+    return sessionId ? url + "?session=" + encodeURIComponent(sessionId) : url;
   }
 
   function initTerminal() {
@@ -54,6 +63,9 @@
     term.open(container);
     if (fitAddon) fitAddon.fit();
     term.writeln("Conectando ao terminal...");
+    term.onData(function (data) {
+      if (ws && ws.readyState === WebSocket.OPEN) ws.send(data);
+    });
     connect();
     container.addEventListener("click", function () {
       if (term) term.focus();
@@ -67,27 +79,37 @@
       ws.binaryType = "arraybuffer";
       ws.onopen = function () {
         term.clear();
-        term.writeln("Terminal conectado. Cwd: sandbox/");
+        if (!reconnectAttempts) term.writeln("Terminal conectado. Cwd: sandbox/");
+        reconnectAttempts = 0;
       };
       ws.onmessage = function (ev) {
         var str = typeof ev.data === "string" ? ev.data : new TextDecoder().decode(ev.data);
+        if (str.indexOf(SESSION_PREFIX) === 0) {
+          try { window.sessionStorage.setItem(SESSION_KEY, str.slice(SESSION_PREFIX.length, -1)); } catch (e) {}
+          return;
+        }
         term.write(str);
       };
       ws.onclose = function () {
+        if (disposing || !term) return;
+        if (reconnectAttempts < MAX_RECONNECT) {
+          reconnectAttempts += 1;
+          term.writeln("\r\n\r\nTerminal desconectado. Reconectando...");
+          setTimeout(connect, 1000 * reconnectAttempts);
+          return;
+        }
         term.writeln("\r\n\r\nTerminal desconectado. Recarregue o Workspace para reconectar.");
       };
       ws.onerror = function () {
         term.writeln("\r\nErro de conexão. O terminal pode não estar disponível neste ambiente.");
       };
-      term.onData(function (data) {
-        if (ws && ws.readyState === WebSocket.OPEN) ws.send(data);
-      });
     } catch (e) {
       term.writeln("\r\nErro ao conectar: " + (e.message || String(e)));
     }
   }
 
   function disposeTerminal() {
+    disposing = true;
     if (ws) {
       ws.close();
       ws = null;
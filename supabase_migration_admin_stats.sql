@@ -0,0 +1,183 @@
+-- Migration: estatísticas do painel Admin calculadas no servidor
+-- Execute no SQL Editor do Supabase (Dashboard -> SQL Editor)
+-- Usado por: GET /api/admin/users (paginado) e GET /api/admin/stats
+-- Sem esta migration o backend cai no modo compatível (consultas paginadas simples).
+
+-- ==========================================================
+-- user_stats: agregados materializados por usuário (opcional)
+-- Atualizado incrementalmente por triggers em chats/messages.
+-- ==========================================================
+CREATE TABLE IF NOT EXISTS user_stats (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  chats_count INTEGER NOT NULL DEFAULT 0,
+  messages_count INTEGER NOT NULL DEFAULT 0,
+  last_activity_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+ALTER TABLE user_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION user_stats_bump(p_user_id UUID, p_chats INTEGER, p_messages INTEGER)
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  INSERT INTO user_stats (user_id, chats_count, messages_count, last_activity_at, updated_at)
+  VALUES (p_user_id, GREATEST(p_chats, 0), GREATEST(p_messages, 0), now(), now())
+  ON CONFLICT (user_id) DO UPDATE SET
+    chats_count = GREATEST(user_stats.chats_count + p_chats, 0),
+    messages_count = GREATEST(user_stats.messages_count + p_messages, 0),
+    last_activity_at = CASE WHEN p_chats > 0 OR p_messages > 0 THEN now() ELSE user_stats.last_activity_at END,
+    updated_at = now();
+$$;
+
+CREATE OR REPLACE FUNCTION user_stats_on_chat()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM user_stats_bump(NEW.user_id, 1, 0);
+    RETURN NEW;
+  END IF;
+  -- BEFORE DELETE: as mensagens ainda existem; o cascade apaga depois.
+  PERFORM user_stats_bump(
+    OLD.user_id, -1,
+    -(SELECT count(*) FROM messages WHERE messages.chat_id = OLD.id)::INTEGER
+  );
+  RETURN OLD;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION user_stats_on_message()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_user UUID;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT user_id INTO v_user FROM chats WHERE id = NEW.chat_id;
+    IF v_user IS NOT NULL THEN
+      PERFORM user_stats_bump(v_user, 0, 1);
+    END IF;
+    RETURN NEW;
+  END IF;
+  -- Chat já removido (cascade): contagem descontada em user_stats_on_chat.
+  SELECT user_id INTO v_user FROM chats WHERE id = OLD.chat_id;
+  IF v_user IS NOT NULL THEN
+    PERFORM user_stats_bump(v_user, 0, -1);
+  END IF;
+  RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_stats_chats_ins ON chats;
+CREATE TRIGGER trg_user_stats_chats_ins AFTER INSERT ON chats
+  FOR EACH ROW EXECUTE FUNCTION user_stats_on_chat();
+
+DROP TRIGGER IF EXISTS trg_user_stats_chats_del ON chats;
+CREATE TRIGGER trg_user_stats_chats_del BEFORE DELETE ON chats
+  FOR EACH ROW EXECUTE FUNCTION user_stats_on_chat();
+
+DROP TRIGGER IF EXISTS trg_user_stats_messages ON messages;
+CREATE TRIGGER trg_user_stats_messages AFTER INSERT OR DELETE ON messages
+  FOR EACH ROW EXECUTE FUNCTION user_stats_on_message();
+
+-- Reconstrói user_stats (todos os usuários ou só um). Rodar uma vez após a migration.
+CREATE OR REPLACE FUNCTION refresh_user_stats(p_user_id UUID DEFAULT NULL)
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+  INSERT INTO user_stats (user_id, chats_count, messages_count, last_activity_at, updated_at)
+  SELECT c.user_id,
+         count(DISTINCT c.id)::INTEGER,
+         count(m.id)::INTEGER,
+         GREATEST(max(c.created_at), max(m.created_at)),
+         now()
+  FROM chats c
+  LEFT JOIN messages m ON m.chat_id = c.id
+  WHERE p_user_id IS NULL OR c.user_id = p_user_id
+  GROUP BY c.user_id
+  ON CONFLICT (user_id) DO UPDATE SET
+    chats_count = EXCLUDED.chats_count,
+    messages_count = EXCLUDED.messages_count,
+    last_activity_at = EXCLUDED.last_activity_at,
+    updated_at = now();
+$$;
+
+SELECT refresh_user_stats();
+
+-- ==========================================================
+-- RPC: listagem paginada de usuários com contagens agrupadas
+-- Uma página = uma query. total_count vem na mesma resposta.
+-- ==========================================================
+CREATE OR REPLACE FUNCTION admin_list_users(p_limit INTEGER DEFAULT 50, p_offset INTEGER DEFAULT 0)
+RETURNS TABLE (
+  id UUID,
+  email TEXT,
+  created_at TIMESTAMPTZ,
+  last_sign_in_at TIMESTAMPTZ,
+  chats_count INTEGER,
+  messages_count INTEGER,
+  total_count BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, auth
+AS $$
+  WITH page AS (
+    SELECT u.id,
+           COALESCE(p.email, u.email)::TEXT AS email,
+           u.created_at,
+           u.last_sign_in_at,
+           count(*) OVER () AS total_count
+    FROM auth.users u
+    LEFT JOIN users_profile p ON p.id = u.id
+    ORDER BY u.created_at DESC
+    LIMIT GREATEST(LEAST(p_limit, 200), 1)
+    OFFSET GREATEST(p_offset, 0)
+  )
+  SELECT page.id,
+         page.email,
+         page.created_at,
+         page.last_sign_in_at,
+         COALESCE(s.chats_count, c.chats_count, 0)::INTEGER,
+         COALESCE(s.messages_count, 0)::INTEGER,
+         page.total_count
+  FROM page
+  LEFT JOIN user_stats s ON s.user_id = page.id
+  LEFT JOIN LATERAL (
+    SELECT count(*)::INTEGER AS chats_count FROM chats WHERE chats.user_id = page.id
+  ) c ON s.user_id IS NULL
+  ORDER BY page.created_at DESC;
+$$;
+
+-- RPC: totais gerais em uma única chamada
+CREATE OR REPLACE FUNCTION admin_global_stats()
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, auth
+AS $$
+  SELECT jsonb_build_object(
+    'users', (SELECT count(*) FROM auth.users),
+    'chats', (SELECT count(*) FROM chats),
+    'messages', (SELECT count(*) FROM messages)
+  );
+$$;
+
+-- Apenas o backend (service_role) pode chamar as RPCs administrativas
+REVOKE ALL ON FUNCTION admin_list_users(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION admin_global_stats() FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION refresh_user_stats(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION user_stats_bump(UUID, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION admin_list_users(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION admin_global_stats() TO service_role;
+GRANT EXECUTE ON FUNCTION refresh_user_stats(UUID) TO service_role;
+
+COMMENT ON TABLE user_stats IS 'Agregados por usuário (chats, mensagens) mantidos por triggers; reconstruir com refresh_user_stats()';
@@ -0,0 +1,82 @@
+-- Migration: contexto do turno em uma única chamada (RPC) com busca full-text
+-- Execute no SQL Editor do Supabase (Dashboard -> SQL Editor)
+-- Usado por: core/context_retrieval.py (build_context_text + memoria_ia.buscar_memoria)
+-- Sem esta migration o backend volta às queries separadas (comportamento anterior).
+
+-- Vetor de busca (português) para memoria_ia: resumo + tags
+ALTER TABLE memoria_ia
+  ADD COLUMN IF NOT EXISTS busca TSVECTOR
+  GENERATED ALWAYS AS (
+    to_tsvector('portuguese', coalesce(resumo, '') || ' ' || coalesce(tags, ''))
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_memoria_ia_busca ON memoria_ia USING GIN (busca);
+
+-- Índice composto para os eventos do turno (user + tipo + chat, mais recentes primeiro)
+CREATE INDEX IF NOT EXISTS idx_memory_events_user_tipo_created
+  ON memory_events(user_id, tipo, created_at DESC);
+
+-- p_tsquery: termos já separados por " | " (montado no backend, só caracteres de palavra)
+CREATE OR REPLACE FUNCTION yui_turn_context(
+  p_user_id UUID,
+  p_chat_id UUID DEFAULT NULL,
+  p_tsquery TEXT DEFAULT '',
+  p_limit_short INTEGER DEFAULT 20,
+  p_limit_long INTEGER DEFAULT 20,
+  p_limit_memoria INTEGER DEFAULT 12
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_query TSQUERY;
+BEGIN
+  IF coalesce(trim(p_tsquery), '') <> '' THEN
+    v_query := to_tsquery('portuguese', p_tsquery);
+  END IF;
+
+  RETURN jsonb_build_object(
+    'longa', coalesce((
+      SELECT jsonb_agg(to_jsonb(e) ORDER BY e.created_at DESC)
+      FROM (
+        SELECT id, chat_id, tipo, conteudo, created_at
+        FROM memory_events
+        WHERE user_id = p_user_id AND tipo = 'longa'
+        ORDER BY created_at DESC
+        LIMIT LEAST(GREATEST(p_limit_long, 1), 100)
+      ) e
+    ), '[]'::jsonb),
+    'curta', CASE WHEN p_chat_id IS NULL THEN '[]'::jsonb ELSE coalesce((
+      SELECT jsonb_agg(to_jsonb(e) ORDER BY e.created_at DESC)
+      FROM (
+        SELECT id, chat_id, tipo, conteudo, created_at
+        FROM memory_events
+        WHERE user_id = p_user_id AND tipo = 'curta' AND chat_id = p_chat_id
+        ORDER BY created_at DESC
+        LIMIT LEAST(GREATEST(p_limit_short, 1), 100)
+      ) e
+    ), '[]'::jsonb) END,
+    'memoria', coalesce((
+      SELECT jsonb_agg(to_jsonb(m) - 'rank' ORDER BY m.rank DESC, m.created_at DESC)
+      FROM (
+        SELECT resumo, tags, created_at, chat_id,
+               CASE WHEN v_query IS NULL THEN 0 ELSE ts_rank(busca, v_query) END AS rank
+        FROM memoria_ia
+        WHERE user_id = p_user_id
+          AND (p_chat_id IS NULL OR chat_id = p_chat_id OR chat_id IS NULL)
+          AND (v_query IS NULL OR busca @@ v_query)
+        ORDER BY rank DESC, created_at DESC
+        LIMIT LEAST(GREATEST(p_limit_memoria, 1), 50)
+      ) m
+    ), '[]'::jsonb)
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION yui_turn_context(UUID, UUID, TEXT, INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION yui_turn_context(UUID, UUID, TEXT, INTEGER, INTEGER, INTEGER) TO service_role;
+
+COMMENT ON COLUMN memoria_ia.busca IS 'tsvector (portuguese) de resumo + tags; usado pela RPC yui_turn_context';
@@ -5,7 +5,30 @@ Execute os testes sempre da raiz: python -m pytest tests/ -v
 import sys
 from pathlib import Path
 
+import pytest
+
 # Raiz do projeto (pasta que contém web_server.py, cli.py)
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _log_stores_in_tmp(tmp_path_factory):
+    """
+    Energia, goals e uso diário (core/log_store) gravam snapshot + .log + .lock.
+    Nos testes, esses arquivos vão para um diretório temporário, não para data/.
+    """
+    from core import energy_manager, usage_tracker
+    from core.goals import goal_manager
+
+    base = tmp_path_factory.mktemp("log_stores")
+    mp = pytest.MonkeyPatch()
+    mp.setattr(energy_manager, "ENERGY_STATE_PATH", base / "energy_state.json")
+    mp.setattr(goal_manager, "GOAL_MEMORY_PATH", base / "goal_memory.json")
+    mp.setattr(usage_tracker, "USAGE_PATH", base / "usage_daily.json")
+    for mod in (energy_manager, goal_manager, usage_tracker):
+        mp.setattr(mod, "_store", None)
+    mp.setattr(energy_manager, "_energy_manager", None)
+    yield base
+    mp.undo()
@@ -126,6 +126,21 @@ def test_job_queue_cleanup_removes_expired_entries():
     assert "new" in job_queue._results
 
 
+def test_job_queue_poll_cleanup_is_throttled(monkeypatch):
+    """Garante que enqueue/poll não varrem os jobs a cada chamada."""
+    varreduras = []
+    monkeypatch.setattr(job_queue, "cleanup_old_jobs", lambda *a, **k: varreduras.append(1) or 0)
+    monkeypatch.setattr(job_queue, "_last_cleanup", float("-inf"))
+
+    for _ in range(5):
+        job_queue.get_job_result("inexistente")
+    assert len(varreduras) == 1
+
+    monkeypatch.setattr(job_queue, "_last_cleanup", job_queue._last_cleanup - job_queue.CLEANUP_INTERVAL)
+    job_queue.get_job_result("inexistente")
+    assert len(varreduras) == 2
+
+
 def test_sandbox_execute_javascript_basic_success():
     """Testa a execução básica de código no Sandbox."""
     client = app.test_client()
@@ -229,3 +244,1362 @@ def test_sandbox_runner_module_has_valid_python_syntax():
     """Verifica sintaxe válida do módulo sandbox runner."""
     root = Path(__file__).resolve().parents[1]
     py_compile.compile(str(root / 'core' / 'sandbox_executor' / 'runner.py'), doraise=True)
+
+
+def test_admin_users_is_paginated_and_counts_only_current_page(monkeypatch):
+    """Garante que /api/admin/users pagina e conta chats só da página (sem varrer a tabela)."""
+    from types import SimpleNamespace
+    from web.routes import routes_admin
+
+    profiles = [{"id": f"u{i}", "email": f"u{i}@x.com"} for i in range(5)]
+    queried = []
+
+    class _Query:
+        def __init__(self, table):
+            self.table, self.filters, self.rng, self.count = table, {}, None, None
+
+        def select(self, *_cols, count=None):
+            self.count = count
+            return self
+
+        def range(self, start, end):
+            self.rng = (start, end)
+            return self
+
+        def in_(self, col, values):
+            self.filters[col] = list(values)
+            return self
+
+        def eq(self, col, value):
+            self.filters[col] = [value]
+            return self
+
+        def limit(self, _n):
+            return self
+
+        def execute(self):
+            queried.append((self.table, dict(self.filters), self.rng))
+            if self.table == "user_stats":
+                raise RuntimeError("relation user_stats does not exist")
+            if self.table == "users_profile" and "id" in self.filters:
+                return SimpleNamespace(data=[p for p in profiles if p["id"] in self.filters["id"]], count=None)
+            if self.table == "users_profile":
+                start, end = self.rng
+                return SimpleNamespace(data=profiles[start:end + 1], count=len(profiles))
+            if self.table == "chats":
+                uid = self.filters["user_id"][0]
+                return SimpleNamespace(data=[{"id": "c"}], count=int(uid[1:]))
+            return SimpleNamespace(data=[], count=0)
+
+    class _RpcMissing:
+        def execute(self):
+            raise RuntimeError("function admin_list_users does not exist")
+
+    fake_sb = SimpleNamespace(table=_Query, rpc=lambda *_a, **_k: _RpcMissing())
+    monkeypatch.setattr(routes_admin, "_is_admin", lambda *_a, **_k: True)
+    monkeypatch.setattr("core.supabase_client.get_supabase_client", lambda *_a, **_k: fake_sb)
+
+    client = app.test_client()
+    resp = client.get("/api/admin/users?user_id=admin&page=2&per_page=2")
+    assert resp.status_code == 200
+    payload = resp.get_json()
+    assert payload["ok"] is True
+    assert payload["source"] == "fallback"
+    assert [u["id"] for u in payload["users"]] == ["u2", "u3"]
+    assert [u["chats_count"] for u in payload["users"]] == [2, 3]
+    assert payload["total"] == 5 and payload["has_more"] is True
+    chat_queries = [q for q in queried if q[0] == "chats"]
+    assert {q[1]["user_id"][0] for q in chat_queries} == {"u2", "u3"}
+
+    # Com a API admin do Auth: contas sem users_profile também aparecem, com o perfil juntado
+    contas = [{"id": f"u{i}", "email": "" if i < 5 else f"a{i}@x.com"} for i in range(7)]
+
+    def _list_users(page, per_page):
+        return contas[(page - 1) * per_page:page * per_page]
+
+    fake_sb.auth = SimpleNamespace(admin=SimpleNamespace(list_users=_list_users))
+    queried.clear()
+    payload = client.get("/api/admin/users?user_id=admin&page=3&per_page=2").get_json()
+    assert [u["id"] for u in payload["users"]] == ["u4", "u5"]
+    assert [u["email"] for u in payload["users"]] == ["u4@x.com", "a5@x.com"]
+    assert payload["has_more"] is True
+    payload = client.get("/api/admin/users?user_id=admin&page=4&per_page=2").get_json()
+    assert [u["id"] for u in payload["users"]] == ["u6"] and payload["has_more"] is False
+
+
+def test_log_store_concurrent_appends_are_not_lost(tmp_path):
+    """Garante que o LogStore agrega em RAM, compacta e não perde incrementos entre threads."""
+    import threading
+    from core.log_store import LogStore
+
+    def _reduce(state, op):
+        state[op["k"]] = state.get(op["k"], 0) + op["n"]
+        return state
+
+    path = tmp_path / "counters.json"
+    store = LogStore(path, _reduce, compact_every=50, snapshot_interval=3600)
+
+    def _worker():
+        for _ in range(100):
+            store.apply({"k": "hits", "n": 1})
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.read()["hits"] == 800
+    assert path.exists()
+    assert store.pending() < 50
+
+    # Outro "processo" (instância nova) enxerga snapshot + log pendente
+    other = LogStore(path, _reduce)
+    assert other.read()["hits"] == 800
+    other.apply({"k": "hits", "n": 5})
+    assert store.read()["hits"] == 805
+    store.compact()
+    assert store.log_path.stat().st_size == 0
+    assert LogStore(path, _reduce).read()["hits"] == 805
+
+
+def test_goal_and_energy_updates_append_deltas_without_lost_updates(tmp_path, monkeypatch):
+    """Garante que progresso de goal e energia gravam variações: escritores com leitura velha se somam."""
+    from core import energy_manager as em
+    from core.goals import goal_manager as gm
+    from core.log_store import LogStore
+
+    monkeypatch.setattr(gm, "_store", LogStore(tmp_path / "goals.json", gm._reduce_memory,
+                                               default=lambda: {"goals": [], "last_updated": ""}))
+    gm.add_goal("site")
+    velho = gm._load_memory()
+    monkeypatch.setattr(gm, "_load_memory", lambda: velho)  # os dois "processos" leram antes de gravar
+    gm.update_progress("site", True, delta=0.25)
+    gm.update_progress("site", True, delta=0.25)
+    gm.update_progress("site", False, delta=0.5)
+    goal = gm._store.read()["goals"][0]
+    assert goal["progress"] == 0.5 and goal["priority"] == 0.1 and goal["last_execution"]
+
+    # Dois processos (stores distintos no mesmo arquivo) consomem energia e persistem
+    caminho = tmp_path / "energy.json"
+    padrao = lambda: {"energy": em.ENERGY_MAX, "last_updated": ""}
+    monkeypatch.setattr(em, "_shared_energy", lambda: None)
+    monkeypatch.setattr(em, "_store", LogStore(caminho, em._reduce_state, default=padrao))
+    a = em.EnergyManager()
+    monkeypatch.setattr(em, "_store", LogStore(caminho, em._reduce_state, default=padrao))
+    b = em.EnergyManager()
+    a.consume(30)
+    b.consume(20)
+    a.persist()
+    b.persist()
+    assert b.energy == em.ENERGY_MAX - 50
+    assert LogStore(caminho, em._reduce_state, default=padrao).read()["energy"] == em.ENERGY_MAX - 50
+
+
+def test_history_manager_stores_deltas_and_reverts(tmp_path):
+    """Garante que o histórico guarda deltas, reconstrói versões, reverte e aplica retenção."""
+    from yui_ai.code_editor.history_manager import HistoryManager
+
+    alvo = tmp_path / "app.py"
+    linhas = [f"linha_{i} = {i}\n" for i in range(400)]
+    versoes = ["".join(linhas)]
+    hm = HistoryManager(diretorio=str(tmp_path / "hist"))
+    for n in range(25):
+        linhas[n * 7] = f"linha_{n * 7} = 'editada {n}'\n"
+        versoes.append("".join(linhas))
+        hm.registrar_mudanca(str(alvo), versoes[-2], versoes[-1], tags=["edicao_codigo"])
+    alvo.write_text(versoes[-1], encoding="utf-8")
+
+    objetos = [p for p in (tmp_path / "hist" / "objects").rglob("*") if p.is_file()]
+    assert sum(p.stat().st_size for p in objetos) < len(versoes[0]) * 3
+
+    reaberto = HistoryManager(diretorio=str(tmp_path / "hist"))
+    assert reaberto.obter_conteudos(10) == (versoes[10], versoes[11])
+    ok, erro = reaberto.reverter_arquivo(str(alvo))
+    assert ok is True and erro is None
+    assert alvo.read_text(encoding="utf-8") == versoes[-2]
+
+    reaberto.store.compactar(max_entradas=5)
+    assert len(reaberto.historico) == 5
+    assert HistoryManager(diretorio=str(tmp_path / "hist")).obter_conteudos(24) == (versoes[24], versoes[25])
+
+    # Retenção com histerese: compacta ao passar de ~1,25 × max e volta a max (não a cada registro)
+    from yui_ai.code_editor.history_store import HistoryStore
+    store = HistoryStore(str(tmp_path / "hist2"), max_entradas=8)
+    compactacoes = []
+    original = store.compactar
+    store.compactar = lambda **kw: compactacoes.append(len(store._entradas)) or original(**kw)
+    for n in range(30):
+        store.registrar(str(alvo), f"v{n}\n", f"v{n + 1}\n")
+    assert compactacoes == [11, 11, 11, 11, 11, 11, 11]
+    assert 8 <= len(store.entradas()) <= 10
+
+
+def test_architecture_memory_indexed_relevance_and_incremental_writes(tmp_path):
+    """Garante busca por índice invertido e escrita incremental (log) da memória arquitetural."""
+    from yui_ai.architecture.memory_store import ArchitectureMemory
+
+    arquivo = str(tmp_path / "arch.json")
+    mem_arch = ArchitectureMemory(arquivo=arquivo)
+    mem_arch.registrar_regra("Sempre usar type hints em Python", tags=["python"])
+    mem_arch.registrar_regra("Rotas Flask ficam em web/routes", obrigatoria=False, tags=["flask"])
+    mem_arch.registrar_decisao("Usar Supabase para persistir chats", motivo="multiusuário")
+    mem_arch.registrar_decisao("Cache de busca web em disco")
+    mem_arch.registrar_restricao("Não chamar a OpenAI direto das rotas Flask")
+
+    assert not Path(arquivo).exists()  # nenhuma reescrita completa ainda
+    assert len(Path(arquivo + ".log").read_text(encoding="utf-8").splitlines()) == 5
+
+    top = mem_arch.buscar("onde colocar rotas flask?")
+    assert top and top[0][2]["regra"].startswith("Rotas Flask")
+    assert [d["decisao"] for d in mem_arch.obter_decisoes_relevantes("persistir chats supabase")][0].startswith("Usar Supabase")
+    assert [r["id"] for r in mem_arch.obter_regras_relevantes(tags=["flask"])] == [1]
+
+    reaberta = ArchitectureMemory(arquivo=arquivo)
+    assert len(reaberta.memoria["regras"]) == 2
+    assert reaberta.buscar("type hints")[0][1] == "regras"
+
+
+def test_memoria_ia_local_backend_uses_sqlite_fts(tmp_path, monkeypatch):
+    """Garante que o backend local da memoria_ia ranqueia via SQLite FTS5."""
+    from core import memoria_ia, context_retrieval
+
+    monkeypatch.setattr(memoria_ia, "supabase", None)
+    monkeypatch.setattr(context_retrieval, "supabase", None)
+    monkeypatch.setattr(memoria_ia, "MEMORIA_IA_PATH", tmp_path / "memoria_ia.json")
+    monkeypatch.setattr(memoria_ia, "MEMORIA_IA_DB", tmp_path / "memoria_ia.db")
+    monkeypatch.setattr(memoria_ia, "_local_conn", None)
+    context_retrieval.invalidate()
+
+    memoria_ia.salvar_resumo("u-fts", "Decidimos usar Postgres para os pedidos", tags="#db")
+    memoria_ia.salvar_resumo("u-fts", "Login via Supabase Auth com magic link", tags="#login")
+    memoria_ia.salvar_resumo("outro", "Postgres também aqui", tags="#db")
+
+    texto = memoria_ia.buscar_memoria("u-fts", query="qual banco postgres?")
+    assert "Postgres para os pedidos" in texto
+    assert "Login" not in texto and "também aqui" not in texto
+    assert "magic link" in memoria_ia.buscar_memoria("u-fts", query="autenticação login")
+
+
+def test_turn_context_uses_single_rpc_per_turn(monkeypatch):
+    """Garante que build_context_text e buscar_memoria compartilham uma única RPC por turno."""
+    from types import SimpleNamespace
+    from core import context_retrieval
+    from core.memory_manager import build_context_text
+    from core.memoria_ia import buscar_memoria
+
+    calls = []
+
+    def _rpc(name, params):
+        calls.append((name, params))
+        data = {
+            "longa": [{"conteudo": "Usuário prefere Python"}],
+            "curta": [{"conteudo": "Falou sobre deploy"}],
+            "memoria": [{"resumo": "Deploy no Zeabur", "tags": "#deploy"}],
+        }
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+    monkeypatch.setattr(context_retrieval, "supabase", SimpleNamespace(rpc=_rpc))
+    monkeypatch.setattr(context_retrieval, "_rpc_disabled_until", 0.0)
+    context_retrieval.invalidate()
+
+    msg = "como faço o deploy?"
+    memoria = buscar_memoria("u-rpc", query=msg, chat_id="c1", limite=6)
+    contexto = build_context_text("u-rpc", "c1", limit_short=8, limit_long=8, query=msg)
+
+    assert "Deploy no Zeabur" in memoria
+    assert "Usuário prefere Python" in contexto and "Falou sobre deploy" in contexto
+    assert len(calls) == 1
+    assert calls[0][0] == "yui_turn_context"
+    assert calls[0][1]["p_tsquery"] == "como | faço | deploy"
+
+
+def test_turn_context_rpc_backs_off_only_on_missing_function_or_repeated_transport_errors(monkeypatch):
+    """Garante que um pedido inválido não desliga a RPC para todos os usuários."""
+    from types import SimpleNamespace
+    from core import context_retrieval as cr
+
+    class _APIError(Exception):
+        def __init__(self, code, message):
+            super().__init__({"code": code, "message": message})
+            self.code = code
+
+    falha = {"erro": None}
+    calls = []
+
+    def _rpc(name, params):
+        calls.append(params["p_user_id"])
+
+        def _execute():
+            if falha["erro"] is not None:
+                raise falha["erro"]
+            return SimpleNamespace(data={"longa": [], "curta": [], "memoria": []})
+        return SimpleNamespace(execute=_execute)
+
+    monkeypatch.setattr(cr, "supabase", SimpleNamespace(rpc=_rpc))
+    monkeypatch.setattr(cr, "_rpc_disabled_until", 0.0)
+    monkeypatch.setattr(cr, "_rpc_failures", 0)
+    monkeypatch.setattr(cr, "_fetch_fallback", lambda *a: cr._empty())
+
+    # user_id que não é UUID: erro do banco sobre a entrada → fallback, RPC segue ligada
+    falha["erro"] = _APIError("22P02", 'invalid input syntax for type uuid: "abc"')
+    assert cr._fetch_rpc("abc", None, "oi") is None
+    falha["erro"] = None
+    assert cr._fetch_rpc("u-ok", None, "oi") is not None
+
+    # Transporte: só pausa depois de RPC_MAX_FAILURES falhas seguidas
+    falha["erro"] = ConnectionError("reset")
+    for _ in range(cr.RPC_MAX_FAILURES - 1):
+        assert cr._fetch_rpc("u", None, "oi") is None
+    assert cr._rpc_disabled_until == 0.0
+    assert cr._fetch_rpc("u", None, "oi") is None
+    assert cr._rpc_disabled_until > time.time()
+
+    # Função ausente (migration não aplicada): pausa na hora
+    monkeypatch.setattr(cr, "_rpc_disabled_until", 0.0)
+    falha["erro"] = _APIError("PGRST202", "Could not find the function public.yui_turn_context")
+    assert cr._fetch_rpc("u", None, "oi") is None
+    antes = len(calls)
+    assert cr._fetch_rpc("u", None, "oi") is None and len(calls) == antes
+
+
+def test_tool_executor_runs_independent_calls_in_parallel_and_orders_results():
+    """Garante paralelismo entre calls independentes, serialização de conflitos e timeout por tool."""
+    import threading
+    import time
+    from core.tool_executor import plan_waves, run_tools
+
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+    log = []
+
+    def _runner(name, args):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            log.append(("start", name, args.get("caminho")))
+        time.sleep(0.5 if name == "buscar_web" and args.get("query") == "lenta" else 0.05)
+        with lock:
+            running["now"] -= 1
+            log.append(("end", name, args.get("caminho")))
+        return {"ok": True, "result": name, "error": None}
+
+    calls = [
+        {"tool": "buscar_web", "args": {"query": "x"}},
+        {"tool": "ler_arquivo_workspace", "args": {"caminho": "src/app.py"}},
+        {"tool": "escrever_arquivo_workspace", "args": {"caminho": "./src/app.py"}},
+        {"tool": "ler_arquivo_workspace", "args": {"caminho": "docs/a.md"}},
+        {"tool": "listar_arquivos_workspace", "args": {"pasta": "src"}},
+    ]
+    assert plan_waves(calls) == [[0, 1, 3], [2], [4]]
+
+    results = run_tools(calls, runner=_runner)
+    assert [r["result"] for r in results] == [c["tool"] for c in calls]
+    assert running["max"] == 3
+    pos = {(e[0], e[1], e[2]): i for i, e in enumerate(log)}
+    assert pos[("end", "ler_arquivo_workspace", "src/app.py")] < pos[("start", "escrever_arquivo_workspace", "./src/app.py")]
+
+    lenta = run_tools([{"tool": "buscar_web", "args": {"query": "lenta"}}, {"tool": "get_current_time", "args": {}}],
+                      runner=_runner, timeout=0.2)
+    assert lenta[0]["ok"] is False and "Tempo limite" in lenta[0]["error"]
+    assert lenta[1]["ok"] is True
+
+    # Escrita que estourou o timeout e segue rodando: a escrita seguinte no mesmo caminho falha
+    inicio = len(log)
+    presa = run_tools([{"tool": "escrever_arquivo_workspace", "args": {"caminho": "a.txt", "query": "lenta"}},
+                       {"tool": "escrever_arquivo_workspace", "args": {"caminho": "a.txt"}}],
+                      runner=lambda n, a: _runner("buscar_web" if a.get("query") else n, a), timeout=0.2)
+    assert "Tempo limite" in presa[0]["error"] and "ainda está rodando" in presa[1]["error"]
+    assert [e for e in log[inicio:] if e[0] == "start"] == [("start", "buscar_web", "a.txt")]
+
+    # admit roda por onda, depois que as ondas anteriores terminaram; STOP encerra o resto
+    from core.tool_executor import STOP
+    vistos = []
+
+    def _admit(i, call, admitidas):
+        vistos.append((i, len(log), list(admitidas)))
+        return STOP if i == 4 else ({"ok": False, "result": None, "error": "pulada"} if i == 3 else None)
+
+    time.sleep(0.4)  # a call presa termina
+    antes = len(log)
+    parcial = run_tools(calls, runner=_runner, admit=_admit)
+    assert [i for i, _, _ in vistos] == [0, 1, 3, 2, 4]
+    assert vistos[2][2] == ["buscar_web", "ler_arquivo_workspace"] and vistos[3][1] == antes + 4
+    assert parcial[3]["error"] == "pulada" and parcial[4] is None and parcial[2]["ok"] is True
+
+    from core.metacognition import MetaCognition
+    assert MetaCognition().analyze(pending_actions=["tool_repetida"] * 3)["loop_detected"] is True
+
+    # Tools paralelas enxergam o contexto do agente (user_id/chat_id) de quem chamou
+    import contextvars
+    from core.agent_context import get_agent_context, set_agent_context
+
+    def _com_contexto():
+        set_agent_context("u-42", "c-7")
+        return run_tools([{"tool": "buscar_web", "args": {}}, {"tool": "get_current_time", "args": {}}],
+                         runner=lambda n, a: {"ok": True, "result": get_agent_context(), "error": None})
+
+    vistos_ctx = contextvars.copy_context().run(_com_contexto)
+    assert [r["result"] for r in vistos_ctx] == [("u-42", "c-7"), ("u-42", "c-7")]
+
+
+def test_search_cache_coalesces_concurrent_queries_and_persists(tmp_path):
+    """Garante single-flight para buscas iguais simultâneas, chave normalizada e persistência em disco."""
+    import threading
+    import time
+    from core.search_cache import SearchCache
+
+    calls = []
+
+    def _fake_backend(query, limite):
+        calls.append(query)
+        time.sleep(0.2)
+        return [{"title": "Python", "body": f"sobre {query}", "href": "https://example.com"}]
+
+    db = tmp_path / "search_cache.db"
+    cache = SearchCache(path=db, backend=_fake_backend)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.search("Linguagem Python?", 5))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(out) == 8 and all(r[0][0]["title"] == "Python" for r in out)
+    assert sorted(o for _, o in out).count("network") == 1
+
+    assert cache.search("  linguagem   PYTHON ", 5)[1] == "memory"
+    reaberto = SearchCache(path=db, backend=_fake_backend)
+    assert reaberto.search("linguagem python", 5)[1] == "disk"
+    assert len(calls) == 1
+
+    curto = SearchCache(path=tmp_path / "ttl.db", backend=_fake_backend, ttl_by_kind={"recente": 0})
+    curto.search("cotação do dólar hoje", 5)
+    curto.search("cotação do dólar hoje", 5)
+    assert len(calls) == 3
+
+
+def test_startup_subsystems_are_lazy_and_reported():
+    """Garante que subsistemas pesados só constroem no primeiro uso/warm-up e aparecem no relatório."""
+    from core import startup
+
+    client = app.test_client()
+    resp = client.get('/api/system/startup_report')
+    assert resp.status_code == 200
+    payload = resp.get_json() or {}
+    assert {"mode", "event_wiring", "task_engine", "supabase"} <= set(payload.get("subsystems") or {})
+    assert payload["subsystems"]["event_wiring"]["trigger"] == "eager"
+    assert any(p["phase"] == "import:flask" for p in payload.get("phases") or [])
+
+    chamadas = []
+    startup.register("teste_lazy", lambda: chamadas.append(1) or "pronto", warm=False)
+    assert chamadas == [] and not startup.is_ready("teste_lazy")
+    assert startup.get("teste_lazy") == "pronto"
+    assert startup.get("teste_lazy") == "pronto"
+    assert chamadas == [1]
+    info = startup.report()["subsystems"]["teste_lazy"]
+    assert info["status"] == "ready" and info["trigger"] == "first_use"
+
+    # Getter singleton chamado direto (sem startup.get) também entra no relatório
+    import threading
+    singleton = {"valor": None}
+    trava = threading.Lock()
+
+    def _getter():
+        with trava:
+            if singleton["valor"] is None:
+                singleton["valor"] = startup.track("teste_getter", lambda: time.sleep(0.01) or object())
+        return singleton["valor"]
+
+    startup.register("teste_getter", _getter, warm=False)
+    valor = _getter()
+    info = startup.report()["subsystems"]["teste_getter"]
+    assert info["status"] == "ready" and info["trigger"] == "first_use" and info["init_ms"] >= 10
+    assert startup.get("teste_getter") is valor and _getter() is valor
+
+
+def test_shared_state_sqlite_is_consistent_across_worker_processes(tmp_path):
+    """Garante que N processos (workers) compartilham jobs, sessões e contadores sem perder escrita."""
+    import subprocess
+    import sys
+    from pathlib import Path
+    from core.shared_state import SQLiteBackend
+
+    db = tmp_path / "shared_state.db"
+    root = Path(__file__).resolve().parents[1]
+    code = (
+        "import sys\n"
+        "from core.shared_state import shared_dict\n"
+        "from core.session_manager import append_turn\n"
+        "from core import job_queue\n"
+        "i = int(sys.argv[1])\n"
+        "c = shared_dict('teste')\n"
+        "for n in range(100):\n"
+        "    c.incr('hits')\n"
+        "append_turn('u1', f'oi {i}', 'ok', chat_id='c1')\n"
+        "job_queue._results[f'job-{i}'] = {'status': 'done', 'result': i, 'updated_at': 9999999999.0}\n"
+    )
+    env = dict(__import__("os").environ, YUI_SHARED_STATE="sqlite", YUI_SHARED_STATE_PATH=str(db))
+    procs = [subprocess.Popen([sys.executable, "-c", code, str(i)], cwd=str(root), env=env) for i in range(3)]
+    assert all(p.wait(timeout=60) == 0 for p in procs)
+
+    backend = SQLiteBackend(db)
+    assert backend.get("teste", "hits") == 300
+    sessao = backend.get("sessions", "u1:c1")
+    assert sorted(t["user"] for t in sessao["historico_recente"]) == ["oi 0", "oi 1", "oi 2"]
+    assert {k: v["result"] for k, v in backend.items("jobs").items()} == {"job-0": 0, "job-1": 1, "job-2": 2}
+
+
+def test_asgi_streams_chat_natively_and_bridges_flask_routes(monkeypatch):
+    """Garante que o modo ASGI faz SSE do chat numa corrotina e serve as demais rotas pelo Flask."""
+    import asyncio
+    import json as _json
+    import asgi
+
+    async def _fake_stream(user_id, chat_id, message, **kwargs):
+        yield "Olá, "
+        await asyncio.sleep(0)
+        yield message
+
+    monkeypatch.setattr(asgi.ai_service, "handle_chat_stream_async", _fake_stream)
+    monkeypatch.setattr(asgi, "chat_pertence_usuario", lambda chat_id, user_id: True)
+
+    async def _call(method, path, body=b""):
+        sent = []
+        inbox = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if inbox:
+                return inbox.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")], "http_version": "1.1",
+                 "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "scheme": "http"}
+        await asyncio.wait_for(asgi.app(scope, receive, send), timeout=20)
+        start = next(m for m in sent if m["type"] == "http.response.start")
+        data = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+        return start, data
+
+    payload = _json.dumps({"chat_id": "c1", "user_id": "u1", "message": "mundo"}).encode()
+    start, data = asyncio.run(_call("POST", "/api/chat/stream", payload))
+    assert start["status"] == 200
+    headers = dict(start["headers"])
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert b"set-cookie" in headers
+    eventos = [_json.loads(line[6:]) for line in data.decode().split("\n\n") if line.startswith("data: ")]
+    assert eventos == ["__STATUS__:thinking", "Olá, ", "mundo", "__STATUS__:done"]
+
+    start, data = asyncio.run(_call("POST", "/api/chat/stream", b"{}"))
+    assert start["status"] == 400
+
+    # Preflight cross-origin do SSE nativo: mesmos cabeçalhos CORS do Flask
+    start, _ = asyncio.run(_call("OPTIONS", "/api/chat/stream"))
+    headers = dict(start["headers"])
+    assert start["status"] == 204
+    assert b"POST" in headers[b"access-control-allow-methods"]
+    assert headers[b"access-control-allow-headers"] == b"Content-Type"
+
+    start, data = asyncio.run(_call("GET", "/api/system/startup_report"))
+    assert start["status"] == 200
+    assert "subsystems" in _json.loads(data)
+
+
+def test_asgi_wsgi_bridge_streams_with_context_and_chunked_bodies():
+    """Garante que a ponte WSGI itera a resposta numa só thread (stream_with_context) e lê corpo chunked."""
+    import asyncio
+    import threading
+
+    from flask import Flask, Response, request, stream_with_context
+
+    import asgi
+
+    mini = Flask("ponte")
+
+    @mini.route("/eco", methods=["POST"])
+    def eco():
+        corpo = request.get_data()
+        threads = set()
+
+        def _gerar():
+            for i in range(5):
+                threads.add(threading.get_ident())
+                yield f"{request.path}:{len(corpo)}:{i}\n"  # precisa do contexto do request
+            yield f"threads={len(threads)}\n"
+
+        return Response(stream_with_context(_gerar()), mimetype="text/plain")
+
+    bridge = asgi.WSGIBridge(mini, max_workers=4)
+
+    async def _call(partes):
+        sent = []
+        inbox = [{"type": "http.request", "body": p, "more_body": i < len(partes) - 1}
+                 for i, p in enumerate(partes)]
+
+        async def receive():
+            if inbox:
+                return inbox.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        # Sem content-length: corpo chunked
+        scope = {"type": "http", "method": "POST", "path": "/eco", "query_string": b"",
+                 "headers": [(b"transfer-encoding", b"chunked")], "http_version": "1.1",
+                 "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "scheme": "http"}
+        await asyncio.wait_for(bridge(scope, receive, send), timeout=20)
+        return sent
+
+    async def _varias():
+        return await asyncio.gather(*[_call([b"abc", b"de"]) for _ in range(30)])
+
+    try:
+        for sent in asyncio.run(_varias()):
+            assert sent[0]["status"] == 200
+            assert sent[-1]["type"] == "http.response.body" and not sent[-1].get("more_body")
+            texto = b"".join(m.get("body", b"") for m in sent[1:]).decode()
+            assert texto == "".join(f"/eco:5:{i}\n" for i in range(5)) + "threads=1\n"
+    finally:
+        bridge.executor.shutdown(wait=True)
+
+
+def test_terminal_mux_coalesces_output_reattaches_and_applies_backpressure():
+    """Garante um loop único para os PTYs: saída agrupada, reattach no mesmo shell e pausa com cliente lento."""
+    import os
+    import pty
+    import subprocess
+    from core.terminal_mux import TerminalMux
+
+    def _spawn():
+        master, slave = pty.openpty()
+        proc = subprocess.Popen(["sh"], stdin=slave, stdout=slave, stderr=slave, start_new_session=True,
+                                env=dict(os.environ, PS1="$ "))
+        os.close(slave)
+        return proc, master, True
+
+    def _read_until(att, needle, timeout=10):
+        buf, deadline = "", time.time() + timeout
+        while needle not in buf and time.time() < deadline:
+            buf += "".join(att.take(0.2) or [])
+        return buf
+
+    mux = TerminalMux(flush_interval=0.05, high_water=8 * 1024, low_water=2 * 1024)
+    att = mux.attach(None, _spawn)
+    sid, pid = att.session.id, att.session.proc.pid
+    try:
+        att.write("for i in 1 2 3 4 5 6 7 8; do echo linha_$i; done; echo FIM_$((40+2))\n")
+        assert "FIM_42" in _read_until(att, "FIM_42")
+        assert mux.stats()["frames"] < mux.stats()["reads"] + 2
+
+        mux.detach(att)
+        assert mux.get(sid) is not None
+        att2 = mux.attach(sid, _spawn)
+        assert att2.resumed and att2.session.proc.pid == pid
+        assert "FIM_42" in "".join(att2.take(1) or [])
+
+        att2.write("yes yui_backpressure | head -c 600000; echo PRONTO_$((1+1))\n")
+        deadline = time.time() + 10
+        while not att2.session.paused and time.time() < deadline:
+            time.sleep(0.05)
+        assert att2.session.paused
+        lidos = mux.stats()["bytes"]
+        time.sleep(0.3)
+        assert mux.stats()["bytes"] - lidos < 64 * 1024
+        assert "PRONTO_2" in _read_until(att2, "PRONTO_2", timeout=30)
+        assert mux.stats()["pauses"] >= 1
+    finally:
+        mux.close(sid)
+
+
+def test_session_store_evicts_by_budget_and_idle_and_restores_from_spill(tmp_path):
+    """Garante teto de sessões/bytes (LRU), despejo por ociosidade e volta do spill em disco."""
+    from core.session_manager import SessionStore
+    from core.shared_state import MemoryBackend, SharedDict
+
+    def _add(msg):
+        def _fn(s):
+            s["historico_recente"] = (s.get("historico_recente") or []) + [msg]
+            return s
+        return _fn
+
+    store = SessionStore(SharedDict("sessions_test", backend=MemoryBackend()), max_sessions=3,
+                         max_bytes=10_000, idle_ttl=3600, spill_path=tmp_path / "spill.db")
+    for i in range(5):
+        store.update(f"u{i}", _add(f"oi {i}"), default={})
+    m = store.metrics()
+    assert m["live_sessions"] == 3 and m["evicted_lru"] == 2 and m["spilled_sessions"] == 2
+    assert 0 < m["live_bytes"] <= 10_000
+    assert store.hot.get("u0") is None
+
+    # sessão despejada volta do disco com o histórico e continua de onde parou
+    store.update("u0", _add("de volta"), default={})
+    assert store.get("u0")["historico_recente"] == ["oi 0", "de volta"]
+    assert store.metrics()["restored"] == 1
+
+    # teto de bytes
+    store.update("grande", lambda s: {"contexto": "x" * 9_000}, default={})
+    assert store.metrics()["live_bytes"] <= 10_000
+
+    # ociosidade
+    store.idle_ttl = 0
+    time.sleep(0.01)
+    assert store.sweep() == store.metrics()["evicted_idle"] > 0
+    assert store.metrics()["live_sessions"] == 0
+
+    sem_spill = SessionStore(SharedDict("sessions_test2", backend=MemoryBackend()), max_sessions=1)
+    sem_spill.update("a", _add("1"), default={})
+    sem_spill.update("b", _add("2"), default={})
+    assert sem_spill.get("a") is None and sem_spill.get("b") is not None
+
+    # Com spill, o TTL do backend dura mais que a ociosidade: o sweep ainda acha o valor
+    from core.session_manager import _hot_ttl
+    ocioso = SessionStore(SharedDict("sessions_test3", ttl=_hot_ttl(1.0, True), backend=MemoryBackend()),
+                          idle_ttl=1.0, spill_path=tmp_path / "spill3.db")
+    ocioso.update("u", _add("antes"), default={})
+    time.sleep(1.1)
+    assert ocioso.sweep() == 1 and ocioso.metrics()["spilled"] == 1
+    assert ocioso.get("u")["historico_recente"] == ["antes"]
+
+
+def test_context_memory_recalls_old_turns_through_index_with_caps():
+    """Garante recall por índice invertido além da janela antiga de 12 itens, rápido e com teto de texto."""
+    from backend.ai import context_memory as cm
+
+    cm.limpar_memoria()
+    cm.salvar_memoria("chat-idx", "Configuramos o deploy no Zeabur com gunicorn e variável WEB_CONCURRENCY.")
+    for i in range(150):
+        cm.salvar_memoria("chat-idx", f"Resposta {i} sobre componentes React, estado e hooks. " + "detalhe " * 20)
+    cm.salvar_memoria("chat-idx", "Resumo: banco Postgres com índices parciais.")
+
+    achado = cm.buscar_contexto("chat-idx", "como ficou o deploy no zeabur?")
+    assert achado.startswith("Configuramos o deploy no Zeabur")
+    assert "React" not in achado.split("\n\n")[0]
+    assert len(cm.buscar_contexto("chat-idx", "react hooks estado")) <= cm.MAX_RECALL_CHARS + 10
+    assert cm.buscar_contexto("chat-idx", "xyzzy inexistente") == ""
+    assert cm.buscar_contexto("outro-chat", "deploy") == ""
+
+    t = time.perf_counter()
+    for _ in range(200):
+        cm.buscar_contexto("chat-idx", "postgres índices parciais")
+    assert (time.perf_counter() - t) / 200 < 0.005
+
+    antigo = cm.MAX_ITENS
+    cm.MAX_ITENS = 10
+    try:
+        cm.salvar_memoria("chat-idx", "mais um")
+        assert cm.estatisticas()["itens"] == 10
+        assert cm.buscar_contexto("chat-idx", "zeabur") == ""
+    finally:
+        cm.MAX_ITENS = antigo
+        cm.limpar_memoria()
+
+
+def test_token_budget_packs_context_by_priority_and_reports_sources():
+    """Garante contagem de tokens com cache, empacotamento por prioridade no orçamento e relatório por fonte."""
+    from core import token_budget as tb
+    from core.attention_manager import filter_context_blocks
+
+    texto = "Configuração do deploy com gunicorn, variáveis de ambiente e cache. " * 40
+    n = tb.count_tokens(texto)
+    assert n > 0 and tb.count_tokens(texto) == n
+    assert tb.cache_stats()["hits"] >= 1
+    assert tb.count_tokens(tb.truncate_to_tokens(texto, 100)) <= 100
+
+    historico = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem {i} " + "x " * 50}
+                 for i in range(30)]
+    ctx = {
+        "historico": historico,
+        "memoria_vetorial": "trecho vetorial " * 300,
+        "contexto_projeto": "arquivo main.py " * 300,
+        "contexto_chat_anterior": "resposta anterior " * 20,
+        "memoria_eventos": "evento " * 400,
+        "system_state": "energia ok",
+        "user_profile": {},
+    }
+    out = filter_context_blocks(ctx, user_message="oi", top=4, token_budget=1500)
+    packed = out["token_pack"]
+    assert packed.used <= 1500
+    assert out["historico"] and out["historico"][-1] == historico[-1]
+    assert len(out["historico"]) < len(historico)
+    assert packed.breakdown["historico"] > 0 and "system_state" in packed.breakdown
+    assert packed.dropped or packed.truncated
+
+    msgs = [{"role": "system", "content": "Você é a YUI."}] + out["historico"] + [{"role": "user", "content": "oi"}]
+    report = tb.turn_report(msgs, packed, "oi", budget=2000)
+    assert report["total"] == tb.count_messages(msgs)
+    assert report["fontes"]["historico"] == packed.breakdown["historico"]
+    assert report["fontes"]["instrucoes_sistema"] > 0
+    assert tb.last_report()["total"] == report["total"]
+
+
+def test_prompt_assembler_keeps_byte_identical_prefix_across_turns():
+    """Garante que dados voláteis (hora, energia) ficam depois do prefixo fixo e que o reaproveitamento é medido."""
+    from core import prompt_assembler as pa
+
+    pa.reset_stats()
+
+    def turno(hora, energia, historico, mensagem):
+        asm = pa.PromptAssembler()
+        asm.turn(f"Agora são {hora}.", "contexto_base")
+        asm.static("Você é a Yui. Ferramentas: ler_arquivo, listar_arquivos.", "tools")
+        asm.turn(f"Estado da Yui: energia {energia}", "system_state")
+        asm.session("Usuário: nível avançado, modo dev.", "perfil")
+        msgs = asm.build(historico, mensagem)
+        return asm, msgs, pa.note_prompt("chat-1", asm, msgs)
+
+    asm1, msgs1, info1 = turno("10:00", 90, [], "oi")
+    hist = [{"role": "user", "content": "oi"}, {"role": "assistant", "content": "olá!"}]
+    asm2, msgs2, info2 = turno("10:05", 42, hist, "e agora?")
+
+    assert [m["content"] for m in msgs1[:2]] == [
+        "Você é a Yui. Ferramentas: ler_arquivo, listar_arquivos.",
+        "Usuário: nível avançado, modo dev.",
+    ]
+    assert msgs2[2:4] == hist and msgs2[-1] == {"role": "user", "content": "e agora?"}
+    assert "10:05" in msgs2[-3]["content"]
+    assert asm1.static_prefix_hash() == asm2.static_prefix_hash()
+    assert not info1["static_reused"] and info2["static_reused"]
+    assert info2["shared_bytes"] == sum(len(m["content"].encode()) for m in msgs1[:2])
+
+    class _Usage:
+        prompt_tokens = 2000
+        prompt_tokens_details = type("D", (), {"cached_tokens": 1536})()
+
+    pa.note_provider_usage(_Usage())
+    stats = pa.prefix_stats()
+    assert stats["turns"] == 2 and stats["static_prefix_reuse_rate"] == 0.5
+    assert stats["shared_prefix_ratio"] > 0
+    assert stats["provider_cache_hit_ratio"] == 0.768
+    pa.reset_stats()
+
+
+def test_execution_graph_runs_dag_in_parallel_memoizes_and_resumes(monkeypatch):
+    """Garante ramos independentes em paralelo, memoização por grafo (ou por cache_key) e retomada após falha."""
+    import threading
+    import time as _time
+
+    from core import execution_graph as eg
+    from core import resource_governor
+
+    # Não depende da CPU da máquina de teste
+    monkeypatch.setattr(resource_governor, "allow_execution_graph",
+                        lambda *a, **k: resource_governor.GovernorDecision(allow=True, reason=""))
+
+    eg.clear_memo()
+    barreira = threading.Barrier(2, timeout=5)
+    chamadas = []
+
+    def ramo(nome):
+        def _acao(ctx):
+            chamadas.append(nome)
+            barreira.wait()  # só passa se os dois ramos rodarem ao mesmo tempo
+            return len(ctx["_result_fonte"]) + (1 if nome == "a" else 2)
+        return _acao
+
+    falhar = {"sim": True}
+
+    def juntar(ctx):
+        chamadas.append("juntar")
+        if falhar["sim"]:
+            raise RuntimeError("falha simulada")
+        return ctx["_result_a"] + ctx["_result_b"]
+
+    g = eg.ExecutionGraph("teste", max_workers=4)
+    g.add_step("fonte", lambda ctx: "abc", inputs=[])
+    g.add_step("a", ramo("a"), inputs=["fonte"], memoize=True)
+    g.add_step("b", ramo("b"), inputs=["fonte"], memoize=True)
+    g.add_step("juntar", juntar, inputs=["a", "b"])
+
+    inicio = _time.monotonic()
+    try:
+        g.run()
+        raise AssertionError("deveria falhar")
+    except RuntimeError as e:
+        assert "falha simulada" in str(e)
+    assert _time.monotonic() - inicio < 5
+    assert [n["status"] for n in g.to_ui_status()] == ["done", "done", "done", "failed"]
+
+    chamadas.clear()
+    falhar["sim"] = False
+    out = g.resume()
+    assert chamadas == ["juntar"]
+    assert out["ctx"]["_result_juntar"] == 9
+
+    # Nova execução com as mesmas entradas: ramos vêm da memoização
+    chamadas.clear()
+    out = g.run()
+    assert sorted(chamadas) == ["juntar"]
+    assert [r["cached"] for r in out["results"] if r["node"] in ("a", "b")] == [True, True]
+    assert g.memo_stats()["hits"] >= 2
+
+    # Closures de mesmo __qualname__ em grafos diferentes não dividem o cache...
+    def fabrica(valor):
+        return lambda ctx: valor
+
+    g1, g2 = eg.ExecutionGraph(), eg.ExecutionGraph()
+    g1.add_step("n", fabrica(1), inputs=[], memoize=True)
+    g2.add_step("n", fabrica(2), inputs=[], memoize=True)
+    assert g1.run()["ctx"]["_result_n"] == 1
+    assert g2.run()["ctx"]["_result_n"] == 2
+    # ...a não ser que o chamador declare a mesma computação com cache_key
+    g3, g4 = eg.ExecutionGraph(), eg.ExecutionGraph()
+    g3.add_step("n", fabrica(3), inputs=[], memoize=True, cache_key="constante")
+    g4.add_step("m", fabrica(4), inputs=[], memoize=True, cache_key="constante")
+    assert g3.run()["ctx"]["_result_n"] == 3
+    assert g4.run()["results"][0] == {"node": "m", "status": "done", "result": 3, "cached": True}
+    assert eg.memo_stats()["hits"] == 1
+
+    ciclo = eg.ExecutionGraph()
+    ciclo.add_step("x", lambda ctx: 1, inputs=["y"])
+    ciclo.add_step("y", lambda ctx: 2, inputs=["x"])
+    try:
+        ciclo.run()
+        raise AssertionError("ciclo deveria ser rejeitado")
+    except ValueError:
+        pass
+
+    seq = eg.graph_from_planner_steps(["p1", "p2"], {"p1": lambda ctx: 1, "p2": lambda ctx: ctx["_result_p1"] + 1})
+    assert seq.run()["ctx"]["_result_p2"] == 2
+
+    # Nós enxergam o contexto do agente de quem chamou run() (rodam em threads do pool)
+    import contextvars
+    from core.agent_context import get_agent_context, set_agent_context
+
+    def _rodar_com_contexto():
+        set_agent_context("u-9", "c-9")
+        g = eg.ExecutionGraph()
+        g.add_step("quem", lambda ctx: get_agent_context())
+        return g.run()["ctx"]["_result_quem"]
+
+    assert contextvars.copy_context().run(_rodar_com_contexto) == ("u-9", "c-9")
+    eg.clear_memo()
+
+
+def test_project_index_invalidates_on_change_and_reanalyzes_only_changed_files(tmp_path, monkeypatch):
+    """Garante que o índice do projeto reflete mudanças em arquivos e só reanalisa o que mudou."""
+    import os as _os
+
+    from yui_ai.project_analysis import project_index as pi
+
+    monkeypatch.setattr(pi, "_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(pi, "_shards", {})
+    proj = tmp_path / "proj"
+    (proj / "pkg").mkdir(parents=True)
+    (proj / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (proj / "pkg" / "a.py").write_text("def soma(a, b):\n    return a + b\n", encoding="utf-8")
+    alvo = proj / "pkg" / "b.py"
+    alvo.write_text("def sub(a, b):\n    return a - b\n", encoding="utf-8")
+
+    ok, dados, err = pi.get_or_compute(str(proj))
+    assert ok and err is None
+    assert dados["metricas_codigo"]["empty_except"] == 0
+
+    antes = pi.index_stats()
+    ok, dados2, _ = pi.get_or_compute(str(proj))
+    depois = pi.index_stats()
+    assert dados2 == dados and depois["hits"] == antes["hits"] + 1
+    assert depois["files_reanalyzed"] == antes["files_reanalyzed"]
+
+    alvo.write_text("def sub(a, b):\n    try:\n        return a - b\n    except Exception:\n        pass\n", encoding="utf-8")
+    st = alvo.stat()
+    _os.utime(alvo, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    ok, dados3, _ = pi.get_or_compute(str(proj))
+    assert dados3["metricas_codigo"]["empty_except"] == 1
+    assert pi.index_stats()["files_reanalyzed"] == depois["files_reanalyzed"] + 1
+
+    # Novo processo: shard lido do disco, sem reanalisar nada
+    monkeypatch.setattr(pi, "_shards", {})
+    ok, dados4, _ = pi.get_or_compute(str(proj))
+    assert dados4["metricas_codigo"] == dados3["metricas_codigo"]
+    assert pi.index_stats()["files_reanalyzed"] == depois["files_reanalyzed"] + 1
+    assert len(list((tmp_path / "index").glob("*.json"))) == 1
+
+
+def test_fs_snapshot_walks_once_and_serves_scanners_from_memory(tmp_path, monkeypatch):
+    """Garante que o snapshot acompanha mudanças por diff e que os scanners leem dele, sem walk próprio."""
+    import os as _os
+
+    from core import fs_snapshot
+    from core.workspace_indexer import scan
+    from yui_ai.analyzer.project_scanner import scan_structure
+    from yui_ai.project_analysis.project_scanner import escanear_estrutura
+
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (tmp_path / "pkg" / "mod.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "index.js").write_text("", encoding="utf-8")
+    (tmp_path / "README.md").write_text("# oi\n", encoding="utf-8")
+
+    snap = fs_snapshot.get_snapshot(str(tmp_path), max_age=0)
+    assert sorted(snap.files) == ["README.md", "pkg/__init__.py", "pkg/mod.py"]
+
+    # Consumidores servidos da memória: nenhum walk/scandir durante as leituras
+    walks = []
+    monkeypatch.setattr(_os, "walk", lambda *a, **k: walks.append(a) or iter(()))
+    assert scan(str(tmp_path))["python"] == ["pkg/__init__.py", "pkg/mod.py"]
+    estrutura = escanear_estrutura(str(tmp_path))
+    assert estrutura["modulos_principais"] == ["pkg"] and estrutura["total_arquivos"] == 3
+    assert scan_structure(str(tmp_path))["caminhos_py"] == [
+        _os.path.join(str(tmp_path), "pkg", "__init__.py"), _os.path.join(str(tmp_path), "pkg", "mod.py")]
+    assert walks == []
+    monkeypatch.undo()
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+
+    (tmp_path / "pkg" / "novo.py").write_text("y = 2\n", encoding="utf-8")
+    (tmp_path / "README.md").unlink()
+    fs_snapshot.notify_changed(str(tmp_path / "pkg" / "novo.py"))
+    changes = snap.refresh()
+    assert changes.added == ["pkg/novo.py"] and changes.removed == ["README.md"]
+    assert "pkg/novo.py" in scan(str(tmp_path))["python"]
+
+
+def test_project_map_is_incremental_and_compact(tmp_path, monkeypatch):
+    """Garante que o mapa reaproveita entradas de arquivos inalterados e só relê o que mudou."""
+    import json as _json
+    import os as _os
+
+    from core import fs_snapshot, project_mapper
+
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+    (tmp_path / "a.py").write_text("import os\n", encoding="utf-8")
+    (tmp_path / "b.py").write_text("import json\n", encoding="utf-8")
+    (tmp_path / "c.js").write_text("import x from './a'\n", encoding="utf-8")
+
+    primeiro = project_mapper.generate_yui_map(tmp_path)
+    assert primeiro["ok"] and primeiro["changes"]["added"] == 3
+    texto = (tmp_path / ".yui_map.json").read_text(encoding="utf-8")
+    assert "\n" not in texto and _json.loads(texto)["files"]["a.py"]["imports"] == ["os"]
+
+    lidos = []
+    original = project_mapper._get_file_deps
+    monkeypatch.setattr(project_mapper, "_get_file_deps", lambda p, r: lidos.append(p.name) or original(p, r))
+    assert project_mapper.generate_yui_map(tmp_path).get("unchanged") is True
+    assert lidos == []
+
+    (tmp_path / "b.py").write_text("import re\nimport sys\n", encoding="utf-8")
+    _os.utime(tmp_path / "b.py", ns=(1, 1))
+    (tmp_path / "c.js").unlink()
+    res = project_mapper.generate_yui_map(tmp_path)
+    assert lidos == ["b.py"]
+    assert res["changes"] == {"added": 0, "modified": 1, "removed": 1, "reused": 1}
+    mapa = project_mapper.get_yui_map(tmp_path)
+    assert sorted(mapa["files"]["b.py"]["imports"]) == ["re", "sys"] and "c.js" not in mapa["files"]
+    assert mapa["structure"] == ["a.py", "b.py"]
+
+
+def test_dependency_graph_is_incremental_with_module_level_cycles(tmp_path, monkeypatch):
+    """Garante ciclos por módulo (Tarjan iterativo), arestas trocadas só do arquivo alterado e grafo persistido."""
+    from core import fs_snapshot
+    from yui_ai.analyzer import dependency_mapper as dm
+
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+    monkeypatch.setattr(dm, "_GRAPH_DIR", str(tmp_path / "graphs"))
+    monkeypatch.setattr(dm, "_graphs", {})
+    root = tmp_path / "proj"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (root / "pkg" / "a.py").write_text("from . import b\n", encoding="utf-8")
+    (root / "pkg" / "b.py").write_text("from pkg.a import f\nimport os\n", encoding="utf-8")
+    (root / "main.py").write_text("import pkg.a\n", encoding="utf-8")
+
+    dados = dm.build_dependency_graph(str(root))
+    assert dados["edges"] == [("main", "pkg.a"), ("pkg.a", "pkg.b"), ("pkg.b", "pkg.a")]
+    assert dados["circular"] == [["pkg.a", "pkg.b", "pkg.a"]]
+
+    graph = dm._graphs[str(root)]
+    antes = graph.stats["reparsed"]
+    (root / "pkg" / "b.py").write_text("import os\n", encoding="utf-8")
+    dados = dm.build_dependency_graph(str(root))
+    assert graph.stats["reparsed"] - antes == 1
+    assert dados["edges"] == [("main", "pkg.a"), ("pkg.a", "pkg.b")] and dados["circular"] == []
+
+    # Persistido: uma nova instância não reparseia nada
+    novo = dm.DependencyGraph(str(root))
+    assert novo.refresh() == {"added": 0, "modified": 0, "removed": 0} and novo.stats["reparsed"] == 0
+    assert novo.edges() == graph.edges()
+
+    # Sem recursão: cadeia longa não estoura o limite do interpretador
+    n = 20000
+    adj = {f"m{i}": {f"m{i + 1}"} for i in range(n)}
+    adj[f"m{n}"] = {"m0"}
+    assert [len(c) for c in dm.strongly_connected_components(adj)] == [n + 1]
+
+
+def test_workspace_windowed_reads_and_paginated_listing(tmp_path, monkeypatch):
+    """Garante leituras em janela (linhas, cauda, busca, bytes) e listagens paginadas por cursor."""
+    from core import fs_snapshot
+    from yui import yui_tools
+
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+    monkeypatch.setattr(settings, "SANDBOX_DIR", tmp_path)
+    linhas = [f"linha {i}" + (" TODO" if i % 100 == 0 else "") for i in range(1, 5001)]
+    (tmp_path / "big.txt").write_text("\n".join(linhas) + "\n", encoding="utf-8")
+    for i in range(7):
+        (tmp_path / "src" / f"m{i}").mkdir(parents=True)
+        (tmp_path / "src" / f"m{i}" / "a.py").write_text("", encoding="utf-8")
+
+    res = yui_tools.ler_arquivo_workspace("big.txt", linha_inicio=10, linhas=3)
+    assert res["conteudo"] == "linha 10\nlinha 11\nlinha 12" and res["proxima_linha"] == 13
+    assert yui_tools.ler_arquivo_workspace("big.txt", cauda=2)["conteudo"] == "linha 4999\nlinha 5000 TODO"
+    busca = yui_tools.ler_arquivo_workspace("big.txt", buscar="todo")
+    assert busca["ocorrencias"] == 50 and busca["conteudo"].startswith("100: linha 100 TODO")
+    assert yui_tools.ler_arquivo_workspace("big.txt", max_chars=10) == {
+        "ok": True, "conteudo": "linha 1\nli", "truncado": True, "erro": None}
+    janela = yui_tools.executar_tool("ler_arquivo_workspace", {"caminho": "big.txt", "offset": 8, "limite": 7})
+    assert janela["conteudo"] == "linha 2" and janela["proximo_offset"] == 15
+    from yui.yui_core import TOOLS_SCHEMA
+    props = next(t["function"]["parameters"]["properties"] for t in TOOLS_SCHEMA
+                 if t["function"]["name"] == "ler_arquivo_workspace")
+    assert {"offset", "limite"} <= set(props)
+
+    vistos, cursor = [], None
+    while True:
+        page = yui_tools.listar_arquivos_workspace("src", cursor=cursor, limite=3)
+        vistos += page["arquivos"]
+        cursor = page["cursor"]
+        if not cursor:
+            break
+    assert vistos == [f"src/m{i}/a.py" for i in range(7)]
+
+    client = app.test_client()
+    payload = client.get("/api/sandbox/read?path=big.txt&offset=8&length=7").get_json()
+    assert payload["content"] == "linha 2" and payload["next_offset"] == 15
+    payload = client.get("/api/sandbox/read?path=big.txt&grep=linha%204999&context=1").get_json()
+    assert [m["line"] for m in payload["matches"]] == [4999] and payload["matches"][0]["after"] == ["linha 5000 TODO"]
+    # Padrão do cliente é sempre literal (sem regex sem limite no servidor)
+    assert client.get("/api/sandbox/read?path=big.txt&grep=(a%2B)%2B%24&regex=1").get_json()["matches"] == []
+    page = client.get("/api/sandbox/list?path=src&limit=4").get_json()
+    assert [e["name"] for e in page["entries"]] == ["m0", "m1", "m2", "m3"] and page["cursor"]
+    page = client.get(f"/api/sandbox/list?path=src&limit=4&cursor={page['cursor']}").get_json()
+    assert [e["path"] for e in page["entries"]] == ["src/m4", "src/m5", "src/m6"] and page["cursor"] is None
+    assert client.get("/api/sandbox/list?path=src&cursor=%%%").status_code == 400
+
+
+def test_workspace_backups_are_deduplicated_with_retention_and_restore(tmp_path, monkeypatch):
+    """Garante backups por hash (sem cópia repetida), deltas, retenção e restauração de versões."""
+    from core import backup_store
+    from yui import yui_tools
+
+    monkeypatch.setattr(settings, "SANDBOX_DIR", tmp_path)
+    monkeypatch.setattr(backup_store, "KEEP_VERSIONS", 3)
+    monkeypatch.setattr(backup_store, "GC_EVERY", 1000)
+    texto = "".join(f"linha {i} com bastante conteúdo repetido\n" for i in range(400))
+    assert yui_tools.escrever_arquivo_workspace("app.py", texto)["backup"] is None
+    assert yui_tools.escrever_arquivo_workspace("app.py", texto).get("inalterado") is True
+
+    versoes = []
+    for i in range(5):
+        res = yui_tools.escrever_arquivo_workspace("app.py", texto.replace(f"linha {i} ", f"LINHA {i} "))
+        versoes.append(res["backup"])
+    assert versoes[0] == backup_store._sha(texto.encode("utf-8"))
+    # Conteúdo igual a um já guardado (outro arquivo) não gera objeto novo
+    yui_tools.escrever_arquivo_workspace("copia.py", texto)
+    yui_tools.escrever_arquivo_workspace("copia.py", "x = 1\n")
+
+    store = backup_store.get_backup_store(str(tmp_path.resolve()))
+    uso = store.usage()
+    assert uso["deltas"] >= 1 and uso["dedup"] >= 1
+    assert uso["stored_bytes"] < uso["logical_bytes"] / 10
+    listados = yui_tools.listar_backups_workspace("app.py")["versoes"]
+    assert [v["versao"] for v in listados] == [s[:12] for s in reversed(versoes[-3:])]  # retenção: 3 últimas
+    assert not list((tmp_path / ".yui-backups").glob("*.bak"))
+    # Poda não dispara o GC a cada backup: os objetos órfãos saem em lote
+    for i in range(6):
+        yui_tools.escrever_arquivo_workspace("cfg.py", f"valor = {i}\n")
+    uso = store.usage()
+    assert uso["pruned"] >= 4 and uso["gc_runs"] == 0
+    assert store.prune() >= 2
+    assert store.usage()["objects"] < uso["objects"] and store.usage()["gc_runs"] == 1
+
+    alvo = listados[-1]["versao"]
+    res = yui_tools.restaurar_backup_workspace("app.py", alvo)
+    assert res["ok"] and backup_store._sha((tmp_path / "app.py").read_bytes()).startswith(alvo)
+    assert yui_tools.listar_backups_workspace("app.py")["versoes"][0]["versao"] == res["backup"][:12]
+    assert yui_tools.restaurar_backup_workspace("app.py", "ffffffff")["ok"] is False
+    assert ".yui-backups" not in " ".join(yui_tools.listar_arquivos_workspace(".")["arquivos"])
+
+
+def test_lint_pipeline_runs_in_parallel_with_hash_cache_and_warm_workers(tmp_path, monkeypatch):
+    """Garante lint em lote no pool com cache por conteúdo, workers quentes reaproveitados e cache do linter de sintaxe."""
+    import time as _time
+
+    from core import code_linter
+    from yui_ai.validation import linter_runner as lr
+    from yui_ai.validation.validation_engine import ValidationEngine
+
+    # Worker quente: o "linter" é importado uma vez e atende vários pedidos no mesmo processo
+    (tmp_path / "fakelint.py").write_text(
+        "import os, sys\n"
+        "def main(argv):\n"
+        "    sys.stdout.buffer.write(f'{os.getpid()} {argv[0]}\\n'.encode())  # como o flake8\n"
+        "    return 1 if 'ruim' in argv[0] else 0\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    lr.fechar_linters_quentes()
+    rc1, out1 = lr._rodar_quente("fakelint:main", ["a.py"], str(tmp_path), timeout=20)
+    rc2, out2 = lr._rodar_quente("fakelint:main", ["ruim.py"], str(tmp_path), timeout=20)
+    assert (rc1, rc2) == (0, 1) and out1.split()[0] == out2.split()[0] and out2.split()[1] == "ruim.py"
+    lr.fechar_linters_quentes()
+
+    # Lote: arquivos em paralelo no pool; o mesmo conteúdo vem do cache na segunda vez
+    chamadas = []
+
+    def _lento(arquivo, raiz=None):
+        chamadas.append(arquivo)
+        _time.sleep(0.2)
+        return True, "ok", None, {"linter": "fake", "erros": 0, "avisos": 0}
+
+    monkeypatch.setattr(lr, "executar_linter", _lento)
+    arquivos = []
+    for i in range(4):
+        arquivo = tmp_path / f"m{i}.py"
+        arquivo.write_text(f"x = {i}\n", encoding="utf-8")
+        arquivos.append(str(arquivo))
+    primeiro = lr.executar_linters_em_lote(arquivos, max_workers=4)
+    assert primeiro["sucesso"] and primeiro["tempo"]["executados"] == 4
+    assert primeiro["tempo"]["total_s"] < 0.7  # em série seriam 4 × 0,2 s
+    (tmp_path / "m0.py").write_text("x = 10\n", encoding="utf-8")
+    resultado = ValidationEngine().validar_lote(arquivos)
+    assert resultado["sucesso_geral"] and resultado["tempo"]["linter"]["cache_hits"] == 3
+    assert len(chamadas) == 5
+
+    # Linter de sintaxe do /multi-save: mesmo conteúdo não é reanalisado
+    antes = code_linter.lint_stats()["cache_hits"]
+    erros = code_linter.lint_code("def f(:\n    pass\n", "a.py")
+    assert code_linter.lint_code("def f(:\n    pass\n", "b.py")[0]["path"] == "b.py"
+    assert erros[0]["path"] == "a.py" and code_linter.lint_stats()["cache_hits"] == antes + 1
+
+    # /multi-save passa os arquivos de código gravados pelo lint em lote (avisos, sem bloquear)
+    acoes = [{"action": "create", "path": "regression_lint/m.py", "content": "x = 1\n"},
+             {"action": "create", "path": "regression_lint/n.txt", "content": "texto"}]
+    client = app.test_client()
+    payload = client.post("/api/sandbox/multi-save", json={"actions": acoes}).get_json()
+    assert payload["ok"] and payload["validation"] == {"regression_lint/m.py": {"ok": True, "linter": "fake", "erro": None}}
+    assert chamadas[-1].endswith("m.py")
+    assert client.post("/api/sandbox/multi-save", json={"actions": acoes, "validate": False}).get_json()["validation"] is None
+
+
+def test_affected_tests_runner_selects_by_dependency_graph_and_caches_passes(tmp_path, monkeypatch):
+    """Garante que só testes afetados rodam (fecho de imports), em shards, e que passes ficam em cache por hash."""
+    from core import fs_snapshot
+    from yui_ai.analyzer import dependency_mapper as dm
+    from yui_ai.validation import test_runner as tr
+
+    monkeypatch.setattr(fs_snapshot, "USE_WATCHER", False)
+    monkeypatch.setattr(dm, "_GRAPH_DIR", str(tmp_path / "graphs"))
+    monkeypatch.setattr(dm, "_graphs", {})
+    monkeypatch.setattr(tr, "_CACHE_DIR", str(tmp_path / "test_cache"))
+    root = tmp_path / "proj"
+    (root / "pkg").mkdir(parents=True)
+    (root / "tests").mkdir()
+    (root / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (root / "pkg" / "base.py").write_text("VALOR = 1\n", encoding="utf-8")
+    (root / "pkg" / "a.py").write_text("from pkg.base import VALOR\nA = VALOR + 1\n", encoding="utf-8")
+    (root / "pkg" / "b.py").write_text("B = 3\n", encoding="utf-8")
+    (root / "tests" / "test_a.py").write_text("from pkg.a import A\n\ndef test_a():\n    assert A == 2\n", encoding="utf-8")
+    (root / "tests" / "test_b.py").write_text("from pkg import b\n\ndef test_b():\n    assert b.B == 3\n", encoding="utf-8")
+    (root / "pytest.ini").write_text("[pytest]\npythonpath = .\n", encoding="utf-8")
+
+    assert tr.mapear_testes(str(root))["tests/test_a.py"] == [
+        "pkg/__init__.py", "pkg/a.py", "pkg/base.py", "tests/test_a.py"]
+
+    ok, _, _, det = tr.executar_testes_afetados(diretorio_projeto=str(root), max_shards=2)
+    assert ok and det["selecionados"] == ["tests/test_a.py", "tests/test_b.py"] and det["shards"] == 2
+    assert det["testes_executados"] == 2 and det["testes_passaram"] == 2
+
+    ok, _, _, det = tr.executar_testes_afetados(diretorio_projeto=str(root))
+    assert ok and det["selecionados"] == [] and len(det["em_cache"]) == 2
+
+    # Mudança transitiva (base → a → test_a): só test_a roda, e a falha não entra no cache
+    (root / "pkg" / "base.py").write_text("VALOR = 5\n", encoding="utf-8")
+    ok, saida, _, det = tr.executar_testes_afetados([str(root / "pkg" / "base.py")], str(root))
+    assert not ok and det["selecionados"] == ["tests/test_a.py"] and det["testes_falharam"] == 1
+    (root / "pkg" / "base.py").write_text("VALOR = 1\n", encoding="utf-8")
+    ok, _, _, det = tr.executar_testes_afetados(["pkg/base.py"], str(root))
+    assert ok and det["selecionados"] == ["tests/test_a.py"]
+    assert tr.executar_testes_afetados(["pkg/b.py"], str(root))[3]["em_cache"] == ["tests/test_b.py"]
+
+
+def test_sandbox_batch_streams_ndjson_results_and_resumes_by_batch_id(tmp_path, monkeypatch):
+    """Garante que /batch aplica ações linha a linha, responde em NDJSON e retoma pulando seq já confirmados."""
+    import json
+    import shutil
+    from core import batch_save
+
+    monkeypatch.setattr(batch_save, "_BATCH_DIR", str(tmp_path / "batches"))
+    base = Path(settings.SANDBOX_DIR) / "regression_batch"
+    shutil.rmtree(base, ignore_errors=True)
+    acoes = [{"action": "create", "path": f"regression_batch/f{i}.txt", "content": f"v{i}"} for i in range(4)]
+    corpo = lambda itens: "".join(json.dumps(a) + "\n" for a in itens)
+    client = app.test_client()
+
+    # Primeira tentativa "cai" depois de 2 ações (o cliente só enviou essas)
+    resp = client.post("/api/sandbox/batch?batch_id=reg-1", data=corpo(acoes[:2]),
+                       content_type="application/x-ndjson")
+    linhas = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    assert resp.status_code == 200 and resp.headers["X-Batch-Id"] == "reg-1"
+    assert linhas[0]["last_seq"] == -1 and [l["seq"] for l in linhas[1:3]] == [0, 1]
+    assert (base / "f1.txt").read_text(encoding="utf-8") == "v1"
+    assert client.get("/api/sandbox/batch/reg-1").get_json()["last_seq"] == 1
+
+    # Retomada: reenviar o lote todo pula o que já foi confirmado; erros voltam por ação
+    (base / "f0.txt").write_text("editado", encoding="utf-8")
+    extras = "{quebrado\n" + json.dumps({"action": "create", "path": "regression_batch/m.py", "content": "def (:\n"}) + "\n"
+    resp = client.post("/api/sandbox/batch", data=corpo(acoes) + extras, headers={"X-Batch-Id": "reg-1"})
+    linhas = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    assert linhas[0]["last_seq"] == 1 and linhas[0]["acked"] == 2
+    assert [l.get("skipped", False) for l in linhas[1:5]] == [True, True, False, False]
+    assert linhas[1]["kind"] == "saved" and linhas[1]["path"] == "regression_batch/f0.txt"
+    assert linhas[5]["ok"] is False and linhas[5]["line"] == 5
+    assert linhas[6]["seq"] == 4 and linhas[6]["ok"] is False and linhas[6]["lint_errors"]
+    fim = linhas[-1]
+    assert fim["done"] and fim["saved"] == 2 and fim["skipped"] == 2 and fim["errors"] == 2 and fim["last_seq"] == 3
+    assert (base / "f0.txt").read_text(encoding="utf-8") == "editado" and (base / "f3.txt").exists()
+    assert not (base / "m.py").exists()
+    status = client.get("/api/sandbox/batch/reg-1").get_json()
+    assert status["saved"] == 4 and status["errors"] == 1 and status["done"] and not status["active"]
+
+    # Ação que falhou não conta como confirmada: o reenvio corrigido (mesmo seq) é aplicado
+    corrigida = {"seq": 4, "action": "create", "path": "regression_batch/m.py", "content": "x = 1\n"}
+    resp = client.post("/api/sandbox/batch?batch_id=reg-1", data=json.dumps(corrigida) + "\n")
+    linhas = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    assert linhas[1] == {"seq": 4, "ok": True, "kind": "saved", "path": "regression_batch/m.py"}
+    assert (base / "m.py").read_text(encoding="utf-8") == "x = 1\n"
+    status = client.get("/api/sandbox/batch/reg-1").get_json()
+    assert status["saved"] == 5 and status["errors"] == 0 and status["last_seq"] == 4
+
+    # Mesmo lote aberto em outra requisição → 409; id inválido → 400; desconhecido → 404
+    with batch_save.BatchJournal("reg-1"):
+        assert client.post("/api/sandbox/batch?batch_id=reg-1", data="").status_code == 409
+    assert client.post("/api/sandbox/batch?batch_id=../x", data="").status_code == 400
+    assert client.get("/api/sandbox/batch/nao-existe").status_code == 404
+
+    # Outro worker (processo) com o lote aberto também dá 409
+    import subprocess
+    import sys as _sys
+    filho = subprocess.Popen(
+        [_sys.executable, "-c",
+         "import sys, time\n"
+         "from core import batch_save\n"
+         f"batch_save._BATCH_DIR = {str(tmp_path / 'batches')!r}\n"
+         "with batch_save.BatchJournal('reg-1'):\n"
+         "    print('aberto', flush=True)\n"
+         "    sys.stdin.readline()\n"],
+        cwd=str(Path(__file__).resolve().parents[1]), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert filho.stdout.readline().strip() == "aberto"
+        assert batch_save._active == set()
+        assert client.post("/api/sandbox/batch?batch_id=reg-1", data="").status_code == 409
+        assert client.get("/api/sandbox/batch/reg-1").get_json()["active"] is True
+    finally:
+        filho.communicate("\n", timeout=20)
+    assert client.get("/api/sandbox/batch/reg-1").get_json()["active"] is False
+    shutil.rmtree(base, ignore_errors=True)
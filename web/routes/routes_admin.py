@@ -113,59 +113,170 @@ def api_admin_logs_clear():
 # USUÁRIOS
 # ==========================================================
 
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+
+def _page_args() -> tuple:
+    """Lê page/per_page da query string. Retorna (page, per_page) já limitados."""
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        per_page = int(request.args.get("per_page", ADMIN_PAGE_SIZE))
+    except (TypeError, ValueError):
+        per_page = ADMIN_PAGE_SIZE
+    per_page = max(1, min(per_page, ADMIN_MAX_PAGE_SIZE))
+    return page, per_page
+
+
+def _exact_count(sb, table: str, column: str = "id"):
+    """COUNT(*) no servidor (count=exact) sem baixar as linhas. None se falhar."""
+    try:
+        r = sb.table(table).select(column, count="exact").limit(1).execute()
+        count = getattr(r, "count", None)
+        return int(count) if count is not None else None
+    except Exception:
+        return None
+
+
+def _users_page_rpc(sb, page: int, per_page: int):
+    """
+    Página de usuários via RPC admin_list_users (supabase_migration_admin_stats.sql).
+    Contagens agrupadas no Postgres. Retorna (users, total) ou None se a RPC não existir.
+    """
+    try:
+        r = sb.rpc("admin_list_users", {"p_limit": per_page, "p_offset": (page - 1) * per_page}).execute()
+    except Exception:
+        return None
+    rows = r.data or []
+    users = [
+        {
+            "id": str(row.get("id", "")),
+            "email": row.get("email", "") or "",
+            "created_at": str(row.get("created_at") or ""),
+            "last_sign_in_at": str(row.get("last_sign_in_at") or ""),
+            "chats_count": int(row.get("chats_count") or 0),
+            "messages_count": int(row.get("messages_count") or 0),
+        }
+        for row in rows
+    ]
+    total = int(rows[0].get("total_count") or 0) if rows else _exact_count(sb, "users_profile") or 0
+    return users, total
+
+
+def _chats_count_for(sb, user_ids: list) -> dict:
+    """
+    Contagem de chats só dos usuários da página.
+    Prefere user_stats (materializada); senão conta no servidor por usuário (count=exact).
+    """
+    if not user_ids:
+        return {}
+    try:
+        r = sb.table("user_stats").select("user_id, chats_count, messages_count").in_("user_id", user_ids).execute()
+        if r.data is not None:
+            counts = {str(row.get("user_id")): int(row.get("chats_count") or 0) for row in r.data}
+            return {uid: counts.get(uid, 0) for uid in user_ids}
+    except Exception:
+        pass
+    counts = {}
+    for uid in user_ids:
+        try:
+            r = sb.table("chats").select("id", count="exact").eq("user_id", uid).limit(1).execute()
+            counts[uid] = int(getattr(r, "count", None) or 0)
+        except Exception:
+            counts[uid] = 0
+    return counts
+
+
+def _auth_users_page(sb, page: int, per_page: int):
+    """Página do Supabase Auth (fonte de todas as contas). None se a API admin falhar."""
+    try:
+        ar = sb.auth.admin.list_users(page=page, per_page=per_page)
+        auth_users = ar if isinstance(ar, list) else (getattr(ar, "users", []) or [])
+    except Exception:
+        return None
+    users = []
+    for u in auth_users[:per_page]:
+        uid = str(getattr(u, "id", "") or (u.get("id", "") if isinstance(u, dict) else ""))
+        if not uid:
+            continue
+        users.append({
+            "id": uid,
+            "email": getattr(u, "email", "") or (u.get("email", "") if isinstance(u, dict) else ""),
+            "created_at": str(getattr(u, "created_at", "") or (u.get("created_at", "") if isinstance(u, dict) else "")),
+            "last_sign_in_at": str(getattr(u, "last_sign_in_at", "") or (u.get("last_sign_in_at", "") if isinstance(u, dict) else "")),
+        })
+    return users
+
+
+def _users_page_fallback(sb, page: int, per_page: int):
+    """
+    Página de usuários sem a RPC. Pagina o Supabase Auth e junta os users_profile da
+    página (contas sem perfil continuam na lista); sem a API admin, pagina users_profile.
+    Contagens só da página.
+    """
+    offset = (page - 1) * per_page
+    users = _auth_users_page(sb, page, per_page)
+    if users is not None and (users or page > 1):
+        ids = [u["id"] for u in users]
+        try:
+            r = sb.table("users_profile").select("id, email").in_("id", ids).execute() if ids else None
+            perfis = {str(row.get("id", "")): row for row in (r.data or [])} if r is not None else {}
+        except Exception:
+            perfis = {}
+        for u in users:
+            u["email"] = u["email"] or (perfis.get(u["id"]) or {}).get("email", "") or ""
+        # Auth não devolve o total: users_profile é o piso e página cheia garante has_more
+        total = max(_exact_count(sb, "users_profile") or 0,
+                    offset + len(users) + (1 if len(users) == per_page else 0))
+    else:
+        r = sb.table("users_profile").select("id, email", count="exact").range(offset, offset + per_page - 1).execute()
+        users = [
+            {"id": str(row.get("id", "")), "email": row.get("email", "") or "", "created_at": "", "last_sign_in_at": ""}
+            for row in (r.data or [])
+        ]
+        total = int(getattr(r, "count", None) or len(users))
+    counts = _chats_count_for(sb, [u["id"] for u in users])
+    for u in users:
+        u["chats_count"] = counts.get(u["id"], 0)
+    return users, total
+
+
 @admin_bp.get("/users")
 def api_admin_users():
-    """Lista usuários (Supabase Auth + users_profile). Requer service key."""
+    """
+    Lista usuários paginada (Supabase Auth + users_profile). Requer service key.
+    Query: page (1..), per_page (máx 200). Contagens calculadas no servidor.
+    """
     user_id, err = _require_admin()
     if err:
         return err[0], err[1]
+    page, per_page = _page_args()
     try:
         from core.supabase_client import get_supabase_client
         sb = get_supabase_client("service")
         if not sb:
             return jsonify({"ok": False, "error": "Supabase não configurado"}), 503
-        users = []
+        source = "rpc"
         try:
-            r = sb.table("users_profile").select("id, email").execute()
-            if r.data:
-                users = [
-                    {"id": str(row.get("id", "")), "email": row.get("email", "") or "", "created_at": "", "last_sign_in_at": ""}
-                    for row in r.data
-                ]
-            auth_users = []
-            try:
-                ar = sb.auth.admin.list_users()
-                auth_users = getattr(ar, "users", []) or []
-            except Exception:
-                pass
-            if auth_users:
-                seen = {u["id"] for u in users}
-                for u in auth_users:
-                    uid = str(getattr(u, "id", "") or (u.get("id", "") if isinstance(u, dict) else ""))
-                    if uid and uid not in seen:
-                        users.append({
-                            "id": uid,
-                            "email": getattr(u, "email", "") or (u.get("email", "") if isinstance(u, dict) else ""),
-                            "created_at": str(getattr(u, "created_at", "") or (u.get("created_at", "") if isinstance(u, dict) else "")),
-                            "last_sign_in_at": str(getattr(u, "last_sign_in_at", "") or (u.get("last_sign_in_at", "") if isinstance(u, dict) else "")),
-                        })
-                        seen.add(uid)
-            if not users:
-                users = [{"id": "—", "email": "Nenhum usuário encontrado", "created_at": "", "last_sign_in_at": ""}]
+            result = _users_page_rpc(sb, page, per_page)
+            if result is None:
+                source = "fallback"
+                result = _users_page_fallback(sb, page, per_page)
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
-        chats_count = {}
-        try:
-            r_chats = sb.table("chats").select("user_id").execute()
-            for row in (r_chats.data or []):
-                uid = row.get("user_id")
-                if uid:
-                    chats_count[uid] = chats_count.get(uid, 0) + 1
-        except Exception:
-            pass
-        for u in users:
-            u["chats_count"] = chats_count.get(u.get("id", ""), 0)
-        return jsonify({"ok": True, "users": users})
+        users, total = result
+        return jsonify({
+            "ok": True,
+            "users": users,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "has_more": page * per_page < total,
+            "source": source,
+        })
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -176,7 +287,7 @@ def api_admin_users():
 
 @admin_bp.get("/stats")
 def api_admin_stats():
-    """Estatísticas gerais: chats, mensagens, usuários."""
+    """Estatísticas gerais: chats, mensagens, usuários (COUNT no servidor)."""
     user_id, err = _require_admin()
     if err:
         return err[0], err[1]
@@ -186,24 +297,23 @@ def api_admin_stats():
         stats = {"chats": 0, "messages": 0, "users": 0}
         if sb:
             try:
-                r = sb.table("chats").select("id", count="exact").execute()
-                stats["chats"] = r.count if hasattr(r, "count") and r.count is not None else len(r.data or [])
+                r = sb.rpc("admin_global_stats", {}).execute()
+                if isinstance(r.data, dict):
+                    for k in stats:
+                        stats[k] = int(r.data.get(k) or 0)
+                    return jsonify({"ok": True, "stats": stats})
             except Exception:
                 pass
-            try:
-                r = sb.table("messages").select("id", count="exact").execute()
-                stats["messages"] = r.count if hasattr(r, "count") and r.count is not None else len(r.data or [])
-            except Exception:
-                pass
-            try:
-                r = sb.auth.admin.list_users()
-                stats["users"] = len(getattr(r, "users", []) or [])
-            except Exception:
+            stats["chats"] = _exact_count(sb, "chats") or 0
+            stats["messages"] = _exact_count(sb, "messages") or 0
+            users = _exact_count(sb, "users_profile")
+            if users is None:
                 try:
-                    r = sb.table("users_profile").select("id", count="exact").execute()
-                    stats["users"] = r.count if hasattr(r, "count") and r.count is not None else len(r.data or [])
+                    r = sb.auth.admin.list_users()
+                    users = len(getattr(r, "users", []) or [])
                 except Exception:
-                    pass
+                    users = 0
+            stats["users"] = users
         return jsonify({"ok": True, "stats": stats})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
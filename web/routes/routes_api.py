@@ -1,10 +1,14 @@
 # Rotas de API: index, estáticos, download, clear_chat, upload, analyze, tools.
 
 from pathlib import Path
+import json
+import os
+import sys
+import time
 import zipfile
 from datetime import datetime
 
-from flask import Blueprint, request, render_template, send_from_directory, jsonify, session
+from flask import Blueprint, Response, request, render_template, send_from_directory, jsonify, session, stream_with_context
 
 from config import settings
 from core.tool_runner import run_tool
@@ -195,12 +199,41 @@ def api_system_telemetry():
 
 @system_bp.get("/runtime_metrics")
 def api_system_runtime_metrics():
-    """Métricas leves de runtime (fila assíncrona + executor sandbox)."""
+    """Métricas leves de runtime (fila assíncrona, executor sandbox, sessões, tokens do último prompt)."""
     try:
         from core.job_queue import get_job_metrics
     except Exception:
         def get_job_metrics():
             return {"available": False}
+    try:
+        from core.session_manager import get_session_metrics
+    except Exception:
+        def get_session_metrics():
+            return {"available": False}
+    try:
+        from core.token_budget import last_report as get_prompt_tokens
+    except Exception:
+        def get_prompt_tokens():
+            return {"available": False}
+    try:
+        from core.fs_snapshot import snapshot_stats as get_fs_snapshots
+    except Exception:
+        def get_fs_snapshots():
+            return {"available": False}
+    try:
+        from core.prompt_assembler import prefix_stats as get_prompt_prefix
+    except Exception:
+        def get_prompt_prefix():
+            return {"available": False}
+    try:
+        from core.code_linter import lint_stats as get_syntax_lint
+        from yui_ai.validation.linter_runner import lint_stats as get_linters
+    except Exception:
+        def get_syntax_lint():
+            return {"available": False}
+
+        def get_linters():
+            return {"available": False}
     try:
         from core.sandbox_executor.runner import get_execution_metrics
     except Exception:
@@ -209,13 +242,25 @@ def api_system_runtime_metrics():
     return jsonify({
         "job_queue": get_job_metrics(),
         "sandbox_executor": get_execution_metrics(),
+        "sessions": get_session_metrics(),
+        "prompt_tokens": get_prompt_tokens(),
+        "prompt_prefix": get_prompt_prefix(),
+        "fs_snapshots": get_fs_snapshots(),
+        "lint": {"syntax": get_syntax_lint(), "linters": get_linters()},
     })
 
+@system_bp.get("/startup_report")
+def api_system_startup_report():
+    """Tempo de import por fase e de init por subsistema lazy (core/startup)."""
+    from core import startup
+    return jsonify(startup.report())
+
+
 @system_bp.post("/cleanup")
 def api_system_cleanup():
     """
     Limpeza: generated_projects + arquivos temporários do sandbox.
-    Também encerra terminais sem interação há > 2 min (kill switch).
+    Também encerra terminais sem interação há > 2 min (kill switch) e despeja sessões ociosas.
     Chamar periodicamente (ex: cron) para reduzir carga no Zeabur.
     """
     import shutil
@@ -224,6 +269,11 @@ def api_system_cleanup():
         cleanup_processes()
     except Exception:
         pass
+    try:
+        from core.session_manager import sweep_sessions
+        sweep_sessions()
+    except Exception:
+        pass
     try:
         from config import settings
         deleted = 0
@@ -659,7 +709,12 @@ def api_sandbox_zip():
 
 @sandbox_bp.get("/read")
 def api_sandbox_read():
-    """Lê conteúdo de um arquivo no sandbox. Query: path."""
+    """
+    Lê conteúdo de um arquivo no sandbox. Query: path.
+    Janelas (só o trecho sai do disco): offset+length (bytes), start+lines (linhas),
+    head=N, tail=N, grep=texto (literal, sem regex: padrão do cliente não roda sem limite no
+    servidor; context=N, max=N). Sem janela: arquivo inteiro.
+    """
     path_arg = (request.args.get("path") or "").strip()
     if not path_arg or ".." in path_arg or path_arg.startswith("/"):
         return jsonify({"ok": False, "error": "path inválido"}), 400
@@ -670,7 +725,23 @@ def api_sandbox_read():
         return jsonify({"ok": False, "error": "path inválido"}), 400
     if not target.exists() or not target.is_file():
         return jsonify({"ok": False, "error": "arquivo não encontrado"}), 404
+    args = request.args
     try:
+        from core import file_window as fw
+        if args.get("grep"):
+            res = fw.grep_file(str(target), args["grep"][:fw.MAX_GREP_PATTERN],
+                               context=args.get("context", 0, type=int), max_matches=args.get("max", 50, type=int))
+            return jsonify({"ok": True, "path": path_arg, **res})
+        if args.get("tail"):
+            return jsonify({"ok": True, "path": path_arg, **fw.tail(str(target), args.get("tail", 50, type=int))})
+        if args.get("head"):
+            return jsonify({"ok": True, "path": path_arg, **fw.head(str(target), args.get("head", 50, type=int))})
+        if args.get("start") or args.get("lines"):
+            res = fw.read_lines(str(target), args.get("start", 1, type=int), args.get("lines", 200, type=int))
+            return jsonify({"ok": True, "path": path_arg, **res})
+        if args.get("offset") or args.get("length"):
+            res = fw.read_bytes(str(target), args.get("offset", 0, type=int), args.get("length", 65536, type=int))
+            return jsonify({"ok": True, "path": path_arg, **res})
         content = target.read_text(encoding="utf-8", errors="replace")
         return jsonify({"ok": True, "path": path_arg, "content": content})
     except Exception as e:
@@ -682,6 +753,7 @@ def api_sandbox_list():
     """
     Lazy File Listing: lista apenas o conteúdo direto de uma pasta (não recursivo).
     Query: path (opcional, default "."). Use para expandir pastas sob demanda.
+    Paginação opcional: limit=N e cursor (devolvido como "cursor" quando há mais entradas).
     """
     path_arg = (request.args.get("path") or ".").strip()
     if ".." in path_arg or path_arg.startswith("/"):
@@ -697,16 +769,23 @@ def api_sandbox_list():
     if not target.is_dir():
         return jsonify({"ok": False, "error": "não é pasta"}), 400
     ignore = {"__pycache__", ".git", ".venv", "venv", "env", "node_modules", ".mypy_cache", ".pytest_cache", "build", "dist", ".DS_Store", "Thumbs.db", ".yui_map.json"}
-    entries = []
-    for child in sorted(target.iterdir(), key=lambda p: (not p.is_dir(), p.name.lower())):
-        if child.name in ignore or (child.name.startswith(".") and child.name not in (".env", ".env.example")):
-            continue
-        entries.append({
-            "name": child.name,
-            "path": str(child.relative_to(sandbox)).replace("\\", "/"),
-            "is_dir": child.is_dir(),
-        })
-    return jsonify({"ok": True, "entries": entries})
+    from core.file_window import list_dir_page
+    limit = request.args.get("limit", type=int)
+    try:
+        page = list_dir_page(
+            str(target),
+            cursor=request.args.get("cursor") or None,
+            limit=max(1, min(limit, 5000)) if limit else sys.maxsize,
+            skip=lambda name: name in ignore or (name.startswith(".") and name not in (".env", ".env.example")),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    base = target.relative_to(sandbox.resolve())
+    entries = [
+        {"name": e["name"], "path": str(base / e["name"]).replace("\\", "/"), "is_dir": e["is_dir"]}
+        for e in page["entries"]
+    ]
+    return jsonify({"ok": True, "entries": entries, "cursor": page["cursor"]})
 
 
 @sandbox_bp.get("/map")
@@ -739,12 +818,50 @@ def api_sandbox_lessons():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+MULTI_SAVE_VALIDATE = os.environ.get("YUI_MULTI_SAVE_VALIDATE", "1").strip().lower() not in ("0", "false", "no")
+_VALIDATE_EXTS = (".py", ".js", ".mjs", ".cjs")  # node --check não entende JSX/TS
+
+
+def _apply_sandbox_action(sandbox: Path, item: dict):
+    """
+    Aplica uma ação de escrita no sandbox (multi-save e batch).
+    Retorna (kind, erro): kind "saved", "deleted" ou None (delete de algo que não existe).
+    """
+    action = (item.get("action") or "").strip().lower()
+    path = (item.get("path") or "").strip()
+    if not path or ".." in path or path.startswith("/"):
+        return None, "path inválido"
+    try:
+        target = _safe_path(sandbox, path)
+        if action == "delete":
+            if not target.exists():
+                return None, None
+            if target.is_file():
+                target.unlink()
+            else:
+                import shutil
+                shutil.rmtree(target)
+            _record_disk_write()
+            return "deleted", None
+        if action in ("create", "update"):
+            content = item.get("content", "")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content, encoding="utf-8", errors="replace")
+            _record_disk_write()
+            return "saved", None
+        return None, "action inválida"
+    except Exception as e:
+        return None, str(e)
+
+
 @sandbox_bp.post("/multi-save")
 def api_sandbox_multi_save():
     """
     Multi-Write: salva lote de arquivos com streaming.
-    Body: { actions: [{ action: "create"|"update"|"delete", path: str, content?: str }] }
-    Processa em chunks para evitar >2GB RAM.
+    Body: { actions: [{ action: "create"|"update"|"delete", path: str, content?: str }], validate?: bool }
+    Processa em chunks para evitar >2GB RAM. validate (padrão YUI_MULTI_SAVE_VALIDATE=1) roda os
+    linters do projeto nos arquivos de código gravados (ValidationEngine.validar_lote) e devolve avisos.
+    Lotes grandes: POST /batch (NDJSON em streaming, com retomada).
     """
     data = request.get_json(silent=True) or {}
     actions = data.get("actions") or []
@@ -754,10 +871,13 @@ def api_sandbox_multi_save():
     sandbox.mkdir(parents=True, exist_ok=True)
     CHUNK_SIZE = 15
     saved, deleted, errors = [], [], []
+    inicio = time.perf_counter()
+    lint_ms = 0.0
     # Validação de sintaxe (Linter) antes de salvar
     try:
         from core.code_linter import lint_multi_write_actions
         _, lint_errors = lint_multi_write_actions(actions)
+        lint_ms = (time.perf_counter() - inicio) * 1000
         if lint_errors:
             return jsonify({
                 "ok": False,
@@ -771,41 +891,148 @@ def api_sandbox_multi_save():
         for item in chunk:
             if not isinstance(item, dict):
                 continue
-            action = (item.get("action") or "").strip().lower()
             path = (item.get("path") or "").strip()
-            if not path or ".." in path or path.startswith("/"):
-                errors.append(f"{path}: path inválido")
-                continue
-            try:
-                target = _safe_path(sandbox, path)
-                if action == "delete":
-                    if target.exists():
-                        if target.is_file():
-                            target.unlink()
-                        else:
-                            import shutil
-                            shutil.rmtree(target)
-                        deleted.append(path)
-                        _record_disk_write()
-                elif action in ("create", "update"):
-                    content = item.get("content", "")
-                    target.parent.mkdir(parents=True, exist_ok=True)
-                    target.write_text(content, encoding="utf-8", errors="replace")
-                    saved.append(path)
-                    _record_disk_write()
-                else:
-                    errors.append(f"{path}: action inválida")
-            except ValueError as e:
-                errors.append(f"{path}: {e}")
-            except Exception as e:
-                errors.append(f"{path}: {e}")
+            kind, error = _apply_sandbox_action(sandbox, item)
+            if error:
+                errors.append(f"{path}: {error}")
+            elif kind == "saved":
+                saved.append(path)
+            elif kind == "deleted":
+                deleted.append(path)
     for path in saved + deleted:
         try:
             from core.event_bus import emit
             emit("file_changed", path=path, action="multi_save")
         except Exception:
             pass
-    return jsonify({"ok": True, "saved": saved, "deleted": deleted, "errors": errors})
+    write_ms = (time.perf_counter() - inicio) * 1000 - lint_ms
+    # Linters externos (flake8/pylint/eslint) nos arquivos gravados, em paralelo e com
+    # cache por hash: só avisos, os arquivos já foram salvos
+    validation, validate_ms = None, 0.0
+    if data.get("validate", MULTI_SAVE_VALIDATE):
+        arquivos = {str(_safe_path(sandbox, p)): p for p in saved if p.lower().endswith(_VALIDATE_EXTS)}
+        if arquivos:
+            t0 = time.perf_counter()
+            try:
+                from yui_ai.validation import ValidationEngine
+                lote = ValidationEngine().validar_lote(list(arquivos), str(sandbox))
+                validation = {
+                    arquivos[a]: {
+                        "ok": r["sintaxe"]["sucesso"] and r["linter"]["sucesso"],
+                        "linter": r["linter"]["detalhes"].get("linter"),
+                        "erro": (r["sintaxe"]["erro"] or r["linter"]["erro"] or "")[:2000] or None,
+                    }
+                    for a, r in lote["arquivos"].items()
+                }
+            except Exception as e:
+                validation = {"error": str(e)}
+            validate_ms = (time.perf_counter() - t0) * 1000
+    total_ms = (time.perf_counter() - inicio) * 1000
+    return jsonify({"ok": True, "saved": saved, "deleted": deleted, "errors": errors, "validation": validation,
+                    "timing": {"lint_ms": round(lint_ms, 2), "write_ms": round(write_ms, 2),
+                               "validate_ms": round(validate_ms, 2), "total_ms": round(total_ms, 2)}})
+
+
+@sandbox_bp.post("/batch")
+def api_sandbox_batch():
+    """
+    Lote em streaming, sem limite de ações: corpo NDJSON, uma ação por linha
+    { seq?: int, action: "create"|"update"|"delete", path: str, content?: str }.
+    Cada ação é aplicada assim que a linha chega; a resposta (NDJSON) traz uma
+    linha de cabeçalho { batch_id, last_seq }, uma por ação { seq, ok, kind?, error? }
+    e o resumo final { done: true, ... }.
+    Retomada: reenviar com o mesmo batch_id (?batch_id= ou X-Batch-Id) pula os seq já
+    aplicados com sucesso e reaplica os que falharam (seq padrão = posição da ação no lote). ?lint=0 desliga o lint por ação.
+    """
+    from core.batch_save import BatchJournal, iter_ndjson
+
+    batch_id = (request.args.get("batch_id") or request.headers.get("X-Batch-Id") or "").strip() or None
+    lint = request.args.get("lint", "1").strip().lower() not in ("0", "false", "no")
+    try:
+        journal = BatchJournal(batch_id).open()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e), "batch_id": batch_id}), 409
+    sandbox = Path(settings.SANDBOX_DIR)
+    sandbox.mkdir(parents=True, exist_ok=True)
+    stream = request.stream
+
+    def _linha(obj: dict) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def generate():
+        inicio = time.perf_counter()
+        counts = {"saved": 0, "deleted": 0, "errors": 0, "skipped": 0}
+        try:
+            yield _linha({"batch_id": journal.batch_id, "last_seq": journal.last_seq,
+                          "acked": len(journal.acked)})
+            seq_padrao = 0
+            for numero, item, erro in iter_ndjson(stream):
+                if erro or not isinstance(item, dict):
+                    counts["errors"] += 1
+                    yield _linha({"line": numero, "ok": False, "error": erro or "ação deve ser objeto"})
+                    continue
+                seq = item.get("seq")
+                if not isinstance(seq, int) or isinstance(seq, bool):
+                    seq = seq_padrao
+                seq_padrao = seq + 1
+                path = (item.get("path") or "").strip()
+                anterior = journal.acked_record(seq)
+                if anterior is not None:
+                    counts["skipped"] += 1
+                    yield _linha({"seq": seq, "ok": anterior["ok"], "skipped": True,
+                                  "kind": anterior.get("kind"), "path": anterior.get("path", path)})
+                    continue
+                action = (item.get("action") or "").strip().lower()
+                content = item.get("content", "")
+                if lint and action in ("create", "update") and content:
+                    from core.code_linter import lint_code
+                    ext = path.rsplit(".", 1)[-1].lower()
+                    if ext in ("py", "js", "jsx", "ts", "tsx", "mjs", "cjs"):
+                        lint_errors = lint_code(content, path, "python" if ext == "py" else "javascript")
+                        if lint_errors:
+                            journal.record(seq, False, None, path)
+                            counts["errors"] += 1
+                            yield _linha({"seq": seq, "ok": False, "path": path, "error": "erros de sintaxe",
+                                          "lint_errors": [f"{e.get('line', 0)} - {e.get('message', '')}"
+                                                          for e in lint_errors[:10]]})
+                            continue
+                kind, error = _apply_sandbox_action(sandbox, item)
+                journal.record(seq, error is None, kind, path)
+                if error:
+                    counts["errors"] += 1
+                    yield _linha({"seq": seq, "ok": False, "path": path, "error": error})
+                    continue
+                if kind:
+                    counts[kind] += 1
+                    try:
+                        from core.event_bus import emit
+                        emit("file_changed", path=path, action="batch")
+                    except Exception:
+                        pass
+                yield _linha({"seq": seq, "ok": True, "kind": kind, "path": path})
+            journal.finish()
+            yield _linha(dict(counts, done=True, batch_id=journal.batch_id, last_seq=journal.last_seq,
+                              total_ms=round((time.perf_counter() - inicio) * 1000, 2)))
+        finally:
+            journal.close()
+
+    resp = Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Batch-Id": journal.batch_id, "Cache-Control": "no-cache"})
+    resp.call_on_close(journal.close)  # gerador nunca iniciado (cliente caiu antes) não passa pelo finally
+    return resp
+
+
+@sandbox_bp.get("/batch/<batch_id>")
+def api_sandbox_batch_status(batch_id: str):
+    """Progresso de um lote: último seq confirmado (de onde retomar) e contagens."""
+    from core.batch_save import batch_status
+
+    status = batch_status(batch_id)
+    if status is None:
+        return jsonify({"ok": False, "error": "lote não encontrado"}), 404
+    return jsonify(dict(status, ok=True))
 
 
 @sandbox_bp.post("/deploy")
@@ -97,54 +97,72 @@ def api_chat_job(job_id):
         return jsonify({"error": str(e)}), 500
 
 
+def parse_chat_stream_payload(data: dict):
+    """
+    Valida o corpo de /chat/stream (usado também pelo modo ASGI, asgi.py).
+    Retorna (params, None) ou (None, (erro, status)). Não consulta o banco.
+    """
+    params = {
+        "chat_id": data.get("chat_id"),
+        "user_id": data.get("user_id"),
+        "message": (data.get("message") or "").strip(),
+        "model": (data.get("model") or "yui").strip().lower(),
+        "confirm_high_cost": bool(data.get("confirm_high_cost")),
+        "active_files": data.get("active_files") or [],
+        "console_errors": data.get("console_errors") or [],
+        "workspace_open": bool(data.get("workspace_open")),
+    }
+    try:
+        from core.event_bus import emit
+        emit("workspace_toggled", open=params["workspace_open"])
+    except Exception:
+        try:
+            from core.system_state import set_workspace_open
+            set_workspace_open(params["workspace_open"])
+        except Exception:
+            pass
+    if params["model"] not in ("yui", "heathcliff", "auto"):
+        params["model"] = "yui"
+    if not params["chat_id"]:
+        return None, ("chat_id obrigatório", 400)
+    if not params["user_id"]:
+        return None, ("user_id obrigatório", 400)
+    if not params["message"]:
+        return None, ("message obrigatória", 400)
+    return params, None
+
+
+def sse_event(chunk) -> str:
+    """Formata um chunk como evento SSE (data: <json>)."""
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
 @chat_bp.route("/chat/stream", methods=["POST", "OPTIONS"])
 def api_chat_stream():
     if request.method == "OPTIONS":
         return "", 204
     try:
-        data = request.get_json(silent=True) or {}
-        chat_id = data.get("chat_id")
-        user_id = data.get("user_id")
-        message = (data.get("message") or "").strip()
-        model = (data.get("model") or "yui").strip().lower()
-        confirm_high_cost = bool(data.get("confirm_high_cost"))
-        active_files = data.get("active_files") or []
-        console_errors = data.get("console_errors") or []
-        workspace_open = bool(data.get("workspace_open"))
-        try:
-            from core.event_bus import emit
-            emit("workspace_toggled", open=workspace_open)
-        except Exception:
-            try:
-                from core.system_state import set_workspace_open
-                set_workspace_open(workspace_open)
-            except Exception:
-                pass
-        if model not in ("yui", "heathcliff", "auto"):
-            model = "yui"
-        if not chat_id:
-            return jsonify({"error": "chat_id obrigatório"}), 400
-        if not user_id:
-            return jsonify({"error": "user_id obrigatório"}), 400
-        if not message:
-            return jsonify({"error": "message obrigatória"}), 400
+        params, erro = parse_chat_stream_payload(request.get_json(silent=True) or {})
+        if erro:
+            return jsonify({"error": erro[0]}), erro[1]
+        user_id, chat_id = params["user_id"], params["chat_id"]
         if not chat_pertence_usuario(chat_id, user_id):
             return jsonify({"error": "Chat não encontrado ou não pertence ao usuário"}), 403
 
         session["user_id"] = user_id
 
         def generate():
-            yield f"data: {json.dumps('__STATUS__:thinking')}\n\n"
+            yield sse_event("__STATUS__:thinking")
             for chunk in handle_chat_stream(
-                user_id, chat_id, message,
-                model=model,
-                confirm_high_cost=confirm_high_cost,
-                active_files=active_files,
-                console_errors=console_errors,
-                workspace_open=workspace_open,
+                user_id, chat_id, params["message"],
+                model=params["model"],
+                confirm_high_cost=params["confirm_high_cost"],
+                active_files=params["active_files"],
+                console_errors=params["console_errors"],
+                workspace_open=params["workspace_open"],
             ):
-                yield f"data: {json.dumps(chunk)}\n\n"
-            yield f"data: {json.dumps('__STATUS__:done')}\n\n"
+                yield sse_event(chunk)
+            yield sse_event("__STATUS__:done")
 
         return Response(
             stream_with_context(generate()),
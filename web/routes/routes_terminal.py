@@ -1,19 +1,23 @@
 """
 Terminal WebSocket — conecta xterm.js ao shell do servidor.
-Um PTY por conexão; cwd = sandbox.
+Um PTY por sessão; cwd = sandbox.
 Linux/macOS: PTY. Windows: subprocess (sem PTY).
-Kill Switch: processos sem interação > 2 min são encerrados.
+Leitura, agrupamento da saída, backpressure e reattach ficam em core/terminal_mux
+(um loop para todos os shells). Reconectar com ?session=<token> volta ao mesmo bash.
+Kill Switch: sessões sem interação > 2 min são encerradas.
 """
 
 import os
 import subprocess
 import sys
 import threading
-import time
 from pathlib import Path
 
+from flask import request
 from flask_sock import Sock
 
+from core.terminal_mux import get_terminal_mux, session_marker
+
 try:
     from config import settings
     SANDBOX_DIR = Path(settings.SANDBOX_DIR).resolve()
@@ -22,48 +26,10 @@ except Exception:
 
 sock = Sock()
 
-# Registro de processos ativos: {id: {proc, master, use_pty, last_activity}}
-_terminal_processes: dict = {}
-_terminal_lock = threading.Lock()
-_terminal_counter = 0
-
-IDLE_KILL_SECONDS = 120  # 2 minutos sem interação
-
 
 def cleanup_processes():
-    """Encerra processos de terminal sem interação há mais de 2 minutos."""
-    now = time.time()
-    to_remove = []
-    with _terminal_lock:
-        for tid, info in list(_terminal_processes.items()):
-            if now - info.get("last_activity", 0) > IDLE_KILL_SECONDS:
-                to_remove.append(tid)
-    for tid in to_remove:
-        with _terminal_lock:
-            info = _terminal_processes.pop(tid, None)
-        if info:
-            proc = info.get("proc")
-            master = info.get("master")
-            try:
-                if proc and proc.poll() is None:
-                    proc.terminate()
-                    proc.wait(timeout=2)
-            except Exception:
-                try:
-                    proc.kill()
-                except Exception:
-                    pass
-            if master is not None:
-                try:
-                    os.close(master)
-                except Exception:
-                    pass
-    try:
-        from core.system_state import set_terminal_sessions_alive
-        with _terminal_lock:
-            set_terminal_sessions_alive(len(_terminal_processes) > 0)
-    except Exception:
-        pass
+    """Encerra sessões de terminal sem interação há mais de terminal_mux.IDLE_KILL_SECONDS."""
+    return get_terminal_mux().reap_idle()
 
 
 def _spawn_shell():
@@ -109,101 +75,39 @@ def _spawn_shell():
         return proc, None, False
 
 
-def _run_reader(ws, proc, master, use_pty):
-    """Thread: lê da saída e envia ao WebSocket."""
+def _pump_output(ws, att):
+    """Thread: entrega ao WebSocket os frames que o mux agrupou (bloqueia sem polling)."""
     try:
-        if use_pty and master is not None:
-            import select
-            while proc.poll() is None:
-                r, _, _ = select.select([master], [], [], 0.1)
-                if r:
-                    try:
-                        data = os.read(master, 4096)
-                        if data:
-                            ws.send(data.decode("utf-8", errors="replace"))
-                    except (OSError, UnicodeDecodeError):
-                        break
-        elif proc.stdout:
-            while proc.poll() is None:
-                try:
-                    data = proc.stdout.read(4096)
-                    if data:
-                        ws.send(data.decode("utf-8", errors="replace"))
-                except Exception:
-                    break
+        while True:
+            frames = att.take()
+            if frames is None:
+                break
+            for frame in frames:
+                ws.send(frame)
+    except Exception:
+        pass
+    try:
+        ws.close()
     except Exception:
         pass
-
-
-def _cleanup_loop():
-    """Thread que chama cleanup_processes a cada 60 segundos."""
-    while True:
-        time.sleep(60)
-        try:
-            cleanup_processes()
-        except Exception:
-            pass
 
 
 def register_terminal_sock(app, sock_instance):
     """Registra a rota WebSocket do terminal."""
-    threading.Thread(target=_cleanup_loop, daemon=True).start()
 
     @sock_instance.route("/ws/terminal")
     def terminal_ws(ws):
-        global _terminal_counter
-        proc, master, use_pty = _spawn_shell()
-        with _terminal_lock:
-            _terminal_counter += 1
-            tid = _terminal_counter
-            _terminal_processes[tid] = {
-                "proc": proc,
-                "master": master,
-                "use_pty": use_pty,
-                "last_activity": time.time(),
-            }
+        mux = get_terminal_mux()
+        att = mux.attach(request.args.get("session"), _spawn_shell)
         try:
-            from core.system_state import set_terminal_sessions_alive
-            set_terminal_sessions_alive(True)
-        except Exception:
-            pass
-        try:
-            t = threading.Thread(target=_run_reader, args=(ws, proc, master, use_pty), daemon=True)
-            t.start()
+            ws.send(session_marker(att.session.id))
+            threading.Thread(target=_pump_output, args=(ws, att), daemon=True).start()
             while True:
-                try:
-                    msg = ws.receive()
-                    if msg is None:
-                        break
-                    with _terminal_lock:
-                        if tid in _terminal_processes:
-                            _terminal_processes[tid]["last_activity"] = time.time()
-                    if use_pty and master is not None:
-                        os.write(master, msg.encode("utf-8", errors="replace"))
-                    elif proc.stdin:
-                        proc.stdin.write(msg.encode("utf-8", errors="replace"))
-                        proc.stdin.flush()
-                except Exception:
+                msg = ws.receive()
+                if msg is None:
                     break
+                att.write(msg)
+        except Exception:
+            pass
         finally:
-            with _terminal_lock:
-                _terminal_processes.pop(tid, None)
-                alive = len(_terminal_processes) > 0
-            try:
-                from core.system_state import set_terminal_sessions_alive
-                set_terminal_sessions_alive(alive)
-            except Exception:
-                pass
-            try:
-                proc.terminate()
-                proc.wait(timeout=2)
-            except Exception:
-                try:
-                    proc.kill()
-                except Exception:
-                    pass
-            if master is not None:
-                try:
-                    os.close(master)
-                except Exception:
-                    pass
+            mux.detach(att)
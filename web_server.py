@@ -3,18 +3,29 @@ YUI Web Server — ponto de entrada enxuto.
 
 Rotas em: routes/routes_chat.py, routes_auth.py, routes_api.py (blueprints).
 Lógica em: services/, config/settings.py.
+
+Startup: só o essencial roda no import. Plugins, Task Engine (cap_*.py) e
+cliente Supabase são subsistemas lazy (core/startup): construídos no primeiro
+uso ou aquecidos em background após o primeiro request.
+Relatório: GET /api/system/startup_report.
 """
 
 import logging
 import os
 
-from flask import Flask
-from flask_cors import CORS
-from werkzeug.middleware.proxy_fix import ProxyFix
+from core import startup
+
+with startup.phase("import:flask"):
+    from flask import Flask
+    from flask_cors import CORS
+    from werkzeug.middleware.proxy_fix import ProxyFix
 
-from config import settings
-from web.routes import register_routes
-from web.routes.routes_terminal import sock, register_terminal_sock
+with startup.phase("import:settings"):
+    from config import settings
+
+with startup.phase("import:routes"):
+    from web.routes import register_routes
+    from web.routes.routes_terminal import sock, register_terminal_sock
 
 app = Flask(
     __name__,
@@ -36,7 +47,8 @@ def add_cors_headers(response):
     return response
 
 
-register_routes(app)
+with startup.phase("register_routes"):
+    register_routes(app)
 
 # Runtime mode (aplica também em Gunicorn/import time)
 def _is_cloud_runtime() -> bool:
@@ -50,48 +62,68 @@ def _is_cloud_runtime() -> bool:
 
 
 IS_CLOUD_RUNTIME = _is_cloud_runtime()
-if IS_CLOUD_RUNTIME:
-    try:
+
+
+def _init_mode():
+    if IS_CLOUD_RUNTIME:
         from core.capabilities import apply_mode
         apply_mode("lite")
-    except Exception as e:
-        logging.warning("apply_mode(lite): %s", e)
+    return "lite" if IS_CLOUD_RUNTIME else "full"
+
 
-# Event Bus: wiring (workspace_toggled → system_state etc.)
-try:
+def _init_events():
+    # Event Bus: wiring (workspace_toggled → system_state etc.)
     from core.event_wiring import wire_events
     wire_events()
-except Exception as e:
-    logging.warning("Event wiring: %s", e)
 
-# Observability: auto-trace de eventos (Graph, Scheduler, Governor)
-try:
+
+def _init_observability():
+    # Observability: auto-trace de eventos (Graph, Scheduler, Governor)
     from core.observability import wire_observability
     wire_observability()
-except Exception as e:
-    logging.warning("Observability wiring: %s", e)
 
-# Core Engine: injeta plugins no startup
-try:
+
+def _init_plugins():
+    # Core Engine: lista tools (plugins carregam sob demanda no primeiro run_tool)
     from core.plugins_loader import inject_into_engine
-    _tools = inject_into_engine()
-    if _tools:
-        logging.info("Core Engine: %d tools disponíveis (incl. plugins)", len(_tools))
-except Exception as e:
-    logging.warning("Plugin loader: %s", e)
-
-# Capability Loader: escaneia capabilities/ e registra no Task Engine
-try:
+    tools = inject_into_engine()
+    if tools:
+        logging.info("Core Engine: %d tools disponíveis (incl. plugins)", len(tools))
+    return tools
+
+
+def _init_task_engine():
+    # Capability Loader: escaneia capabilities/ e registra no Task Engine
     from core.task_engine import get_task_engine
     from core.capability_loader import list_loaded
-    get_task_engine()  # dispara carregamento
+    engine = get_task_engine()
     caps = list_loaded()
     if caps:
         logging.info("Capabilities carregadas: %s", caps)
     else:
         logging.info("Capabilities: fallback bootstrap")
-except Exception as e:
-    logging.warning("Capability loader: %s", e)
+    return engine
+
+
+def _init_supabase():
+    from core.supabase_client import get_supabase_client
+    return get_supabase_client("service")
+
+
+# Baratos e necessários antes do primeiro request: eager (listeners precisam existir antes do 1º emit)
+startup.register("mode", _init_mode, eager=True)
+startup.register("event_wiring", _init_events, eager=True)
+startup.register("observability", _init_observability, eager=True)
+# Pesados: primeiro uso ou warm-up em background
+startup.register("plugins", _init_plugins)
+startup.register("task_engine", _init_task_engine)
+startup.register("supabase", _init_supabase)
+
+
+@app.before_request
+def _warm_up_after_bind():
+    # Primeiro request = porta já aceitando conexões (também vale para cada worker do gunicorn)
+    startup.warm_up()
 
 
 if __name__ == "__main__":
@@ -108,5 +140,6 @@ if __name__ == "__main__":
             logging.warning("Indexação da memória vetorial ignorada: %s", e)
 
     threading.Thread(target=_indexar_memoria, daemon=True).start()
+    startup.warm_up(delay=2.0)  # app.run faz o bind logo em seguida
     _debug = settings.FLASK_DEBUG and not IS_CLOUD_RUNTIME
     app.run(host="0.0.0.0", port=settings.PORT, debug=_debug)
@@ -74,7 +74,11 @@ TOOLS_SCHEMA = [
             "description": "Lista arquivos do workspace (sandbox). Use para ver estrutura do projeto.",
             "parameters": {
                 "type": "object",
-                "properties": {"pasta": {"type": "string", "description": "Pasta relativa (ex: . ou src)"}},
+                "properties": {
+                    "pasta": {"type": "string", "description": "Pasta relativa (ex: . ou src)"},
+                    "cursor": {"type": "string", "description": "Cursor da página anterior (continua a listagem)"},
+                    "limite": {"type": "integer", "description": "Arquivos por página (default 200)"},
+                },
                 "required": [],
             },
         },
@@ -89,6 +93,12 @@ TOOLS_SCHEMA = [
                 "properties": {
                     "caminho": {"type": "string", "description": "Caminho relativo (ex: main.py)"},
                     "max_chars": {"type": "integer", "description": "Máx caracteres (default 8000)"},
+                    "linha_inicio": {"type": "integer", "description": "Primeira linha (1-based) de um intervalo"},
+                    "linhas": {"type": "integer", "description": "Quantidade de linhas do intervalo (default 200)"},
+                    "cauda": {"type": "integer", "description": "Últimas N linhas do arquivo"},
+                    "buscar": {"type": "string", "description": "Só as linhas que contêm este texto"},
+                    "offset": {"type": "integer", "description": "Byte inicial de uma janela; continue com proximo_offset"},
+                    "limite": {"type": "integer", "description": "Bytes lidos a partir do offset (default max_chars)"},
                 },
                 "required": ["caminho"],
             },
@@ -109,6 +119,33 @@ TOOLS_SCHEMA = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "listar_backups_workspace",
+            "description": "Lista as versões guardadas (backups) de um arquivo do workspace.",
+            "parameters": {
+                "type": "object",
+                "properties": {"caminho": {"type": "string", "description": "Caminho relativo (ex: main.py)"}},
+                "required": ["caminho"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "restaurar_backup_workspace",
+            "description": "Restaura uma versão guardada de um arquivo do workspace (o conteúdo atual vira backup).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "caminho": {"type": "string"},
+                    "versao": {"type": "string", "description": "Versão de listar_backups_workspace (default: a mais recente)"},
+                },
+                "required": ["caminho"],
+            },
+        },
+    },
 ]
 
 
@@ -187,7 +224,8 @@ async def stream_chat_agent(
 
     if chat_id and user_id:
         from yui.memory_manager import build_context_for_chat
-        ctx, _ = build_context_for_chat(chat_id, user_id, mensagem)
+        # I/O síncrono (Supabase) fora do event loop: no modo ASGI o loop atende outros streams
+        ctx, _ = await asyncio.to_thread(build_context_for_chat, chat_id, user_id, mensagem)
         if ctx:
             messages = ctx
         else:
@@ -257,8 +295,8 @@ async def stream_chat_agent(
         if not tool_calls_buf:
             if chat_id and user_id and full_content:
                 from yui.memory_manager import save_message
-                save_message(chat_id, "user", mensagem, user_id)
-                save_message(chat_id, "assistant", full_content, user_id)
+                await asyncio.to_thread(save_message, chat_id, "user", mensagem, user_id)
+                await asyncio.to_thread(save_message, chat_id, "assistant", full_content, user_id)
             return
 
         # Tool calls (só Heathcliff): executar e continuar
@@ -269,16 +307,21 @@ async def stream_chat_agent(
             args_str = tc.get("arguments", "{}")
             msg["tool_calls"].append({"id": tid, "function": {"name": name, "arguments": args_str}})
         messages.append(msg)
+        calls = []
         for tc in tool_calls_buf:
-            tid = tc.get("id", "")
-            name = tc.get("name", "")
             args_str = tc.get("arguments", "{}")
             try:
                 args = json.loads(args_str) if isinstance(args_str, str) else {}
             except json.JSONDecodeError:
                 args = {}
-            result = _executar_tool(name, args)
-            messages.append({"role": "tool", "tool_call_id": tid, "content": result})
+            calls.append({"tool": tc.get("name", ""), "args": args if isinstance(args, dict) else {}})
+        # Calls independentes do mesmo turno rodam em paralelo, fora do event loop
+        from core.tool_executor import run_tools
+        results = await asyncio.to_thread(run_tools, calls, _executar_tool)
+        for tc, result in zip(tool_calls_buf, results):
+            if not isinstance(result, str):
+                result = json.dumps(result, ensure_ascii=False)
+            messages.append({"role": "tool", "tool_call_id": tc.get("id", ""), "content": result})
         kwargs["tool_choice"] = "auto"
         kwargs["messages"] = messages
 
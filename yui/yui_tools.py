@@ -5,14 +5,16 @@ Yui Tools — Implementação das ferramentas técnicas.
 - calcular_custo_estimado: estimativa de custo em tokens
 - resumir_contexto: resumo técnico para memória
 - listar_arquivos_workspace: lista arquivos do workspace (sandbox)
-- ler_arquivo_workspace: lê arquivo do workspace
+- ler_arquivo_workspace: lê arquivo do workspace (em janela: linhas, cauda, busca)
 - escrever_arquivo_workspace: escreve no workspace (com backup)
+- listar_backups_workspace / restaurar_backup_workspace: versões guardadas de um arquivo
 """
 
-import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
+
+from core.fs_snapshot import notify_changed
 
 FORBIDDEN_DIRS = {"node_modules", ".git", "dist", "build", ".next", "coverage", "__pycache__"}
 BACKUP_DIR = ".yui-backups"
@@ -41,10 +43,11 @@ def _safe_path(base: Path, rel_path: str) -> Path:
     return full
 
 
-def listar_arquivos_workspace(pasta: str = ".") -> Dict[str, Any]:
+def listar_arquivos_workspace(pasta: str = ".", cursor: Optional[str] = None, limite: int = 200) -> Dict[str, Any]:
     """
-    Lista arquivos do workspace (sandbox).
-    pasta: caminho relativo ao sandbox.
+    Lista arquivos do workspace (sandbox), paginado.
+    pasta: caminho relativo ao sandbox. cursor: valor devolvido pela página anterior
+    (None quando não há mais arquivos).
     """
     try:
         sandbox = _get_sandbox()
@@ -52,61 +55,138 @@ def listar_arquivos_workspace(pasta: str = ".") -> Dict[str, Any]:
         if not target.is_dir():
             return {"ok": False, "arquivos": [], "erro": f"Pasta não encontrada: {pasta}"}
 
-        arquivos: List[str] = []
-        for p in target.rglob("*"):
-            if p.is_file():
-                rel = p.relative_to(sandbox)
-                parts = rel.parts
-                if any(part.lower() in FORBIDDEN_DIRS for part in parts):
-                    continue
-                arquivos.append(str(rel).replace("\\", "/"))
-        return {"ok": True, "arquivos": sorted(arquivos)[:200], "erro": None}
+        from core.file_window import list_files_page
+        base = sandbox.resolve()
+        prefix = str(target.relative_to(base)).replace("\\", "/")
+        page = list_files_page(
+            str(base),
+            prefix="" if prefix == "." else prefix,
+            cursor=cursor,
+            limit=max(1, min(int(limite or 200), 1000)),
+            skip=lambda part: part.lower() in FORBIDDEN_DIRS or part == BACKUP_DIR,
+        )
+        return {"ok": True, "arquivos": page["files"], "cursor": page["cursor"], "erro": None}
     except ValueError as e:
         return {"ok": False, "arquivos": [], "erro": str(e)}
     except Exception as e:
         return {"ok": False, "arquivos": [], "erro": str(e)}
 
 
-def ler_arquivo_workspace(caminho: str, max_chars: int = 8000) -> Dict[str, Any]:
-    """Lê conteúdo de um arquivo do workspace."""
+def ler_arquivo_workspace(
+    caminho: str,
+    max_chars: int = 8000,
+    linha_inicio: Optional[int] = None,
+    linhas: Optional[int] = None,
+    cauda: Optional[int] = None,
+    buscar: Optional[str] = None,
+    offset: Optional[int] = None,
+    limite: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Lê um arquivo do workspace em janela (só o trecho pedido sai do disco):
+    - padrão: primeiros max_chars caracteres
+    - linha_inicio/linhas: intervalo de linhas (1-based)
+    - cauda: últimas N linhas
+    - buscar: linhas que contêm o texto (com número da linha)
+    - offset/limite: limite bytes (default max_chars) a partir do offset
+    """
     try:
+        from core import file_window as fw
         sandbox = _get_sandbox()
         target = _safe_path(sandbox, caminho)
         if not target.is_file():
             return {"ok": False, "conteudo": "", "erro": f"Arquivo não encontrado: {caminho}"}
-        content = target.read_text(encoding="utf-8", errors="replace")
-        return {"ok": True, "conteudo": content[:max_chars], "erro": None}
+        path = str(target)
+        if buscar:
+            res = fw.grep_file(path, buscar)
+            texto = "\n".join(f"{m['line']}: {m['text']}" for m in res["matches"])
+            return {"ok": True, "conteudo": texto, "ocorrencias": len(res["matches"]),
+                    "truncado": res["truncated"], "erro": None}
+        if cauda:
+            res = fw.tail(path, cauda)
+            return {"ok": True, "conteudo": "\n".join(res["lines"]), "erro": None}
+        if linha_inicio or linhas:
+            res = fw.read_lines(path, linha_inicio or 1, linhas or 200)
+            return {"ok": True, "conteudo": "\n".join(res["lines"]), "proxima_linha": res["next_line"], "erro": None}
+        if offset is not None:
+            res = fw.read_bytes(path, offset, limite or max_chars)
+            return {"ok": True, "conteudo": res["content"], "proximo_offset": res["next_offset"],
+                    "tamanho": res["size"], "erro": None}
+        res = fw.read_chars(path, max_chars)
+        return {"ok": True, "conteudo": res["content"], "truncado": res["truncated"], "erro": None}
     except ValueError as e:
         return {"ok": False, "conteudo": "", "erro": str(e)}
     except Exception as e:
         return {"ok": False, "conteudo": "", "erro": str(e)}
 
 
+def _rel_workspace(sandbox: Path, target: Path) -> str:
+    return str(target.relative_to(sandbox.resolve())).replace("\\", "/")
+
+
 def escrever_arquivo_workspace(caminho: str, conteudo: str) -> Dict[str, Any]:
-    """Escreve no workspace. Cria backup automático antes de modificar."""
+    """
+    Escreve no workspace. O conteúdo anterior vai para o backup store (core/backup_store):
+    deduplicado por hash, com deltas e retenção. Conteúdo igual ao atual não é regravado.
+    """
     try:
+        from core.backup_store import get_backup_store
         sandbox = _get_sandbox()
         target = _safe_path(sandbox, caminho)
 
         # Backup antes de modificar
-        backup_path = None
-        if target.exists():
-            backup_root = sandbox / BACKUP_DIR
-            backup_root.mkdir(parents=True, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = caminho.replace("/", "_").replace("\\", "_")
-            backup_path = backup_root / f"{safe_name}.{ts}.bak"
-            shutil.copy2(target, backup_path)
+        backup_sha = None
+        if target.is_file():
+            atual = target.read_bytes()
+            if atual == conteudo.encode("utf-8", errors="replace"):
+                return {"ok": True, "backup": None, "inalterado": True, "erro": None}
+            backup_sha = get_backup_store(str(sandbox.resolve())).backup(_rel_workspace(sandbox, target), atual)
 
         target.parent.mkdir(parents=True, exist_ok=True)
         target.write_text(conteudo, encoding="utf-8", errors="replace")
-        return {"ok": True, "backup": str(backup_path) if backup_path else None, "erro": None}
+        notify_changed(target)
+        return {"ok": True, "backup": backup_sha, "erro": None}
     except ValueError as e:
         return {"ok": False, "backup": None, "erro": str(e)}
     except Exception as e:
         return {"ok": False, "backup": None, "erro": str(e)}
 
 
+def listar_backups_workspace(caminho: str) -> Dict[str, Any]:
+    """Versões guardadas de um arquivo do workspace (mais recente primeiro)."""
+    try:
+        from core.backup_store import get_backup_store
+        sandbox = _get_sandbox()
+        target = _safe_path(sandbox, caminho)
+        versoes = get_backup_store(str(sandbox.resolve())).versions(_rel_workspace(sandbox, target))
+        return {"ok": True, "versoes": [
+            {"versao": v["sha"][:12], "tamanho": v["size"],
+             "data": datetime.fromtimestamp(v["created_at"]).isoformat(timespec="seconds")}
+            for v in versoes
+        ], "erro": None}
+    except ValueError as e:
+        return {"ok": False, "versoes": [], "erro": str(e)}
+    except Exception as e:
+        return {"ok": False, "versoes": [], "erro": str(e)}
+
+
+def restaurar_backup_workspace(caminho: str, versao: Optional[str] = None) -> Dict[str, Any]:
+    """Restaura uma versão do arquivo (padrão: a mais recente). O conteúdo atual vira backup antes."""
+    try:
+        from core.backup_store import get_backup_store
+        sandbox = _get_sandbox()
+        target = _safe_path(sandbox, caminho)
+        res = get_backup_store(str(sandbox.resolve())).restore(_rel_workspace(sandbox, target), versao or None)
+        notify_changed(target)
+        return {"ok": True, "versao": res["sha"][:12], "backup": res["backup"], "erro": None}
+    except KeyError as e:
+        return {"ok": False, "versao": None, "erro": str(e.args[0] if e.args else e)}
+    except ValueError as e:
+        return {"ok": False, "versao": None, "erro": str(e)}
+    except Exception as e:
+        return {"ok": False, "versao": None, "erro": str(e)}
+
+
 def analisar_codigo(codigo: str) -> Dict[str, Any]:
     """
     Detecta vulnerabilidades, más práticas, problemas de arquitetura.
@@ -268,6 +348,13 @@ def resumir_contexto(conversa: str) -> Dict[str, Any]:
         return {"ok": True, "resumo": conversa[:1500] + "..." if len(conversa) > 1500 else conversa}
 
 
+def _int_or_none(valor: Any) -> Optional[int]:
+    try:
+        return int(valor) if valor is not None and valor != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
 def executar_tool(nome: str, args: Dict[str, Any]) -> Dict[str, Any]:
     """Dispatcher: executa a tool pelo nome."""
     if nome == "analisar_codigo":
@@ -282,15 +369,32 @@ def executar_tool(nome: str, args: Dict[str, Any]) -> Dict[str, Any]:
     if nome == "resumir_contexto":
         return resumir_contexto(args.get("conversa", "") or "")
     if nome == "listar_arquivos_workspace":
-        return listar_arquivos_workspace(args.get("pasta", ".") or ".")
+        return listar_arquivos_workspace(
+            args.get("pasta", ".") or ".",
+            args.get("cursor") or None,
+            int(args.get("limite", 200) or 200),
+        )
     if nome == "ler_arquivo_workspace":
         return ler_arquivo_workspace(
             args.get("caminho", "") or "",
             int(args.get("max_chars", 8000) or 8000),
+            linha_inicio=_int_or_none(args.get("linha_inicio")),
+            linhas=_int_or_none(args.get("linhas")),
+            cauda=_int_or_none(args.get("cauda")),
+            buscar=args.get("buscar") or None,
+            offset=_int_or_none(args.get("offset")),
+            limite=_int_or_none(args.get("limite")),
         )
     if nome == "escrever_arquivo_workspace":
         return escrever_arquivo_workspace(
             args.get("caminho", "") or "",
             args.get("conteudo", "") or "",
         )
+    if nome == "listar_backups_workspace":
+        return listar_backups_workspace(args.get("caminho", "") or "")
+    if nome == "restaurar_backup_workspace":
+        return restaurar_backup_workspace(
+            args.get("caminho", "") or "",
+            args.get("versao") or None,
+        )
     return {"ok": False, "erro": f"Tool desconhecida: {nome}"}
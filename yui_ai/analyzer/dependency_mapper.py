@@ -1,13 +1,36 @@
 """
 Mapeador de dependências: extrai imports de arquivos .py via AST.
 SOMENTE LEITURA. Construção de grafo de módulos para análise.
+
+Antes: build_dependency_graph relia e reparseava todos os .py a cada chamada,
+ligava cada arquivo só ao pacote top-level importado e procurava ciclos com DFS
+recursivo entre pacotes top-level (estoura o limite de recursão em grafos grandes
+e para no primeiro ciclo de cada componente).
+
+Agora: DependencyGraph persistente por raiz (~/Yui/dependency_graph/<hash>.json)
+- uma entrada por .py (mtime_ns, tamanho, imports, funções, classes, alvos)
+- refresh() faz stat pelo core/fs_snapshot e só reparseia arquivos alterados;
+  as arestas de um arquivo alterado são trocadas sem tocar nas demais (arquivos
+  criados/removidos mudam o conjunto de módulos: só então tudo é re-resolvido,
+  sem reparsear nada)
+- arestas entre módulos (a.b.c → a.d), não só entre pacotes
+- ciclos = componentes fortemente conexos via Tarjan iterativo (sem recursão),
+  recalculados só quando alguma aresta mudou
 """
 
 import ast
+import hashlib
+import json
 import os
-from typing import Dict, List, Optional, Set, Tuple
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from yui_ai.analyzer.project_scanner import list_py_files, scan_structure
+from core.fs_snapshot import get_snapshot
+from yui_ai.analyzer.project_scanner import list_py_files
+
+_GRAPH_DIR: Optional[str] = None
+_GRAPH_VERSION = 1
 
 
 def _path_to_module(root: str, path: str) -> str:
@@ -53,144 +76,364 @@ def _extract_imports_from_code(code: str, path: str) -> Tuple[List[str], List[st
     return std_imports, local_imports
 
 
-def _resolve_local_module(root: str, file_path: str, import_module: str, level: int) -> Optional[str]:
+def _import_targets(tree: ast.AST, mod: str, is_package: bool) -> List[str]:
     """
-    Resolve import relativo (from .x import) para nome de módulo no projeto.
-    Simplificado: só considera primeiro nível do projeto (pastas na raiz).
+    Nomes pontuados candidatos de cada import (absolutos ou relativos já resolvidos).
+    "from a.b import c" gera "a.b.c"; a resolução cai para "a.b" se c não for módulo.
     """
-    dir_file = os.path.dirname(file_path)
-    if level == 0:
-        return import_module.split(".")[0] if import_module else None
-    parts = import_module.split(".") if import_module else []
-    for _ in range(level - 1):
-        dir_file = os.path.dirname(dir_file)
-    if not parts:
-        # from . import x → pasta atual
-        rel = os.path.relpath(dir_file, root)
-        return rel.replace("\\", "/").split("/")[0] if rel != "." else None
-    # from .sub import x → sub
-    return parts[0] if parts else None
+    pacote = mod.split(".") if is_package else mod.split(".")[:-1]
+    alvos: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            alvos.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.level - 1 > len(pacote):
+                    continue
+                base = pacote[: len(pacote) - (node.level - 1)]
+                if node.module:
+                    base = base + node.module.split(".")
+            else:
+                base = (node.module or "").split(".")
+            base_nome = ".".join(p for p in base if p)
+            for alias in node.names:
+                if alias.name == "*":
+                    if base_nome:
+                        alvos.append(base_nome)
+                else:
+                    alvos.append(f"{base_nome}.{alias.name}" if base_nome else alias.name)
+    return alvos
 
 
-def build_dependency_graph(root: str) -> Dict:
+def _parse_file(code: str, path: str, mod: str) -> Dict[str, Any]:
+    """Entrada de um arquivo: imports (formato antigo), funções, classes e alvos de import."""
+    std_imp, local_imp = _extract_imports_from_code(code, path)
+    funcoes: List[str] = []
+    classes: List[str] = []
+    alvos: List[str] = []
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        tree = None
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                funcoes.append(node.name)
+            elif isinstance(node, ast.ClassDef):
+                classes.append(node.name)
+        alvos = _import_targets(tree, mod, os.path.basename(path) == "__init__.py")
+    return {
+        "module": mod,
+        "imports_std": std_imp,
+        "imports_local": local_imp,
+        "funcoes": funcoes,
+        "classes": classes,
+        "targets": alvos,
+    }
+
+
+def strongly_connected_components(adj: Dict[str, Iterable[str]]) -> List[List[str]]:
+    """
+    Tarjan iterativo (pilha explícita): componentes fortemente conexos de adj.
+    Não depende do limite de recursão; O(V + E).
     """
-    Constrói grafo de dependências a partir dos arquivos .py do projeto.
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    sccs: List[List[str]] = []
+    contador = 0
+    for inicio in sorted(adj):
+        if inicio in index:
+            continue
+        index[inicio] = low[inicio] = contador
+        contador += 1
+        stack.append(inicio)
+        on_stack.add(inicio)
+        trabalho = [(inicio, iter(sorted(adj.get(inicio, ()))))]
+        while trabalho:
+            v, vizinhos = trabalho[-1]
+            desceu = False
+            for w in vizinhos:
+                if w not in index:
+                    index[w] = low[w] = contador
+                    contador += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    trabalho.append((w, iter(sorted(adj.get(w, ())))))
+                    desceu = True
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            if desceu:
+                continue
+            trabalho.pop()
+            if trabalho:
+                pai = trabalho[-1][0]
+                low[pai] = min(low[pai], low[v])
+            if low[v] == index[v]:
+                comp: List[str] = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    comp.append(w)
+                    if w == v:
+                        break
+                sccs.append(sorted(comp))
+    return sccs
 
-    Returns:
-        Dict com:
-        - nodes: { modulo: { "path", "imports_std", "imports_local", "funcoes", "classes" } }
-        - edges: [ (from_module, to_module), ... ]
-        - circular: [ [mod1, mod2, ...], ... ] ciclos detectados
-        - stats: { total_arquivos, total_imports_internos, etc }
+
+def _cycle_path(comp: List[str], adj: Dict[str, Set[str]]) -> List[str]:
+    """Um ciclo concreto dentro do componente (BFS a partir do menor módulo): [a, b, ..., a]."""
+    membros = set(comp)
+    inicio = comp[0]
+    anterior: Dict[str, str] = {}
+    fila = deque([inicio])
+    while fila:
+        v = fila.popleft()
+        for w in sorted(adj.get(v, ())):
+            if w not in membros:
+                continue
+            if w == inicio:
+                caminho = [v]
+                while caminho[-1] != inicio:
+                    caminho.append(anterior[caminho[-1]])
+                return list(reversed(caminho)) + [inicio]
+            if w not in anterior:
+                anterior[w] = v
+                fila.append(w)
+    return comp + [inicio]
+
+
+def _get_graph_dir() -> str:
+    global _GRAPH_DIR
+    if _GRAPH_DIR is not None:
+        return _GRAPH_DIR
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    _GRAPH_DIR = os.path.join(base, "Yui", "dependency_graph")
+    return _GRAPH_DIR
+
+
+class DependencyGraph:
     """
-    root = os.path.abspath(root)
-    paths = list_py_files(root)
-    scan_data = scan_structure(root)
-    modulos_projeto = set(scan_data.get("modulos_principais", []))
-    nodes: Dict[str, Dict] = {}
-    edges: List[Tuple[str, str]] = []
-    encoding = "utf-8"
-
-    for path in paths:
+    Grafo de dependências persistente de uma raiz, em granularidade de módulo.
+    files: rel → entrada (_parse_file + mtime_ns/size); adj: módulo → módulos importados.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.modules: Dict[str, str] = {}  # módulo → rel
+        self.adj: Dict[str, Set[str]] = {}
+        self._sccs: Optional[List[List[str]]] = None
+        self._lock = threading.Lock()
+        self.stats = {"reparsed": 0, "reused": 0, "edge_updates": 0, "scc_runs": 0}
+        self._load()
+
+    # ---------- persistência ----------
+
+    def _path(self) -> str:
+        nome = hashlib.sha1(self.root.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+        return os.path.join(_get_graph_dir(), nome + ".json")
+
+    def _load(self) -> None:
         try:
-            with open(path, "r", encoding=encoding) as f:
-                code = f.read()
-        except Exception:
-            continue
+            with open(self._path(), "r", encoding="utf-8") as f:
+                salvo = json.load(f)
+        except (OSError, ValueError):
+            return
+        if salvo.get("version") != _GRAPH_VERSION or salvo.get("root") != self.root:
+            return
+        self.files = salvo.get("files") or {}
+        for rel in sorted(self.files):
+            self._claim(rel)
+        for mod, rel in self.modules.items():
+            self.adj[mod] = self._resolve(self.files[rel])
+
+    def _save(self) -> None:
+        path = self._path()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": _GRAPH_VERSION, "root": self.root, "files": self.files},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    # ---------- arestas ----------
+
+    def _resolve(self, entry: Dict[str, Any]) -> Set[str]:
+        """Alvos → módulos do projeto (maior prefixo existente); sem auto-aresta."""
+        mod = entry["module"]
+        deps: Set[str] = set()
+        for alvo in entry.get("targets") or []:
+            partes = alvo.split(".")
+            while partes:
+                nome = ".".join(partes)
+                if nome in self.modules:
+                    if nome != mod:
+                        deps.add(nome)
+                    break
+                partes.pop()
+        return deps
 
-        mod = _path_to_module(root, path)
-        std_imp, local_imp = _extract_imports_from_code(code, path)
+    def _set_edges(self, mod: str, deps: Set[str]) -> None:
+        if self.adj.get(mod) != deps:
+            self.adj[mod] = deps
+            self._sccs = None
+            self.stats["edge_updates"] += 1
 
-        funcoes: List[str] = []
-        classes: List[str] = []
+    def update_file(self, rel: str, st: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        (Re)parseia um arquivo e troca só as arestas dele. Retorna True se o conjunto
+        de módulos mudou (o chamador deve re-resolver as arestas dos demais).
+        """
+        path = os.path.join(self.root, rel)
         try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    funcoes.append(node.name)
-                elif isinstance(node, ast.ClassDef):
-                    classes.append(node.name)
-        except SyntaxError:
-            pass
-
-        nodes[mod] = {
-            "path": path,
-            "imports_std": std_imp,
-            "imports_local": local_imp,
-            "funcoes": funcoes,
-            "classes": classes,
-        }
-
-        for imp in std_imp:
-            top = imp.split(".")[0]
-            if top in modulos_projeto and top != mod.split(".")[0]:
-                edges.append((mod, top))
-        for loc in local_imp:
-            if loc.startswith("."):
-                level = len(loc) - len(loc.lstrip("."))
-                resolved = _resolve_local_module(root, path, loc.lstrip("."), level)
-                if resolved and resolved in modulos_projeto:
-                    edges.append((mod, resolved))
-
-    circular = _find_circular_deps(edges)
-    total_internal = sum(1 for a, b in edges if a and b)
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+            if st is None:
+                est = os.stat(path)
+                st = (est.st_size, est.st_mtime_ns)
+        except (OSError, UnicodeDecodeError):
+            return self.remove_file(rel)
+        mod = _path_to_module(self.root, path)
+        entry = _parse_file(code, path, mod)
+        entry["size"], entry["mtime_ns"] = st
+        self.files[rel] = entry
+        self.stats["reparsed"] += 1
+        novo_modulo = self._claim(rel)
+        if self.modules.get(mod) == rel:
+            self._set_edges(mod, self._resolve(entry))
+        return novo_modulo
 
-    return {
-        "nodes": nodes,
-        "edges": edges,
-        "circular": circular,
-        "stats": {
-            "total_arquivos_py": len(nodes),
-            "total_arestas": len(edges),
-            "total_imports_internos": total_internal,
-            "ciclos": len(circular),
-        },
-    }
+    def _claim(self, rel: str) -> bool:
+        """
+        Registra o módulo do arquivo. Pacote e módulo homônimos (x/__init__.py e x.py):
+        vale o pacote, como no import do Python. Retorna True se o dono mudou.
+        """
+        mod = self.files[rel]["module"]
+        dono = self.modules.get(mod)
+        if dono == rel or (dono is not None and not rel.endswith("__init__.py")):
+            return False
+        self.modules[mod] = rel
+        return True
+
+    def remove_file(self, rel: str) -> bool:
+        entry = self.files.pop(rel, None)
+        if entry is None or self.modules.get(entry["module"]) != rel:
+            return False
+        mod = entry["module"]
+        del self.modules[mod]
+        self.adj.pop(mod, None)
+        self._sccs = None
+        for outro, e in self.files.items():
+            if e["module"] == mod:
+                self.modules[mod] = outro
+                break
+        return True
+
+    def _reresolve_all(self) -> None:
+        for mod, rel in self.modules.items():
+            self._set_edges(mod, self._resolve(self.files[rel]))
+
+    def refresh(self) -> Dict[str, int]:
+        """Sincroniza com o disco: só arquivos com mtime/tamanho diferentes são reparseados."""
+        with self._lock:
+            snap = get_snapshot(self.root, max_age=0)
+            atuais: Dict[str, Optional[Tuple[int, int]]] = {}
+            for path in list_py_files(self.root):
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                atuais[rel] = snap.stat(rel)
+            mudancas = {"added": 0, "modified": 0, "removed": 0}
+            modulos_mudaram = False
+            for rel in [r for r in self.files if r not in atuais]:
+                modulos_mudaram |= self.remove_file(rel)
+                mudancas["removed"] += 1
+            for rel, st in atuais.items():
+                entry = self.files.get(rel)
+                if entry is not None and st is not None and (entry.get("size"), entry.get("mtime_ns")) == st:
+                    self.stats["reused"] += 1
+                    continue
+                mudancas["added" if entry is None else "modified"] += 1
+                modulos_mudaram |= self.update_file(rel, st)
+            if modulos_mudaram:
+                self._reresolve_all()
+            if any(mudancas.values()):
+                self._save()
+            return mudancas
+
+    # ---------- consultas ----------
 
+    def edges(self) -> List[Tuple[str, str]]:
+        return [(a, b) for a in sorted(self.adj) for b in sorted(self.adj[a])]
 
-def _find_circular_deps(edges: List[Tuple[str, str]]) -> List[List[str]]:
-    """Detecta ciclos no grafo de dependências (por módulo top-level)."""
-    from collections import defaultdict
-
-    # Simplificar: agrupar por primeiro segmento do módulo (pasta)
-    def top(m: str) -> str:
-        return m.split(".")[0] if m else ""
-
-    adj: Dict[str, Set[str]] = defaultdict(set)
-    for a, b in edges:
-        ta, tb = top(a), top(b)
-        if ta and tb and ta != tb:
-            adj[ta].add(tb)
-
-    cycles: List[List[str]] = []
-    visited: Set[str] = set()
-    rec_stack: Set[str] = set()
-    path: List[str] = []
-    path_set: Set[str] = set()
-    cycle_nodes: Set[str] = set()
-
-    def dfs(v: str) -> bool:
-        visited.add(v)
-        rec_stack.add(v)
-        path.append(v)
-        path_set.add(v)
-        for w in adj.get(v, []):
-            if w not in visited:
-                if dfs(w):
-                    return True
-            elif w in rec_stack:
-                idx = path.index(w)
-                cycle = path[idx:] + [w]
-                cycle_nodes.update(cycle)
-                cycles.append(cycle)
-                return True
-        rec_stack.discard(v)
-        path.pop()
-        path_set.discard(v)
-        return False
-
-    for node in adj:
-        if node not in visited:
-            dfs(node)
-
-    return cycles
+    def cycles(self) -> List[List[str]]:
+        """Ciclos de import: um caminho [a, ..., a] por componente fortemente conexo com 2+ módulos."""
+        if self._sccs is None:
+            self.stats["scc_runs"] += 1
+            self._sccs = [c for c in strongly_connected_components(self.adj) if len(c) > 1]
+        return [_cycle_path(c, self.adj) for c in self._sccs]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Formato de build_dependency_graph."""
+        with self._lock:
+            nodes = {}
+            for mod, rel in sorted(self.modules.items()):
+                e = self.files[rel]
+                nodes[mod] = {
+                    "path": os.path.join(self.root, rel.replace("/", os.sep)),
+                    "imports_std": e["imports_std"],
+                    "imports_local": e["imports_local"],
+                    "funcoes": e["funcoes"],
+                    "classes": e["classes"],
+                }
+            edges = self.edges()
+            circular = self.cycles()
+            return {
+                "nodes": nodes,
+                "edges": edges,
+                "circular": circular,
+                "stats": {
+                    "total_arquivos_py": len(nodes),
+                    "total_arestas": len(edges),
+                    "total_imports_internos": len(edges),
+                    "ciclos": len(circular),
+                    "modulos_em_ciclos": sum(len(c) for c in self._sccs or []),
+                },
+            }
+
+
+_graphs: Dict[str, DependencyGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_dependency_graph(root: str) -> DependencyGraph:
+    """Grafo persistente da raiz, já sincronizado com o disco."""
+    root = os.path.abspath(root)
+    with _graphs_lock:
+        graph = _graphs.get(root)
+        if graph is None:
+            graph = _graphs[root] = DependencyGraph(root)
+    graph.refresh()
+    return graph
+
+
+def build_dependency_graph(root: str) -> Dict:
+    """
+    Constrói grafo de dependências a partir dos arquivos .py do projeto
+    (incremental: só arquivos alterados desde a última chamada são reparseados).
+
+    Returns:
+        Dict com:
+        - nodes: { modulo: { "path", "imports_std", "imports_local", "funcoes", "classes" } }
+        - edges: [ (from_module, to_module), ... ] entre módulos do projeto
+        - circular: [ [mod1, mod2, ..., mod1], ... ] um ciclo por componente fortemente conexo
+        - stats: { total_arquivos_py, total_arestas, total_imports_internos, ciclos, modulos_em_ciclos }
+    """
+    return get_dependency_graph(root).to_dict()
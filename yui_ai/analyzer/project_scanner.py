@@ -6,6 +6,8 @@ SOMENTE LEITURA. Não altera nada no projeto analisado.
 import os
 from typing import Dict, List
 
+from core.fs_snapshot import get_snapshot
+
 IGNORAR_DIRS = {
     "__pycache__", ".git", ".venv", "venv", "env",
     "node_modules", ".mypy_cache", ".pytest_cache", "build", "dist",
@@ -44,42 +46,31 @@ def scan_structure(root: str) -> Dict:
             "caminhos_py": [],
         }
 
-    diretorios: List[str] = []
+    snap = get_snapshot(raiz)
+    diretorios: List[str] = [d for d in snap.subdirs("") if not _skip_dir(d)]
     arquivos_por_pasta: Dict[str, List[str]] = {}
     extensoes: Dict[str, int] = {}
     total = 0
-    modulos_principais: List[str] = []
     caminhos_py: List[str] = []
 
-    for _dir, dirnames, filenames in os.walk(raiz):
-        dirnames[:] = [d for d in dirnames if not _skip_dir(d)]
-        rel = os.path.relpath(_dir, raiz)
-        pasta_nome = "[raiz]" if rel == "." else rel
-        if rel == ".":
-            diretorios = [d for d in dirnames if not _skip_dir(d)]
-
-        arquivos: List[str] = []
-        for f in filenames:
-            if _skip_file(f):
-                continue
-            ext = os.path.splitext(f)[1].lower() or "(sem ext)"
-            extensoes[ext] = extensoes.get(ext, 0) + 1
-            arquivos.append(f)
-            total += 1
-            if f.endswith(".py"):
-                caminhos_py.append(os.path.normpath(os.path.join(_dir, f)))
-
-        if arquivos:
-            arquivos_por_pasta[pasta_nome] = sorted(arquivos)
-
-        if rel != "." and os.path.isfile(os.path.join(_dir, "__init__.py")):
-            top = rel.split(os.sep)[0]
-            if top not in modulos_principais:
-                modulos_principais.append(top)
-
-    for d in diretorios:
-        if os.path.isfile(os.path.join(raiz, d, "__init__.py")) and d not in modulos_principais:
-            modulos_principais.append(d)
+    for rel in snap.iter_files():
+        pasta, f = rel.rsplit("/", 1) if "/" in rel else ("", rel)
+        if _skip_file(f) or (pasta and any(_skip_dir(p) for p in pasta.split("/"))):
+            continue
+        ext = os.path.splitext(f)[1].lower() or "(sem ext)"
+        extensoes[ext] = extensoes.get(ext, 0) + 1
+        arquivos_por_pasta.setdefault(pasta.replace("/", os.sep) or "[raiz]", []).append(f)
+        total += 1
+        if f.endswith(".py"):
+            caminhos_py.append(os.path.normpath(os.path.join(raiz, rel)))
+
+    for arquivos in arquivos_por_pasta.values():
+        arquivos.sort()
+    modulos_principais = sorted({
+        d.split("/")[0]
+        for d in snap.dirs
+        if d and not any(_skip_dir(p) for p in d.split("/")) and f"{d}/__init__.py" in snap.files
+    })
 
     return {
         "raiz": raiz,
@@ -0,0 +1,180 @@
+"""
+Índices de consulta da memória arquitetural.
+
+- KeywordIndex: índice invertido (token → entradas) com pontuação TF-IDF,
+  mais índice de tags. Consultas tocam só as listas dos tokens da busca.
+- EmbeddingIndex (opcional): vetores por entrada para relevância semântica.
+  Só é usado se uma função de embedding for fornecida (ex.: OpenAI).
+"""
+
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# (secao, id) identifica uma entrada da memória
+Chave = Tuple[str, int]
+
+STOPWORDS = {
+    "que", "para", "com", "uma", "por", "mais", "como", "mas", "dos", "das",
+    "nos", "nas", "num", "numa", "sem", "sob", "sobre", "entre", "quando",
+    "sempre", "nunca", "deve", "devem", "usar", "the", "and", "for", "with",
+    "this", "that", "from", "not", "are", "use",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+# Campos textuais indexados por seção
+CAMPOS_POR_SECAO = {
+    "decisoes_tecnicas": ("decisao", "motivo", "contexto"),
+    "padroes_arquiteturais": ("nome", "descricao", "exemplo", "quando_usar"),
+    "regras": ("regra", "descricao", "tipo"),
+    "restricoes": ("restricao", "motivo"),
+}
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Minúsculas, sem acentos, tokens alfanuméricos com 3+ caracteres, sem stopwords."""
+    if not texto:
+        return []
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return [t for t in _TOKEN_RE.findall(texto) if len(t) >= 3 and t not in STOPWORDS]
+
+
+def texto_da_entrada(secao: str, entrada: Dict) -> str:
+    campos = CAMPOS_POR_SECAO.get(secao, ())
+    partes = [str(entrada.get(c) or "") for c in campos]
+    partes.extend(entrada.get("tags") or [])
+    return " ".join(p for p in partes if p)
+
+
+class KeywordIndex:
+    """Índice invertido token → {chave: frequência} + índice de tags."""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Chave, int]] = defaultdict(dict)
+        self._tags: Dict[str, Set[Chave]] = defaultdict(set)
+        self._tokens_por_chave: Dict[Chave, Dict[str, int]] = {}
+        self._tags_por_chave: Dict[Chave, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens_por_chave)
+
+    def adicionar(self, secao: str, entrada: Dict) -> None:
+        chave = (secao, int(entrada.get("id", 0)))
+        self.remover(chave)
+        freq: Dict[str, int] = defaultdict(int)
+        for t in tokenizar(texto_da_entrada(secao, entrada)):
+            freq[t] += 1
+        for t, n in freq.items():
+            self._postings[t][chave] = n
+        self._tokens_por_chave[chave] = dict(freq)
+        tags = [str(tag) for tag in entrada.get("tags") or []]
+        for tag in tags:
+            self._tags[tag].add(chave)
+        self._tags_por_chave[chave] = tags
+
+    def remover(self, chave: Chave) -> None:
+        for t in self._tokens_por_chave.pop(chave, None) or {}:
+            lista = self._postings.get(t)
+            if lista is not None:
+                lista.pop(chave, None)
+                if not lista:
+                    del self._postings[t]
+        for tag in self._tags_por_chave.pop(chave, None) or []:
+            self._tags[tag].discard(chave)
+
+    def por_tags(self, tags: Iterable[str], secao: Optional[str] = None) -> Set[Chave]:
+        out: Set[Chave] = set()
+        for tag in tags:
+            out |= self._tags.get(str(tag), set())
+        if secao:
+            out = {c for c in out if c[0] == secao}
+        return out
+
+    def pontuar(self, consulta: str, secao: Optional[str] = None) -> Dict[Chave, float]:
+        """Score TF-IDF das entradas que contêm algum token da consulta."""
+        tokens = set(tokenizar(consulta))
+        if not tokens:
+            return {}
+        total = max(1, len(self._tokens_por_chave))
+        scores: Dict[Chave, float] = defaultdict(float)
+        for t in tokens:
+            lista = self._postings.get(t)
+            if not lista:
+                continue
+            idf = math.log(1 + total / len(lista))
+            for chave, tf in lista.items():
+                if secao and chave[0] != secao:
+                    continue
+                scores[chave] += (1 + math.log(tf)) * idf
+        return dict(scores)
+
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingIndex:
+    """
+    Vetores por entrada (opcional). embed_fn recebe textos e devolve vetores.
+    Entradas novas são embutidas em lote na próxima consulta.
+    """
+
+    def __init__(self, embed_fn: EmbedFn):
+        self._embed = embed_fn
+        self._vetores: Dict[Chave, List[float]] = {}
+        self._pendentes: Dict[Chave, str] = {}
+
+    def adicionar(self, secao: str, entrada: Dict) -> None:
+        chave = (secao, int(entrada.get("id", 0)))
+        self._vetores.pop(chave, None)
+        self._pendentes[chave] = texto_da_entrada(secao, entrada)
+
+    def _processar_pendentes(self) -> None:
+        if not self._pendentes:
+            return
+        chaves = list(self._pendentes)
+        vetores = self._embed([self._pendentes[c] for c in chaves])
+        for chave, vetor in zip(chaves, vetores):
+            self._vetores[chave] = _normalizar(vetor)
+        self._pendentes.clear()
+
+    def pontuar(self, consulta: str, secao: Optional[str] = None) -> Dict[Chave, float]:
+        if not consulta.strip():
+            return {}
+        try:
+            self._processar_pendentes()
+            q = _normalizar(self._embed([consulta])[0])
+        except Exception:
+            return {}
+        return {
+            chave: sum(a * b for a, b in zip(q, vetor))
+            for chave, vetor in self._vetores.items()
+            if not secao or chave[0] == secao
+        }
+
+
+def _normalizar(vetor: List[float]) -> List[float]:
+    norma = math.sqrt(sum(x * x for x in vetor)) or 1.0
+    return [x / norma for x in vetor]
+
+
+def embedding_openai() -> Optional[EmbedFn]:
+    """Função de embedding via OpenAI (text-embedding-3-small), se disponível."""
+    import os
+    api_key = (os.environ.get("OPENAI_API_KEY") or "").strip()
+    if not api_key:
+        return None
+    try:
+        from openai import OpenAI
+    except ImportError:
+        return None
+    client = OpenAI(api_key=api_key)
+
+    def _embed(textos: List[str]) -> List[List[float]]:
+        r = client.embeddings.create(model="text-embedding-3-small", input=textos)
+        return [d.embedding for d in r.data]
+
+    return _embed
@@ -1,15 +1,29 @@
 """
 Armazenamento persistente de memória arquitetural.
+
+Persistência incremental: snapshot JSON compacto + log append-only (.log),
+regravando o snapshot só a cada COMPACTAR_A_CADA operações.
+Relevância: índice invertido de palavras-chave (memory_index.KeywordIndex)
+e, opcionalmente, índice de embeddings.
 """
 
 import os
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from yui_ai.architecture.memory_index import (
+    CAMPOS_POR_SECAO,
+    EmbedFn,
+    EmbeddingIndex,
+    KeywordIndex,
+    embedding_openai,
+)
 from yui_ai.memory.memory import BASE_DATA_DIR
 
 
 ARCHITECTURE_FILE = os.path.join(BASE_DATA_DIR, "architecture_memory.json")
+COMPACTAR_A_CADA = 100  # operações no log antes de regravar o snapshot
+SECOES = tuple(CAMPOS_POR_SECAO)
 
 
 class ArchitectureMemory:
@@ -17,8 +31,18 @@ class ArchitectureMemory:
     Gerencia memória arquitetural persistente do projeto.
     """
 
-    def __init__(self):
+    def __init__(self, arquivo: Optional[str] = None, embed_fn: Optional[EmbedFn] = None):
+        self.arquivo = arquivo or ARCHITECTURE_FILE
+        self.log_path = self.arquivo + ".log"
+        self._ops_no_log = 0
         self.memoria: Dict = self._carregar_memoria()
+        self.indice = KeywordIndex()
+        if embed_fn is None and os.environ.get("YUI_ARCH_EMBEDDINGS", "").lower() in ("1", "true", "yes"):
+            embed_fn = embedding_openai()
+        self.indice_semantico = EmbeddingIndex(embed_fn) if embed_fn else None
+        for secao in SECOES:
+            for entrada in self.memoria.get(secao, []):
+                self._indexar(secao, entrada)
 
     def _estrutura_base(self) -> Dict:
         """Retorna estrutura base da memória arquitetural."""
@@ -43,44 +67,129 @@ class ArchitectureMemory:
         }
 
     def _carregar_memoria(self) -> Dict:
-        """Carrega memória do disco."""
-        if not os.path.exists(ARCHITECTURE_FILE):
-            memoria = self._estrutura_base()
-            self._salvar_memoria(memoria)
-            return memoria
-
+        """Carrega memória do disco (snapshot + operações do log)."""
+        memoria = self._estrutura_base()
+        if os.path.exists(self.arquivo):
+            try:
+                with open(self.arquivo, "r", encoding="utf-8") as f:
+                    memoria = json.load(f)
+            except Exception:
+                memoria = self._estrutura_base()
+
+        # Garante estrutura completa
+        base = self._estrutura_base()
+        for chave, valor in base.items():
+            if chave not in memoria:
+                memoria[chave] = valor
+            elif isinstance(valor, dict) and isinstance(memoria.get(chave), dict):
+                for subchave, subvalor in valor.items():
+                    if subchave not in memoria[chave]:
+                        memoria[chave][subchave] = subvalor
+
+        if os.path.exists(self.log_path):
+            try:
+                with open(self.log_path, "r", encoding="utf-8") as f:
+                    for linha in f:
+                        linha = linha.strip()
+                        if not linha:
+                            continue
+                        try:
+                            self._aplicar_op(memoria, json.loads(linha))
+                            self._ops_no_log += 1
+                        except Exception:
+                            continue
+            except OSError:
+                pass
+        return memoria
+
+    @staticmethod
+    def _aplicar_op(memoria: Dict, op: Dict) -> None:
+        """Aplica uma operação do log: adicionar entrada ou atualizar projeto."""
+        if op.get("op") == "add":
+            memoria.setdefault(op["secao"], []).append(op["entrada"])
+        elif op.get("op") == "projeto":
+            memoria.setdefault("projeto", {}).update(op.get("campos") or {})
+
+    def _registrar_op(self, op: Dict) -> None:
+        """Anexa a operação ao log; compacta quando o log cresce."""
         try:
-            with open(ARCHITECTURE_FILE, "r", encoding="utf-8") as f:
-                memoria = json.load(f)
-            
-            # Garante estrutura completa
-            base = self._estrutura_base()
-            for chave, valor in base.items():
-                if chave not in memoria:
-                    memoria[chave] = valor
-                elif isinstance(valor, dict) and isinstance(memoria.get(chave), dict):
-                    for subchave, subvalor in valor.items():
-                        if subchave not in memoria[chave]:
-                            memoria[chave][subchave] = subvalor
-
-            return memoria
-        except Exception:
-            memoria = self._estrutura_base()
-            self._salvar_memoria(memoria)
-            return memoria
+            os.makedirs(os.path.dirname(self.arquivo), exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._ops_no_log += 1
+            if self._ops_no_log >= COMPACTAR_A_CADA:
+                self._salvar_memoria()
+        except Exception as e:
+            print(f"❌ Erro ao salvar memória arquitetural: {e}")
 
     def _salvar_memoria(self, memoria: Optional[Dict] = None):
-        """Salva memória no disco."""
+        """Grava o snapshot completo (compacto) e zera o log."""
         if memoria is None:
             memoria = self.memoria
 
         try:
-            os.makedirs(os.path.dirname(ARCHITECTURE_FILE), exist_ok=True)
-            with open(ARCHITECTURE_FILE, "w", encoding="utf-8") as f:
-                json.dump(memoria, f, ensure_ascii=False, indent=2)
+            os.makedirs(os.path.dirname(self.arquivo), exist_ok=True)
+            tmp = f"{self.arquivo}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(memoria, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.arquivo)
+            with open(self.log_path, "w", encoding="utf-8"):
+                pass
+            self._ops_no_log = 0
         except Exception as e:
             print(f"❌ Erro ao salvar memória arquitetural: {e}")
 
+    def _indexar(self, secao: str, entrada: Dict) -> None:
+        self.indice.adicionar(secao, entrada)
+        if self.indice_semantico is not None:
+            self.indice_semantico.adicionar(secao, entrada)
+
+    def _adicionar(self, secao: str, entrada: Dict) -> Dict:
+        self.memoria[secao].append(entrada)
+        self._indexar(secao, entrada)
+        self._registrar_op({"op": "add", "secao": secao, "entrada": entrada})
+        return entrada
+
+    def buscar(
+        self,
+        consulta: str,
+        secao: Optional[str] = None,
+        limite: int = 10
+    ) -> List[Tuple[float, str, Dict]]:
+        """
+        Busca entradas relevantes (palavras-chave + embeddings, se ativos).
+
+        Retorna: [(score, secao, entrada), ...] em ordem decrescente de score.
+        """
+        scores = self.indice.pontuar(consulta, secao)
+        if self.indice_semantico is not None:
+            maximo = max(scores.values(), default=0.0) or 1.0
+            scores = {k: v / maximo for k, v in scores.items()}
+            for chave, sim in self.indice_semantico.pontuar(consulta, secao).items():
+                scores[chave] = scores.get(chave, 0.0) + max(0.0, sim)
+        por_id = {
+            (s, e.get("id")): e
+            for s in ([secao] if secao else SECOES)
+            for e in self.memoria.get(s, [])
+        }
+        ranking = sorted(
+            ((score, chave) for chave, score in scores.items() if score > 0 and chave in por_id),
+            key=lambda x: (-x[0], x[1]),
+        )
+        return [(score, chave[0], por_id[chave]) for score, chave in ranking[:limite]]
+
+    def _relevantes(self, secao: str, contexto: str = "", tags: List[str] = None) -> List[Dict]:
+        """Entradas da seção filtradas por tags (índice) e ordenadas por relevância ao contexto."""
+        entradas = self.memoria.get(secao, [])
+        if tags:
+            ids = {c[1] for c in self.indice.por_tags(tags, secao)}
+            entradas = [e for e in entradas if e.get("id") in ids]
+        if contexto:
+            scores = {e.get("id"): s for s, _, e in self.buscar(contexto, secao, limite=len(entradas) or 1)}
+            # sorted é estável: sem score mantém a ordem original
+            entradas = sorted(entradas, key=lambda e: -scores.get(e.get("id"), 0.0))
+        return list(entradas)
+
     def registrar_decisao(
         self,
         decisao: str,
@@ -102,10 +211,7 @@ class ArchitectureMemory:
             "timestamp": datetime.now().isoformat()
         }
 
-        self.memoria["decisoes_tecnicas"].append(entrada)
-        self._salvar_memoria()
-
-        return entrada
+        return self._adicionar("decisoes_tecnicas", entrada)
 
     def registrar_padrao(
         self,
@@ -130,10 +236,7 @@ class ArchitectureMemory:
             "timestamp": datetime.now().isoformat()
         }
 
-        self.memoria["padroes_arquiteturais"].append(entrada)
-        self._salvar_memoria()
-
-        return entrada
+        return self._adicionar("padroes_arquiteturais", entrada)
 
     def registrar_regra(
         self,
@@ -158,10 +261,7 @@ class ArchitectureMemory:
             "timestamp": datetime.now().isoformat()
         }
 
-        self.memoria["regras"].append(entrada)
-        self._salvar_memoria()
-
-        return entrada
+        return self._adicionar("regras", entrada)
 
     def registrar_restricao(
         self,
@@ -182,10 +282,7 @@ class ArchitectureMemory:
             "timestamp": datetime.now().isoformat()
         }
 
-        self.memoria["restricoes"].append(entrada)
-        self._salvar_memoria()
-
-        return entrada
+        return self._adicionar("restricoes", entrada)
 
     def obter_regras_relevantes(
         self,
@@ -195,18 +292,13 @@ class ArchitectureMemory:
         """
         Retorna regras relevantes para um contexto.
 
-        Filtra por tags e contexto se fornecidos.
+        Filtra por tags e ordena por relevância ao contexto (índice invertido).
         """
-        regras = self.memoria.get("regras", [])
+        regras = self._relevantes("regras", contexto, tags)
+        ordem = {id(r): i for i, r in enumerate(regras)}
 
-        if tags:
-            regras = [
-                r for r in regras
-                if any(tag in r.get("tags", []) for tag in tags)
-            ]
-
-        # Ordena por obrigatoriedade primeiro
-        regras.sort(key=lambda x: (not x.get("obrigatoria", True), x.get("id", 0)))
+        # Ordena por obrigatoriedade primeiro (depois relevância/id)
+        regras.sort(key=lambda x: (not x.get("obrigatoria", True), ordem[id(x)] if contexto else x.get("id", 0)))
 
         return regras
 
@@ -218,15 +310,7 @@ class ArchitectureMemory:
         """
         Retorna padrões relevantes para um contexto.
         """
-        padroes = self.memoria.get("padroes_arquiteturais", [])
-
-        if tags:
-            padroes = [
-                p for p in padroes
-                if any(tag in p.get("tags", []) for tag in tags)
-            ]
-
-        return padroes
+        return self._relevantes("padroes_arquiteturais", contexto, tags)
 
     def obter_decisoes_relevantes(
         self,
@@ -236,15 +320,7 @@ class ArchitectureMemory:
         """
         Retorna decisões técnicas relevantes.
         """
-        decisoes = self.memoria.get("decisoes_tecnicas", [])
-
-        if tags:
-            decisoes = [
-                d for d in decisoes
-                if any(tag in d.get("tags", []) for tag in tags)
-            ]
-
-        return decisoes
+        return self._relevantes("decisoes_tecnicas", contexto, tags)
 
     def obter_restricoes_relevantes(
         self,
@@ -254,15 +330,7 @@ class ArchitectureMemory:
         """
         Retorna restrições relevantes.
         """
-        restricoes = self.memoria.get("restricoes", [])
-
-        if tags:
-            restricoes = [
-                r for r in restricoes
-                if any(tag in r.get("tags", []) for tag in tags)
-            ]
-
-        return restricoes
+        return self._relevantes("restricoes", contexto, tags)
 
     def montar_contexto_arquitetural(
         self,
@@ -275,6 +343,7 @@ class ArchitectureMemory:
         Retorna: string formatada com regras, padrões e decisões relevantes.
         """
         linhas = []
+        consulta = " ".join(p for p in (contexto_operacao, os.path.basename(arquivo or "")) if p)
 
         # Informações do projeto
         projeto = self.memoria.get("projeto", {})
@@ -287,7 +356,7 @@ class ArchitectureMemory:
 
         # Regras obrigatórias
         regras_obrigatorias = [
-            r for r in self.memoria.get("regras", [])
+            r for r in self.obter_regras_relevantes(consulta)
             if r.get("obrigatoria", True)
         ]
         if regras_obrigatorias:
@@ -298,14 +367,14 @@ class ArchitectureMemory:
                     linhas.append(f"  {regra['descricao']}")
 
         # Padrões arquiteturais
-        padroes = self.memoria.get("padroes_arquiteturais", [])
+        padroes = self.obter_padroes_relevantes(consulta)
         if padroes:
             linhas.append("\nPADRÕES ARQUITETURAIS:")
             for padrao in padroes[:5]:  # Limita a 5
                 linhas.append(f"- {padrao['nome']}: {padrao['descricao']}")
 
         # Restrições
-        restricoes = self.memoria.get("restricoes", [])
+        restricoes = self.obter_restricoes_relevantes(consulta)
         if restricoes:
             linhas.append("\nRESTRIÇÕES:")
             for restricao in restricoes[:5]:  # Limita a 5
@@ -315,9 +384,11 @@ class ArchitectureMemory:
 
         # Decisões técnicas recentes
         decisoes = self.memoria.get("decisoes_tecnicas", [])
+        relevantes = [e for _, _, e in self.buscar(consulta, "decisoes_tecnicas", limite=3)] if consulta else []
         if decisoes:
             linhas.append("\nDECISÕES TÉCNICAS RECENTES:")
-            for decisao in decisoes[-3:]:  # Últimas 3
+            # Relevantes ao contexto primeiro; sem match, as últimas 3
+            for decisao in relevantes or decisoes[-3:]:
                 linhas.append(f"- {decisao['decisao']}")
                 if decisao.get("motivo"):
                     linhas.append(f"  Motivo: {decisao['motivo']}")
@@ -347,7 +418,13 @@ class ArchitectureMemory:
             projeto["descricao"] = descricao
 
         self.memoria["projeto"] = projeto
-        self._salvar_memoria()
+        campos = {
+            k: v for k, v in (
+                ("nome", nome), ("linguagem", linguagem), ("versao_linguagem", versao_linguagem),
+                ("framework", framework), ("descricao", descricao),
+            ) if v is not None
+        }
+        self._registrar_op({"op": "projeto", "campos": campos})
 
     def obter_tudo(self) -> Dict:
         """Retorna toda a memória arquitetural."""
@@ -8,11 +8,13 @@ from yui_ai.code_editor.diff_engine import gerar_diff, aplicar_diff
 from yui_ai.code_editor.patch_engine import PatchEngine
 from yui_ai.code_editor.file_manager import FileManager
 from yui_ai.code_editor.history_manager import HistoryManager
+from yui_ai.code_editor.history_store import HistoryStore
 
 __all__ = [
     "gerar_diff",
     "aplicar_diff",
     "PatchEngine",
     "FileManager",
-    "HistoryManager"
+    "HistoryManager",
+    "HistoryStore"
 ]
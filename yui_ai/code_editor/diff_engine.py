@@ -127,6 +127,39 @@ def aplicar_diff(conteudo_original: str, hunks: List[dict]) -> Tuple[str, bool]:
     return "".join(linhas_resultado), True
 
 
+def gerar_delta(conteudo_antigo: str, conteudo_novo: str) -> List[list]:
+    """
+    Gera um delta compacto e exato (sem contexto) para armazenamento.
+
+    Retorna lista de operações sobre as linhas antigas:
+    [[inicio, fim, [linhas_novas...]], ...] — substitui antigas[inicio:fim].
+    Diferente de gerar_diff (feito para revisão humana), o delta sempre
+    reconstrói o conteúdo novo byte a byte via aplicar_delta.
+    """
+    linhas_antigas = conteudo_antigo.splitlines(keepends=True)
+    linhas_novas = conteudo_novo.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, linhas_antigas, linhas_novas, autojunk=False)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        delta.append([i1, i2, linhas_novas[j1:j2]])
+    return delta
+
+
+def aplicar_delta(conteudo_antigo: str, delta: List[list]) -> str:
+    """Aplica um delta de gerar_delta. Operações em ordem crescente, sem sobreposição."""
+    linhas = conteudo_antigo.splitlines(keepends=True)
+    resultado: List[str] = []
+    pos = 0
+    for inicio, fim, novas in delta:
+        resultado.extend(linhas[pos:inicio])
+        resultado.extend(novas)
+        pos = fim
+    resultado.extend(linhas[pos:])
+    return "".join(resultado)
+
+
 def visualizar_diff(hunks: List[dict], arquivo: str = "") -> str:
     """
     Gera uma visualização legível do diff.
@@ -1,44 +1,58 @@
 """
 Gerenciador de histórico completo de mudanças com rollback granular.
+
+Armazenamento: yui_ai/code_editor/history_store.py (deltas + objetos por hash).
 """
 
 import os
 import json
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime
+from yui_ai.code_editor.history_store import HistoryStore
 from yui_ai.memory.memory import BASE_DATA_DIR
 
 
-HISTORY_FILE = os.path.join(BASE_DATA_DIR, "code_history.json")
+HISTORY_FILE = os.path.join(BASE_DATA_DIR, "code_history.json")  # formato antigo (migrado)
+HISTORY_DIR = os.path.join(BASE_DATA_DIR, "code_history")
 
 
 class HistoryManager:
     """
     Gerencia histórico completo de mudanças de código com rollback.
+
+    Conteúdos ficam no HistoryStore (deltas comprimidos, endereçados por hash);
+    as entradas guardam só metadados + hashes "antigo"/"novo".
     """
 
-    def __init__(self):
-        self.historico: List[dict] = self._carregar_historico()
+    def __init__(self, diretorio: Optional[str] = None):
+        self.store = HistoryStore(diretorio or HISTORY_DIR)
+        if diretorio is None:
+            self._migrar_formato_antigo()
 
-    def _carregar_historico(self) -> List[dict]:
-        """Carrega histórico do disco."""
-        if not os.path.exists(HISTORY_FILE):
-            return []
+    @property
+    def historico(self) -> List[dict]:
+        return self.store.entradas()
 
+    def _migrar_formato_antigo(self):
+        """Importa code_history.json (conteúdo completo por entrada) uma única vez."""
+        if not os.path.exists(HISTORY_FILE) or self.store.entradas():
+            return
         try:
             with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
-
-    def _salvar_historico(self):
-        """Salva histórico no disco."""
-        try:
-            os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.historico, f, ensure_ascii=False, indent=2)
+                antigas = json.load(f)
+            for e in antigas:
+                nova = self.store.registrar(
+                    e.get("arquivo", ""),
+                    e.get("conteudo_antigo", ""),
+                    e.get("conteudo_novo", ""),
+                    e.get("descricao", ""),
+                    e.get("tags") or [],
+                    timestamp=e.get("timestamp"),
+                )
+                if e.get("revertido"):
+                    self.store.marcar_revertido(nova["id"])
+            os.replace(HISTORY_FILE, HISTORY_FILE + ".migrado")
         except Exception as e:
-            print(f"❌ Erro ao salvar histórico: {e}")
+            print(f"❌ Erro ao migrar histórico antigo: {e}")
 
     def registrar_mudanca(
         self,
@@ -53,21 +67,11 @@ class HistoryManager:
 
         Retorna: entrada do histórico
         """
-        entrada = {
-            "id": len(self.historico),
-            "arquivo": os.path.abspath(arquivo),
-            "timestamp": datetime.now().isoformat(),
-            "descricao": descricao or f"Modificação em {os.path.basename(arquivo)}",
-            "conteudo_antigo": conteudo_antigo,
-            "conteudo_novo": conteudo_novo,
-            "tags": tags or [],
-            "revertido": False
-        }
-
-        self.historico.append(entrada)
-        self._salvar_historico()
-
-        return entrada
+        return self.store.registrar(arquivo, conteudo_antigo, conteudo_novo, descricao, tags)
+
+    def obter_conteudos(self, entrada_id: int) -> Optional[Tuple[str, str]]:
+        """Reconstrói (conteudo_antigo, conteudo_novo) de uma entrada."""
+        return self.store.conteudos(entrada_id)
 
     def obter_historico(
         self,
@@ -96,11 +100,10 @@ class HistoryManager:
 
         Retorna: (sucesso, mensagem_erro)
         """
-        if entrada_id < 0 or entrada_id >= len(self.historico):
+        entrada = self.store.obter(entrada_id)
+        if entrada is None:
             return False, "ID de entrada inválido"
 
-        entrada = self.historico[entrada_id]
-
         if entrada.get("revertido"):
             return False, "Mudança já foi revertida"
 
@@ -111,12 +114,11 @@ class HistoryManager:
 
         try:
             # Restaura conteúdo antigo
+            conteudo_antigo = self.store.reconstruir(entrada["antigo"])
             with open(arquivo, "w", encoding="utf-8") as f:
-                f.write(entrada["conteudo_antigo"])
+                f.write(conteudo_antigo)
 
-            entrada["revertido"] = True
-            entrada["timestamp_reversao"] = datetime.now().isoformat()
-            self._salvar_historico()
+            self.store.marcar_revertido(entrada_id)
 
             return True, None
 
@@ -159,14 +161,7 @@ class HistoryManager:
 
     def limpar_historico_antigo(self, dias: int = 30):
         """
-        Remove entradas do histórico mais antigas que X dias.
+        Remove entradas do histórico mais antigas que X dias
+        (e os objetos que só elas referenciavam).
         """
-        from datetime import timedelta
-        limite = datetime.now() - timedelta(days=dias)
-
-        self.historico = [
-            e for e in self.historico
-            if datetime.fromisoformat(e["timestamp"]) > limite
-        ]
-
-        self._salvar_historico()
+        self.store.compactar(dias=dias)
@@ -0,0 +1,274 @@
+"""
+Armazenamento de histórico de código baseado em deltas.
+
+- Objetos endereçados por conteúdo (sha256), comprimidos com zlib e deduplicados.
+- Versões guardadas como delta (diff_engine.gerar_delta) sobre a versão anterior,
+  com snapshot completo a cada SNAPSHOT_A_CADA deltas na cadeia.
+- Índice append-only (index.jsonl): registrar uma mudança anexa poucas linhas,
+  sem reescrever o histórico inteiro.
+- Retenção limitada (MAX_ENTRADAS / dias): a compactação regrava o índice e
+  remove objetos que nenhuma entrada mantida referencia. Com histerese: só roda
+  quando o índice passa de MAX_ENTRADAS × FOLGA_COMPACTACAO, então o custo O(N)
+  se paga a cada ~MAX_ENTRADAS/4 registros em vez de a cada registro.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from yui_ai.code_editor.diff_engine import aplicar_delta, gerar_delta
+
+SNAPSHOT_A_CADA = 20     # profundidade máxima da cadeia de deltas
+MAX_ENTRADAS = 1000      # retenção: entradas mantidas no índice
+FOLGA_COMPACTACAO = 1.25 # compacta só acima de max_entradas × folga (e volta a max_entradas)
+CACHE_VERSOES = 32       # conteúdos reconstruídos mantidos em RAM
+
+
+def hash_conteudo(conteudo: str) -> str:
+    """sha256 do conteúdo (endereço da versão)."""
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """
+    Store append-only de versões de arquivos.
+
+    Entradas: {"id", "arquivo", "timestamp", "descricao", "tags", "revertido",
+               "antigo": sha, "novo": sha}
+    """
+
+    def __init__(self, diretorio: str, max_entradas: int = MAX_ENTRADAS, snapshot_a_cada: int = SNAPSHOT_A_CADA):
+        self.diretorio = diretorio
+        self.objetos_dir = os.path.join(diretorio, "objects")
+        self.indice_path = os.path.join(diretorio, "index.jsonl")
+        self.max_entradas = max(1, int(max_entradas))
+        self._limite_compactacao = max(self.max_entradas + 1, int(self.max_entradas * FOLGA_COMPACTACAO))
+        self.snapshot_a_cada = max(1, int(snapshot_a_cada))
+        self._lock = threading.RLock()
+        self._versoes: Dict[str, dict] = {}
+        self._entradas: List[dict] = []
+        self._por_id: Dict[int, dict] = {}
+        self._proximo_id = 0
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._carregar()
+
+    # ---------- índice ----------
+
+    def _carregar(self) -> None:
+        if not os.path.exists(self.indice_path):
+            return
+        try:
+            with open(self.indice_path, "r", encoding="utf-8") as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        self._aplicar_registro(json.loads(linha))
+                    except Exception:
+                        continue
+        except OSError:
+            pass
+
+    def _aplicar_registro(self, reg: dict) -> None:
+        tipo = reg.get("t")
+        if tipo == "v":
+            self._versoes[reg["sha"]] = reg
+        elif tipo == "e":
+            entrada = {k: v for k, v in reg.items() if k != "t"}
+            entrada.setdefault("revertido", False)
+            self._entradas.append(entrada)
+            self._por_id[entrada["id"]] = entrada
+            self._proximo_id = max(self._proximo_id, entrada["id"] + 1)
+        elif tipo == "r":
+            entrada = self._por_id.get(reg.get("id"))
+            if entrada:
+                entrada["revertido"] = True
+                entrada["timestamp_reversao"] = reg.get("ts", "")
+
+    def _anexar(self, registros: List[dict]) -> None:
+        os.makedirs(self.diretorio, exist_ok=True)
+        dados = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in registros)
+        with open(self.indice_path, "a", encoding="utf-8") as f:
+            f.write(dados)
+
+    # ---------- objetos ----------
+
+    def _objeto_path(self, sha: str) -> str:
+        return os.path.join(self.objetos_dir, sha[:2], sha)
+
+    def _gravar_objeto(self, dados: bytes) -> str:
+        sha = hashlib.sha256(dados).hexdigest()
+        path = self._objeto_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(dados, 6))
+            os.replace(tmp, path)
+        return sha
+
+    def _ler_objeto(self, sha: str) -> bytes:
+        with open(self._objeto_path(sha), "rb") as f:
+            return zlib.decompress(f.read())
+
+    # ---------- versões ----------
+
+    def _registrar_versao(self, conteudo: str, base: Optional[str]) -> List[dict]:
+        """Garante que a versão existe. Retorna registros novos a anexar ao índice."""
+        sha = hash_conteudo(conteudo)
+        if sha in self._versoes:
+            return []
+        base_reg = self._versoes.get(base) if base else None
+        if base_reg is not None and base_reg.get("depth", 0) + 1 < self.snapshot_a_cada:
+            conteudo_base = self.reconstruir(base)
+            delta = gerar_delta(conteudo_base, conteudo)
+            payload = json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            # Delta maior que o próprio arquivo não compensa: vira snapshot
+            if len(payload) < len(conteudo.encode("utf-8")) and aplicar_delta(conteudo_base, delta) == conteudo:
+                reg = {"t": "v", "sha": sha, "kind": "delta", "base": base,
+                       "obj": self._gravar_objeto(payload), "depth": base_reg.get("depth", 0) + 1}
+                self._versoes[sha] = reg
+                return [reg]
+        reg = {"t": "v", "sha": sha, "kind": "full", "obj": self._gravar_objeto(conteudo.encode("utf-8")), "depth": 0}
+        self._versoes[sha] = reg
+        return [reg]
+
+    def reconstruir(self, sha: str) -> str:
+        """Reconstrói o conteúdo de uma versão (snapshot + deltas da cadeia)."""
+        with self._lock:
+            if sha in self._cache:
+                self._cache.move_to_end(sha)
+                return self._cache[sha]
+            cadeia = []
+            atual = sha
+            while True:
+                reg = self._versoes.get(atual)
+                if reg is None:
+                    raise KeyError(f"Versão desconhecida: {atual}")
+                if atual in self._cache:
+                    conteudo = self._cache[atual]
+                    break
+                if reg["kind"] == "full":
+                    conteudo = self._ler_objeto(reg["obj"]).decode("utf-8")
+                    break
+                cadeia.append(reg)
+                atual = reg["base"]
+            for reg in reversed(cadeia):
+                conteudo = aplicar_delta(conteudo, json.loads(self._ler_objeto(reg["obj"]).decode("utf-8")))
+            self._cache[sha] = conteudo
+            while len(self._cache) > CACHE_VERSOES:
+                self._cache.popitem(last=False)
+            return conteudo
+
+    # ---------- API ----------
+
+    def registrar(self, arquivo: str, conteudo_antigo: str, conteudo_novo: str,
+                  descricao: str = "", tags: Optional[List[str]] = None,
+                  timestamp: Optional[str] = None) -> dict:
+        """Registra mudança: grava só os objetos novos e anexa ao índice."""
+        with self._lock:
+            arquivo_abs = os.path.abspath(arquivo)
+            anterior = next((e["novo"] for e in reversed(self._entradas) if e["arquivo"] == arquivo_abs), None)
+            registros = self._registrar_versao(conteudo_antigo, anterior)
+            sha_antigo = hash_conteudo(conteudo_antigo)
+            registros += self._registrar_versao(conteudo_novo, sha_antigo)
+            entrada = {
+                "id": self._proximo_id,
+                "arquivo": arquivo_abs,
+                "timestamp": timestamp or datetime.now().isoformat(),
+                "descricao": descricao or f"Modificação em {os.path.basename(arquivo)}",
+                "tags": tags or [],
+                "revertido": False,
+                "antigo": sha_antigo,
+                "novo": hash_conteudo(conteudo_novo),
+            }
+            registros.append(dict(entrada, t="e"))
+            self._anexar(registros)
+            self._entradas.append(entrada)
+            self._por_id[entrada["id"]] = entrada
+            self._proximo_id += 1
+            if len(self._entradas) > self._limite_compactacao:
+                self.compactar(max_entradas=self.max_entradas)
+            return dict(entrada)
+
+    def marcar_revertido(self, entrada_id: int) -> None:
+        with self._lock:
+            entrada = self._por_id.get(entrada_id)
+            if not entrada:
+                return
+            ts = datetime.now().isoformat()
+            self._anexar([{"t": "r", "id": entrada_id, "ts": ts}])
+            entrada["revertido"] = True
+            entrada["timestamp_reversao"] = ts
+
+    def entradas(self) -> List[dict]:
+        with self._lock:
+            return [dict(e) for e in self._entradas]
+
+    def obter(self, entrada_id: int) -> Optional[dict]:
+        with self._lock:
+            e = self._por_id.get(entrada_id)
+            return dict(e) if e else None
+
+    def conteudos(self, entrada_id: int) -> Optional[tuple]:
+        """(conteudo_antigo, conteudo_novo) de uma entrada."""
+        e = self.obter(entrada_id)
+        if not e:
+            return None
+        return self.reconstruir(e["antigo"]), self.reconstruir(e["novo"])
+
+    def compactar(self, max_entradas: Optional[int] = None, dias: Optional[int] = None) -> int:
+        """
+        Aplica retenção e regrava o índice (único ponto que reescreve o arquivo).
+        Retorna quantas entradas foram removidas.
+        """
+        with self._lock:
+            manter = self._entradas
+            if dias is not None:
+                limite = datetime.now() - timedelta(days=dias)
+                manter = [e for e in manter if datetime.fromisoformat(e["timestamp"]) > limite]
+            if max_entradas is not None:
+                manter = manter[-max_entradas:]
+            removidas = len(self._entradas) - len(manter)
+
+            # Versões alcançáveis: as das entradas mantidas + bases das cadeias
+            vivas = set()
+            for e in manter:
+                for sha in (e["antigo"], e["novo"]):
+                    while sha and sha not in vivas and sha in self._versoes:
+                        vivas.add(sha)
+                        sha = self._versoes[sha].get("base")
+            versoes = {sha: reg for sha, reg in self._versoes.items() if sha in vivas}
+            objetos_vivos = {reg["obj"] for reg in versoes.values()}
+            objetos_mortos = {reg["obj"] for reg in self._versoes.values()} - objetos_vivos
+
+            registros = list(versoes.values())
+            for e in manter:
+                registros.append(dict({k: v for k, v in e.items() if k not in ("revertido", "timestamp_reversao")}, t="e"))
+                if e.get("revertido"):
+                    registros.append({"t": "r", "id": e["id"], "ts": e.get("timestamp_reversao", "")})
+            os.makedirs(self.diretorio, exist_ok=True)
+            tmp = f"{self.indice_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for r in registros:
+                    f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.indice_path)
+
+            for obj in objetos_mortos:
+                try:
+                    os.remove(self._objeto_path(obj))
+                except OSError:
+                    pass
+            self._versoes = versoes
+            self._entradas = manter
+            self._por_id = {e["id"]: e for e in manter}
+            for sha in list(self._cache):
+                if sha not in vivas:
+                    del self._cache[sha]
+            return removidas
@@ -4,7 +4,7 @@ SOMENTE LEITURA — NUNCA edita, NUNCA gera patch, NUNCA pede confirmação de e
 """
 
 import os
-from typing import Dict, Optional, Tuple, Any
+from typing import Any, Dict, List, Optional, Tuple
 
 from yui_ai.project_analysis.project_scanner import escanear_estrutura, DEFAULT_PROJECT_ROOT
 from yui_ai.project_analysis.architecture_analyzer import analisar_arquitetura
@@ -16,9 +16,15 @@ from yui_ai.system.history import salvar_historico
 from yui_ai.config.config import modo_resposta
 
 
-def executar_analise_completa(raiz: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+def executar_analise_completa(
+    raiz: Optional[str] = None,
+    scanner: Optional[Dict[str, Any]] = None,
+    metricas: Optional[Tuple[Dict[str, int], List[Dict[str, Any]]]] = None,
+) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
     """
     Executa análise completa do projeto (somente leitura).
+    scanner/metricas: resultados já calculados (ex.: pelo índice incremental em
+    project_index); quando ausentes, são calculados aqui.
 
     Retorna (sucesso, dados, erro):
         - sucesso: True apenas após a análise completar corretamente
@@ -33,12 +39,13 @@ def executar_analise_completa(raiz: Optional[str] = None) -> Tuple[bool, Optiona
     try:
         log_event("Iniciando análise completa", {"raiz": raiz})
         raiz_abs = os.path.abspath(raiz or DEFAULT_PROJECT_ROOT)
-        scanner = escanear_estrutura(raiz_abs)
+        if scanner is None:
+            scanner = escanear_estrutura(raiz_abs)
         arquitetura = analisar_arquitetura(scanner)
         qualidade = analisar_qualidade(scanner, arquitetura)
         roadmap = gerar_roadmap(scanner, arquitetura, qualidade)
 
-        metricas_codigo, problemas_detectados = extrair_metricas_python(raiz_abs)
+        metricas_codigo, problemas_detectados = metricas if metricas is not None else extrair_metricas_python(raiz_abs)
         dados_intermed = {
             "scanner": scanner,
             "arquitetura": arquitetura,
@@ -5,7 +5,9 @@ SOMENTE LEITURA — análise estática via AST.
 
 import ast
 import os
-from typing import Dict, List, Any, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
+
+from core.fs_snapshot import get_snapshot
 
 IGNORAR_DIRS = {"__pycache__", ".git", ".venv", "venv", "node_modules", "build", "dist"}
 NOMES_GENERICOS = {"job", "cb", "callback", "handler", "func", "fn", "run", "do", "main", "test", "tmp", "temp"}
@@ -13,13 +15,12 @@ MAX_LINHAS_FUNCAO = 80
 
 
 def _listar_py(raiz: str) -> List[str]:
-    paths = []
-    for _dir, dirnames, filenames in os.walk(raiz):
-        dirnames[:] = [d for d in dirnames if d not in IGNORAR_DIRS]
-        for f in filenames:
-            if f.endswith(".py"):
-                paths.append(os.path.join(_dir, f))
-    return paths
+    snap = get_snapshot(raiz)
+    return [
+        os.path.join(raiz, rel)
+        for rel in snap.iter_files(skip=lambda parte: parte in IGNORAR_DIRS)
+        if rel.endswith(".py")
+    ]
 
 
 def _conta_linhas(source: str, node: ast.AST) -> int:
@@ -28,68 +29,71 @@ def _conta_linhas(source: str, node: ast.AST) -> int:
     return 0
 
 
-def extrair_metricas_python(raiz: str) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+def metricas_arquivo(source: str, rel_path: str) -> Dict[str, Any]:
     """
-    Analisa .py do projeto. Retorna (contagens_para_score, problemas_com_tags).
-    contagens: empty_except, no_type_except, generic_name, long_function
-    problemas: [{ "mensagem", "tag": "[arquitetura]"|"[legibilidade]"|"[manutenibilidade]", "arquivo", "linha" }]
+    Contribuição de um único .py: {"counts", "problemas", "funcoes"}.
+    Base do índice incremental (project_index): só arquivos alterados são reanalisados.
     """
-    raiz = os.path.abspath(raiz)
-    paths = _listar_py(raiz)
     counts = {"empty_except": 0, "no_type_except": 0, "generic_name": 0, "long_function": 0}
     problemas: List[Dict[str, Any]] = []
-    nomes_funcoes: Dict[str, List[str]] = {}  # nome -> [arquivo1, arquivo2]
+    funcoes: List[str] = []
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {"counts": counts, "problemas": problemas, "funcoes": funcoes}
 
-    for path in paths:
-        try:
-            with open(path, "r", encoding="utf-8", errors="replace") as f:
-                source = f.read()
-        except Exception:
-            continue
-        try:
-            tree = ast.parse(source)
-        except SyntaxError:
-            continue
-        rel_path = os.path.relpath(path, raiz)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler):
+            if node.type is None:
+                counts["no_type_except"] += 1
+                problemas.append({
+                    "mensagem": "except sem tipo (captura tudo)",
+                    "tag": "[manutenibilidade]",
+                    "arquivo": rel_path,
+                    "linha": node.lineno,
+                })
+            if len(node.body) == 1 and isinstance(node.body[0], ast.Pass):
+                counts["empty_except"] += 1
+                problemas.append({
+                    "mensagem": "except vazio (pass) pode esconder erros",
+                    "tag": "[manutenibilidade]",
+                    "arquivo": rel_path,
+                    "linha": node.lineno,
+                })
+        if isinstance(node, ast.FunctionDef):
+            nome = node.name
+            if nome.lower() in NOMES_GENERICOS and not nome.startswith("test_"):
+                counts["generic_name"] += 1
+                problemas.append({
+                    "mensagem": f"nome genérico: '{nome}'",
+                    "tag": "[legibilidade]",
+                    "arquivo": rel_path,
+                    "linha": node.lineno,
+                })
+            linhas = _conta_linhas(source, node)
+            if linhas > MAX_LINHAS_FUNCAO:
+                counts["long_function"] += 1
+                problemas.append({
+                    "mensagem": f"função '{nome}' muito longa ({linhas} linhas)",
+                    "tag": "[manutenibilidade]",
+                    "arquivo": rel_path,
+                    "linha": node.lineno,
+                })
+            funcoes.append(nome)
+    return {"counts": counts, "problemas": problemas, "funcoes": funcoes}
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ExceptHandler):
-                if node.type is None:
-                    counts["no_type_except"] += 1
-                    problemas.append({
-                        "mensagem": "except sem tipo (captura tudo)",
-                        "tag": "[manutenibilidade]",
-                        "arquivo": rel_path,
-                        "linha": node.lineno,
-                    })
-                if len(node.body) == 1 and isinstance(node.body[0], ast.Pass):
-                    counts["empty_except"] += 1
-                    problemas.append({
-                        "mensagem": "except vazio (pass) pode esconder erros",
-                        "tag": "[manutenibilidade]",
-                        "arquivo": rel_path,
-                        "linha": node.lineno,
-                    })
-            if isinstance(node, ast.FunctionDef):
-                nome = node.name
-                if nome.lower() in NOMES_GENERICOS and not nome.startswith("test_"):
-                    counts["generic_name"] += 1
-                    problemas.append({
-                        "mensagem": f"nome genérico: '{nome}'",
-                        "tag": "[legibilidade]",
-                        "arquivo": rel_path,
-                        "linha": node.lineno,
-                    })
-                linhas = _conta_linhas(source, node)
-                if linhas > MAX_LINHAS_FUNCAO:
-                    counts["long_function"] += 1
-                    problemas.append({
-                        "mensagem": f"função '{nome}' muito longa ({linhas} linhas)",
-                        "tag": "[manutenibilidade]",
-                        "arquivo": rel_path,
-                        "linha": node.lineno,
-                    })
-                nomes_funcoes.setdefault(nome, []).append(rel_path)
+
+def agregar_metricas(por_arquivo: Iterable[Tuple[str, Dict[str, Any]]]) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """Soma as contribuições [(rel_path, metricas_arquivo), ...] e detecta funções duplicadas."""
+    counts = {"empty_except": 0, "no_type_except": 0, "generic_name": 0, "long_function": 0}
+    problemas: List[Dict[str, Any]] = []
+    nomes_funcoes: Dict[str, List[str]] = {}  # nome -> [arquivo1, arquivo2]
+    for rel_path, contrib in por_arquivo:
+        for k, v in (contrib.get("counts") or {}).items():
+            counts[k] = counts.get(k, 0) + v
+        problemas.extend(contrib.get("problemas") or [])
+        for nome in contrib.get("funcoes") or []:
+            nomes_funcoes.setdefault(nome, []).append(rel_path)
 
     for nome, arquivos in nomes_funcoes.items():
         if len(arquivos) > 1:
@@ -99,10 +103,28 @@ def extrair_metricas_python(raiz: str) -> Tuple[Dict[str, int], List[Dict[str, A
                 "arquivo": ", ".join(arquivos[:3]),
                 "linha": None,
             })
-
     return counts, problemas
 
 
+def extrair_metricas_python(raiz: str) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """
+    Analisa .py do projeto. Retorna (contagens_para_score, problemas_com_tags).
+    contagens: empty_except, no_type_except, generic_name, long_function
+    problemas: [{ "mensagem", "tag": "[arquitetura]"|"[legibilidade]"|"[manutenibilidade]", "arquivo", "linha" }]
+    """
+    raiz = os.path.abspath(raiz)
+    por_arquivo = []
+    for path in _listar_py(raiz):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                source = f.read()
+        except Exception:
+            continue
+        rel_path = os.path.relpath(path, raiz)
+        por_arquivo.append((rel_path, metricas_arquivo(source, rel_path)))
+    return agregar_metricas(por_arquivo)
+
+
 def calcular_score_qualidade(dados_analise: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calcula score a partir de 10. -1 por: except vazio, except sem tipo, nome genérico, função >80 linhas.
@@ -1,104 +1,201 @@
 """
-ProjectIndex: cache leve para análise completa de projeto.
+ProjectIndex: cache incremental da análise completa de projeto.
 
-Armazena o resultado de executar executar_analise_completa(raiz) em disco,
-para evitar re-escanear o projeto a cada chamada.
+Antes: um único project_index.json com TTL de 6h por raiz — não invalidava quando
+arquivos mudavam e reescrevia o arquivo inteiro (todas as raízes) a cada atualização.
+
+Agora: um shard por raiz (~/Yui/project_index/<hash>.json) com uma entrada por .py
+({mtime_ns, size, hash, contribuição das métricas}). A cada chamada:
+- mtime/tamanho de cada .py (core/fs_snapshot); iguais → reaproveita a contribuição
+- mudou → lê e compara o hash do conteúdo; só reanalisa (AST) o que mudou de fato
+- estrutura (escanear_estrutura) e arquivos iguais → devolve a análise guardada
+- o shard só é regravado quando algo mudou (escrita atômica, JSON compacto)
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Tuple
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
+from core.fs_snapshot import get_snapshot
 from yui_ai.project_analysis.analysis_report import executar_analise_completa
+from yui_ai.project_analysis.code_quality_metrics import agregar_metricas, metricas_arquivo, _listar_py
+from yui_ai.project_analysis.project_scanner import escanear_estrutura, DEFAULT_PROJECT_ROOT
 
 
-_INDEX_PATH: Optional[str] = None
-_TTL_HORAS = 6  # tempo de vida padrão do cache
-
+_INDEX_DIR: Optional[str] = None
+_SHARD_VERSION = 1
 
-def _get_index_path() -> str:
-    global _INDEX_PATH
-    if _INDEX_PATH is not None:
-        return _INDEX_PATH
-    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
-    dir_path = os.path.join(base, "Yui")
-    try:
-        os.makedirs(dir_path, exist_ok=True)
-    except OSError:
-        pass
-    _INDEX_PATH = os.path.join(dir_path, "project_index.json")
-    return _INDEX_PATH
+_shards: Dict[str, Dict[str, Any]] = {}   # raiz → shard em memória
+_lock = threading.Lock()
+_stats = {"hits": 0, "refreshes": 0, "files_reanalyzed": 0, "files_reused": 0}
 
 
-def _load_index() -> Dict[str, Any]:
-    path = _get_index_path()
-    if not os.path.isfile(path):
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+def _get_index_dir() -> str:
+    global _INDEX_DIR
+    if _INDEX_DIR is not None:
+        return _INDEX_DIR
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    _INDEX_DIR = os.path.join(base, "Yui", "project_index")
+    return _INDEX_DIR
 
 
-def _save_index(store: Dict[str, Any]) -> None:
-    path = _get_index_path()
+def _normalize_root(raiz: Optional[str]) -> str:
+    return os.path.abspath(raiz or DEFAULT_PROJECT_ROOT)
+
+
+def _shard_path(root: str) -> str:
+    nome = hashlib.sha1(root.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return os.path.join(_get_index_dir(), nome + ".json")
+
+
+def _load_shard(root: str) -> Dict[str, Any]:
+    shard = _shards.get(root)
+    if shard is not None:
+        return shard
+    shard = {"version": _SHARD_VERSION, "root": root, "files": {}, "scanner": None, "data": None, "timestamp": None}
+    path = _shard_path(root)
+    if os.path.isfile(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                salvo = json.load(f)
+            if salvo.get("version") == _SHARD_VERSION and salvo.get("root") == root:
+                shard = salvo
+        except Exception:
+            pass
+    _shards[root] = shard
+    return shard
+
+
+def _save_shard(root: str, shard: Dict[str, Any]) -> None:
+    path = _shard_path(root)
+    tmp = f"{path}.{os.getpid()}.tmp"
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(store, f, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(shard, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
     except OSError:
-        pass
-
-
-def _normalize_root(raiz: Optional[str]) -> str:
-    return os.path.abspath(raiz or os.getcwd())
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _refresh_files(root: str, shard: Dict[str, Any]) -> bool:
+    """Atualiza as entradas por arquivo do shard. Retorna True se algum .py mudou."""
+    snap = get_snapshot(root, max_age=0)  # diff agora: o índice não pode servir estado velho
+    antigos: Dict[str, Any] = shard.get("files") or {}
+    novos: Dict[str, Any] = {}
+    mudou = False
+    for path in _listar_py(root):
+        rel = os.path.relpath(path, root)
+        st = snap.stat(rel.replace(os.sep, "/"))
+        if st is None:
+            continue
+        size, mtime_ns = st
+        entry = antigos.get(rel)
+        if entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+            novos[rel] = entry
+            _stats["files_reused"] += 1
+            continue
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            continue
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry and entry["hash"] == digest:
+            # só o mtime mudou (touch, checkout): mesma contribuição
+            novos[rel] = dict(entry, mtime_ns=mtime_ns, size=size)
+            _stats["files_reused"] += 1
+            continue
+        source = raw.decode("utf-8", errors="replace")
+        novos[rel] = {
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "hash": digest,
+            "metricas": metricas_arquivo(source, rel),
+        }
+        _stats["files_reanalyzed"] += 1
+        mudou = True
+    if set(novos) != set(antigos):
+        mudou = True
+    shard["files"] = novos
+    if mudou:
+        shard["data"] = None  # análise guardada não vale mais
+    return mudou
+
+
+def _metricas(shard: Dict[str, Any]) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    files = shard.get("files") or {}
+    return agregar_metricas((rel, files[rel]["metricas"]) for rel in sorted(files))
 
 
 def get_cached(raiz: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
-    """Retorna (True, dados) se houver cache válido para a raiz."""
-    store = _load_index()
+    """Retorna (True, dados) se a análise guardada para a raiz ainda vale (nenhum arquivo mudou)."""
     root = _normalize_root(raiz)
-    entry = store.get(root)
-    if not entry:
-        return False, None
-    ts = entry.get("timestamp")
-    dados = entry.get("data")
-    if not ts or not dados:
-        return False, None
-    try:
-        dt = datetime.fromisoformat(ts)
-    except Exception:
-        return False, None
-    if datetime.now() - dt > timedelta(hours=_TTL_HORAS):
-        return False, None
-    return True, dados
+    with _lock:
+        shard = _load_shard(root)
+        if not shard.get("data"):
+            return False, None
+        mudou = _refresh_files(root, shard)
+        if mudou or escanear_estrutura(root) != shard.get("scanner"):
+            return False, None
+        return True, shard["data"]
 
 
 def set_cached(raiz: Optional[str], dados: Dict[str, Any]) -> None:
-    store = _load_index()
+    """Guarda uma análise calculada fora do índice (as entradas por arquivo são atualizadas junto)."""
     root = _normalize_root(raiz)
-    store[root] = {
-        "timestamp": datetime.now().isoformat(),
-        "data": dados,
-    }
-    _save_index(store)
+    with _lock:
+        shard = _load_shard(root)
+        _refresh_files(root, shard)
+        shard["scanner"] = dados.get("scanner") or escanear_estrutura(root)
+        shard["data"] = dados
+        shard["timestamp"] = datetime.now().isoformat()
+        _save_shard(root, shard)
 
 
 def get_or_compute(raiz: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
     """
-    Retorna (ok, dados, erro) usando cache se possível.
-    Se não houver cache válido, executa a análise completa e salva no índice.
+    Retorna (ok, dados, erro) usando o índice incremental.
+    Sem mudanças desde a última análise: devolve a guardada. Com mudanças: reanalisa
+    só os .py alterados e recompõe o relatório a partir das contribuições por arquivo.
     """
-    has, dados = get_cached(raiz)
-    if has and dados:
-        return True, dados, None
-
-    ok, dados, err = executar_analise_completa(raiz)
-    if ok and dados:
-        set_cached(raiz, dados)
-    return ok, dados, err
-
+    root = _normalize_root(raiz)
+    with _lock:
+        shard = _load_shard(root)
+        mudou = _refresh_files(root, shard)
+        scanner = escanear_estrutura(root)
+        if not mudou and shard.get("data") and scanner == shard.get("scanner"):
+            _stats["hits"] += 1
+            return True, shard["data"], None
+
+        _stats["refreshes"] += 1
+        ok, dados, err = executar_analise_completa(root, scanner=scanner, metricas=_metricas(shard))
+        if ok and dados:
+            shard["scanner"] = scanner
+            shard["data"] = dados
+            shard["timestamp"] = datetime.now().isoformat()
+        _save_shard(root, shard)
+        return ok, dados, err
+
+
+def invalidate(raiz: Optional[str] = None) -> None:
+    """Descarta a análise guardada (de uma raiz ou de todas); as entradas por arquivo continuam."""
+    with _lock:
+        roots = [_normalize_root(raiz)] if raiz is not None else list(_shards)
+        for root in roots:
+            shard = _load_shard(root)
+            shard["data"] = None
+            _save_shard(root, shard)
+
+
+def index_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, roots=len(_shards))
@@ -2,6 +2,8 @@
 import os
 from typing import Dict, Optional
 
+from core.fs_snapshot import get_snapshot
+
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 _PACKAGE_DIR = os.path.dirname(_THIS_DIR)
 DEFAULT_PROJECT_ROOT = os.path.dirname(_PACKAGE_DIR)
@@ -18,32 +20,22 @@ def escanear_estrutura(raiz: Optional[str] = None) -> Dict:
     raiz = os.path.abspath(raiz or DEFAULT_PROJECT_ROOT)
     if not os.path.isdir(raiz):
         return {"raiz": raiz, "diretorios": [], "arquivos_por_pasta": {}, "extensoes": {}, "total_arquivos": 0, "modulos_principais": []}
-    diretorios = []
+    snap = get_snapshot(raiz)
+    diretorios = [d for d in snap.subdirs("") if not _skip(d)]
     arquivos_por_pasta = {}
     extensoes = {}
     total = 0
-    modulos_principais = []
-    for _dir, dirnames, filenames in os.walk(raiz):
-        dirnames[:] = [d for d in dirnames if not _skip(d)]
-        rel = os.path.relpath(_dir, raiz)
-        pasta_nome = "[raiz]" if rel == "." else rel
-        if rel == ".":
-            diretorios = [d for d in dirnames if not _skip(d)]
-        arquivos = []
-        for f in filenames:
-            if _skip(f):
-                continue
-            ext = os.path.splitext(f)[1].lower() or "(sem ext)"
-            extensoes[ext] = extensoes.get(ext, 0) + 1
-            arquivos.append(f)
-            total += 1
-        if arquivos:
-            arquivos_por_pasta[pasta_nome] = sorted(arquivos)
-        if rel != "." and os.path.isfile(os.path.join(_dir, "__init__.py")):
-            top = rel.split(os.sep)[0]
-            if top not in modulos_principais:
-                modulos_principais.append(top)
-    for d in diretorios:
-        if os.path.isfile(os.path.join(raiz, d, "__init__.py")) and d not in modulos_principais:
-            modulos_principais.append(d)
-    return {"raiz": raiz, "diretorios": sorted(diretorios), "arquivos_por_pasta": arquivos_por_pasta, "extensoes": extensoes, "total_arquivos": total, "modulos_principais": sorted(set(modulos_principais))}
+    for rel in snap.iter_files(skip=_skip):
+        pasta, f = rel.rsplit("/", 1) if "/" in rel else ("", rel)
+        ext = os.path.splitext(f)[1].lower() or "(sem ext)"
+        extensoes[ext] = extensoes.get(ext, 0) + 1
+        arquivos_por_pasta.setdefault(pasta.replace("/", os.sep) or "[raiz]", []).append(f)
+        total += 1
+    for arquivos in arquivos_por_pasta.values():
+        arquivos.sort()
+    modulos_principais = {
+        d.split("/")[0]
+        for d in snap.dirs
+        if d and not any(_skip(p) for p in d.split("/")) and f"{d}/__init__.py" in snap.files
+    }
+    return {"raiz": raiz, "diretorios": sorted(diretorios), "arquivos_por_pasta": arquivos_por_pasta, "extensoes": extensoes, "total_arquivos": total, "modulos_principais": sorted(modulos_principais)}
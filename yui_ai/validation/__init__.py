@@ -10,13 +10,15 @@ NUNCA corrige automaticamente - apenas relata e pergunta.
 """
 
 from yui_ai.validation.syntax_validator import validar_sintaxe
-from yui_ai.validation.test_runner import executar_testes
-from yui_ai.validation.linter_runner import executar_linter
+from yui_ai.validation.test_runner import executar_testes, executar_testes_afetados
+from yui_ai.validation.linter_runner import executar_linter, executar_linters_em_lote
 from yui_ai.validation.validation_engine import ValidationEngine
 
 __all__ = [
     "validar_sintaxe",
     "executar_testes",
+    "executar_testes_afetados",
     "executar_linter",
+    "executar_linters_em_lote",
     "ValidationEngine"
 ]
@@ -2,11 +2,44 @@
 Executor de linters.
 
 Detecta e executa linters se existirem.
+
+Antes: cada chamada sondava `<linter> --version` (um processo por sonda) e
+iniciava um processo novo de pylint/flake8/eslint por arquivo.
+Agora:
+- a detecção de comandos fica em cache (uma sonda por comando)
+- pylint/flake8 instalados no interpretador rodam em workers Python de vida
+  longa ("quentes": o linter é importado uma vez e atende vários pedidos);
+  sem o módulo, cai no processo por execução de antes. eslint_d (daemon)
+  é preferido ao eslint quando existe
+- executar_linters_em_lote: vários arquivos num pool de threads, com cache
+  por hash do conteúdo e tempos agregados
 """
 
-import subprocess
+import atexit
+import hashlib
+import importlib.util
+import json
 import os
-from typing import Dict, List, Optional, Tuple
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LINT_WORKERS = max(1, int(os.environ.get("YUI_LINT_WORKERS", str(min(4, os.cpu_count() or 1)))))
+USE_WARM_LINTERS = os.environ.get("YUI_WARM_LINTERS", "1").strip().lower() not in ("0", "false", "no")
+LINT_CACHE_MAX = 512
+LINT_TIMEOUT = 30
+
+# linter → "modulo:funcao" chamada como funcao(argv) dentro do worker quente
+WARM_ENTRYPOINTS = {
+    "flake8": "flake8.main.cli:main",
+    "pylint": "pylint:run_pylint",
+}
 
 
 def executar_linter(arquivo_modificado: Optional[str] = None, diretorio_projeto: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str], Dict]:
@@ -73,8 +106,9 @@ def _tem_eslint(raiz: str) -> bool:
     return _tem_comando("eslint") or os.path.exists(os.path.join(raiz, "node_modules", ".bin", "eslint"))
 
 
+@lru_cache(maxsize=32)
 def _tem_comando(comando: str) -> bool:
-    """Verifica se comando está disponível."""
+    """Verifica se comando está disponível (uma sonda por comando, depois cache)."""
     try:
         subprocess.run(
             [comando, "--version"],
@@ -89,24 +123,14 @@ def _tem_comando(comando: str) -> bool:
 def _executar_pylint(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Optional[str], Dict]:
     """Executa pylint."""
     try:
-        cmd = ["pylint", arquivo, "--output-format=text"]
-        
-        resultado = subprocess.run(
-            cmd,
-            cwd=raiz,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        returncode, saida = _rodar_linter("pylint", [arquivo, "--output-format=text"], raiz)
 
-        saida = resultado.stdout + resultado.stderr
-        
         # Parse básico
         erros = saida.count("error")
         avisos = saida.count("warning")
-        
+
         # pylint retorna 0 se não houver erros críticos
-        sucesso = resultado.returncode in [0, 4]  # 4 = alguns avisos mas sem erros críticos
+        sucesso = returncode in [0, 4]  # 4 = alguns avisos mas sem erros críticos
 
         return sucesso, saida, None if sucesso else saida, {
             "linter": "pylint",
@@ -125,16 +149,8 @@ def _executar_pylint(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Opti
 def _executar_flake8(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Optional[str], Dict]:
     """Executa flake8."""
     try:
-        resultado = subprocess.run(
-            ["flake8", arquivo],
-            cwd=raiz,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        saida = resultado.stdout + resultado.stderr
-        sucesso = resultado.returncode == 0
+        returncode, saida = _rodar_linter("flake8", [arquivo], raiz)
+        sucesso = returncode == 0
 
         # Parse básico
         linhas_erro = [l for l in saida.split("\n") if l.strip()]
@@ -148,6 +164,8 @@ def _executar_flake8(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Opti
 
     except FileNotFoundError:
         return True, "flake8 não encontrado", None, {"linter": "flake8", "erros": 0, "avisos": 0}
+    except subprocess.TimeoutExpired:
+        return False, None, "Timeout ao executar flake8", {"linter": "flake8", "erros": 0, "avisos": 0}
     except Exception as e:
         return False, None, f"Erro ao executar flake8: {str(e)}", {"linter": "flake8", "erros": 0, "avisos": 0}
 
@@ -155,8 +173,11 @@ def _executar_flake8(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Opti
 def _executar_eslint(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Optional[str], Dict]:
     """Executa eslint."""
     try:
-        # Tenta usar npx se disponível
-        cmd = ["npx", "eslint", arquivo] if _tem_comando("npx") else ["eslint", arquivo]
+        # eslint_d (daemon, já aquecido) > npx eslint > eslint
+        if _tem_comando("eslint_d"):
+            cmd = ["eslint_d", arquivo]
+        else:
+            cmd = ["npx", "eslint", arquivo] if _tem_comando("npx") else ["eslint", arquivo]
 
         resultado = subprocess.run(
             cmd,
@@ -183,3 +204,246 @@ def _executar_eslint(arquivo: str, raiz: str) -> Tuple[bool, Optional[str], Opti
         return True, "eslint não encontrado", None, {"linter": "eslint", "erros": 0, "avisos": 0}
     except Exception as e:
         return False, None, f"Erro ao executar eslint: {str(e)}", {"linter": "eslint", "erros": 0, "avisos": 0}
+
+
+# ---------- linters quentes ----------
+
+_WORKER_SRC = r"""
+import contextlib, importlib, io, json, linecache, os, sys
+funcoes = {}
+resposta = sys.stdout
+for linha in sys.stdin:
+    req = json.loads(linha)
+    func = funcoes.get(req["entry"])
+    # flake8 escreve em sys.stdout.buffer: saída precisa ter bytes por baixo
+    out = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", errors="replace", write_through=True)
+    rc = 0
+    inicio = os.getcwd()
+    # o pylint guarda módulos já analisados no astroid: sem limpar, arquivo editado daria o resultado antigo
+    if "astroid" in sys.modules:
+        sys.modules["astroid"].MANAGER.clear_cache()
+    linecache.clearcache()
+    try:
+        if func is None:
+            modulo, _, nome = req["entry"].partition(":")
+            func = funcoes[req["entry"]] = getattr(importlib.import_module(modulo), nome)
+        os.chdir(req["cwd"])
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            r = func(req["argv"])
+        rc = r if isinstance(r, int) else 0
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException as e:
+        out.write(f"{type(e).__name__}: {e}")
+        rc = -1
+    finally:
+        os.chdir(inicio)
+    resposta.write(json.dumps({"rc": rc, "out": out.buffer.getvalue().decode("utf-8", "replace")}) + "\n")
+    resposta.flush()
+"""
+
+
+class _WarmWorker:
+    """Processo Python de vida longa que chama o linter in-process a cada pedido."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", "-c", _WORKER_SRC],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        self._respostas: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._ler, daemon=True).start()
+        self.pedidos = 0
+
+    def _ler(self) -> None:
+        for linha in self.proc.stdout:
+            self._respostas.put(linha)
+        self._respostas.put(None)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, entry: str, argv: List[str], cwd: str, timeout: float) -> Tuple[int, str]:
+        self.proc.stdin.write(json.dumps({"entry": entry, "argv": argv, "cwd": cwd}) + "\n")
+        self.proc.stdin.flush()
+        try:
+            linha = self._respostas.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise subprocess.TimeoutExpired(entry, timeout)
+        if linha is None:
+            raise RuntimeError("worker do linter encerrou")
+        self.pedidos += 1
+        r = json.loads(linha)
+        return int(r["rc"]), r["out"]
+
+    def close(self) -> None:
+        try:
+            self.proc.kill()
+        except Exception:
+            pass
+
+
+_warm_idle: List[_WarmWorker] = []
+_warm_lock = threading.Lock()
+_warm_stats = {"warm_runs": 0, "cold_runs": 0, "workers_started": 0}
+
+
+@lru_cache(maxsize=16)
+def _tem_modulo(modulo: str) -> bool:
+    try:
+        return importlib.util.find_spec(modulo) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _rodar_quente(entry: str, argv: List[str], cwd: str, timeout: float = LINT_TIMEOUT) -> Tuple[int, str]:
+    """Executa entry(argv) num worker quente livre (cria um se todos estiverem ocupados)."""
+    with _warm_lock:
+        worker = None
+        while _warm_idle and worker is None:
+            candidato = _warm_idle.pop()
+            worker = candidato if candidato.alive() else None
+    if worker is None:
+        worker = _WarmWorker()
+        _warm_stats["workers_started"] += 1
+    try:
+        resultado = worker.run(entry, argv, cwd, timeout)
+    except Exception:
+        worker.close()
+        raise
+    with _warm_lock:
+        if len(_warm_idle) < LINT_WORKERS:
+            _warm_idle.append(worker)
+        else:
+            worker.close()
+    _warm_stats["warm_runs"] += 1
+    return resultado
+
+
+def _rodar_linter(linter: str, argv: List[str], raiz: str) -> Tuple[int, str]:
+    """(returncode, saida) do linter: worker quente se o módulo existe, senão processo novo."""
+    entry = WARM_ENTRYPOINTS.get(linter)
+    if USE_WARM_LINTERS and entry and _tem_modulo(entry.split(".")[0].split(":")[0]):
+        try:
+            rc, saida = _rodar_quente(entry, argv, raiz)
+            if rc != -1:
+                return rc, saida
+            # -1: exceção dentro do worker (não é resultado do linter) → processo novo
+        except subprocess.TimeoutExpired:
+            raise
+        except Exception:
+            pass  # worker indisponível: segue pelo processo
+    _warm_stats["cold_runs"] += 1
+    resultado = subprocess.run([linter] + argv, cwd=raiz, capture_output=True, text=True, timeout=LINT_TIMEOUT)
+    return resultado.returncode, resultado.stdout + resultado.stderr
+
+
+def fechar_linters_quentes() -> None:
+    """Encerra os workers quentes (também chamado no exit)."""
+    with _warm_lock:
+        workers = list(_warm_idle)
+        _warm_idle.clear()
+    for w in workers:
+        w.close()
+
+
+atexit.register(fechar_linters_quentes)
+
+
+# ---------- lote ----------
+
+_lint_cache: "OrderedDict[Tuple[str, str, str], Tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+_lote_stats = {"lotes": 0, "arquivos": 0, "cache_hits": 0}
+
+
+def _chave_conteudo(arquivo: str, diretorio_projeto: Optional[str]) -> Optional[Tuple[str, str, str]]:
+    try:
+        with open(arquivo, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+    return os.path.abspath(arquivo), digest, os.path.abspath(diretorio_projeto) if diretorio_projeto else ""
+
+
+def _cacheavel(resultado: Tuple) -> bool:
+    """Timeouts e falhas ao iniciar o linter não vão para o cache."""
+    erro = resultado[2] or ""
+    return not erro.startswith(("Timeout", "Erro ao executar"))
+
+
+def executar_linters_em_lote(
+    arquivos: Iterable[str],
+    diretorio_projeto: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> Dict:
+    """
+    Executa executar_linter em vários arquivos no pool (LINT_WORKERS threads; os linters
+    são processos ou workers quentes, então rodam de fato em paralelo). Arquivos com o
+    mesmo conteúdo da última execução vêm do cache.
+
+    Retorna: {
+        "resultados": {arquivo: (sucesso, saida, erro, detalhes)},
+        "sucesso": bool,
+        "tempo": {"total_s", "soma_s", "cache_hits", "executados", "workers"}
+    }
+    """
+    inicio = time.perf_counter()
+    arquivos = list(dict.fromkeys(arquivos))
+    resultados: Dict[str, Tuple] = {}
+    pendentes: List[Tuple[str, Optional[Tuple[str, str, str]]]] = []
+    for arquivo in arquivos:
+        chave = _chave_conteudo(arquivo, diretorio_projeto)
+        with _cache_lock:
+            hit = _lint_cache.get(chave) if chave else None
+            if hit is not None:
+                _lint_cache.move_to_end(chave)
+        if hit is not None:
+            resultados[arquivo] = hit
+        else:
+            pendentes.append((arquivo, chave))
+
+    def _um(item: Tuple[str, Optional[Tuple[str, str, str]]]) -> Tuple[str, Optional[Tuple[str, str, str]], Tuple, float]:
+        arquivo, chave = item
+        t0 = time.perf_counter()
+        return arquivo, chave, executar_linter(arquivo, diretorio_projeto), time.perf_counter() - t0
+
+    soma = 0.0
+    workers = max(1, min(max_workers or LINT_WORKERS, len(pendentes) or 1))
+    if pendentes:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yui-lint") as pool:
+            for arquivo, chave, resultado, dur in pool.map(_um, pendentes):
+                resultados[arquivo] = resultado
+                soma += dur
+                if chave is not None and _cacheavel(resultado):
+                    with _cache_lock:
+                        _lint_cache[chave] = resultado
+                        while len(_lint_cache) > LINT_CACHE_MAX:
+                            _lint_cache.popitem(last=False)
+
+    hits = len(arquivos) - len(pendentes)
+    _lote_stats["lotes"] += 1
+    _lote_stats["arquivos"] += len(arquivos)
+    _lote_stats["cache_hits"] += hits
+    return {
+        "resultados": resultados,
+        "sucesso": all(r[0] for r in resultados.values()),
+        "tempo": {
+            "total_s": round(time.perf_counter() - inicio, 4),
+            "soma_s": round(soma, 4),
+            "cache_hits": hits,
+            "executados": len(pendentes),
+            "workers": workers if pendentes else 0,
+        },
+    }
+
+
+def lint_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return dict(_lote_stats, **_warm_stats, cache=len(_lint_cache), warm_idle=len(_warm_idle))
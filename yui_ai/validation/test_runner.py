@@ -2,10 +2,20 @@
 Executor de testes automatizados.
 
 Detecta e executa testes se existirem.
+executar_testes_afetados: seleção incremental (só testes afetados, cache por hash, shards paralelos).
 """
 
+import hashlib
+import json
 import subprocess
 import os
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
 
@@ -195,3 +205,240 @@ def _executar_jest(raiz: str) -> Tuple[bool, Optional[str], Optional[str], Dict]
 
     except Exception as e:
         return False, None, f"Erro ao executar jest: {str(e)}", {"framework": "jest", "testes_executados": 0, "testes_passaram": 0, "testes_falharam": 0}
+
+
+# ---------- seleção incremental de testes ----------
+#
+# executar_testes roda a suíte inteira num processo novo a cada edição.
+# executar_testes_afetados:
+# - liga cada arquivo de teste aos módulos que ele importa (fecho transitivo no
+#   grafo de dependências persistente, yui_ai/analyzer/dependency_mapper), mais
+#   os conftest.py das pastas acima dele
+# - seleciona só os testes cujo fecho contém algum arquivo alterado
+# - chave de cache = hash dos conteúdos do fecho; teste que passou com a mesma
+#   chave não roda de novo
+# - os selecionados rodam em shards de pytest paralelos (um processo por shard)
+# Dados que não são .py (fixtures, json) não entram na chave.
+
+TEST_SHARDS = max(1, int(os.environ.get("YUI_TEST_SHARDS", str(min(4, os.cpu_count() or 1)))))
+SHARD_TIMEOUT = 300
+
+_CACHE_DIR: Optional[str] = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache_dir() -> str:
+    global _CACHE_DIR
+    if _CACHE_DIR is not None:
+        return _CACHE_DIR
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    _CACHE_DIR = os.path.join(base, "Yui", "test_cache")
+    return _CACHE_DIR
+
+
+def _cache_path(raiz: str) -> str:
+    nome = hashlib.sha1(raiz.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return os.path.join(_get_cache_dir(), nome + ".json")
+
+
+def _carregar_cache(raiz: str) -> Dict:
+    try:
+        with open(_cache_path(raiz), "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if dados.get("raiz") == raiz:
+            return dados
+    except (OSError, ValueError):
+        pass
+    return {"raiz": raiz, "passaram": {}, "hashes": {}}
+
+
+def _salvar_cache(raiz: str, dados: Dict) -> None:
+    path = _cache_path(raiz)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dados, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _eh_teste(rel: str) -> bool:
+    nome = rel.rsplit("/", 1)[-1]
+    return nome.endswith(".py") and (nome.startswith("test_") or nome.endswith("_test.py"))
+
+
+def _hash_arquivo(raiz: str, rel: str, hashes: Dict[str, list]) -> str:
+    """sha1 do conteúdo, reaproveitado enquanto tamanho e mtime não mudam."""
+    path = os.path.join(raiz, rel)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    memo = hashes.get(rel)
+    if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+        return memo[2]
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ""
+    hashes[rel] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+
+def mapear_testes(raiz: str) -> Dict[str, List[str]]:
+    """Arquivo de teste (rel) → arquivos do projeto (rel) de que ele depende, incluindo ele mesmo."""
+    from yui_ai.analyzer.dependency_mapper import get_dependency_graph
+
+    graph = get_dependency_graph(raiz)
+    conftests = {rel.rsplit("/", 1)[0] if "/" in rel else "": rel
+                 for rel in graph.files if rel.rsplit("/", 1)[-1] == "conftest.py"}
+    mapa: Dict[str, List[str]] = {}
+    for rel, entry in graph.files.items():
+        if not _eh_teste(rel) or graph.modules.get(entry["module"]) != rel:
+            continue
+        inicio = [entry["module"]]
+        pasta = rel.rsplit("/", 1)[0] if "/" in rel else ""
+        while True:
+            if pasta in conftests:
+                inicio.append(graph.files[conftests[pasta]]["module"])
+            if not pasta:
+                break
+            pasta = pasta.rsplit("/", 1)[0] if "/" in pasta else ""
+        vistos = set(inicio)
+        fila = deque(inicio)
+        while fila:
+            atual = fila.popleft()
+            # importar pkg.a executa pkg/__init__.py antes: pacotes pai entram no fecho
+            pais = [atual.rsplit(".", i)[0] for i in range(1, atual.count(".") + 1)]
+            for dep in list(graph.adj.get(atual, ())) + pais:
+                if dep not in vistos:
+                    vistos.add(dep)
+                    fila.append(dep)
+        mapa[rel] = sorted(graph.modules[m] for m in vistos if m in graph.modules)
+    return mapa
+
+
+def _rodar_shard(raiz: str, arquivos: List[str]) -> Tuple[int, str, Dict[str, bool], Dict[str, int]]:
+    """Roda um shard de pytest; devolve (rc, saida, arquivo → passou, contagens)."""
+    fd, xml_path = tempfile.mkstemp(prefix="yui-shard-", suffix=".xml")
+    os.close(fd)
+    try:
+        cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", f"--junitxml={xml_path}"] + arquivos
+        resultado = subprocess.run(cmd, cwd=raiz, capture_output=True, text=True, timeout=SHARD_TIMEOUT)
+        saida = resultado.stdout + resultado.stderr
+        contagens = {"executados": 0, "falharam": 0}
+        modulos = {a[:-3].replace("/", "."): a for a in arquivos}
+        com_casos: Dict[str, bool] = {}  # arquivo → nenhum caso falhou
+        try:
+            casos = list(ET.parse(xml_path).getroot().iter("testcase"))
+        except (OSError, ET.ParseError):
+            casos = None
+        if casos is None:
+            return resultado.returncode, saida, {a: resultado.returncode == 0 for a in arquivos}, contagens
+        for caso in casos:
+            falhou = any(filho.tag in ("failure", "error") for filho in caso)
+            contagens["executados"] += 1
+            contagens["falharam"] += int(falhou)
+            classe = caso.get("classname", "")
+            dono = max((m for m in modulos if classe == m or classe.startswith(m + ".")), key=len, default=None)
+            if dono is not None:
+                arquivo = modulos[dono]
+                com_casos[arquivo] = com_casos.get(arquivo, True) and not falhou
+        if resultado.returncode == 0:
+            passou = {a: True for a in arquivos}
+        else:
+            # Só confirma arquivos com casos registrados e sem falha (erro de coleta não confirma nada)
+            passou = {a: com_casos.get(a, False) for a in arquivos}
+        return resultado.returncode, saida, passou, contagens
+    finally:
+        try:
+            os.remove(xml_path)
+        except OSError:
+            pass
+
+
+def executar_testes_afetados(
+    arquivos_alterados: Optional[List[str]] = None,
+    diretorio_projeto: Optional[str] = None,
+    max_shards: Optional[int] = None,
+    usar_cache: bool = True,
+) -> Tuple[bool, Optional[str], Optional[str], Dict]:
+    """
+    Roda só os testes afetados (pytest). arquivos_alterados (absolutos ou relativos à raiz)
+    restringe a seleção aos testes que dependem deles; sem a lista, todos os testes são
+    candidatos e o cache decide. Testes que já passaram com o mesmo conteúdo no fecho
+    de dependências não rodam de novo.
+
+    Retorna o mesmo formato de executar_testes; detalhes ganha
+    "selecionados", "em_cache", "shards" e "tempo_s".
+    """
+    inicio = time.perf_counter()
+    raiz = os.path.abspath(diretorio_projeto or os.getcwd())
+    mapa = mapear_testes(raiz)
+    detalhes = {"framework": "pytest", "testes_executados": 0, "testes_passaram": 0, "testes_falharam": 0,
+                "selecionados": [], "em_cache": [], "shards": 0, "tempo_s": 0.0}
+    if not mapa:
+        detalhes["framework"] = "nenhum"
+        return True, "Nenhum arquivo de teste encontrado", None, detalhes
+
+    alterados = None
+    if arquivos_alterados is not None:
+        alterados = {
+            os.path.relpath(os.path.abspath(os.path.join(raiz, a)), raiz).replace(os.sep, "/")
+            for a in arquivos_alterados
+        }
+
+    with _cache_lock:
+        cache = _carregar_cache(raiz)
+    chaves: Dict[str, str] = {}
+    candidatos: List[str] = []
+    for teste, deps in sorted(mapa.items()):
+        if alterados is not None and not alterados.intersection(deps):
+            continue
+        h = hashlib.sha1()
+        for rel in deps:
+            h.update(rel.encode("utf-8", "surrogatepass") + b"\0" + _hash_arquivo(raiz, rel, cache["hashes"]).encode() + b"\0")
+        chaves[teste] = h.hexdigest()
+        if usar_cache and cache["passaram"].get(teste) == chaves[teste]:
+            detalhes["em_cache"].append(teste)
+        else:
+            candidatos.append(teste)
+    detalhes["selecionados"] = candidatos
+
+    if not candidatos:
+        with _cache_lock:
+            _salvar_cache(raiz, cache)
+        detalhes["tempo_s"] = round(time.perf_counter() - inicio, 3)
+        return True, f"Nenhum teste afetado ({len(detalhes['em_cache'])} em cache)", None, detalhes
+
+    n_shards = max(1, min(max_shards or TEST_SHARDS, len(candidatos)))
+    shards = [candidatos[i::n_shards] for i in range(n_shards)]
+    detalhes["shards"] = n_shards
+    saidas: List[str] = []
+    sucesso = True
+    try:
+        with ThreadPoolExecutor(max_workers=n_shards, thread_name_prefix="yui-tests") as pool:
+            for rc, saida, passou, contagens in pool.map(lambda arqs: _rodar_shard(raiz, arqs), shards):
+                saidas.append(saida)
+                sucesso = sucesso and rc == 0
+                detalhes["testes_executados"] += contagens["executados"]
+                detalhes["testes_falharam"] += contagens["falharam"]
+                for teste, ok in passou.items():
+                    if ok:
+                        cache["passaram"][teste] = chaves[teste]
+                    else:
+                        cache["passaram"].pop(teste, None)
+    except subprocess.TimeoutExpired:
+        detalhes["tempo_s"] = round(time.perf_counter() - inicio, 3)
+        return False, None, f"Timeout ao executar testes (limite: {SHARD_TIMEOUT}s por shard)", detalhes
+    except FileNotFoundError:
+        return True, "pytest não encontrado", None, detalhes
+    detalhes["testes_passaram"] = detalhes["testes_executados"] - detalhes["testes_falharam"]
+    with _cache_lock:
+        _salvar_cache(raiz, cache)
+    detalhes["tempo_s"] = round(time.perf_counter() - inicio, 3)
+    saida = "\n".join(saidas)
+    return sucesso, saida, None if sucesso else saida, detalhes
@@ -4,10 +4,12 @@ Engine de validação completa pós-edição.
 Executa todas as validações após aplicar código e relata resultados.
 """
 
-from typing import Dict, List, Optional, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 from yui_ai.validation.syntax_validator import validar_sintaxe
-from yui_ai.validation.test_runner import executar_testes
-from yui_ai.validation.linter_runner import executar_linter
+from yui_ai.validation.test_runner import executar_testes, executar_testes_afetados
+from yui_ai.validation.linter_runner import LINT_WORKERS, executar_linter, executar_linters_em_lote
 
 
 class ValidationEngine:
@@ -94,6 +96,64 @@ class ValidationEngine:
 
         return resultados
 
+    def validar_lote(
+        self,
+        arquivos: Iterable[str],
+        diretorio_projeto: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        incluir_testes: bool = False,
+    ) -> Dict:
+        """
+        Valida vários arquivos editados de uma vez: sintaxe e linter em paralelo no
+        pool (node --check e os linters são processos), linter com cache por hash.
+        incluir_testes: roda uma vez, para o lote todo, só os testes afetados
+        (executar_testes_afetados, exige diretorio_projeto).
+
+        Retorna: {
+            "sucesso_geral": bool,
+            "arquivos": {arquivo: {"sintaxe": {...}, "linter": {...}}},
+            "testes": {...} (com incluir_testes),
+            "tempo": {"total_s", "sintaxe_s", "linter": {...}}
+        }
+        """
+        inicio = time.perf_counter()
+        arquivos = list(dict.fromkeys(arquivos))
+        workers = max(1, min(max_workers or LINT_WORKERS, len(arquivos) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yui-valid") as pool:
+            t0 = time.perf_counter()
+            sintaxes = list(pool.map(validar_sintaxe, arquivos))
+            sintaxe_s = time.perf_counter() - t0
+        lint = executar_linters_em_lote(arquivos, diretorio_projeto, max_workers=workers)
+
+        por_arquivo: Dict[str, Dict] = {}
+        tem_erros = False
+        for arquivo, (ok, saida, erro) in zip(arquivos, sintaxes):
+            l_ok, l_saida, l_erro, l_detalhes = lint["resultados"][arquivo]
+            por_arquivo[arquivo] = {
+                "sintaxe": {"sucesso": ok, "saida": saida, "erro": erro},
+                "linter": {"sucesso": l_ok, "saida": l_saida, "erro": l_erro, "detalhes": l_detalhes},
+            }
+            tem_erros = tem_erros or not ok or not l_ok
+
+        testes = None
+        if incluir_testes and diretorio_projeto:
+            t_ok, t_saida, t_erro, t_detalhes = executar_testes_afetados(arquivos, diretorio_projeto)
+            testes = {"sucesso": t_ok, "saida": t_saida, "erro": t_erro, "detalhes": t_detalhes}
+            tem_erros = tem_erros or not t_ok
+
+        resultado = {
+            "sucesso_geral": not tem_erros,
+            "arquivos": por_arquivo,
+            "testes": testes,
+            "tempo": {
+                "total_s": round(time.perf_counter() - inicio, 4),
+                "sintaxe_s": round(sintaxe_s, 4),
+                "linter": lint["tempo"],
+            },
+        }
+        self.resultados_validacao.append(resultado)
+        return resultado
+
     def _gerar_resumo(self, resultados: Dict) -> str:
         """Gera resumo legível dos resultados."""
         linhas = []